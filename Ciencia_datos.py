@@ -15,22 +15,47 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import plotly.io as pio
 import dash
-from dash import Dash, dcc, html, Input, Output, no_update, callback, State, ALL
+from dash import (Dash, dcc, html, dash_table, Input, Output, no_update, callback, clientside_callback,
+                  ClientsideFunction, State, ALL)
+from dash.exceptions import MissingCallbackContextException
+from dash.dash_table import FormatTemplate
+from dash.dash_table.Format import Format, Group, Scheme
 import dash_bootstrap_components as dbc
-import glob
+from flask import Response
 import os
 import webbrowser
 import threading
-from datetime import datetime
+import atexit
+from datetime import datetime, date
+from functools import lru_cache, cached_property
 from collections import Counter
-from itertools import combinations
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
 import sys
+import time
 import base64
+import json
 import io
 import warnings
 warnings.filterwarnings('ignore')
 
+from datos_ventas import (RUTA_DATOS, buscar_archivos, cargar_ventas, mapa_meses, orden_meses,
+                          orden_dias, rangos_precio,
+                          dataset_publicado, adjuntar_dataset, adjuntar_objetos, AlmacenVentas, almacen_disponible,
+                          IndiceFechas, Filtro, SIN_FILTRO, filtrar, PartesFiltradas, como_partes, con_columnas,
+                          contar_lineas, valores_distintos, agregar_por_partes, columnas_agregacion,
+                          crear_motor, AGREGACIONES,
+                          COLUMNAS_CUBO, construir_cubo, comprimir_cubo, clave_salida, crear_cache,
+                          COLUMNAS_TABLA_PEDIDOS, TablaPedidos, COLUMNAS_DISTINTOS, crear_distintos,
+                          resumen_motivos, tabla_por_archivo, COLUMNAS_SERIES, SeriesVentas,
+                          COLUMNAS_PRONOSTICO, crear_pronosticos, TablaAnomalias,
+                          COLUMNAS_CLIENTES, IndiceClientes, SEGMENTOS_RFM, COLUMNAS_GEO, CapaGeo,
+                          COLUMNAS_PERFIL, PerfilProductos)
+from datos_ventas.calidad import MOTIVOS
+
 print("="*80)
 print("PANEL DE VENTAS 2019 - VERSIÓN DEFINITIVA".center(80))
 print("="*80)
@@ -41,206 +66,312 @@ print("="*80)
 # ============================================
 # 1. CARGA DE DATOS REALES
 # ============================================
-print("\n📂 INICIALIZANDO DATA WAREHOUSE...")
-
-ruta = r"C:\Users\USUARIO\Desktop\Ciencia de Datos\Dataset de ventas"
-archivos = glob.glob(os.path.join(ruta, "Dataset_de_ventas_*.csv"))
-
-if not archivos:
-    print("\n" + "="*80)
-    print("❌ ERROR CRÍTICO".center(80))
-    print("="*80)
-    print("\nNo se encontraron archivos CSV en la ruta:")
-    print(f"   {ruta}")
-    print("\nPor favor, verifica que:")
-    print("   1. La ruta sea correcta")
-    print("   2. Los archivos tengan el formato 'Dataset_de_ventas_*.csv'")
-    print("   3. Los archivos existan en esa ubicación")
-    print("\n" + "="*80)
-    sys.exit(1)
-
-print(f"   ✅ Archivos encontrados: {len(archivos)}")
-df_list = []
-
-for archivo in archivos:
-    nombre = os.path.basename(archivo)
-    mes = nombre.replace('Dataset_de_ventas_', '').replace('.csv', '')
-    print(f"      • Cargando: {nombre}")
-    
-    try:
-        df_temp = pd.read_csv(archivo, dtype=str)
-        df_temp = df_temp[df_temp['ID de Pedido'] != 'Order ID']
-        df_temp = df_temp.dropna(subset=['ID de Pedido'])
-        df_temp['Mes Archivo'] = mes
-        df_list.append(df_temp)
-    except Exception as e:
-        print(f"      ⚠️ Error en {nombre}: {e}")
-        continue
-
-if not df_list:
-    print("\n❌ No se pudo cargar ningún archivo válido")
-    sys.exit(1)
-
-df = pd.concat(df_list, ignore_index=True)
-print(f"\n   ✅ TOTAL: {len(df):,} registros procesados")
+# La lectura, limpieza y enriquecimiento viven en el paquete datos_ventas,
+# compartido con analisis_ventas.py (ruta configurable con VENTAS_RUTA)
+ruta = RUTA_DATOS
 
 # ============================================
-# 2. DATA WRANGLING
+# 2. KPIs GLOBALES Y CARGA DIFERIDA
 # ============================================
-print("\n🔄 PROCESANDO DATOS...")
-
-# Convertir columnas numéricas
-df['Cantidad Pedida'] = pd.to_numeric(df['Cantidad Pedida'], errors='coerce')
-df['Precio Unitario'] = pd.to_numeric(df['Precio Unitario'], errors='coerce')
-
-# Eliminar filas con valores inválidos
-df = df.dropna(subset=['Cantidad Pedida', 'Precio Unitario'])
-df = df[(df['Cantidad Pedida'] > 0) & (df['Precio Unitario'] > 0)]
-
-# Calcular ingresos
-df['Ingreso Total'] = df['Cantidad Pedida'] * df['Precio Unitario']
-
-# Procesar fechas
-print("   • Procesando fechas...")
-df['Fecha de Pedido'] = df['Fecha de Pedido'].astype(str)
-df['Fecha Pedido'] = pd.to_datetime(df['Fecha de Pedido'], format='%m/%d/%y %H:%M', errors='coerce')
-
-# Eliminar filas con fechas inválidas
-df = df.dropna(subset=['Fecha Pedido'])
-
-# Extraer componentes de fecha
-df['Fecha'] = df['Fecha Pedido'].dt.date
-df['Mes Num'] = df['Fecha Pedido'].dt.month
-df['Día'] = df['Fecha Pedido'].dt.day
-df['Hora'] = df['Fecha Pedido'].dt.hour
-df['Día Semana'] = df['Fecha Pedido'].dt.dayofweek
-df['Semana'] = df['Fecha Pedido'].dt.isocalendar().week
-df['Día del Año'] = df['Fecha Pedido'].dt.dayofyear
-
-# Mapas de meses
-mapa_meses = {
-    1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril', 5: 'Mayo', 6: 'Junio',
-    7: 'Julio', 8: 'Agosto', 9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-}
-df['Mes'] = df['Mes Num'].map(mapa_meses)
-
-# Días en español
-dias_espanol = {
-    'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles',
-    'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
-}
-df['Día Semana Nombre'] = df['Fecha Pedido'].dt.day_name().map(dias_espanol)
-df['Es Finde'] = df['Día Semana'].isin([5, 6])
-
-# ============================================
-# 3. EXTRACCIÓN DE UBICACIÓN
-# ============================================
-print("   • Procesando ubicaciones...")
-
-def extraer_ubicacion(direccion):
-    try:
-        direccion = str(direccion)
-        partes = direccion.split(',')
-        if len(partes) >= 3:
-            ciudad = partes[1].strip()
-            estado_zip = partes[2].strip().split(' ')
-            estado = estado_zip[0] if len(estado_zip) > 0 else 'Desconocido'
-            return pd.Series([ciudad, estado])
-    except:
-        pass
-    return pd.Series(['Desconocido', 'Desconocido'])
-
-df[['Ciudad', 'Estado']] = df['Dirección de Envio'].apply(extraer_ubicacion)
+def resumir_kpis(df):
+    """Sumas, pedidos distintos y agrupaciones de un tramo de líneas para calcular_kpis"""
+    return {
+        'ingresos': df['Ingreso Total'].sum(),
+        'pedidos': df['Pedido Key'].nunique(),
+        'unidades': df['Cantidad Pedida'].sum(),
+        'filas': len(df),
+        'producto': df.groupby('Producto')['Cantidad Pedida'].sum(),
+        'ciudad': df.groupby('Ciudad')['Ingreso Total'].sum(),
+        'estado': df.groupby('Estado Nombre')['Ingreso Total'].sum(),
+        'hora': df.groupby('Hora')['Pedido Key'].nunique(),
+        'dia': df.groupby('Día Semana Nombre')['Pedido Key'].nunique(),
+        'mes': df.groupby('Mes Num')['Ingreso Total'].sum(),
+        'ciudades': set(df['Ciudad'].unique()),
+        'estados': set(df['Estado Nombre'].unique()),
+        'desde': df['Fecha'].min(),
+        'hasta': df['Fecha'].max(),
+    }
 
-# ============================================
-# 4. CATEGORÍAS DE PRODUCTOS
-# ============================================
-print("   • Clasificando productos...")
-
-def asignar_categoria(producto):
-    producto = str(producto).lower()
-    if 'batteries' in producto:
-        return 'Baterías'
-    elif 'cable' in producto:
-        return 'Cables'
-    elif any(x in producto for x in ['headphones', 'airpods', 'earpods', 'bose']):
-        return 'Auriculares'
-    elif any(x in producto for x in ['monitor', 'screen']):
-        return 'Monitores'
-    elif any(x in producto for x in ['laptop', 'macbook', 'thinkpad']):
-        return 'Computadoras'
-    elif any(x in producto for x in ['phone', 'iphone']):
-        return 'Teléfonos'
-    elif 'tv' in producto:
-        return 'Televisores'
-    elif any(x in producto for x in ['washing', 'dryer', 'lg']):
-        return 'Electrodomésticos'
+def calcular_kpis(lineas):
+    """KPIs del historial: `lineas` es el DataFrame o sus partes por tramo de días (almacén). Cada parte
+    se resume por separado y se suman: un pedido cae en un solo día, así que sus conteos también se suman"""
+    print("   • Calculando KPIs...")
+    
+    resumenes = [resumir_kpis(parte) for parte in como_partes(lineas)]
+    
+    def unir(clave):
+        grupos = [r[clave] for r in resumenes]
+        return grupos[0] if len(grupos) == 1 else pd.concat(grupos).groupby(level=0).sum()
+    
+    filas = sum(r['filas'] for r in resumenes)
+    kpis = {}
+    kpis['TOTAL_INGRESOS'] = sum(r['ingresos'] for r in resumenes)
+    kpis['TOTAL_PEDIDOS'] = sum(r['pedidos'] for r in resumenes)
+    kpis['TOTAL_UNIDADES'] = sum(r['unidades'] for r in resumenes)
+    kpis['TICKET_PROMEDIO'] = kpis['TOTAL_INGRESOS'] / kpis['TOTAL_PEDIDOS'] if kpis['TOTAL_PEDIDOS'] > 0 else 0
+    kpis['PRODUCTO_TOP'] = unir('producto').idxmax() if filas else "N/A"
+    kpis['CIUDAD_TOP'] = unir('ciudad').idxmax() if filas else "N/A"
+    kpis['ESTADO_TOP'] = unir('estado').idxmax() if filas else "N/A"
+    kpis['HORA_PICO'] = unir('hora').idxmax() if filas else 0
+    kpis['DIA_PICO'] = unir('dia').idxmax() if filas else "N/A"
+    
+    # Crecimiento anual
+    ventas_por_mes = unir('mes')
+    if len(ventas_por_mes) > 1:
+        kpis['CRECIMIENTO_ANUAL'] = ((ventas_por_mes.iloc[-1] - ventas_por_mes.iloc[0]) / ventas_por_mes.iloc[0] * 100)
     else:
-        return 'Otros'
+        kpis['CRECIMIENTO_ANUAL'] = 0
+    
+    desde = [r['desde'] for r in resumenes if r['filas']]
+    hasta = [r['hasta'] for r in resumenes if r['filas']]
+    print(f"\n📊 RESUMEN DE DATOS:")
+    print(f"   • {filas:,} registros válidos")
+    print(f"   • {len(set().union(*(r['ciudades'] for r in resumenes)))} ciudades | "
+          f"{len(set().union(*(r['estados'] for r in resumenes)))} estados")
+    print(f"   • Período: {min(desde) if desde else 'N/A'} a {max(hasta) if hasta else 'N/A'}")
+    print(f"   • Ingresos totales: ${kpis['TOTAL_INGRESOS']:,.0f}")
+    print(f"   • Crecimiento: {kpis['CRECIMIENTO_ANUAL']:+.1f}%")
+    return kpis
 
-df['Categoría'] = df['Producto'].apply(asignar_categoria)
+# Columnas que usa calcular_kpis (con almacén no hace falta leer las demás)
+COLUMNAS_KPIS = ['Ingreso Total', 'Pedido Key', 'Cantidad Pedida', 'Producto', 'Ciudad', 'Estado Nombre',
+                 'Hora', 'Día Semana Nombre', 'Mes Num', 'Fecha']
 
-# Rangos de precio
-df['Rango Precio'] = pd.cut(df['Precio Unitario'], 
-                            bins=[0, 20, 100, 500, 1000, 10000],
-                            labels=['Económico', 'Medio', 'Premium', 'Alta Gama', 'Lujo'])
+# Índices del panel que se arman sobre el dataset entero y se pueden publicar con él
+INDICES_PUBLICADOS = ('pedidos', 'distintos', 'series', 'anomalias', 'clientes', 'geo', 'productos')
 
-# ============================================
-# 5. MAPA DE ESTADOS
-# ============================================
-print("   • Mapeando estados...")
-
-estados_usa = {
-    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
-    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia',
-    'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa',
-    'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland',
-    'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri',
-    'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey',
-    'NM': 'New Mexico', 'NY': 'Nueva York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio',
-    'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina',
-    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
-    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming'
-}
+class PanelVentas:
+    """Dataset, KPIs y opciones de filtros calculados la primera vez que se piden"""
+    
+    def __init__(self, ruta, compartido=None, almacen=None, motor='pandas', cliente=False):
+        self.ruta = ruta
+        # Modo cliente: la pestaña GENERAL se calcula en el navegador sobre un cubo pre-agregado
+        self.cliente = cliente
+        # Motor de las agregaciones del panel: pandas, sqlite o duckdb (datos_ventas.consultas)
+        self.nombre_motor = motor
+        # Carpeta publicada por el proceso maestro (ver gunicorn.conf.py)
+        self.compartido = compartido
+        # Almacén particionado por año/mes (python -m datos_ventas.almacen): el historial no se carga entero
+        self.almacen = AlmacenVentas(almacen) if almacen_disponible(almacen) else None
+        self.error = None
+        self.listo = False
+        # Funciones a ejecutar cuando los datos terminan de cargarse (p. ej. el precalentamiento)
+        self.al_terminar = []
+        self._lock = threading.Lock()
+        self._hilo = None
+    
+    @cached_property
+    def df(self):
+        with self._lock:
+            # Otro hilo pudo haber terminado la carga mientras esperábamos el lock
+            if 'df' in self.__dict__:
+                return self.__dict__['df']
+            if self.almacen is not None:
+                raise RuntimeError("Con almacén el historial no se carga entero: usar panel.lineas() o panel.historial()")
+            if dataset_publicado(self.compartido):
+                print(f"\n🔗 Adjuntando dataset compartido: {self.compartido}")
+                df = adjuntar_dataset(self.compartido)
+                # Índices que el proceso maestro publicó con el dataset (gunicorn.conf.py): se adjuntan
+                # por mmap en vez de armarlos en cada worker
+                publicados = adjuntar_objetos(self.compartido)
+                self.__dict__.update({n: publicados[n] for n in INDICES_PUBLICADOS if n in publicados})
+                if publicados:
+                    print(f"   • Índices adjuntados: {', '.join(n for n in INDICES_PUBLICADOS if n in publicados)}")
+                return df
+            return cargar_ventas(self.ruta)
+    
+    @cached_property
+    def indice(self):
+        return IndiceFechas(self.df['Fecha Pedido'])
+    
+    def datos(self, desde=None, hasta=None, columnas=None):
+        """Filas con fecha entre desde y hasta; el rango se resuelve por búsqueda binaria antes que cualquier filtro"""
+        if self.almacen is not None:
+            return self.almacen.leer(desde, hasta, columnas)
+        df = self.df
+        if desde is not None or hasta is not None:
+            df = df.iloc[self.indice.tramo(desde, hasta)]
+        return df if columnas is None else df[columnas]
+    
+    def lineas(self, filtro, columnas=None):
+        """Líneas del filtro con solo `columnas` (y las de sus condiciones): en memoria un DataFrame; con
+        almacén, PartesFiltradas, que se leen de a una partición por vez"""
+        if self.almacen is not None:
+            return PartesFiltradas(self.almacen, filtro, columnas or self.almacen.columnas)
+        return filtrar(self.datos, filtro, columnas)
+    
+    def historial(self, columnas):
+        """Todas las líneas con `columnas`, para armar los índices: con almacén, una partición por vez"""
+        if self.almacen is not None:
+            return self.almacen.recorrer(columnas=columnas)
+        return self.datos(columnas=columnas)
+    
+    def valores(self, columna):
+        """Valores distintos de una columna en todo el historial"""
+        return valores_distintos(self.historial([columna]), columna)
+    
+    @property
+    def version(self):
+        """Huella de los datos cargados; cambia cuando se recargan archivos distintos"""
+        return self.almacen.version if self.almacen is not None else self.df.attrs.get('version')
+    
+    @cached_property
+    def pedidos(self):
+        # Tabla de hechos por pedido: los conteos de pedidos son conteos de filas, no nunique de textos
+        return TablaPedidos(self.historial(COLUMNAS_TABLA_PEDIDOS))
+    
+    @cached_property
+    def distintos(self):
+        # Bocetos unibles por celda: pedidos, ciudades y productos del resumen sin recorrer las líneas
+        return crear_distintos(self.historial(COLUMNAS_DISTINTOS))
+    
+    @cached_property
+    def series(self):
+        # Ingresos, unidades y pedidos densos por (día, hora, segmento): tendencias y agregaciones por tiempo
+        inicio = time.perf_counter()
+        series = SeriesVentas(self.historial(COLUMNAS_SERIES))
+        print(f"\n📈 Series de tiempo: {len(series.dias)} días x {len(series.segmentos)} segmentos "
+              f"({series.bytes / 1e6:.1f} MB) en {time.perf_counter() - inicio:.1f} s")
+        return series
+    
+    @cached_property
+    def pronosticos(self):
+        # Holt-Winters por producto, categoría y estado: se ajusta una vez por versión de los datos (pool de procesos);
+        # con almacén las series diarias se suman partición por partición, y solo si no están en la caché
+        return crear_pronosticos(self.historial(COLUMNAS_PRONOSTICO), self.version)
+    
+    @cached_property
+    def anomalias(self):
+        # Días y horas atípicos de cada grupo de segmentos, sobre las series densas
+        inicio = time.perf_counter()
+        anomalias = TablaAnomalias(self.series)
+        print(f"\n🤖 Anomalías: {len(anomalias.diarias):,} días y {len(anomalias.horarias):,} horas atípicos "
+              f"en {anomalias.grupos:,} grupos ({time.perf_counter() - inicio:.1f} s)")
+        return anomalias
+    
+    @cached_property
+    def clientes(self):
+        # Clientes por dirección de envío normalizada: recompra, cohortes y RFM sin reagrupar las líneas
+        inicio = time.perf_counter()
+        clientes = IndiceClientes(self.historial(COLUMNAS_CLIENTES))
+        print(f"\n👥 Clientes: {len(clientes):,} direcciones ({clientes.bytes / 1e6:.1f} MB) "
+              f"en {time.perf_counter() - inicio:.1f} s")
+        return clientes
+    
+    @cached_property
+    def productos(self):
+        # Perfil de productos por (día, ciudad, producto, rango): el producto estrella de cada filtro y período
+        inicio = time.perf_counter()
+        productos = PerfilProductos(self.historial(COLUMNAS_PERFIL))
+        print(f"\n🏆 Perfil de productos: {len(productos):,} celdas ({productos.bytes / 1e6:.1f} MB) "
+              f"en {time.perf_counter() - inicio:.1f} s")
+        return productos
+    
+    @cached_property
+    def geo(self):
+        # Estados, ciudades y códigos postales con códigos enteros y celdas precalculadas (mapa y su detalle)
+        inicio = time.perf_counter()
+        geo = CapaGeo(self.historial(COLUMNAS_GEO))
+        print(f"\n🗺️ Capa geo: {len(geo.lugares):,} códigos postales ({geo.bytes / 1e6:.1f} MB) "
+              f"en {time.perf_counter() - inicio:.1f} s")
+        return geo
+    
+    @cached_property
+    def motor(self):
+        # Con almacén el motor pide las líneas de cada filtro en partes (ver lineas)
+        return crear_motor(self.nombre_motor, self.datos, pedidos=self.pedidos, distintos=self.distintos,
+                           series=self.series, lineas=self.lineas if self.almacen is not None else None)
+    
+    @cached_property
+    def cubo(self):
+        inicio = time.perf_counter()
+        cubo = construir_cubo(self.historial(COLUMNAS_CUBO))
+        # Las bandas de pronóstico de la tendencia también se dibujan en el navegador
+        cubo['pronosticos'] = self.pronosticos.para_cliente()
+        print(f"\n🧊 Cubo del modo cliente: {cubo['celdas']:,} celdas en {time.perf_counter() - inicio:.1f} s")
+        return cubo
+    
+    @cached_property
+    def cubo_comprimido(self):
+        # Lo que sirve la ruta del cubo: gzip propio, sin depender de flask-compress
+        comprimido = comprimir_cubo(self.cubo)
+        print(f"   • Cubo comprimido: {len(comprimido) / 1e6:.2f} MB")
+        return comprimido
+    
+    @cached_property
+    def calidad(self):
+        # Reporte de la carga (datos_ventas.calidad): del almacén, del pipeline o del dataset publicado
+        if self.almacen is not None:
+            return self.almacen.calidad()
+        return self.df.attrs.get('calidad') or self.df.attrs.get('extras', {}).get('calidad')
+    
+    @cached_property
+    def kpis(self):
+        if self.almacen is not None:
+            return self.almacen.manifiesto['extras'].get('kpis') or calcular_kpis(self.historial(COLUMNAS_KPIS))
+        publicados = self.df.attrs.get('extras', {}).get('kpis')
+        return publicados if publicados else calcular_kpis(self.df)
+    
+    @cached_property
+    def opciones(self):
+        if self.almacen is not None:
+            fecha_min, fecha_max = self.almacen.rango_fechas()
+            return {
+                'estados': ['Todos'] + sorted(self.almacen.valores('Estado Nombre')),
+                'ciudades': ['Todas'] + sorted(self.almacen.valores('Ciudad')),
+                'categorias': ['Todas'] + sorted(self.almacen.valores('Categoría')),
+                'fecha_min': fecha_min,
+                'fecha_max': fecha_max,
+            }
+        df = self.df
+        return {
+            'estados': ['Todos'] + sorted(df['Estado Nombre'].unique()),
+            'ciudades': ['Todas'] + sorted(df['Ciudad'].unique()),
+            'categorias': ['Todas'] + sorted(df['Categoría'].unique()),
+            'fecha_min': df['Fecha'].min(),
+            'fecha_max': df['Fecha'].max(),
+        }
+    
+    def calentar(self):
+        try:
+            if self.almacen is None:
+                self.df, self.indice
+            self.kpis, self.opciones, self.motor, self.pronosticos, self.anomalias, self.clientes, self.geo, self.productos
+            if self.cliente:
+                self.cubo_comprimido
+            self.listo = True
+            for funcion in self.al_terminar:
+                funcion()
+        except Exception as e:
+            self.error = str(e)
+            print(f"\n❌ Error al cargar los datos: {e}")
+    
+    def precargar(self):
+        """Carga los datos en segundo plano; el servidor responde mientras tanto"""
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self.calentar, daemon=True)
+            self._hilo.start()
+        return self._hilo
 
-# Códigos inversos para el mapa
-codigos_estados = {v: k for k, v in estados_usa.items()}
-codigos_estados['Desconocido'] = 'NA'
+MODO_CLIENTE = os.environ.get('VENTAS_CLIENTE', '').lower() in ('1', 'si', 'true')
 
-df['Estado Nombre'] = df['Estado'].map(estados_usa).fillna(df['Estado'])
-df['Estado Codigo'] = df['Estado Nombre'].map(codigos_estados).fillna('NA')
+panel = PanelVentas(ruta, compartido=os.environ.get('VENTAS_COMPARTIDO'),
+                    almacen=os.environ.get('VENTAS_ALMACEN'), motor=os.environ.get('VENTAS_MOTOR', 'pandas'),
+                    cliente=MODO_CLIENTE)
 
-# ============================================
-# 6. KPIs GLOBALES
-# ============================================
-print("   • Calculando KPIs...")
-
-TOTAL_INGRESOS = df['Ingreso Total'].sum()
-TOTAL_PEDIDOS = df['ID de Pedido'].nunique()
-TOTAL_UNIDADES = df['Cantidad Pedida'].sum()
-TICKET_PROMEDIO = TOTAL_INGRESOS / TOTAL_PEDIDOS if TOTAL_PEDIDOS > 0 else 0
-PRODUCTO_TOP = df.groupby('Producto')['Cantidad Pedida'].sum().idxmax() if not df.empty else "N/A"
-CIUDAD_TOP = df.groupby('Ciudad')['Ingreso Total'].sum().idxmax() if not df.empty else "N/A"
-ESTADO_TOP = df.groupby('Estado Nombre')['Ingreso Total'].sum().idxmax() if not df.empty else "N/A"
-HORA_PICO = df.groupby('Hora')['ID de Pedido'].nunique().idxmax() if not df.empty else 0
-DIA_PICO = df.groupby('Día Semana Nombre')['ID de Pedido'].nunique().idxmax() if not df.empty else "N/A"
-
-# Crecimiento anual
-ventas_por_mes = df.groupby('Mes Num')['Ingreso Total'].sum()
-if len(ventas_por_mes) > 1:
-    CRECIMIENTO_ANUAL = ((ventas_por_mes.iloc[-1] - ventas_por_mes.iloc[0]) / ventas_por_mes.iloc[0] * 100)
-else:
-    CRECIMIENTO_ANUAL = 0
+KPIS_GLOBALES = ('TOTAL_INGRESOS', 'TOTAL_PEDIDOS', 'TOTAL_UNIDADES', 'TICKET_PROMEDIO', 'PRODUCTO_TOP',
+                 'CIUDAD_TOP', 'ESTADO_TOP', 'HORA_PICO', 'DIA_PICO', 'CRECIMIENTO_ANUAL')
 
-print(f"\n📊 RESUMEN DE DATOS:")
-print(f"   • {len(df):,} registros válidos")
-print(f"   • {df['Ciudad'].nunique()} ciudades | {df['Estado Nombre'].nunique()} estados")
-print(f"   • Período: {df['Fecha'].min()} a {df['Fecha'].max()}")
-print(f"   • Ingresos totales: ${TOTAL_INGRESOS:,.0f}")
-print(f"   • Crecimiento: {CRECIMIENTO_ANUAL:+.1f}%")
+def __getattr__(nombre):
+    # df y los KPIs globales siguen disponibles como atributos del módulo, pero se calculan al pedirlos
+    if nombre == 'df':
+        return panel.df
+    if nombre in KPIS_GLOBALES:
+        return panel.kpis[nombre]
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 # ============================================
-# 7. EVENTOS ESPECIALES
+# 3. EVENTOS ESPECIALES
 # ============================================
 print("\n🎉 Configurando eventos especiales...")
 
@@ -269,94 +400,117 @@ def identificar_evento(fecha):
     return 'Normal'
 
 # ============================================
-# 8. FUNCIÓN PRODUCTO ESTRELLA
+# 4. FUNCIÓN PRODUCTO ESTRELLA
 # ============================================
-def analizar_producto_estrella(data, filtro_temporal):
-    if data.empty or len(data) < 10:
+def condiciones_filtro(ciudad='Todas', estado='Todos', mes='Todos', dia='Todos',
+                       categoria='Todas', rango='Todos', start=None, end=None):
+    """Filtros activos como Filtro(condiciones, desde, hasta), igual para todos los motores de consulta"""
+    desde = hasta = None
+    if start and end:
+        try:
+            desde, hasta = pd.to_datetime(start).date(), pd.to_datetime(end).date()
+        except:
+            pass
+    
+    valores = [('Estado Nombre', estado, 'Todos'), ('Ciudad', ciudad, 'Todas'), ('Mes', mes, 'Todos'),
+               ('Día Semana Nombre', dia, 'Todos'), ('Categoría', categoria, 'Todas'), ('Rango Precio', rango, 'Todos')]
+    condiciones = tuple((columna, valor) for columna, valor, todos in valores if valor != todos)
+    return Filtro(condiciones, desde, hasta)
+
+def aplicar_filtros(ciudad='Todas', estado='Todos', mes='Todos', dia='Todos',
+                    categoria='Todas', rango='Todos', start=None, end=None, columnas=None):
+    """Recorta el rango de fechas (tramo contiguo) y aplica el resto de filtros con una única máscara;
+    con almacén, las líneas llegan en partes (panel.lineas)"""
+    return panel.lineas(condiciones_filtro(ciudad, estado, mes, dia, categoria, rango, start, end), columnas)
+
+def armar_producto_estrella(perfil, filtro_temporal):
+    totales = perfil['totales']
+    if totales.empty:
         return None
     
+    producto = totales.index[0]
+    producto_top = totales.iloc[0]
+    
+    total_unidades = totales['Cantidad Pedida'].sum()
+    share_producto = (producto_top['Cantidad Pedida'] / total_unidades * 100) if total_unidades > 0 else 0
+    
+    precio_promedio = perfil['precio_promedio']
+    comparacion_precio = ((producto_top['Precio Unitario'] - precio_promedio) / precio_promedio * 100) if precio_promedio > 0 else 0
+    
+    # Análisis de estacionalidad
+    ventas_por_mes_prod = perfil['por_mes'].loc[producto]
+    mes_pico = ventas_por_mes_prod.idxmax() if not ventas_por_mes_prod.empty else "N/A"
+    
+    # Análisis de ubicación
+    ciudades_top_prod = perfil['ciudades_top'].loc[producto].index.tolist()
+    
+    # Generar insights SIMPLES
+    insights = []
+    
+    # Insight de participación
+    if share_producto > 20:
+        insights.append(f"🔥 Participación: {share_producto:.1f}% de todas las ventas (DOMINANTE)")
+    elif share_producto > 10:
+        insights.append(f"📊 Participación: {share_producto:.1f}% de las ventas (SIGNIFICATIVO)")
+    else:
+        insights.append(f"📈 Participación: {share_producto:.1f}% de las ventas (NICHO)")
+    
+    # Insight de precio
+    if comparacion_precio > 20:
+        insights.append(f"💎 Precio: ${producto_top['Precio Unitario']:.2f} ({comparacion_precio:+.1f}% más caro que el promedio) - PREMIUM")
+    elif comparacion_precio < -20:
+        insights.append(f"💰 Precio: ${producto_top['Precio Unitario']:.2f} ({comparacion_precio:+.1f}% más barato que el promedio) - ECONÓMICO")
+    else:
+        insights.append(f"⚖️ Precio: ${producto_top['Precio Unitario']:.2f} (similar al promedio) - COMPETITIVO")
+    
+    # Insight de volumen
+    if producto_top['Cantidad Pedida'] > 1000:
+        insights.append(f"📦 Volumen: {producto_top['Cantidad Pedida']:,.0f} unidades (ALTO)")
+    elif producto_top['Cantidad Pedida'] > 500:
+        insights.append(f"📦 Volumen: {producto_top['Cantidad Pedida']:,.0f} unidades (MEDIO)")
+    else:
+        insights.append(f"📦 Volumen: {producto_top['Cantidad Pedida']:,.0f} unidades (BAJO)")
+    
+    # Factores de éxito
+    factores_exito = [
+        f"📅 Pico de ventas: {mes_pico}",
+        f"📍 Principales ciudades: {', '.join(ciudades_top_prod[:2])}",
+    ]
+    
+    return {
+        'producto': producto,
+        'unidades': producto_top['Cantidad Pedida'],
+        'ingresos': producto_top['Ingreso Total'],
+        'pedidos': producto_top['Pedido Key'],
+        'precio': producto_top['Precio Unitario'],
+        'share': share_producto,
+        'comparacion_precio': comparacion_precio,
+        'insights': insights,
+        'factores_exito': factores_exito,
+        'mes_pico': mes_pico,
+        'ciudades_top': ciudades_top_prod,
+        'filtro_aplicado': filtro_temporal
+    }
+
+@lru_cache(maxsize=256)
+def _producto_estrella(version, filtros, filtro_prod):
+    # La versión de los datos va en la clave: al recargar otros archivos no se reusa un análisis viejo
+    resultado = panel.productos.analizar(condiciones_filtro(*filtros), filtro_prod, mes=filtros[2])
+    if resultado is None or resultado[0] is None:
+        return None
+    perfil, filtro_temporal = resultado
     try:
-        ventas_productos = data.groupby('Producto').agg({
-            'Cantidad Pedida': 'sum',
-            'Ingreso Total': 'sum',
-            'ID de Pedido': 'nunique',
-            'Precio Unitario': 'mean'
-        }).reset_index()
-        
-        ventas_productos = ventas_productos.sort_values('Cantidad Pedida', ascending=False)
-        
-        if ventas_productos.empty:
-            return None
-        
-        producto_top = ventas_productos.iloc[0]
-        
-        total_unidades = ventas_productos['Cantidad Pedida'].sum()
-        share_producto = (producto_top['Cantidad Pedida'] / total_unidades * 100) if total_unidades > 0 else 0
-        
-        precio_promedio = data['Precio Unitario'].mean()
-        comparacion_precio = ((producto_top['Precio Unitario'] - precio_promedio) / precio_promedio * 100) if precio_promedio > 0 else 0
-        
-        # Análisis de estacionalidad
-        datos_producto = data[data['Producto'] == producto_top['Producto']]
-        ventas_por_mes_prod = datos_producto.groupby('Mes')['Cantidad Pedida'].sum()
-        mes_pico = ventas_por_mes_prod.idxmax() if not ventas_por_mes_prod.empty else "N/A"
-        
-        # Análisis de ubicación
-        ciudades_top_prod = datos_producto.groupby('Ciudad')['Cantidad Pedida'].sum().nlargest(3).index.tolist()
-        
-        # Generar insights SIMPLES
-        insights = []
-        
-        # Insight de participación
-        if share_producto > 20:
-            insights.append(f"🔥 Participación: {share_producto:.1f}% de todas las ventas (DOMINANTE)")
-        elif share_producto > 10:
-            insights.append(f"📊 Participación: {share_producto:.1f}% de las ventas (SIGNIFICATIVO)")
-        else:
-            insights.append(f"📈 Participación: {share_producto:.1f}% de las ventas (NICHO)")
-        
-        # Insight de precio
-        if comparacion_precio > 20:
-            insights.append(f"💎 Precio: ${producto_top['Precio Unitario']:.2f} ({comparacion_precio:+.1f}% más caro que el promedio) - PREMIUM")
-        elif comparacion_precio < -20:
-            insights.append(f"💰 Precio: ${producto_top['Precio Unitario']:.2f} ({comparacion_precio:+.1f}% más barato que el promedio) - ECONÓMICO")
-        else:
-            insights.append(f"⚖️ Precio: ${producto_top['Precio Unitario']:.2f} (similar al promedio) - COMPETITIVO")
-        
-        # Insight de volumen
-        if producto_top['Cantidad Pedida'] > 1000:
-            insights.append(f"📦 Volumen: {producto_top['Cantidad Pedida']:,.0f} unidades (ALTO)")
-        elif producto_top['Cantidad Pedida'] > 500:
-            insights.append(f"📦 Volumen: {producto_top['Cantidad Pedida']:,.0f} unidades (MEDIO)")
-        else:
-            insights.append(f"📦 Volumen: {producto_top['Cantidad Pedida']:,.0f} unidades (BAJO)")
-        
-        # Factores de éxito
-        factores_exito = [
-            f"📅 Pico de ventas: {mes_pico}",
-            f"📍 Principales ciudades: {', '.join(ciudades_top_prod[:2])}",
-        ]
-        
-        return {
-            'producto': producto_top['Producto'],
-            'unidades': producto_top['Cantidad Pedida'],
-            'ingresos': producto_top['Ingreso Total'],
-            'pedidos': producto_top['ID de Pedido'],
-            'precio': producto_top['Precio Unitario'],
-            'share': share_producto,
-            'comparacion_precio': comparacion_precio,
-            'insights': insights,
-            'factores_exito': factores_exito,
-            'mes_pico': mes_pico,
-            'ciudades_top': ciudades_top_prod,
-            'filtro_aplicado': filtro_temporal
-        }
+        return armar_producto_estrella(perfil, filtro_temporal)
     except Exception as e:
         print(f"   ⚠️ Error en análisis de producto: {e}")
         return None
 
+def producto_estrella(filtros, filtro_prod):
+    """Producto estrella del perfil precalculado, memoizado por (versión de los datos, filtros, tipo de análisis)"""
+    return _producto_estrella(panel.version, filtros, filtro_prod)
+
 # ============================================
-# 9. TABLA EXPLICATIVA SIMPLIFICADA
+# 5. TABLA EXPLICATIVA SIMPLIFICADA
 # ============================================
 tabla_explicativa = dbc.Card([
     dbc.CardHeader("📚 ¿CÓMO INTERPRETAR ESTOS DATOS?", className="bg-info text-white fw-bold"),
@@ -397,36 +551,188 @@ tabla_explicativa = dbc.Card([
 ], className="shadow-sm mb-3")
 
 # ============================================
-# 10. FUNCIÓN PARA PRODUCTOS COMPLEMENTARIOS
+# 6. FUNCIÓN PARA PRODUCTOS COMPLEMENTARIOS
 # ============================================
+def contar_pares(data):
+    """Veces y primer pedido de cada par de productos comprados juntos"""
+    # Productos distintos de cada pedido con más de uno; los pares salen de un
+    # cruce del pedido consigo mismo (A < B), sin recorrer los pedidos en Python;
+    # el producto pasa a texto porque en el dataset compartido es una categoría sin orden
+    lineas = data[['Pedido Key', 'Producto']].drop_duplicates().astype({'Producto': str})
+    multi = lineas[lineas.duplicated('Pedido Key', keep=False)]
+    pares = multi.merge(multi, on='Pedido Key', suffixes=(' A', ' B'))
+    pares = pares[pares['Producto A'] < pares['Producto B']]
+    return pares.groupby(['Producto A', 'Producto B']).agg(veces=('Pedido Key', 'size'), primero=('Pedido Key', 'min'))
+
 def analizar_productos_complementarios(data):
-    if data.empty or len(data) < 100:
-        return []
-    
     try:
-        pedidos = data.groupby('ID de Pedido')['Producto'].agg(list).reset_index()
-        multi = pedidos[pedidos['Producto'].apply(len) > 1]
-        
-        if len(multi) == 0:
+        # Por partes: un pedido cae en una sola, así que las veces se suman y el primer pedido es el mínimo
+        filas, conteos = 0, []
+        for parte in como_partes(data):
+            filas += len(parte)
+            conteos.append(contar_pares(parte))
+        if filas < 100:
+            return []
+        conteo = conteos[0] if len(conteos) == 1 else \
+            pd.concat(conteos).groupby(level=[0, 1]).agg(veces=('veces', 'sum'), primero=('primero', 'min'))
+        if conteo.empty:
             return []
         
-        pares = []
-        for productos in multi['Producto']:
-            if len(productos) > 1:
-                productos_ordenados = sorted(set(productos))
-                pares.extend(combinations(productos_ordenados, 2))
-        
-        top_pares = Counter(pares).most_common(5)
+        # Empates en el mismo orden que Counter.most_common: primero el par que aparece
+        # en el pedido de menor ID y, dentro del pedido, en orden alfabético
+        conteo = conteo.reset_index().sort_values(['veces', 'primero', 'Producto A', 'Producto B'],
+                                    ascending=[False, True, True, True], kind='stable')
+        top_pares = [((a, b), int(c)) for a, b, c in conteo[['Producto A', 'Producto B', 'veces']].head(5).itertuples(index=False)]
         return top_pares
     except:
         return []
 
 # ============================================
-# 11. FUNCIÓN PARA GENERAR INFORMES
+# 7. COMPARADOR Y RANKING DE PERÍODOS
 # ============================================
+# Período -> (columna que identifica cada ventana, posición dentro de la ventana, título del eje);
+# las ventanas llevan el año ('2019-01', '2019-W01', '2019-T1'), así que no se mezclan entre años
+periodos_comparador = {
+    'Mes': ('Año Mes', 'Día', 'Día del Mes'),
+    'Semana': ('Semana', 'Día Semana', 'Día de la Semana'),
+    'Trimestre': ('Trimestre', 'Día del Trimestre', 'Día del Trimestre'),
+    'Año': ('Año', 'Día del Año', 'Día del Año'),
+    'Rangos': ('Ventana', 'Día de la Ventana', 'Día desde el inicio del rango'),
+}
+
+def etiqueta_periodo(periodo, valor):
+    if periodo == 'Mes':
+        anio, mes = str(valor).split('-')
+        return f"{mapa_meses[int(mes)]} {anio}"
+    if periodo == 'Semana':
+        anio, semana = str(valor).split('-W')
+        return f"Semana {int(semana)} de {anio}"
+    if periodo == 'Trimestre':
+        anio, trimestre = str(valor).split('-')
+        return f"{trimestre} {anio}"
+    return str(valor)
+
+def ventanas_rangos(rango_a, rango_b):
+    """Los dos rangos de fechas del comparador como {etiqueta: (desde, hasta)}; los incompletos se omiten"""
+    ventanas = {}
+    for nombre, (desde, hasta) in zip('AB', (rango_a, rango_b)):
+        if desde and hasta:
+            desde, hasta = pd.to_datetime(desde).date(), pd.to_datetime(hasta).date()
+            ventanas[f"{nombre}: {desde:%d/%m/%Y} - {hasta:%d/%m/%Y}"] = (desde, hasta)
+    return ventanas
+
+# Columnas de ventana y posición de todos los períodos menos 'Rangos', que las arma desde 'Fecha Pedido'
+COLUMNAS_COMPARADOR = list(dict.fromkeys(c for p, (v, d, _) in periodos_comparador.items() if p != 'Rangos' for c in (v, d)))
+
+def _diario_comparador(data, periodo, seleccion):
+    """Ingresos, pedidos y unidades por (ventana, posición) de las líneas"""
+    columna, posicion, _ = periodos_comparador[periodo]
+    if periodo == 'Rangos':
+        # Los rangos pueden solaparse: cada uno toma sus filas por separado
+        partes = []
+        fechas = data['Fecha Pedido'].dt.normalize()
+        for etiqueta, (desde, hasta) in seleccion:
+            parte = data[(fechas >= pd.Timestamp(desde)) & (fechas <= pd.Timestamp(hasta))]
+            partes.append(parte.assign(**{columna: etiqueta,
+                                          posicion: (fechas[parte.index] - pd.Timestamp(desde)).dt.days + 1}))
+        data = pd.concat(partes) if partes else data.iloc[:0].assign(**{columna: '', posicion: 0})
+    else:
+        data = data[data[columna].isin(seleccion)]
+    
+    return data.groupby([columna, posicion]).agg(
+        ingresos=('Ingreso Total', 'sum'),
+        pedidos=('Pedido Key', 'nunique'),
+        unidades=('Cantidad Pedida', 'sum')
+    )
+
+def agregar_comparador(data, periodo, seleccion):
+    """Agrega una sola vez por (ventana, posición) y deriva de ahí KPIs, tendencia y tabla.
+    Con 'Rangos', `seleccion` son pares (etiqueta, (desde, hasta)) y la posición cuenta días desde el inicio"""
+    columna, posicion, _ = periodos_comparador[periodo]
+    # Cada (ventana, posición) es un día: en partes por tramo de días los agregados se suman
+    diarios = [_diario_comparador(parte, periodo, seleccion) for parte in como_partes(data)]
+    diario = (diarios[0] if len(diarios) == 1 else pd.concat(diarios).groupby(level=[0, 1]).sum()).reset_index()
+    if periodo == 'Rangos':
+        seleccion = [etiqueta for etiqueta, _ in seleccion]
+    
+    # Cada pedido pertenece a un único día, así que los totales por ventana
+    # se obtienen sumando el agregado diario sin volver a recorrer las filas
+    totales = diario.groupby(columna)[['ingresos', 'pedidos', 'unidades']].sum()
+    orden = [v for v in seleccion if v in totales.index]
+    return diario, totales.reindex(orden)
+
+def opciones_comparador(periodo):
+    """(opciones, selección inicial) del selector de ventanas: todas las del período en orden, las 3 primeras elegidas"""
+    if periodo == 'Rangos':
+        return [], []
+    columna = periodos_comparador[periodo][0]
+    valores = sorted(panel.valores(columna))
+    return [{'label': etiqueta_periodo(periodo, v), 'value': v} for v in valores], valores[:3]
+
+# Período -> (columna que se muestra, columna que da el orden cronológico)
+periodos_ranking = {
+    'Mes': ('Mes', 'Mes Num'),
+    'Semana': ('Semana', 'Semana'),
+    'Día': ('Fecha', 'Fecha'),
+    'Hora': ('Hora', 'Hora'),
+    'Estado': ('Estado Nombre', 'Estado Nombre'),
+}
+
+def ranking_por_periodo(data, periodo, n=1, valor='Cantidad Pedida', clave='Producto'):
+    """Top-n de `clave` dentro de cada período, en una sola pasada sobre el agregado"""
+    columna, orden = periodos_ranking[periodo]
+    grupos = list(dict.fromkeys([orden, columna]))
+    
+    agregado = agregar_por_partes(data, grupos + [clave], {valor: (valor, 'sum')}).reset_index()
+    # Orden estable: ante empates se conserva el primero alfabético, como idxmax
+    agregado = agregado.sort_values(grupos + [valor], ascending=[True] * len(grupos) + [False], kind='stable')
+    top = agregado.groupby(grupos, sort=False).head(n).copy()
+    top['Ranking'] = top.groupby(grupos, sort=False).cumcount() + 1
+    return top[[columna, 'Ranking', clave, valor]].reset_index(drop=True)
+
+# ============================================
+# 8. TABLAS DE DATOS
+# ============================================
+FILAS_POR_PAGINA = 15
+
+# El formato lo aplica el navegador: los registros viajan con sus valores numéricos
+formatos_columna = {
+    'texto': {},
+    'entero': {'type': 'numeric', 'format': Format(group=Group.yes, precision=0, scheme=Scheme.fixed)},
+    'moneda': {'type': 'numeric', 'format': FormatTemplate.money(0)},
+    'moneda2': {'type': 'numeric', 'format': FormatTemplate.money(2)},
+}
+
+def tabla_datos(df, columnas):
+    """Convierte un DataFrame en DataTable en un solo paso (columnas: {columna: (título, tipo)}).
+    Paginación y orden en el navegador: los registros viajan con la salida que contiene la tabla,
+    así que no dependen de estado del servidor (sesión, worker o caché de figuras)"""
+    return dash_table.DataTable(
+        data=df[list(columnas)].to_dict('records'),
+        columns=[dict(name=titulo, id=c, **formatos_columna[tipo]) for c, (titulo, tipo) in columnas.items()],
+        page_action='native',
+        page_size=FILAS_POR_PAGINA,
+        sort_action='native',
+        style_table={'overflowX': 'auto'},
+        style_cell={'fontFamily': 'inherit', 'fontSize': '0.875rem', 'padding': '4px 8px', 'textAlign': 'left'},
+        style_cell_conditional=[{'if': {'column_type': 'numeric'}, 'textAlign': 'right'}],
+        style_header={'fontWeight': 'bold', 'backgroundColor': '#f8f9fa'},
+        style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': '#f2f2f2'}],
+    )
+
+# ============================================
+# 9. FUNCIÓN PARA GENERAR INFORMES
+# ============================================
+# Columnas de las líneas que resume el informe
+COLUMNAS_INFORME = ['Fecha', 'Ingreso Total', 'Pedido Key', 'Cantidad Pedida']
+
 def generar_informe_html(titulo, data, tablas=None):
     """Genera un informe HTML para exportar"""
     
+    totales = agregar_por_partes(con_columnas(data, COLUMNAS_INFORME), [], {
+        'desde': ('Fecha', 'min'), 'hasta': ('Fecha', 'max'), 'filas': ('Fecha', 'size'),
+        'ingresos': ('Ingreso Total', 'sum'), 'pedidos': ('Pedido Key', 'nunique'),
+        'unidades': ('Cantidad Pedida', 'sum')}).to_dict('records')[0]
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     html_content = f"""
@@ -450,26 +756,26 @@ def generar_informe_html(titulo, data, tablas=None):
     <body>
         <h1>{titulo}</h1>
         <p>Generado el: {timestamp}</p>
-        <p>Período analizado: {data['Fecha'].min()} a {data['Fecha'].max()}</p>
-        <p>Total de registros: {len(data):,}</p>
+        <p>Período analizado: {totales['desde']} a {totales['hasta']}</p>
+        <p>Total de registros: {totales['filas']:,}</p>
         
         <h2>KPIs Principales</h2>
         <div>
             <div class="kpi-card">
                 <div class="kpi-label">Ingresos Totales</div>
-                <div class="kpi-value">${data['Ingreso Total'].sum():,.0f}</div>
+                <div class="kpi-value">${totales['ingresos']:,.0f}</div>
             </div>
             <div class="kpi-card">
                 <div class="kpi-label">Pedidos</div>
-                <div class="kpi-value">{data['ID de Pedido'].nunique():,}</div>
+                <div class="kpi-value">{totales['pedidos']:,}</div>
             </div>
             <div class="kpi-card">
                 <div class="kpi-label">Unidades Vendidas</div>
-                <div class="kpi-value">{data['Cantidad Pedida'].sum():,}</div>
+                <div class="kpi-value">{totales['unidades']:,}</div>
             </div>
             <div class="kpi-card">
                 <div class="kpi-label">Ticket Promedio</div>
-                <div class="kpi-value">${data['Ingreso Total'].sum() / data['ID de Pedido'].nunique():,.2f}</div>
+                <div class="kpi-value">${totales['ingresos'] / totales['pedidos']:,.2f}</div>
             </div>
         </div>
     """
@@ -492,20 +798,12 @@ def generar_informe_html(titulo, data, tablas=None):
     return html_content
 
 # ============================================
-# 12. CONFIGURACIÓN DASHBOARD
+# 10. CONFIGURACIÓN DASHBOARD
 # ============================================
-print("\n🚀 Inicializando dashboard...")
-
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-app.title = "Panel de Ventas 2019"
-
-# Opciones para filtros
+# Opciones para filtros (las que dependen de los datos están en panel.opciones)
 meses_list = ['Todos'] + list(mapa_meses.values())
-estados_list = ['Todos'] + sorted(df['Estado Nombre'].unique())
-ciudades_list = ['Todas'] + sorted(df['Ciudad'].unique())
-categorias_list = ['Todas'] + sorted(df['Categoría'].unique())
-rangos_list = ['Todos'] + ['Económico', 'Medio', 'Premium', 'Alta Gama', 'Lujo']
-dias_list = ['Todos'] + ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+rangos_list = ['Todos'] + rangos_precio
+dias_list = ['Todos'] + orden_dias
 
 filtros_temporales = [
     {'label': '📅 Por Mes', 'value': 'Mes'},
@@ -515,353 +813,503 @@ filtros_temporales = [
 ]
 
 # ============================================
-# 13. LAYOUT PRINCIPAL
+# 11. LAYOUT PRINCIPAL
 # ============================================
-app.layout = dbc.Container([
-    
-    # Header
-    dbc.Row([
-        dbc.Col([
-            html.Div([
-                html.H1("📊 PANEL DE VENTAS 2019", className="text-center text-white fw-bold"),
-                html.H5("Análisis Completo de Ventas", className="text-center text-white-50"),
-                html.Hr(className="bg-white opacity-25"),
-                html.P(id='subtitulo', className="text-center text-white small mb-0"),
-            ], className="p-4 bg-gradient bg-primary rounded-3")
-        ], width=12)
-    ], className="mb-4"),
-    
-    # Filtros Globales
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("🔍 FILTROS GLOBALES", className="bg-dark text-white fw-bold"),
-                dbc.CardBody([
-                    dbc.Row([
-                        dbc.Col([
-                            html.Label("📍 Estado", className="fw-bold"),
-                            dcc.Dropdown(
-                                id='estado',
-                                options=[{'label': e, 'value': e} for e in estados_list],
-                                value='Todos',
-                                clearable=False
-                            )
-                        ], width=2),
-                        dbc.Col([
-                            html.Label("🏙️ Ciudad", className="fw-bold"),
-                            dcc.Dropdown(id='ciudad', options=[{'label':'Todas','value':'Todas'}], value='Todas', clearable=False)
-                        ], width=2),
-                        dbc.Col([
-                            html.Label("📅 Mes", className="fw-bold"),
-                            dcc.Dropdown(id='mes', options=[{'label':m,'value':m} for m in meses_list], value='Todos', clearable=False)
-                        ], width=2),
-                        dbc.Col([
-                            html.Label("📆 Día", className="fw-bold"),
-                            dcc.Dropdown(id='dia', options=[{'label':d,'value':d} for d in dias_list], value='Todos', clearable=False)
-                        ], width=2),
-                        dbc.Col([
-                            html.Label("📦 Categoría", className="fw-bold"),
-                            dcc.Dropdown(id='categoria', options=[{'label':c,'value':c} for c in categorias_list], value='Todas', clearable=False)
-                        ], width=2),
-                        dbc.Col([
-                            html.Label("💰 Rango", className="fw-bold"),
-                            dcc.Dropdown(id='rango', options=[{'label':r,'value':r} for r in rangos_list], value='Todos', clearable=False)
-                        ], width=2),
-                    ]),
-                    dbc.Row([
-                        dbc.Col([
-                            html.Label("📅 Rango de Fechas", className="fw-bold mt-3"),
-                            dcc.DatePickerRange(
-                                id='fechas',
-                                start_date=df['Fecha'].min(),
-                                end_date=df['Fecha'].max(),
-                                display_format='DD/MM/YYYY',
-                                className="form-control"
-                            )
-                        ], width=9),
-                        dbc.Col([
-                            html.Label("🔄", className="fw-bold mt-3"),
-                            html.Button("🔄 RESETEAR FILTROS", id='reset', className="btn btn-outline-danger w-100")
-                        ], width=3),
-                    ]),
-                ])
-            ], className="shadow-sm")
-        ], width=12)
-    ], className="mb-4"),
-    
-    # Pestañas
-    dbc.Tabs([
-        # ========================================
-        # PESTAÑA 1: VISIÓN GENERAL
-        # ========================================
-        dbc.Tab([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("📊 KPIs PRINCIPALES", className="bg-primary text-white fw-bold"),
-                        dbc.CardBody(id='kpis')
-                    ], className="shadow-sm")
-                ], width=12)
-            ], className="mb-4"),
+def layout_principal():
+    opciones = panel.opciones
+    
+    return dbc.Container([
+    
+        # Header
+        dbc.Row([
+            dbc.Col([
+                html.Div([
+                    html.H1("📊 PANEL DE VENTAS 2019", className="text-center text-white fw-bold"),
+                    html.H5("Análisis Completo de Ventas", className="text-center text-white-50"),
+                    html.Hr(className="bg-white opacity-25"),
+                    html.P(id='subtitulo', className="text-center text-white small mb-0"),
+                ], className="p-4 bg-gradient bg-primary rounded-3")
+            ], width=12)
+        ], className="mb-4"),
+    
+        # Filtros Globales
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("🔍 FILTROS GLOBALES", className="bg-dark text-white fw-bold"),
+                    dbc.CardBody([
+                        dbc.Row([
+                            dbc.Col([
+                                html.Label("📍 Estado", className="fw-bold"),
+                                dcc.Dropdown(
+                                    id='estado',
+                                    options=[{'label': e, 'value': e} for e in opciones['estados']],
+                                    value='Todos',
+                                    clearable=False
+                                )
+                            ], width=2),
+                            dbc.Col([
+                                html.Label("🏙️ Ciudad", className="fw-bold"),
+                                dcc.Dropdown(id='ciudad', options=[{'label':'Todas','value':'Todas'}], value='Todas', clearable=False)
+                            ], width=2),
+                            dbc.Col([
+                                html.Label("📅 Mes", className="fw-bold"),
+                                dcc.Dropdown(id='mes', options=[{'label':m,'value':m} for m in meses_list], value='Todos', clearable=False)
+                            ], width=2),
+                            dbc.Col([
+                                html.Label("📆 Día", className="fw-bold"),
+                                dcc.Dropdown(id='dia', options=[{'label':d,'value':d} for d in dias_list], value='Todos', clearable=False)
+                            ], width=2),
+                            dbc.Col([
+                                html.Label("📦 Categoría", className="fw-bold"),
+                                dcc.Dropdown(id='categoria', options=[{'label':c,'value':c} for c in opciones['categorias']], value='Todas', clearable=False)
+                            ], width=2),
+                            dbc.Col([
+                                html.Label("💰 Rango", className="fw-bold"),
+                                dcc.Dropdown(id='rango', options=[{'label':r,'value':r} for r in rangos_list], value='Todos', clearable=False)
+                            ], width=2),
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                html.Label("📅 Rango de Fechas", className="fw-bold mt-3"),
+                                dcc.DatePickerRange(
+                                    id='fechas',
+                                    start_date=opciones['fecha_min'],
+                                    end_date=opciones['fecha_max'],
+                                    display_format='DD/MM/YYYY',
+                                    className="form-control"
+                                )
+                            ], width=9),
+                            dbc.Col([
+                                html.Label("🔄", className="fw-bold mt-3"),
+                                html.Button("🔄 RESETEAR FILTROS", id='reset', className="btn btn-outline-danger w-100")
+                            ], width=3),
+                        ]),
+                    ])
+                ], className="shadow-sm")
+            ], width=12)
+        ], className="mb-4"),
+    
+        # Pestañas
+        dbc.Tabs([
+            # ========================================
+            # PESTAÑA 1: VISIÓN GENERAL
+            # ========================================
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("📊 KPIs PRINCIPALES", className="bg-primary text-white fw-bold"),
+                            dbc.CardBody(id='kpis')
+                        ], className="shadow-sm")
+                    ], width=12)
+                ], className="mb-4"),
             
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("📈 ANÁLISIS DE TENDENCIAS", className="bg-info text-white"),
-                        dbc.CardBody(id='tendencias')
-                    ], className="shadow-sm")
-                ], width=12)
-            ], className="mb-4"),
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("📈 ANÁLISIS DE TENDENCIAS", className="bg-info text-white"),
+                            dbc.CardBody(id='tendencias')
+                        ], className="shadow-sm")
+                    ], width=12)
+                ], className="mb-4"),
             
-            dbc.Row([
-                dbc.Col(dbc.Card([dbc.CardHeader("💰 Ventas por Mes"), dbc.CardBody(dcc.Graph(id='graf-mes'))]), width=6),
-                dbc.Col(dbc.Card([dbc.CardHeader("📈 Tendencia Diaria"), dbc.CardBody(dcc.Graph(id='graf-tendencia'))]), width=6)
-            ], className="mb-4"),
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("💰 Ventas por Mes"), dbc.CardBody(dcc.Graph(id='graf-mes'))]), width=6),
+                    dbc.Col(dbc.Card([dbc.CardHeader("📈 Tendencia Diaria"), dbc.CardBody(dcc.Graph(id='graf-tendencia'))]), width=6)
+                ], className="mb-4"),
             
-            dbc.Row([
-                dbc.Col(dbc.Card([dbc.CardHeader("🏙️ Top 10 Ciudades"), dbc.CardBody(dcc.Graph(id='graf-ciudades'))]), width=6),
-                dbc.Col(dbc.Card([dbc.CardHeader("🗺️ Mapa de Estados"), dbc.CardBody(dcc.Graph(id='mapa-estados'))]), width=6)
-            ], className="mb-4"),
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("🏙️ Top 10 Ciudades"), dbc.CardBody(dcc.Graph(id='graf-ciudades'))]), width=6),
+                    dbc.Col(dbc.Card([dbc.CardHeader("🗺️ Mapa de Estados"), dbc.CardBody([
+                        dcc.Graph(id='mapa-estados'),
+                        html.P("👆 Haz clic en un estado para ver sus ciudades y códigos postales", className="text-muted small mb-0")
+                    ])]), width=6)
+                ], className="mb-4"),
             
-            dbc.Row([
-                dbc.Col(dbc.Card([dbc.CardHeader("🎯 RESUMEN EJECUTIVO", className="bg-warning text-dark"), dbc.CardBody(id='resumen')]), width=12)
-            ]),
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("🎯 RESUMEN EJECUTIVO", className="bg-warning text-dark"), dbc.CardBody(id='resumen')]), width=12)
+                ]),
             
-            dcc.Download(id="download-general")
-        ], label="📊 GENERAL"),
+                dcc.Download(id="download-general")
+            ], label="📊 GENERAL"),
         
-        # ========================================
-        # PESTAÑA 2: COMPARADOR DE MESES
-        # ========================================
-        dbc.Tab([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("📅 COMPARADOR DE MESES", className="bg-danger text-white fw-bold"),
-                        dbc.CardBody([
-                            dbc.Row([
-                                dbc.Col([
-                                    html.Label("Selecciona hasta 3 meses para comparar:", className="fw-bold"),
-                                    dcc.Dropdown(
-                                        id='comp-meses',
-                                        options=[{'label':m,'value':m} for m in meses_list if m!='Todos'],
-                                        value=['Enero','Febrero','Marzo'],
-                                        multi=True,
-                                        placeholder="Selecciona meses..."
-                                    )
-                                ], width=6),
-                                dbc.Col([
-                                    html.Label("Métrica a comparar:", className="fw-bold"),
-                                    dcc.RadioItems(
-                                        id='comp-metrica',
-                                        options=[
-                                            {'label':'💰 Ingresos','value':'ingresos'},
-                                            {'label':'📦 Pedidos','value':'pedidos'}
-                                        ],
-                                        value='ingresos',
-                                        inline=True
-                                    )
-                                ], width=6),
-                            ]),
-                            html.Div(id='comp-kpis', className="mt-3")
-                        ])
-                    ], className="shadow-sm")
-                ], width=12)
-            ], className="mb-4"),
+            # ========================================
+            # PESTAÑA 2: COMPARADOR DE MESES
+            # ========================================
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("📅 COMPARADOR DE MESES", className="bg-danger text-white fw-bold"),
+                            dbc.CardBody([
+                                dbc.Row([
+                                    dbc.Col([
+                                        html.Label("Comparar por:", className="fw-bold"),
+                                        dcc.RadioItems(
+                                            id='comp-periodo',
+                                            options=[{'label':'Rangos de fechas' if p == 'Rangos' else p,'value':p} for p in periodos_comparador],
+                                            value='Mes',
+                                            inline=True
+                                        )
+                                    ], width=3),
+                                    dbc.Col([
+                                        html.Div([
+                                            html.Label("Selecciona hasta 3 períodos para comparar:", className="fw-bold"),
+                                            dcc.Dropdown(
+                                                id='comp-meses',
+                                                options=[],
+                                                value=[],
+                                                multi=True,
+                                                placeholder="Selecciona períodos..."
+                                            )
+                                        ], id='comp-selector-periodos'),
+                                        html.Div([
+                                            html.Label("Rangos de fechas a comparar (A y B):", className="fw-bold"),
+                                            dcc.DatePickerRange(id='comp-rango-a', display_format='DD/MM/YYYY',
+                                                                start_date_placeholder_text="Desde A", end_date_placeholder_text="Hasta A"),
+                                            dcc.DatePickerRange(id='comp-rango-b', display_format='DD/MM/YYYY',
+                                                                start_date_placeholder_text="Desde B", end_date_placeholder_text="Hasta B",
+                                                                className="mt-1")
+                                        ], id='comp-selector-rangos', style={'display': 'none'})
+                                    ], width=5),
+                                    dbc.Col([
+                                        html.Label("Métrica a comparar:", className="fw-bold"),
+                                        dcc.RadioItems(
+                                            id='comp-metrica',
+                                            options=[
+                                                {'label':'💰 Ingresos','value':'ingresos'},
+                                                {'label':'📦 Pedidos','value':'pedidos'}
+                                            ],
+                                            value='ingresos',
+                                            inline=True
+                                        )
+                                    ], width=4),
+                                ]),
+                                html.Div(id='comp-kpis', className="mt-3")
+                            ])
+                        ], className="shadow-sm")
+                    ], width=12)
+                ], className="mb-4"),
             
-            dbc.Row([
-                dbc.Col(dbc.Card([dbc.CardHeader("📈 Tendencia Comparativa"), dbc.CardBody(dcc.Graph(id='graf-comp-tend'))]), width=8),
-                dbc.Col(dbc.Card([dbc.CardHeader("📊 Distribución por Mes"), dbc.CardBody(dcc.Graph(id='graf-comp-dist'))]), width=4)
-            ], className="mb-4"),
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("📈 Tendencia Comparativa"), dbc.CardBody(dcc.Graph(id='graf-comp-tend'))]), width=8),
+                    dbc.Col(dbc.Card([dbc.CardHeader("📊 Distribución por Mes"), dbc.CardBody(dcc.Graph(id='graf-comp-dist'))]), width=4)
+                ], className="mb-4"),
             
-            dbc.Row([
-                dbc.Col(dbc.Card([dbc.CardHeader("📋 Tabla Comparativa Detallada"), dbc.CardBody(id='comp-tabla')]), width=12)
-            ]),
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("📋 Tabla Comparativa Detallada"), dbc.CardBody(id='comp-tabla')]), width=12)
+                ]),
             
-            dcc.Download(id="download-comparador")
-        ], label="📅 COMPARADOR"),
+                dcc.Download(id="download-comparador")
+            ], label="📅 COMPARADOR"),
         
-        # ========================================
-        # PESTAÑA 3: PRODUCTO ESTRELLA INTELIGENTE
-        # ========================================
-        dbc.Tab([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("🎯 PRODUCTO ESTRELLA INTELIGENTE", className="bg-warning text-dark fw-bold"),
-                        dbc.CardBody([
-                            dbc.Row([
-                                dbc.Col([
-                                    html.Label("🔍 Analizar por:", className="fw-bold"),
-                                    dcc.RadioItems(
-                                        id='filtro-prod',
-                                        options=filtros_temporales,
-                                        value='General',
-                                        inline=True
-                                    )
-                                ], width=8),
-                                dbc.Col(html.Div(id='indicador-prod', className="mt-2 text-end text-primary fw-bold"), width=4),
-                            ]),
-                            html.Hr(),
-                            html.Div(id='prod-container'),
+            # ========================================
+            # PESTAÑA 3: PRODUCTO ESTRELLA INTELIGENTE
+            # ========================================
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("🎯 PRODUCTO ESTRELLA INTELIGENTE", className="bg-warning text-dark fw-bold"),
+                            dbc.CardBody([
+                                dbc.Row([
+                                    dbc.Col([
+                                        html.Label("🔍 Analizar por:", className="fw-bold"),
+                                        dcc.RadioItems(
+                                            id='filtro-prod',
+                                            options=filtros_temporales,
+                                            value='General',
+                                            inline=True
+                                        )
+                                    ], width=8),
+                                    dbc.Col(html.Div(id='indicador-prod', className="mt-2 text-end text-primary fw-bold"), width=4),
+                                ]),
+                                html.Hr(),
+                                html.Div(id='prod-container'),
                             
-                            # TABLA EXPLICATIVA
-                            html.Hr(),
-                            tabla_explicativa
-                        ])
-                    ], className="shadow-sm")
-                ], width=12)
-            ], className="mb-4"),
+                                # TABLA EXPLICATIVA
+                                html.Hr(),
+                                tabla_explicativa
+                            ])
+                        ], className="shadow-sm")
+                    ], width=12)
+                ], className="mb-4"),
             
-            dbc.Row([
-                dbc.Col(dbc.Card([dbc.CardHeader(id='titulo-factores', className="bg-info text-white"), dbc.CardBody(id='factores-prod')]), width=12)
-            ], className="mb-4"),
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader(id='titulo-factores', className="bg-info text-white"), dbc.CardBody(id='factores-prod')]), width=12)
+                ], className="mb-4"),
             
-            dbc.Row([
-                dbc.Col(dbc.Card([dbc.CardHeader("🏆 Producto Más Vendido por Mes", className="bg-secondary text-white"), dbc.CardBody(id='tabla-prod-mes')]), width=12)
-            ]),
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("🏆 Producto Más Vendido por Mes", className="bg-secondary text-white"), dbc.CardBody(id='tabla-prod-mes')]), width=12)
+                ]),
             
-            dcc.Download(id="download-producto")
-        ], label="🏆 PRODUCTO"),
+                dcc.Download(id="download-producto")
+            ], label="🏆 PRODUCTO"),
         
-        # ========================================
-        # PESTAÑA 4: ANÁLISIS DE HORAS
-        # ========================================
-        dbc.Tab([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("⏰ ANÁLISIS DETALLADO DE HORAS", className="bg-secondary text-white fw-bold"),
-                        dbc.CardBody(
-                            dcc.Tabs([
-                                dcc.Tab(label="📊 Distribución por Hora", children=[
-                                    dcc.Graph(id='graf-horas-dist'),
-                                    html.P("👆 Haz clic en cualquier barra para ver los productos más vendidos en esa hora", 
-                                           className="text-info text-center small mt-2")
-                                ]),
-                                dcc.Tab(label="🔥 Heatmap Hora vs Mes", children=[dcc.Graph(id='graf-horas-heat')]),
-                                dcc.Tab(label="📈 Evolución Horas Pico", children=[dcc.Graph(id='graf-horas-evo')]),
-                            ])
-                        )
-                    ], className="shadow-sm")
-                ], width=12)
-            ], className="mb-4"),
+            # ========================================
+            # PESTAÑA 4: ANÁLISIS DE HORAS
+            # ========================================
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("⏰ ANÁLISIS DETALLADO DE HORAS", className="bg-secondary text-white fw-bold"),
+                            dbc.CardBody(
+                                dcc.Tabs([
+                                    dcc.Tab(label="📊 Distribución por Hora", children=[
+                                        dcc.Graph(id='graf-horas-dist'),
+                                        html.P("👆 Haz clic en cualquier barra para ver los productos más vendidos en esa hora", 
+                                               className="text-info text-center small mt-2")
+                                    ]),
+                                    dcc.Tab(label="🔥 Heatmap Hora vs Mes", children=[dcc.Graph(id='graf-horas-heat')]),
+                                    dcc.Tab(label="📈 Evolución Horas Pico", children=[dcc.Graph(id='graf-horas-evo')]),
+                                ])
+                            )
+                        ], className="shadow-sm")
+                    ], width=12)
+                ], className="mb-4"),
             
-            dbc.Row([
-                dbc.Col(dbc.Card([dbc.CardHeader("🔥 Mapa de Calor - Horas vs Días"), dbc.CardBody(dcc.Graph(id='graf-heatmap'))]), width=6),
-                dbc.Col(dbc.Card([dbc.CardHeader("📆 Ventas por Día de Semana"), dbc.CardBody(dcc.Graph(id='graf-dias'))]), width=6)
-            ]),
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("🔥 Mapa de Calor - Horas vs Días"), dbc.CardBody(dcc.Graph(id='graf-heatmap'))]), width=6),
+                    dbc.Col(dbc.Card([dbc.CardHeader("📆 Ventas por Día de Semana"), dbc.CardBody(dcc.Graph(id='graf-dias'))]), width=6)
+                ]),
             
-            dcc.Download(id="download-horas")
-        ], label="⏰ HORAS"),
+                dcc.Download(id="download-horas")
+            ], label="⏰ HORAS"),
         
-        # ========================================
-        # PESTAÑA 5: EVENTOS ESPECIALES (CON TARJETAS CLICKEABLES)
-        # ========================================
-        dbc.Tab([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("🎉 EVENTOS ESPECIALES", className="bg-danger text-white fw-bold"),
-                        dbc.CardBody([
-                            html.Div(id='eventos-cards'),
-                            html.Hr(),
-                            html.Div(id='eventos-explicacion', className="bg-light p-3 rounded")
-                        ])
-                    ], className="shadow-sm")
-                ], width=12)
-            ]),
+            # ========================================
+            # PESTAÑA 5: EVENTOS ESPECIALES (CON TARJETAS CLICKEABLES)
+            # ========================================
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("🎉 EVENTOS ESPECIALES", className="bg-danger text-white fw-bold"),
+                            dbc.CardBody([
+                                html.Div(id='eventos-cards'),
+                                html.Hr(),
+                                html.Div(id='eventos-explicacion', className="bg-light p-3 rounded")
+                            ])
+                        ], className="shadow-sm")
+                    ], width=12)
+                ]),
             
-            dcc.Download(id="download-eventos")
-        ], label="🎉 EVENTOS"),
+                dcc.Download(id="download-eventos")
+            ], label="🎉 EVENTOS"),
         
-        # ========================================
-        # PESTAÑA 6: PRODUCTOS COMPLEMENTARIOS
-        # ========================================
-        dbc.Tab([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("🔄 PRODUCTOS COMPLEMENTARIOS", className="bg-purple text-white fw-bold", style={'backgroundColor': '#6f42c1'}),
-                        dbc.CardBody([
-                            html.P("¿Qué productos se compran juntos frecuentemente?", className="lead"),
-                            html.Div(id='prod-comp'),
-                            html.Hr(),
-                            html.H5("📊 Estrategia de Venta Cruzada"),
-                            html.P([
-                                "Los productos que aparecen juntos con frecuencia pueden ofrecerse como ",
-                                "bundles para aumentar el ticket promedio."
+            # ========================================
+            # PESTAÑA 6: PRODUCTOS COMPLEMENTARIOS
+            # ========================================
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("🔄 PRODUCTOS COMPLEMENTARIOS", className="bg-purple text-white fw-bold", style={'backgroundColor': '#6f42c1'}),
+                            dbc.CardBody([
+                                html.P("¿Qué productos se compran juntos frecuentemente?", className="lead"),
+                                html.Div(id='prod-comp'),
+                                html.Hr(),
+                                html.H5("📊 Estrategia de Venta Cruzada"),
+                                html.P([
+                                    "Los productos que aparecen juntos con frecuencia pueden ofrecerse como ",
+                                    "bundles para aumentar el ticket promedio."
+                                ])
                             ])
-                        ])
-                    ], className="shadow-sm")
-                ], width=12)
-            ]),
+                        ], className="shadow-sm")
+                    ], width=12)
+                ]),
             
-            dcc.Download(id="download-complementos")
-        ], label="🔄 COMPLEMENTOS"),
+                dcc.Download(id="download-complementos")
+            ], label="🔄 COMPLEMENTOS"),
         
-        # ========================================
-        # PESTAÑA 7: PROPUESTAS ESTRATÉGICAS
-        # ========================================
-        dbc.Tab([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("📋 PROPUESTAS ESTRATÉGICAS 2020", className="bg-dark text-white fw-bold"),
-                        dbc.CardBody(id='propuestas-content')
-                    ], className="shadow-sm")
-                ], width=12)
-            ]),
+            # ========================================
+            # PESTAÑA 7: CLIENTES (DIRECCIÓN DE ENVÍO)
+            # ========================================
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("👥 CLIENTES Y RECOMPRA", className="bg-primary text-white fw-bold"),
+                            dbc.CardBody([
+                                html.Div(id='clientes-kpis'),
+                                html.P("Cada dirección de envío (normalizada) cuenta como un cliente; los valores "
+                                       "corresponden a los pedidos del filtro.", className="small text-muted mt-2 mb-0")
+                            ])
+                        ], className="shadow-sm")
+                    ], width=12)
+                ], className="mb-4"),
             
-            dcc.Download(id="download-propuestas")
-        ], label="📋 PROPUESTAS"),
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("🔁 Pedidos por Cliente"), dbc.CardBody(dcc.Graph(id='graf-clientes-frecuencia'))]), width=6),
+                    dbc.Col(dbc.Card([dbc.CardHeader("📅 Cohortes"), dbc.CardBody(dcc.Graph(id='graf-clientes-cohortes'))]), width=6)
+                ], className="mb-4"),
+            
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("🎯 Segmentos RFM"), dbc.CardBody([
+                        dcc.Graph(id='graf-clientes-rfm'),
+                        html.Div(id='clientes-rfm')
+                    ])]), width=12)
+                ], className="mb-4"),
+            
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("🧊 RETENCIÓN POR COHORTE", className="bg-secondary text-white fw-bold"),
+                            dbc.CardBody(
+                                dcc.Tabs([
+                                    dcc.Tab(label="🔥 Retención (%)", children=[dcc.Graph(id='graf-cohortes-retencion')]),
+                                    dcc.Tab(label="💰 Ingreso por Cliente", children=[dcc.Graph(id='graf-cohortes-ingresos')]),
+                                ])
+                            )
+                        ], className="shadow-sm")
+                    ], width=12)
+                ], className="mb-4"),
+            
+                dbc.Row([
+                    dbc.Col(dbc.Card([dbc.CardHeader("💎 Mejores Clientes", className="bg-secondary text-white"), dbc.CardBody(id='clientes-top')]), width=12)
+                ])
+            ], label="👥 CLIENTES"),
         
-    ], className="mb-4"),
-    
-    # Modal para análisis de horas
-    dbc.Modal([
-        dbc.ModalHeader(dbc.ModalTitle(id="modal-horas-titulo")),
-        dbc.ModalBody(id="modal-horas-contenido"),
-        dbc.ModalFooter(dbc.Button("Cerrar", id="cerrar-modal-horas", className="ms-auto")),
-    ], id="modal-horas", size="xl"),
-    
-    # Modal para eventos
-    dbc.Modal([
-        dbc.ModalHeader(dbc.ModalTitle(id="modal-titulo")),
-        dbc.ModalBody(id="modal-contenido"),
-        dbc.ModalFooter(dbc.Button("Cerrar", id="cerrar-modal", className="ms-auto")),
-    ], id="modal-evento", size="lg"),
-    
-    # Footer
-    dbc.Row([
-        dbc.Col([
-            html.Hr(),
-            html.Div([
-                html.Span("📊 Desarrollado por: Paola Dueña - Data Analyst | ", className="text-muted small"),
-                html.A(" LinkedIn", href="https://ar.linkedin.com/in/paoladit", target="_blank", className="text-primary small text-decoration-none"),
-                html.Span(" | ", className="text-muted small"),
-                html.A(" paoladf.it@gmail.com", href="mailto:paoladf.it@gmail.com", className="text-primary small text-decoration-none"),
-                html.Br(),
-                html.Span(f"Última actualización: {datetime.now().strftime('%d/%m/%Y %H:%M')}", className="text-muted small"),
-            ], className="text-center")
-        ], width=12)
-    ], className="mt-4"),
-    
-], fluid=True)
+            # ========================================
+            # PESTAÑA 8: PROPUESTAS ESTRATÉGICAS
+            # ========================================
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("📋 PROPUESTAS ESTRATÉGICAS 2020", className="bg-dark text-white fw-bold"),
+                            dbc.CardBody(id='propuestas-content')
+                        ], className="shadow-sm")
+                    ], width=12)
+                ]),
+            
+                dcc.Download(id="download-propuestas")
+            ], label="📋 PROPUESTAS"),
+        
+            # ========================================
+            # PESTAÑA 9: CALIDAD DE DATOS
+            # ========================================
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader([
+                                html.Span("🩺 CALIDAD DE LOS DATOS CARGADOS", className="fw-bold"),
+                                dbc.Button("📥 Reporte JSON", id="btn-exportar-calidad", size="sm", color="light", className="float-end"),
+                            ], className="bg-secondary text-white"),
+                            dbc.CardBody(id='calidad-content')
+                        ], className="shadow-sm")
+                    ], width=12)
+                ]),
+            
+                dcc.Download(id="download-calidad")
+            ], label="🩺 CALIDAD"),
+        
+        ], className="mb-4"),
+    
+        # Modal para análisis de horas
+        dbc.Modal([
+            dbc.ModalHeader(dbc.ModalTitle(id="modal-horas-titulo")),
+            dbc.ModalBody(id="modal-horas-contenido"),
+            dbc.ModalFooter(dbc.Button("Cerrar", id="cerrar-modal-horas", className="ms-auto")),
+        ], id="modal-horas", size="xl"),
+    
+        # Modal para el detalle de un estado del mapa
+        dbc.Modal([
+            dbc.ModalHeader(dbc.ModalTitle(id="modal-geo-titulo")),
+            dbc.ModalBody(id="modal-geo-contenido"),
+            dbc.ModalFooter(dbc.Button("Cerrar", id="cerrar-modal-geo", className="ms-auto")),
+        ], id="modal-geo", size="xl"),
+    
+        # Modal para eventos
+        dbc.Modal([
+            dbc.ModalHeader(dbc.ModalTitle(id="modal-titulo")),
+            dbc.ModalBody(id="modal-contenido"),
+            dbc.ModalFooter(dbc.Button("Cerrar", id="cerrar-modal", className="ms-auto")),
+        ], id="modal-evento", size="lg"),
+    
+        # Modo cliente: solo la dirección del cubo; assets/panel_cliente.js lo pide comprimido al abrir el panel
+        *([dcc.Store(id='cubo-ventas', data={'url': app.get_relative_path(f"/datos/cubo-{panel.version}.gz")})]
+          if panel.cliente else []),
+    
+        # Footer
+        dbc.Row([
+            dbc.Col([
+                html.Hr(),
+                html.Div([
+                    html.Span("📊 Desarrollado por: Paola Dueña - Data Analyst | ", className="text-muted small"),
+                    html.A(" LinkedIn", href="https://ar.linkedin.com/in/paoladit", target="_blank", className="text-primary small text-decoration-none"),
+                    html.Span(" | ", className="text-muted small"),
+                    html.A(" paoladf.it@gmail.com", href="mailto:paoladf.it@gmail.com", className="text-primary small text-decoration-none"),
+                    html.Br(),
+                    html.Span(f"Última actualización: {datetime.now().strftime('%d/%m/%Y %H:%M')}", className="text-muted small"),
+                ], className="text-center")
+            ], width=12)
+        ], className="mt-4"),
+    
+    ], fluid=True)
+
+def layout_carga():
+    return dbc.Container([
+        dcc.Location(id='recarga'),
+        dcc.Interval(id='espera-datos', interval=1000),
+        html.Div([
+            dbc.Spinner(color="primary"),
+            html.H4("⏳ Cargando datos de ventas...", className="mt-3"),
+            html.P(id='estado-carga', className="text-muted small")
+        ], className="text-center mt-5")
+    ], fluid=True)
+
+def construir_layout():
+    # Dash llama a esta función en cada carga de página: mientras los datos
+    # se preparan en segundo plano se muestra la pantalla de espera
+    if not panel.listo:
+        panel.precargar()
+        return layout_carga()
+    return layout_principal()
+
+def crear_app():
+    print("\n🚀 Inicializando dashboard...")
+    # Con flask-compress instalado las respuestas de los callbacks viajan comprimidas (el cubo del
+    # modo cliente se comprime siempre, ver descargar_cubo)
+    try:
+        import flask_compress
+        comprimir = True
+    except ImportError:
+        comprimir = False
+    app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True,
+               compress=comprimir)
+    app.title = "Panel de Ventas 2019"
+    app.layout = construir_layout
+    return app
+
+app = crear_app()
+server = app.server
+
+@server.route('/datos/cubo-<version>.gz')
+def descargar_cubo(version):
+    # El cubo del modo cliente, comprimido una vez por versión; la versión en la dirección
+    # permite que el navegador lo guarde en caché sin volver a pedirlo
+    if not panel.cliente or not panel.listo or version != str(panel.version):
+        return Response("Cubo no disponible", status=404)
+    return Response(panel.cubo_comprimido, mimetype='application/octet-stream',
+                    headers={'Cache-Control': 'public, max-age=31536000, immutable'})
 
 # ============================================
-# 14. FUNCIÓN PARA GENERAR PROPUESTAS
+# 12. FUNCIÓN PARA GENERAR PROPUESTAS
 # ============================================
 def generar_propuestas():
+    k = panel.kpis
     return html.Div([
         html.H4("🎯 RESUMEN EJECUTIVO", className="text-primary"),
         html.P("El análisis de ventas 2019 revela oportunidades significativas de crecimiento:", className="lead"),
         dbc.Table(
             html.Tbody([
-                html.Tr([html.Td("📈 Crecimiento anual"), html.Td(f"+{CRECIMIENTO_ANUAL:.1f}%", className="text-success fw-bold"), html.Td("Excelente desempeño")]),
-                html.Tr([html.Td("💰 Ticket promedio"), html.Td(f"${TICKET_PROMEDIO:,.2f}", className="text-info fw-bold"), html.Td("Oportunidad de upselling")]),
-                html.Tr([html.Td("⏰ Hora pico"), html.Td(f"{HORA_PICO}:00", className="text-warning fw-bold"), html.Td("Alta actividad nocturna")]),
-                html.Tr([html.Td("📆 Mejor día"), html.Td(f"{DIA_PICO}", className="text-danger fw-bold"), html.Td("Patrón atípico")]),
+                html.Tr([html.Td("📈 Crecimiento anual"), html.Td(f"+{k['CRECIMIENTO_ANUAL']:.1f}%", className="text-success fw-bold"), html.Td("Excelente desempeño")]),
+                html.Tr([html.Td("💰 Ticket promedio"), html.Td(f"${k['TICKET_PROMEDIO']:,.2f}", className="text-info fw-bold"), html.Td("Oportunidad de upselling")]),
+                html.Tr([html.Td("⏰ Hora pico"), html.Td(f"{k['HORA_PICO']}:00", className="text-warning fw-bold"), html.Td("Alta actividad nocturna")]),
+                html.Tr([html.Td("📆 Mejor día"), html.Td(f"{k['DIA_PICO']}", className="text-danger fw-bold"), html.Td("Patrón atípico")]),
             ]),
             bordered=True, size="sm", className="mb-3"
         ),
@@ -876,11 +1324,11 @@ def generar_propuestas():
                         html.H6("🔍 PROBLEMA", className="text-danger"),
                         html.P("Inversión publicitaria sin considerar patrones de compra."),
                         html.H6("📊 EVIDENCIA", className="text-primary mt-3"),
-                        html.Ul([html.Li(f"Hora pico: {HORA_PICO}:00 (45% ventas)"), html.Li(f"Mejor día: {DIA_PICO}")]),
+                        html.Ul([html.Li(f"Hora pico: {k['HORA_PICO']}:00 (45% ventas)"), html.Li(f"Mejor día: {k['DIA_PICO']}")]),
                     ], width=6),
                     dbc.Col([
                         html.H6("✅ ACCIONES", className="text-success"),
-                        html.Ul([html.Li(f"Aumentar ads: {DIA_PICO} 18-22h"), html.Li("Promociones relámpago: 19:00-20:00")]),
+                        html.Ul([html.Li(f"Aumentar ads: {k['DIA_PICO']} 18-22h"), html.Li("Promociones relámpago: 19:00-20:00")]),
                         html.H6("📈 MÉTRICAS", className="text-info mt-3"),
                         html.Ul([html.Li("+20% ROAS")]),
                     ], width=6),
@@ -931,8 +1379,61 @@ def generar_propuestas():
         ], className="shadow-sm mb-3 border-start border-warning border-4"),
     ])
 
+def generar_calidad():
+    """Filas descartadas por motivo y por archivo, con ejemplos, del reporte de la carga"""
+    reporte = panel.calidad
+    if not reporte:
+        return html.P("No hay reporte de calidad para estos datos (se genera al procesar los CSV).", className="text-muted")
+    
+    leidas = sum(reporte['leidas'].values())
+    resumen = resumen_motivos(reporte)
+    descartadas = int(resumen.loc[resumen['Descarta'], 'Filas'].sum())
+    avisos = int(resumen.loc[~resumen['Descarta'], 'Filas'].sum())
+    tarjetas = dbc.Row([
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("📄 FILAS LEÍDAS"), html.H3(f"{leidas:,}")])], className="border-primary"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("✅ VÁLIDAS"), html.H3(f"{reporte['validas'] or 0:,}")])], className="border-success"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🗑️ DESCARTADAS"), html.H3(f"{descartadas:,}"),
+                                        html.Small(f"{100 * descartadas / max(leidas, 1):.2f}% de las leídas", className="text-muted")])],
+                         className="border-danger"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("⚠️ CON AVISOS"), html.H3(f"{avisos:,}"),
+                                        html.Small("se conservan con valor por defecto", className="text-muted")])],
+                         className="border-warning"), width=3),
+    ], className="mb-4")
+    
+    if resumen.empty:
+        return html.Div([tarjetas, html.P("✅ No se rechazó ninguna fila.", className="text-success")])
+    
+    motivos = resumen.assign(Descarta=resumen['Descarta'].map({True: 'Sí', False: 'No'}))
+    tabla_motivos = tabla_datos(motivos, {'Descripción': ('Motivo', 'texto'), 'Descarta': ('Descarta', 'texto'),
+                                          'Filas': ('Filas', 'entero'), '% Leídas': ('% de las leídas', 'texto')})
+    
+    por_archivo = tabla_por_archivo(reporte)
+    fig = px.bar(por_archivo.melt(id_vars='Archivo', value_vars=list(reporte['motivos']), var_name='Motivo', value_name='Filas')
+                 .assign(Motivo=lambda d: d['Motivo'].map(lambda m: MOTIVOS.get(m, (m,))[0])),
+                 x='Archivo', y='Filas', color='Motivo', title="Filas rechazadas por archivo de origen")
+    fig.update_layout(height=350, legend=dict(orientation='h', y=-0.3), margin=dict(t=50, b=10))
+    tabla_archivos = tabla_datos(por_archivo, {'Archivo': ('Archivo', 'texto'), 'Leídas': ('Leídas', 'entero'),
+                                               **{m: (MOTIVOS.get(m, (m,))[0], 'entero') for m in reporte['motivos']}})
+    
+    ejemplos = [
+        html.Details([
+            html.Summary(f"{MOTIVOS.get(motivo, (motivo,))[0]} ({sum(datos['por_archivo'].values()):,} filas)"),
+            tabla_datos(pd.DataFrame(datos['muestras']), {c: (c, 'texto') for c in pd.DataFrame(datos['muestras']).columns}),
+        ], className="mb-2")
+        for motivo, datos in reporte['motivos'].items() if datos['muestras']
+    ]
+    
+    return html.Div([
+        tarjetas,
+        html.H5("📋 Motivos"), tabla_motivos,
+        dcc.Graph(figure=fig, className="mt-4"),
+        html.H5("📂 Por archivo", className="mt-2"), tabla_archivos,
+        html.H5("🔎 Ejemplos por motivo", className="mt-4"), *ejemplos,
+        html.P(f"Reporte generado: {reporte.get('generado') or 'N/A'}", className="small text-muted mt-3"),
+    ])
+
 # ============================================
-# 15. CALLBACKS PRINCIPALES
+# 13. CALLBACKS PRINCIPALES
 # ============================================
 
 @callback(
@@ -944,12 +1445,13 @@ def generar_propuestas():
 def update_ciudades(estado, reset):
     ctx = dash.callback_context
     if ctx.triggered and 'reset' in ctx.triggered[0]['prop_id']:
-        return [{'label':'Todas','value':'Todas'}] + [{'label':c,'value':c} for c in sorted(df['Ciudad'].unique())], 'Todas'
+        return [{'label':c,'value':c} for c in panel.opciones['ciudades']], 'Todas'
     
     if estado == 'Todos':
-        ciudades = ['Todas'] + sorted(df['Ciudad'].unique())
+        ciudades = panel.opciones['ciudades']
     else:
-        ciudades = ['Todas'] + sorted(df[df['Estado Nombre']==estado]['Ciudad'].unique())
+        lineas = panel.lineas(Filtro((('Estado Nombre', estado),), None, None), ['Ciudad'])
+        ciudades = ['Todas'] + sorted(valores_distintos(lineas, 'Ciudad'))
     return [{'label':c,'value':c} for c in ciudades], 'Todas'
 
 @callback(
@@ -961,13 +1463,45 @@ def update_ciudades(estado, reset):
      Output('fechas', 'start_date'),
      Output('fechas', 'end_date'),
      Output('filtro-prod', 'value'),
-     Output('comp-meses', 'value')],
+     Output('comp-periodo', 'value')],
     Input('reset', 'n_clicks')
 )
 def reset_filtros(n_clicks):
     if not n_clicks:
         return [no_update] * 9
-    return ('Todos','Todos','Todos','Todas','Todos', df['Fecha'].min(), df['Fecha'].max(), 'General', ['Enero','Febrero','Marzo'])
+    return ('Todos','Todos','Todos','Todas','Todos', panel.opciones['fecha_min'], panel.opciones['fecha_max'], 'General', 'Mes')
+
+@callback(
+    [Output('comp-meses', 'options'),
+     Output('comp-meses', 'value'),
+     Output('comp-selector-periodos', 'style'),
+     Output('comp-selector-rangos', 'style')],
+    [Input('comp-periodo', 'value'),
+     Input('reset', 'n_clicks')]
+)
+def update_opciones_comparador(periodo, reset):
+    ctx = dash.callback_context
+    if ctx.triggered and 'reset' in ctx.triggered[0]['prop_id']:
+        periodo = 'Mes'
+    opciones, seleccion = opciones_comparador(periodo)
+    rangos = periodo == 'Rangos'
+    return opciones, seleccion, {'display': 'none'} if rangos else {}, {} if rangos else {'display': 'none'}
+
+@callback(
+    [Output('comp-rango-a', 'start_date'),
+     Output('comp-rango-a', 'end_date'),
+     Output('comp-rango-b', 'start_date'),
+     Output('comp-rango-b', 'end_date')],
+    Input('comp-periodo', 'value'),
+    [State('comp-rango-a', 'start_date'),
+     State('comp-rango-b', 'start_date')]
+)
+def rangos_iniciales(periodo, desde_a, desde_b):
+    # Al elegir 'Rangos' por primera vez: los últimos 30 días contra los 30 anteriores
+    if periodo != 'Rangos' or desde_a or desde_b:
+        return [no_update] * 4
+    fin = pd.Timestamp(panel.opciones['fecha_max'])
+    return (fin - pd.Timedelta(days=29)).date(), fin.date(), (fin - pd.Timedelta(days=59)).date(), (fin - pd.Timedelta(days=30)).date()
 
 @callback(
     [Output('indicador-prod', 'children'),
@@ -991,123 +1525,237 @@ def update_titulos_prod(f):
 def update_propuestas(_):
     return generar_propuestas()
 
+@callback(
+    Output('calidad-content', 'children'),
+    Input('calidad-content', 'id')
+)
+def update_calidad(_):
+    return generar_calidad()
+
+@callback(
+    [Output('recarga', 'href'),
+     Output('estado-carga', 'children')],
+    Input('espera-datos', 'n_intervals'),
+    prevent_initial_call=True
+)
+def esperar_datos(n):
+    if panel.error:
+        return no_update, f"❌ {panel.error}"
+    if panel.listo:
+        return dash.get_relative_path('/'), no_update
+    return no_update, f"Preparando el panel... ({n}s)"
+
+# ========================================
+# TAREAS DE AGREGACIÓN DEL PANEL
+# ========================================
+# update_dashboard calcula sus agregaciones como tareas independientes y arma las
+# figuras cuando terminan todas. VENTAS_PARALELO elige cómo se ejecutan:
+#   'serie'    una tras otra (por defecto)
+#   'hilos'    ThreadPoolExecutor (groupby y NumPy liberan el GIL en buena parte)
+#   'procesos' ProcessPoolExecutor; cada proceso filtra sobre su propia copia
+#              compartida del dataset y solo viajan los resultados agregados
+MODO_AGREGACION = os.environ.get('VENTAS_PARALELO', 'serie')
+TRABAJADORES_AGREGACION = int(os.environ.get('VENTAS_TRABAJADORES', min(8, os.cpu_count() or 1)))
+# VENTAS_TIEMPOS=1 imprime en consola el tiempo de cada refresco y de sus tareas más lentas
+REPORTE_TIEMPOS = os.environ.get('VENTAS_TIEMPOS', '').lower() in ('1', 'si', 'true')
+
+def eventos_y_dias_normales(data):
+    """(ingresos y pedidos por evento especial, ingresos de cada día normal) de las líneas"""
+    # Un evento por fecha distinta, no por fila
+    evento = data['Fecha'].map({f: identificar_evento(f) for f in data['Fecha'].unique()})
+    especiales = evento != 'Normal'
+    por_evento = data[especiales].groupby(evento[especiales]).agg({
+        'Ingreso Total': 'sum',
+        'Pedido Key': 'nunique'
+    })
+    return por_evento, data[~especiales].groupby('Fecha')['Ingreso Total'].sum()
+
+def agregar_eventos(data):
+    """Ingresos y pedidos por evento especial, y el promedio diario de los días normales.
+    En partes por tramo de días cada evento y cada día suman lo de todas (un pedido cae en un solo día)"""
+    por_evento, por_dia, ingresos, filas = [], [], 0.0, 0
+    for parte in como_partes(data):
+        eventos_parte, dias_parte = eventos_y_dias_normales(parte)
+        por_evento.append(eventos_parte)
+        por_dia.append(dias_parte)
+        ingresos += parte['Ingreso Total'].sum()
+        filas += len(parte)
+    eventos_data = por_evento[0] if len(por_evento) == 1 else pd.concat(por_evento).groupby(level=0).sum()
+    eventos_data = eventos_data.rename(columns={'Pedido Key': 'ID de Pedido'}).rename_axis('Evento').reset_index()
+    
+    por_dia = pd.concat(por_dia)
+    if not por_dia.empty:
+        ventas_por_dia_normal = por_dia.mean()
+    else:
+        ventas_por_dia_normal = ingresos / filas if filas else np.nan
+    return eventos_data, ventas_por_dia_normal
+
+# Cada tarea recibe (data filtrada, Filtro, parámetros del callback)
+TAREAS_PANEL = {
+    **{nombre: (lambda data, filtro, p, nombre=nombre: panel.motor.agregar(nombre, filtro, data))
+       for nombre in AGREGACIONES},
+    'producto_estrella': lambda data, filtro, p: producto_estrella(p['filtros'], p['filtro_prod']),
+    'ranking_mes': lambda data, filtro, p: ranking_por_periodo(data, 'Mes'),
+    'comparador': lambda data, filtro, p: agregar_comparador(data, p['periodo_comp'], p['meses_comp']) if p['meses_comp'] else None,
+    'eventos': lambda data, filtro, p: agregar_eventos(data),
+    'tendencia': lambda data, filtro, p: panel.series.tendencia(filtro, VENTANA_MEDIA_MOVIL, DIAS_VARIACION),
+    'pronostico': lambda data, filtro, p: panel.pronosticos.para_filtro(filtro),
+    'anomalias': lambda data, filtro, p: panel.anomalias.para_filtro(filtro),
+    'clientes': lambda data, filtro, p: panel.clientes.analizar(filtro, data),
+    'cohortes': lambda data, filtro, p: panel.clientes.cohortes(filtro, data),
+    'mapa': lambda data, filtro, p: panel.geo.agregar(filtro, 'estado'),
+    'complementarios': lambda data, filtro, p: analizar_productos_complementarios(data),
+}
+
+# Columnas de las líneas que lee cada tarea; las demás salen de los índices y no tocan las líneas.
+# Con almacén cada tarea recorre las particiones leyendo solo las suyas
+COLUMNAS_TAREAS = {
+    **{nombre: columnas_agregacion(nombre) for nombre in AGREGACIONES},
+    'ranking_mes': ['Mes Num', 'Mes', 'Producto', 'Cantidad Pedida'],
+    'comparador': COLUMNAS_COMPARADOR + ['Fecha Pedido', 'Ingreso Total', 'Pedido Key', 'Cantidad Pedida'],
+    'eventos': ['Fecha', 'Ingreso Total', 'Pedido Key'],
+    'clientes': ['Pedido Key', 'Ingreso Total'],
+    'cohortes': ['Pedido Key', 'Ingreso Total'],
+    'complementarios': ['Pedido Key', 'Producto'],
+}
+
+def columnas_tareas(nombres):
+    """Columnas que leen las tareas pedidas, sin repetir"""
+    return list(dict.fromkeys(c for n in TAREAS_PANEL if n in nombres for c in COLUMNAS_TAREAS.get(n, ())))
+
+def _tarea_cronometrada(nombre, data, filtro, parametros):
+    inicio = time.perf_counter()
+    resultado = TAREAS_PANEL[nombre](con_columnas(data, COLUMNAS_TAREAS.get(nombre, ())), filtro, parametros)
+    return resultado, time.perf_counter() - inicio
+
+@lru_cache(maxsize=4)
+def _datos_del_proceso(filtro, columnas):
+    # En un proceso del pool: todas las tareas del mismo refresco comparten el filtrado
+    return panel.lineas(filtro, list(columnas))
+
+def _tarea_en_proceso(nombre, filtro, columnas, parametros):
+    return _tarea_cronometrada(nombre, _datos_del_proceso(filtro, columnas), filtro, parametros)
+
+def _iniciar_proceso():
+    # Las conexiones de los motores SQL no se heredan entre procesos: cada uno abre la suya
+    panel.__dict__.pop('motor', None)
+
+_ejecutores = {}
+_lock_ejecutores = threading.Lock()
+
+def ejecutor_agregacion(modo):
+    with _lock_ejecutores:
+        if modo not in _ejecutores:
+            if modo == 'procesos':
+                # Con fork los procesos heredan el dataset ya cargado sin copiarlo
+                contexto = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+                _ejecutores[modo] = ProcessPoolExecutor(TRABAJADORES_AGREGACION, mp_context=contexto,
+                                                        initializer=_iniciar_proceso)
+            else:
+                _ejecutores[modo] = ThreadPoolExecutor(TRABAJADORES_AGREGACION, thread_name_prefix='agregacion')
+        return _ejecutores[modo]
+
+def ejecutar_tareas(data, filtro, parametros, modo=MODO_AGREGACION, nombres=None):
+    """Resultados de las TAREAS_PANEL pedidas (todas por defecto) y el tiempo de cada una en segundos"""
+    nombres = list(TAREAS_PANEL) if nombres is None else [n for n in TAREAS_PANEL if n in nombres]
+    columnas = tuple(columnas_tareas(nombres))
+    inicio = time.perf_counter()
+    if modo == 'hilos':
+        futuros = {n: ejecutor_agregacion(modo).submit(_tarea_cronometrada, n, data, filtro, parametros) for n in nombres}
+        salidas = {n: f.result() for n, f in futuros.items()}
+    elif modo == 'procesos':
+        futuros = {n: ejecutor_agregacion(modo).submit(_tarea_en_proceso, n, filtro, columnas, parametros) for n in nombres}
+        salidas = {n: f.result() for n, f in futuros.items()}
+    else:
+        salidas = {n: _tarea_cronometrada(n, data, filtro, parametros) for n in nombres}
+    
+    resultados = {n: resultado for n, (resultado, _) in salidas.items()}
+    tiempos = {n: segundos for n, (_, segundos) in salidas.items()}
+    if REPORTE_TIEMPOS:
+        lentas = sorted(tiempos.items(), key=lambda t: -t[1])[:5]
+        print(f"   ⏱️ Agregaciones ({modo}): {(time.perf_counter() - inicio) * 1000:,.0f} ms | "
+              + ", ".join(f"{n} {s * 1000:,.0f}" for n, s in lentas))
+    return resultados, tiempos
+
 # ========================================
 # CALLBACK PRINCIPAL DEL DASHBOARD
 # ========================================
-@callback(
-    [Output('subtitulo', 'children'),
-     Output('kpis', 'children'),
-     Output('tendencias', 'children'),
-     Output('graf-mes', 'figure'),
-     Output('graf-tendencia', 'figure'),
-     Output('graf-heatmap', 'figure'),
-     Output('graf-dias', 'figure'),
-     Output('graf-ciudades', 'figure'),
-     Output('mapa-estados', 'figure'),
-     Output('resumen', 'children'),
-     Output('prod-container', 'children'),
-     Output('tabla-prod-mes', 'children'),
-     Output('factores-prod', 'children'),
-     Output('graf-horas-dist', 'figure'),
-     Output('graf-horas-heat', 'figure'),
-     Output('graf-horas-evo', 'figure'),
-     Output('graf-comp-tend', 'figure'),
-     Output('graf-comp-dist', 'figure'),
-     Output('comp-kpis', 'children'),
-     Output('comp-tabla', 'children'),
-     Output('eventos-cards', 'children'),
-     Output('eventos-explicacion', 'children'),
-     Output('prod-comp', 'children')],
-    [Input('ciudad', 'value'),
-     Input('estado', 'value'),
-     Input('mes', 'value'),
-     Input('dia', 'value'),
-     Input('categoria', 'value'),
-     Input('rango', 'value'),
-     Input('fechas', 'start_date'),
-     Input('fechas', 'end_date'),
-     Input('filtro-prod', 'value'),
-     Input('comp-meses', 'value'),
-     Input('comp-metrica', 'value')]
-)
-def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, filtro_prod, meses_comp, metrica):
-    
-    # Aplicar filtros base
-    data = df.copy()
-    
-    if estado != 'Todos':
-        data = data[data['Estado Nombre'] == estado]
-    if ciudad != 'Todas':
-        data = data[data['Ciudad'] == ciudad]
-    if mes != 'Todos':
-        data = data[data['Mes'] == mes]
-    if dia != 'Todos':
-        data = data[data['Día Semana Nombre'] == dia]
-    if categoria != 'Todas':
-        data = data[data['Categoría'] == categoria]
-    if rango != 'Todos':
-        data = data[data['Rango Precio'] == rango]
-    
-    try:
-        start_date = pd.to_datetime(start).date()
-        end_date = pd.to_datetime(end).date()
-        data = data[(data['Fecha'] >= start_date) & (data['Fecha'] <= end_date)]
-    except:
-        pass
-    
-    subtitulo = f"📊 {len(data):,} transacciones | {data['Ciudad'].nunique()} ciudades | {data['Producto'].nunique()} productos"
-    
-    # Figura vacía para casos sin datos
-    empty_fig = go.Figure().add_annotation(text="Sin datos", showarrow=False)
-    empty_fig.update_layout(height=300)
-    
-    if data.empty:
-        empty_kpi = dbc.Row([dbc.Col(html.H4("No hay datos para los filtros seleccionados"), width=12)])
-        empty_tendencias = html.P("Sin datos")
-        empty_resumen = html.P("Sin datos")
-        empty_container = html.P("Sin datos")
-        empty_table = html.P("Sin datos")
-        empty_factores = html.P("Sin datos")
-        empty_eventos = html.P("Sin datos")
-        empty_explicacion = html.P("Sin datos")
-        
-        return (subtitulo, empty_kpi, empty_tendencias, empty_fig, empty_fig, empty_fig, empty_fig,
-                empty_fig, empty_fig, empty_resumen, empty_container, empty_table, empty_factores,
-                empty_fig, empty_fig, empty_fig, empty_fig, empty_fig, empty_fig, empty_table,
-                empty_eventos, empty_explicacion, empty_fig)
-    
-    # ========================================
-    # KPIs
-    # ========================================
-    ingresos = data['Ingreso Total'].sum()
-    pedidos = data['ID de Pedido'].nunique()
-    unidades = data['Cantidad Pedida'].sum()
+# Puntos máximos por serie temporal: con historiales de varios años la tendencia diaria se reduce
+MAX_PUNTOS_SERIE = int(os.environ.get('VENTAS_MAX_PUNTOS', 1000))
+# Días de la media móvil de la tendencia diaria y de la variación contra días anteriores
+# (los mismos que usa assets/panel_cliente.js)
+VENTANA_MEDIA_MOVIL = 7
+DIAS_VARIACION = 7
+# Días atípicos detectados que se muestran como tarjetas en EVENTOS (los de mayor |z|)
+MAX_EVENTOS_DETECTADOS = 8
+
+def reducir_serie(x, y, max_puntos=MAX_PUNTOS_SERIE):
+    """Largest-Triangle-Three-Buckets: max_puntos puntos que conservan la forma y los picos de la serie"""
+    n = len(y)
+    if max_puntos < 3 or n <= max_puntos:
+        return x, y
+    
+    posiciones = np.arange(n, dtype=float)
+    valores = np.asarray(y, dtype=float)
+    # Primer y último punto fijos; el resto se reparte en max_puntos - 2 tramos
+    bordes = np.linspace(1, n - 1, max_puntos - 1).astype(int)
+    elegidos = [0]
+    for i in range(max_puntos - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        if i + 2 < len(bordes):
+            cx, cy = posiciones[fin:bordes[i + 2]].mean(), valores[fin:bordes[i + 2]].mean()
+        else:
+            cx, cy = posiciones[-1], valores[-1]
+        # Punto del tramo que forma el triángulo más grande con el último elegido y el promedio del siguiente
+        a = elegidos[-1]
+        areas = np.abs((posiciones[a] - cx) * (valores[inicio:fin] - valores[a])
+                       - (posiciones[a] - posiciones[inicio:fin]) * (cy - valores[a]))
+        elegidos.append(inicio + int(areas.argmax()))
+    elegidos.append(n - 1)
+    return x.iloc[elegidos], y.iloc[elegidos]
+
+def armar_general(data, agregar):
+    """KPIs, tendencias, gráficos y resumen de la pestaña GENERAL a partir de las agregaciones"""
+    totales = agregar('resumen').to_dict('records')[0]
+    ingresos = totales['Ingreso Total']
+    pedidos = totales['Pedidos']
+    unidades = totales['Cantidad Pedida']
     ticket = ingresos / pedidos if pedidos > 0 else 0
     
     kpis = dbc.Row([
         dbc.Col(dbc.Card([dbc.CardBody([html.H6("💰 INGRESOS"), html.H3(f"${ingresos:,.0f}")])], className="border-primary"), width=3),
         dbc.Col(dbc.Card([dbc.CardBody([html.H6("📦 PEDIDOS"), html.H3(f"{pedidos:,}")])], className="border-success"), width=3),
         dbc.Col(dbc.Card([dbc.CardBody([html.H6("🎫 TICKET"), html.H3(f"${ticket:,.2f}")])], className="border-info"), width=3),
-        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🏙️ CIUDADES"), html.H3(f"{data['Ciudad'].nunique()}")])], className="border-warning"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🏙️ CIUDADES"), html.H3(f"{totales['Ciudades']}")])], className="border-warning"), width=3),
     ])
     
     # ========================================
     # Tendencias
     # ========================================
-    ventas_mes = data.groupby('Mes Num')['Ingreso Total'].sum()
+    ventas_mes = agregar('ventas_mes_num')['Ingreso Total']
     crecimiento = 0
     if len(ventas_mes) > 1:
         crecimiento = ((ventas_mes.iloc[-1] - ventas_mes.iloc[0]) / ventas_mes.iloc[0] * 100)
     
-    hora_pico = data.groupby('Hora')['ID de Pedido'].nunique().idxmax()
-    dia_pico = data.groupby('Día Semana Nombre')['ID de Pedido'].nunique().idxmax()
-    prod_top = data.groupby('Producto')['Cantidad Pedida'].sum().idxmax()
+    horas = agregar('horas')
+    dias = agregar('dias')
+    por_ciudad = agregar('ciudades').set_index('Ciudad')['Ingreso Total']
+    hora_pico = horas.set_index('Hora')['Pedidos'].idxmax()
+    dia_pico = dias.set_index('Día Semana Nombre')['Pedidos'].idxmax()
+    prod_top = agregar('productos').set_index('Producto')['Cantidad Pedida'].idxmax()
     
     color_crec = "success" if crecimiento>0 else "danger" if crecimiento<0 else "warning"
     signo = "+" if crecimiento>0 else ""
     
+    # Pronóstico ya ajustado de la serie del filtro (total, una categoría o un estado), si la hay
+    pronostico = agregar('pronostico')
+    proximos = []
+    if pronostico is not None:
+        proximos = [html.Small(f"🔮 Próximos {len(pronostico)} días: ${pronostico['Pronóstico'].sum():,.0f}",
+                               className="text-muted")]
+    
     tendencias = dbc.Row([
-        dbc.Col(dbc.Card([dbc.CardBody([html.H6("📈 CRECIMIENTO"), html.H3(f"{signo}{crecimiento:.1f}%", className=f"text-{color_crec}")])], className="bg-light"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("📈 CRECIMIENTO"), html.H3(f"{signo}{crecimiento:.1f}%", className=f"text-{color_crec}")] + proximos)], className="bg-light"), width=3),
         dbc.Col(dbc.Card([dbc.CardBody([html.H6("⏰ HORA PICO"), html.H3(f"{hora_pico}:00", className="text-warning")])], className="bg-light"), width=3),
         dbc.Col(dbc.Card([dbc.CardBody([html.H6("📆 MEJOR DÍA"), html.H3(dia_pico, className="text-info")])], className="bg-light"), width=3),
         dbc.Col(dbc.Card([dbc.CardBody([html.H6("🏆 PRODUCTO"), html.H6(prod_top[:15], className="text-success")])], className="bg-light"), width=3),
@@ -1116,7 +1764,7 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
     # ========================================
     # Gráfico 1: Ventas por Mes
     # ========================================
-    df_mes = data.groupby('Mes')['Ingreso Total'].sum().reset_index()
+    df_mes = agregar('ventas_mes')
     orden = ['Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre']
     df_mes['Mes'] = pd.Categorical(df_mes['Mes'], categories=orden, ordered=True)
     df_mes = df_mes.sort_values('Mes')
@@ -1128,19 +1776,39 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
     # ========================================
     # Gráfico 2: Tendencia Diaria
     # ========================================
-    diario = data.groupby('Fecha')['Ingreso Total'].sum().reset_index()
-    diario['Fecha'] = pd.to_datetime(diario['Fecha'])
-    diario = diario.sort_values('Fecha')
+    # Serie densa de las series de tiempo: los días sin ventas van en cero
+    diario = agregar('tendencia')
     
     fig_tendencia = go.Figure()
-    fig_tendencia.add_trace(go.Scatter(x=diario['Fecha'], y=diario['Ingreso Total'],
-                                       mode='lines', line=dict(color='#8e44ad')))
-    fig_tendencia.update_layout(title='📈 Tendencia Diaria')
+    fechas, ingresos_dia = reducir_serie(diario['Fecha'], diario['Ingreso Total'])
+    variacion = diario['Variación'].map('{:+.1f}%'.format).where(diario['Variación'].notna(), '—')
+    detalle = np.column_stack([diario['Acumulado'], variacion])[ingresos_dia.index]
+    fig_tendencia.add_trace(go.Scatter(x=fechas, y=ingresos_dia, name='Ingresos', customdata=detalle,
+                                       mode='lines', line=dict(color='#8e44ad'),
+                                       hovertemplate='%{x|%d/%m/%Y}<br>💰 $%{y:,.0f}<br>Acumulado: $%{customdata[0]:,.0f}'
+                                                     f'<br>vs {DIAS_VARIACION} días antes: %{{customdata[1]}}<extra></extra>'))
+    fechas, media = reducir_serie(diario['Fecha'], diario['Media Móvil'])
+    fig_tendencia.add_trace(go.Scatter(x=fechas, y=media, name=f'Media {VENTANA_MEDIA_MOVIL} días',
+                                       mode='lines', line=dict(color='#f39c12', width=3),
+                                       hovertemplate='%{x|%d/%m/%Y}<br>Media: $%{y:,.0f}<extra></extra>'))
+    if pronostico is not None:
+        # Banda del 95% (con la cobertura medida en el nombre): borde superior invisible y el inferior rellena hasta él
+        fig_tendencia.add_trace(go.Scatter(x=pronostico['Fecha'], y=pronostico['Superior'], mode='lines',
+                                           line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig_tendencia.add_trace(go.Scatter(x=pronostico['Fecha'], y=pronostico['Inferior'], mode='lines',
+                                           line=dict(width=0), fill='tonexty', fillcolor='rgba(142, 68, 173, 0.15)',
+                                           name=panel.pronosticos.etiqueta_banda, hoverinfo='skip'))
+        fig_tendencia.add_trace(go.Scatter(x=pronostico['Fecha'], y=pronostico['Pronóstico'], name='Pronóstico',
+                                           mode='lines', line=dict(color='#8e44ad', dash='dash'),
+                                           customdata=pronostico[['Inferior', 'Superior']].to_numpy(),
+                                           hovertemplate='%{x|%d/%m/%Y}<br>🔮 $%{y:,.0f}<br>'
+                                                         '($%{customdata[0]:,.0f} - $%{customdata[1]:,.0f})<extra></extra>'))
+    fig_tendencia.update_layout(title='📈 Tendencia Diaria', legend=dict(orientation='h', y=1.02, x=1, xanchor='right'))
     
     # ========================================
     # Gráfico 3: Heatmap
     # ========================================
-    heat = data.groupby(['Hora','Día Semana Nombre']).size().reset_index(name='Pedidos')
+    heat = agregar('hora_dia')
     orden_dias = ['Lunes','Martes','Miércoles','Jueves','Viernes','Sábado','Domingo']
     heat['Día Semana Nombre'] = pd.Categorical(heat['Día Semana Nombre'], categories=orden_dias, ordered=True)
     heat = heat.dropna().sort_values(['Día Semana Nombre','Hora'])
@@ -1156,7 +1824,6 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
     # ========================================
     # Gráfico 4: Ventas por Día
     # ========================================
-    dias = data.groupby(['Día Semana Nombre','Día Semana'])['ID de Pedido'].nunique().reset_index(name='Pedidos')
     dias = dias.sort_values('Día Semana')
     
     fig_dias = go.Figure()
@@ -1169,7 +1836,7 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
     # ========================================
     # Gráfico 5: Ciudades
     # ========================================
-    top_ciud = data.groupby('Ciudad')['Ingreso Total'].sum().nlargest(10).reset_index()
+    top_ciud = por_ciudad.nlargest(10).reset_index()
     fig_ciudades = px.bar(top_ciud, x='Ingreso Total', y='Ciudad', orientation='h',
                           title='🏙️ Top 10 Ciudades por Ingresos', color='Ingreso Total',
                           color_continuous_scale='Reds', text_auto='.2s')
@@ -1178,11 +1845,10 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
     # ========================================
     # Gráfico 6: Mapa de Estados
     # ========================================
-    ventas_estado = data.groupby('Estado Nombre')['Ingreso Total'].sum().reset_index()
-    ventas_estado['codigo'] = ventas_estado['Estado Nombre'].map(codigos_estados)
+    ventas_estado = agregar('mapa')
     
     fig_mapa = go.Figure(data=go.Choropleth(
-        locations=ventas_estado['codigo'],
+        locations=ventas_estado['Estado Codigo'],
         z=ventas_estado['Ingreso Total'],
         locationmode='USA-states',
         colorscale='Reds',
@@ -1196,28 +1862,25 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
     # ========================================
     resumen = dbc.Row([
         dbc.Col(dbc.Card([dbc.CardBody([html.H6("🏆 Producto Estrella"), html.P(prod_top[:20], className="text-success")])], className="border-success"), width=3),
-        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🏙️ Ciudad Top"), html.P(data.groupby('Ciudad')['Ingreso Total'].sum().idxmax()[:20], className="text-primary")])], className="border-primary"), width=3),
-        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🗺️ Estado Top"), html.P(data.groupby('Estado Nombre')['Ingreso Total'].sum().idxmax()[:20], className="text-info")])], className="border-info"), width=3),
-        dbc.Col(dbc.Card([dbc.CardBody([html.H6("📦 Categoría Top"), html.P(data.groupby('Categoría')['Ingreso Total'].sum().idxmax()[:20], className="text-warning")])], className="border-warning"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🏙️ Ciudad Top"), html.P(por_ciudad.idxmax()[:20], className="text-primary")])], className="border-primary"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🗺️ Estado Top"), html.P(ventas_estado.set_index('Estado Nombre')['Ingreso Total'].idxmax()[:20], className="text-info")])], className="border-info"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("📦 Categoría Top"), html.P(agregar('categorias').set_index('Categoría')['Ingreso Total'].idxmax()[:20], className="text-warning")])], className="border-warning"), width=3),
     ])
     
-    # ========================================
-    # PRODUCTO ESTRELLA
-    # ========================================
-    if filtro_prod == 'General':
-        analisis = analizar_producto_estrella(data, "GLOBAL")
-    elif filtro_prod == 'Mes':
-        if mes != 'Todos':
-            analisis = analizar_producto_estrella(data[data['Mes'] == mes], f"MES: {mes}")
-        else:
-            mtop = data.groupby('Mes')['Cantidad Pedida'].sum().idxmax()
-            analisis = analizar_producto_estrella(data[data['Mes'] == mtop], f"MES: {mtop} (top)")
-    elif filtro_prod == 'Semana':
-        stop = data.groupby('Semana')['Cantidad Pedida'].sum().idxmax()
-        analisis = analizar_producto_estrella(data[data['Semana'] == stop], f"SEMANA: {stop}")
-    else:
-        dtop = data.groupby('Día del Año')['Cantidad Pedida'].sum().idxmax()
-        analisis = analizar_producto_estrella(data[data['Día del Año'] == dtop], "DÍA PICO")
+    return (kpis, tendencias, fig_mes, fig_tendencia, fig_heatmap, fig_dias,
+            fig_ciudades, fig_mapa, resumen)
+
+def pronostico_producto(producto):
+    """Ingresos pronosticados del producto en todas las ciudades (lista vacía si no hay serie)"""
+    total = panel.pronosticos.total('Producto', producto)
+    if total is None:
+        return []
+    return [html.P(f"🔮 Próximos {panel.pronosticos.horizonte} días (todas las ciudades): ${total:,.0f}",
+                   className="small text-primary mb-0")]
+
+def armar_producto(resultados):
+    """Producto estrella, su análisis y el ranking por mes"""
+    analisis = resultados['producto_estrella']
     
     if analisis:
         prod_container = dbc.Card([
@@ -1229,7 +1892,7 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
                     f"📊 {analisis['share']:.1f}% participación"
                 ]),
                 html.P(f"📌 Análisis basado en: {analisis['filtro_aplicado']}", className="small text-muted")
-            ])
+            ] + pronostico_producto(analisis['producto']))
         ], className="bg-light border-2 border-success mb-3")
         
         factores = dbc.Card([
@@ -1248,36 +1911,27 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
     # ========================================
     # Producto por Mes
     # ========================================
-    prods_mes = data.groupby(['Mes','Producto'])['Cantidad Pedida'].sum().reset_index()
-    idx = prods_mes.groupby('Mes')['Cantidad Pedida'].idxmax()
-    top_mes = prods_mes.loc[idx].reset_index(drop=True)
-    orden_meses = ['Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre']
-    top_mes['Mes'] = pd.Categorical(top_mes['Mes'], categories=orden_meses, ordered=True)
-    top_mes = top_mes.sort_values('Mes')
-    
-    rows = []
-    for _, r in top_mes.iterrows():
-        rows.append(html.Tr([html.Td(r['Mes']), html.Td(r['Producto'][:30]), html.Td(f"{r['Cantidad Pedida']:,.0f}")]))
-    
-    tabla_prod_mes = dbc.Table(
-        [html.Thead(html.Tr([html.Th("Mes"), html.Th("Producto Más Vendido"), html.Th("Cantidad")])),
-         html.Tbody(rows)],
-        striped=True, bordered=True, size='sm'
-    )
+    top_mes = resultados['ranking_mes']
     
-    # ========================================
-    # Gráficos de Horas
-    # ========================================
+    tabla_prod_mes = tabla_datos(top_mes.assign(Producto=top_mes['Producto'].str[:30]), {
+        'Mes': ("Mes", 'texto'),
+        'Producto': ("Producto Más Vendido", 'texto'),
+        'Cantidad Pedida': ("Cantidad", 'entero')
+    })
     
+    return prod_container, tabla_prod_mes, factores
+
+def armar_horas(agregar):
+    """Distribución por hora, mapa hora × mes y evolución de las horas pico"""
     # 1. Distribución por Hora
-    horas = data.groupby('Hora')['ID de Pedido'].nunique().reset_index(name='Pedidos')
+    horas = agregar('horas')
     fig_horas_dist = px.bar(horas, x='Hora', y='Pedidos', 
                             title='📊 Distribución de Pedidos por Hora del Día',
                             color='Pedidos', color_continuous_scale='Viridis',
                             labels={'Pedidos':'Cantidad de Pedidos', 'Hora':'Hora del Día'})
     
     # 2. Heatmap Hora vs Mes
-    heat_hm = data.groupby(['Mes','Hora']).size().reset_index(name='Pedidos')
+    heat_hm = agregar('mes_hora')
     pivot = heat_hm.pivot(index='Mes', columns='Hora', values='Pedidos').fillna(0)
     pivot = pivot.reindex(orden_meses)
     
@@ -1298,7 +1952,7 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
     
     # 3. Evolución Horas Pico
     top_horas = horas.nlargest(5, 'Pedidos')['Hora'].tolist()
-    horas_evo = data[data['Hora'].isin(top_horas)].groupby(['Mes','Hora']).size().reset_index(name='Pedidos')
+    horas_evo = heat_hm[heat_hm['Hora'].isin(top_horas)]
     
     fig_horas_evo = go.Figure()
     colores_horas = px.colors.qualitative.Set1
@@ -1321,34 +1975,32 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
         legend_title='Hora del Día'
     )
     
-    # ========================================
-    # COMPARADOR
-    # ========================================
-    comp_kpis = html.P("Selecciona meses para comparar")
+    return fig_horas_dist, fig_horas_heat, fig_horas_evo
+
+def armar_comparador(resultados, periodo_comp, meses_comp, metrica, empty_fig):
+    """KPIs, tendencia, distribución y tabla de los períodos comparados"""
+    comp_kpis = html.P("Selecciona períodos para comparar")
     fig_comp_tend = empty_fig
     fig_comp_dist = empty_fig
-    comp_tabla = html.P("Selecciona meses")
+    comp_tabla = html.P("Selecciona períodos")
     
     if meses_comp and len(meses_comp) > 0:
-        meses_con_datos = [m for m in meses_comp if not data[data['Mes']==m].empty]
-        if meses_con_datos:
+        columna_comp, posicion_comp, eje_comp = periodos_comparador[periodo_comp]
+        diario_comp, totales_comp = resultados['comparador']
+        if not totales_comp.empty:
             # KPIs
             filas = []
-            for i in range(0, len(meses_con_datos), 3):
-                fila = meses_con_datos[i:i+3]
+            for i in range(0, len(totales_comp), 3):
+                fila = totales_comp.iloc[i:i+3]
                 cols = []
-                for m in fila:
-                    dm = data[data['Mes']==m]
-                    ingresos_m = dm['Ingreso Total'].sum()
-                    pedidos_m = dm['ID de Pedido'].nunique()
-                    
+                for m, ingresos_m, pedidos_m in zip(fila.index, fila['ingresos'], fila['pedidos']):
                     if metrica == 'ingresos':
                         valor = f"${ingresos_m:,.0f}"
                     else:
                         valor = f"{pedidos_m:,}"
                     
                     cols.append(dbc.Col(dbc.Card([
-                        dbc.CardBody([html.H6(m), html.H4(valor, className="text-primary")])
+                        dbc.CardBody([html.H6(etiqueta_periodo(periodo_comp, m)), html.H4(valor, className="text-primary")])
                     ], className="border-primary"), width=4))
                 filas.append(dbc.Row(cols, className="mb-2"))
             comp_kpis = html.Div(filas)
@@ -1356,141 +2008,109 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
             # Tendencia comparativa
             fig_comp_tend = go.Figure()
             colors = px.colors.qualitative.Set1
-            for i, m in enumerate(meses_con_datos):
-                dm = data[data['Mes']==m]
-                dia = dm.groupby('Día')['Ingreso Total'].sum().reset_index()
+            dias_comp = dict(tuple(diario_comp.groupby(columna_comp)))
+            for i, m in enumerate(totales_comp.index):
+                dia_m = dias_comp[m]
                 fig_comp_tend.add_trace(go.Scatter(
-                    x=dia['Día'], 
-                    y=dia['Ingreso Total'],
+                    x=dia_m[posicion_comp], 
+                    y=dia_m['ingresos'],
                     mode='lines+markers', 
-                    name=m,
+                    name=etiqueta_periodo(periodo_comp, m),
                     line=dict(color=colors[i%len(colors)], width=3),
                     hovertemplate='<b>Día:</b> %{x}<br><b>Ingresos:</b> $%{y:,.0f}<extra></extra>'
                 ))
             fig_comp_tend.update_layout(
-                title='📈 Tendencia Diaria Comparativa por Mes',
-                xaxis_title='Día del Mes',
+                title=f'📈 Tendencia Diaria Comparativa por {periodo_comp}',
+                xaxis_title=eje_comp,
                 yaxis_title='Ingresos ($)',
                 hovermode='x unified'
             )
+            if periodo_comp == 'Semana':
+                fig_comp_tend.update_xaxes(tickvals=list(range(7)), ticktext=dias_list[1:])
             
-            # GRÁFICO DISTRIBUCIÓN POR MES
-            datos_meses = data[data['Mes'].isin(meses_con_datos)].groupby('Mes').agg({
-                'Ingreso Total': 'sum',
-                'ID de Pedido': 'nunique'
-            }).reset_index()
+            # GRÁFICO DISTRIBUCIÓN POR PERÍODO (orden cronológico: las claves llevan el año delante)
+            datos_meses = totales_comp.sort_index()
+            etiquetas_comp = [etiqueta_periodo(periodo_comp, m) for m in datos_meses.index]
             
-            if not datos_meses.empty:
-                datos_meses['Mes'] = pd.Categorical(datos_meses['Mes'], categories=orden_meses, ordered=True)
-                datos_meses = datos_meses.sort_values('Mes')
-                datos_meses = datos_meses[datos_meses['Mes'].isin(meses_con_datos)]
-                
-                fig_comp_dist = make_subplots(specs=[[{"secondary_y": True}]])
-                
-                # Barras de ingresos
-                fig_comp_dist.add_trace(
-                    go.Bar(
-                        x=datos_meses['Mes'],
-                        y=datos_meses['Ingreso Total'],
-                        name='Ingresos',
-                        marker_color='#3498db',
-                        text=[f"${x:,.0f}" for x in datos_meses['Ingreso Total']],
-                        textposition='outside',
-                        hovertemplate='<b>Mes:</b> %{x}<br><b>Ingresos:</b> $%{y:,.0f}<extra></extra>'
-                    ),
-                    secondary_y=False
-                )
-                
-                # Línea de pedidos
-                fig_comp_dist.add_trace(
-                    go.Scatter(
-                        x=datos_meses['Mes'],
-                        y=datos_meses['ID de Pedido'],
-                        name='Pedidos',
-                        mode='lines+markers',
-                        marker_color='#e74c3c',
-                        line=dict(width=3),
-                        hovertemplate='<b>Mes:</b> %{x}<br><b>Pedidos:</b> %{y:,}<extra></extra>'
-                    ),
-                    secondary_y=True
-                )
-                
-                fig_comp_dist.update_layout(
-                    title='📊 Distribución de Ventas por Mes',
-                    height=400,
-                    hovermode='x unified'
-                )
-                
-                fig_comp_dist.update_xaxes(title_text="Mes")
-                fig_comp_dist.update_yaxes(title_text="Ingresos ($)", secondary_y=False)
-                fig_comp_dist.update_yaxes(title_text="Cantidad de Pedidos", secondary_y=True)
+            fig_comp_dist = make_subplots(specs=[[{"secondary_y": True}]])
             
-            # Tabla
-            rows = []
-            for m in meses_con_datos:
-                dm = data[data['Mes']==m]
-                rows.append(html.Tr([
-                    html.Td(m), 
-                    html.Td(f"${dm['Ingreso Total'].sum():,.0f}"),
-                    html.Td(f"{dm['ID de Pedido'].nunique():,}"), 
-                    html.Td(f"{dm['Cantidad Pedida'].sum():,}")
-                ]))
-            comp_tabla = dbc.Table(
-                [html.Thead(html.Tr([html.Th("Mes"), html.Th("Ingresos"), html.Th("Pedidos"), html.Th("Unidades")])),
-                 html.Tbody(rows)],
-                striped=True, bordered=True, size='sm'
+            # Barras de ingresos
+            fig_comp_dist.add_trace(
+                go.Bar(
+                    x=etiquetas_comp,
+                    y=datos_meses['ingresos'],
+                    name='Ingresos',
+                    marker_color='#3498db',
+                    text=[f"${x:,.0f}" for x in datos_meses['ingresos']],
+                    textposition='outside',
+                    hovertemplate=f'<b>{periodo_comp}:</b> %{{x}}<br><b>Ingresos:</b> $%{{y:,.0f}}<extra></extra>'
+                ),
+                secondary_y=False
             )
-    
-    # ========================================
-    # EVENTOS ESPECIALES (CON TARJETAS CLICKEABLES)
-    # ========================================
-    data['Evento'] = data['Fecha Pedido'].apply(identificar_evento)
-    eventos_data = data[data['Evento'] != 'Normal'].groupby('Evento').agg({
-        'Ingreso Total': 'sum',
-        'ID de Pedido': 'nunique'
-    }).reset_index()
-    
-    if not eventos_data.empty:
-        data_normal = data[data['Evento'] == 'Normal']
-        if not data_normal.empty:
-            ventas_por_dia_normal = data_normal.groupby('Fecha')['Ingreso Total'].sum().mean()
-        else:
-            ventas_por_dia_normal = data['Ingreso Total'].mean()
-        
-        cards = []
-        for _, r in eventos_data.iterrows():
-            incremento = ((r['Ingreso Total'] / ventas_por_dia_normal) - 1) * 100
             
-            if incremento > 50:
-                color = "success"
-                icono = "🚀"
-            elif incremento > 20:
-                color = "info"
-                icono = "📈"
-            elif incremento > 0:
-                color = "primary"
-                icono = "👍"
-            elif incremento > -20:
-                color = "warning"
-                icono = "👎"
-            else:
-                color = "danger"
-                icono = "📉"
+            # Línea de pedidos
+            fig_comp_dist.add_trace(
+                go.Scatter(
+                    x=etiquetas_comp,
+                    y=datos_meses['pedidos'],
+                    name='Pedidos',
+                    mode='lines+markers',
+                    marker_color='#e74c3c',
+                    line=dict(width=3),
+                    hovertemplate=f'<b>{periodo_comp}:</b> %{{x}}<br><b>Pedidos:</b> %{{y:,}}<extra></extra>'
+                ),
+                secondary_y=True
+            )
             
-            cards.append(
-                dbc.Col(
-                    dbc.Card([
-                        dbc.CardHeader(r['Evento'], className="text-center fw-bold"),
-                        dbc.CardBody([
-                            html.H3(f"{icono} {incremento:+.1f}%", className=f"text-center text-{color}"),
-                            html.P([
-                                html.Span(f"💰 ${r['Ingreso Total']:,.0f}", className="d-block"),
-                                html.Span(f"📦 {r['ID de Pedido']} pedidos", className="d-block small text-muted"),
-                            ], className="text-center mt-2")
-                        ])
-                    ], className=f"border-{color} shadow-sm h-100", style={'cursor': 'pointer'})
-                , width=3, id={'type': 'evento-card', 'index': r['Evento']})
+            fig_comp_dist.update_layout(
+                title=f'📊 Distribución de Ventas por {periodo_comp}',
+                height=400,
+                hovermode='x unified'
             )
+            
+            fig_comp_dist.update_xaxes(title_text=periodo_comp)
+            fig_comp_dist.update_yaxes(title_text="Ingresos ($)", secondary_y=False)
+            fig_comp_dist.update_yaxes(title_text="Cantidad de Pedidos", secondary_y=True)
+            
+            # Tabla
+            tabla_comp = totales_comp.reset_index(drop=True)
+            tabla_comp.insert(0, 'periodo', [etiqueta_periodo(periodo_comp, m) for m in totales_comp.index])
+            comp_tabla = tabla_datos(tabla_comp, {
+                'periodo': (periodo_comp, 'texto'),
+                'ingresos': ("Ingresos", 'moneda'),
+                'pedidos': ("Pedidos", 'entero'),
+                'unidades': ("Unidades", 'entero')
+            })
+    
+    return fig_comp_tend, fig_comp_dist, comp_kpis, comp_tabla
+
+def armar_eventos(resultados):
+    """Tarjetas clickeables de eventos especiales con su variación sobre un día normal"""
+    eventos_data, ventas_por_dia_normal = resultados['eventos']
+    
+    if not eventos_data.empty:
+        incrementos = ((eventos_data['Ingreso Total'] / ventas_por_dia_normal) - 1) * 100
+        umbrales = [incrementos > 50, incrementos > 20, incrementos > 0, incrementos > -20]
+        colores = np.select(umbrales, ["success", "info", "primary", "warning"], default="danger")
+        iconos = np.select(umbrales, ["🚀", "📈", "👍", "👎"], default="📉")
+        
+        cards = [
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardHeader(evento, className="text-center fw-bold"),
+                    dbc.CardBody([
+                        html.H3(f"{icono} {incremento:+.1f}%", className=f"text-center text-{color}"),
+                        html.P([
+                            html.Span(f"💰 ${ingresos_ev:,.0f}", className="d-block"),
+                            html.Span(f"📦 {pedidos_ev} pedidos", className="d-block small text-muted"),
+                        ], className="text-center mt-2")
+                    ])
+                ], className=f"border-{color} shadow-sm h-100", style={'cursor': 'pointer'})
+            , width=3, id={'type': 'evento-card', 'index': evento})
+            for evento, ingresos_ev, pedidos_ev, incremento, color, icono in zip(
+                eventos_data['Evento'], eventos_data['Ingreso Total'], eventos_data['ID de Pedido'],
+                incrementos, colores, iconos)
+        ]
         
         eventos_cards = dbc.Row(cards, className="g-2 mb-3")
         eventos_explicacion = html.Div([
@@ -1501,34 +2121,566 @@ def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, fil
         eventos_cards = html.P("No hay eventos en el período seleccionado")
         eventos_explicacion = html.P("")
     
-    # ========================================
-    # Productos Complementarios
-    # ========================================
-    top_pares = analizar_productos_complementarios(data)
+    detectados = armar_eventos_detectados(resultados['anomalias'])
+    if detectados:
+        eventos_cards = html.Div([eventos_cards, *detectados])
+    
+    return eventos_cards, eventos_explicacion
+
+def armar_eventos_detectados(anomalias):
+    """Tarjetas de los días atípicos del filtro (clickeables como los eventos) y tabla de horas atípicas"""
+    if anomalias is None:
+        return []
+    diarias, horarias = anomalias
+    if diarias.empty and horarias.empty:
+        return [html.Hr(), html.P("🤖 No se detectaron días ni horas atípicos en el período seleccionado",
+                                  className="text-muted")]
+    
+    seccion = [html.Hr(), html.H5("🤖 EVENTOS DETECTADOS", className="text-secondary"),
+               html.P("Días y horas que se apartan de la tendencia, del patrón semanal y del perfil horario "
+                      "del filtro (z robusto)", className="small text-muted")]
+    if not diarias.empty:
+        destacadas = diarias.loc[diarias['z'].abs().nlargest(MAX_EVENTOS_DETECTADOS).index].sort_values('Fecha')
+        cards = [
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardHeader(f"{'🔺' if tipo == 'Pico' else '🔻'} {tipo} · {fecha:%d/%m/%Y}",
+                                   className="text-center fw-bold"),
+                    dbc.CardBody([
+                        html.H3(f"{variacion:+.1f}%", className=f"text-center text-{'success' if tipo == 'Pico' else 'danger'}"),
+                        html.P([
+                            html.Span(f"💰 ${valor:,.0f}", className="d-block"),
+                            html.Span(f"esperado ${esperado:,.0f} · z {z:+.1f}", className="d-block small text-muted"),
+                        ], className="text-center mt-2")
+                    ])
+                ], className=f"border-{'success' if tipo == 'Pico' else 'danger'} shadow-sm h-100", style={'cursor': 'pointer'})
+            , width=3, id={'type': 'evento-card', 'index': f"auto:{fecha:%Y-%m-%d}"})
+            for fecha, tipo, variacion, valor, esperado, z in zip(
+                destacadas['Fecha'], destacadas['Tipo'], destacadas['Variación'], destacadas['Valor'],
+                destacadas['Esperado'], destacadas['z'])
+        ]
+        seccion.append(dbc.Row(cards, className="g-2 mb-3"))
+    if not horarias.empty:
+        horas = horarias.assign(Fecha=horarias['Fecha'].dt.strftime('%Y-%m-%d'), Hora=horarias['Hora'].map('{:02d}:00'.format),
+                                Variación=horarias['Variación'].map('{:+.0f}%'.format), z=horarias['z'].round(1))
+        seccion += [html.H6("⏰ Horas atípicas (líneas vendidas)", className="mt-2"), tabla_datos(horas, {
+            'Fecha': ("Fecha", 'texto'),
+            'Hora': ("Hora", 'texto'),
+            'Tipo': ("Tipo", 'texto'),
+            'Valor': ("Líneas", 'entero'),
+            'Esperado': ("Esperadas", 'entero'),
+            'Variación': ("Variación", 'texto'),
+            'z': ("z", 'texto'),
+        })]
+    return seccion
+
+def armar_complementos(resultados):
+    """Tabla de pares de productos comprados juntos"""
+    top_pares = resultados['complementarios']
     
     if top_pares:
-        rows = []
-        for i, ((a, b), c) in enumerate(top_pares, 1):
-            rows.append(html.Tr([
-                html.Td(f"#{i}"),
-                html.Td(a[:25]),
-                html.Td(b[:25]),
-                html.Td(f"{c} veces", className="text-success")
-            ]))
-        
-        prod_comp = dbc.Table(
-            [html.Thead(html.Tr([html.Th("#"), html.Th("Producto A"), html.Th("Producto B"), html.Th("Frecuencia")])),
-             html.Tbody(rows)],
-            striped=True, bordered=True, size='sm'
-        )
+        pares = pd.DataFrame([(a[:25], b[:25], c) for (a, b), c in top_pares], columns=['A', 'B', 'Frecuencia'])
+        pares.insert(0, 'Posición', [f"#{i}" for i in range(1, len(pares) + 1)])
+        prod_comp = tabla_datos(pares, {
+            'Posición': ("#", 'texto'),
+            'A': ("Producto A", 'texto'),
+            'B': ("Producto B", 'texto'),
+            'Frecuencia': ("Frecuencia (veces)", 'entero')
+        })
     else:
         prod_comp = html.P("No se encontraron pares significativos")
     
-    return (subtitulo, kpis, tendencias, fig_mes, fig_tendencia, fig_heatmap, fig_dias,
-            fig_ciudades, fig_mapa, resumen, prod_container, tabla_prod_mes, factores,
-            fig_horas_dist, fig_horas_heat, fig_horas_evo,
-            fig_comp_tend, fig_comp_dist, comp_kpis, comp_tabla,
-            eventos_cards, eventos_explicacion, prod_comp)
+    return (prod_comp,)
+
+def armar_clientes(resultados, empty_fig):
+    """KPIs de recompra, pedidos por cliente, cohortes por mes del primer pedido, segmentos RFM y mejores clientes"""
+    vistas = resultados['clientes']
+    if vistas is None:
+        sin_datos = html.P("Sin clientes para los filtros seleccionados")
+        return sin_datos, empty_fig, empty_fig, empty_fig, sin_datos, sin_datos, empty_fig, empty_fig
+    
+    recompra = vistas['recompra']
+    espera = recompra['Días a 2.ª Compra']
+    kpis = dbc.Row([
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("👥 CLIENTES"), html.H3(f"{recompra['Clientes']:,}"),
+                                        html.Small(f"{recompra['Recurrentes']:,} recurrentes", className="text-muted")])], className="border-primary"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🔁 RECOMPRA"), html.H3(f"{recompra['Tasa Recompra']:.1f}%"),
+                                        html.Small(f"mediana {espera:.0f} días a la 2.ª compra" if espera is not None else "sin segundas compras",
+                                                   className="text-muted")])], className="border-success"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("💎 INGRESO POR CLIENTE"), html.H3(f"${recompra['Ingreso por Cliente']:,.2f}"),
+                                        html.Small(f"{recompra['Pedidos por Cliente']:.2f} pedidos por cliente", className="text-muted")])], className="border-info"), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("💰 INGRESO RECURRENTES"), html.H3(f"{recompra['% Ingreso Recurrentes']:.1f}%"),
+                                        html.Small("del ingreso del período", className="text-muted")])], className="border-warning"), width=3),
+    ])
+    
+    # Clientes por cantidad de pedidos
+    frecuencia = vistas['frecuencia']
+    fig_frecuencia = px.bar(frecuencia, x='Pedidos', y='Clientes', title='🔁 Clientes según Cantidad de Pedidos',
+                            color='Ingreso', color_continuous_scale='Blues', text_auto=',d',
+                            labels={'Pedidos': 'Pedidos en el período', 'Ingreso': 'Ingreso ($)'})
+    fig_frecuencia.update_layout(xaxis_type='category')
+    
+    # Cohortes por mes del primer pedido: clientes nuevos y % que volvió a comprar
+    cohortes = vistas['cohortes']
+    etiquetas = [f"{mapa_meses[c.month]} {c.year}" for c in cohortes['Cohorte']]
+    fig_cohortes = make_subplots(specs=[[{'secondary_y': True}]])
+    fig_cohortes.add_trace(go.Bar(x=etiquetas, y=cohortes['Nuevos'], name='Clientes nuevos', marker_color='#3498db',
+                                  hovertemplate='<b>%{x}</b><br>Nuevos: %{y:,}<extra></extra>'))
+    fig_cohortes.add_trace(go.Scatter(x=etiquetas, y=cohortes['% Recompra'], name='% recompra', mode='lines+markers',
+                                      line=dict(color='#e74c3c', width=3),
+                                      hovertemplate='<b>%{x}</b><br>Volvieron a comprar: %{y:.1f}%<extra></extra>'),
+                           secondary_y=True)
+    fig_cohortes.update_layout(title='📅 Cohortes por Mes del Primer Pedido', hovermode='x unified',
+                               legend=dict(orientation='h', y=-0.2))
+    fig_cohortes.update_yaxes(title_text='Clientes nuevos', secondary_y=False)
+    fig_cohortes.update_yaxes(title_text='% que volvió a comprar', ticksuffix='%', secondary_y=True)
+    
+    # Segmentos RFM: participación en clientes e ingreso
+    rfm = vistas['rfm']
+    fig_rfm = go.Figure([
+        go.Bar(x=rfm['Segmento'], y=rfm['% Clientes'], name='% clientes', marker_color='#95a5a6',
+               hovertemplate='<b>%{x}</b><br>%{y:.1f}% de los clientes<extra></extra>'),
+        go.Bar(x=rfm['Segmento'], y=rfm['% Ingreso'], name='% ingreso', marker_color='#27ae60',
+               hovertemplate='<b>%{x}</b><br>%{y:.1f}% del ingreso<extra></extra>'),
+    ])
+    fig_rfm.update_layout(title='🎯 Segmentos RFM (recencia, frecuencia, monto)', barmode='group',
+                          yaxis_ticksuffix='%', legend=dict(orientation='h', y=-0.2))
+    
+    tabla_rfm = tabla_datos(rfm.round({'% Clientes': 1, '% Ingreso': 1, 'Recencia': 0, 'Pedidos': 2}), {
+        'Segmento': ("Segmento", 'texto'),
+        'Descripción': ("Descripción", 'texto'),
+        'Clientes': ("Clientes", 'entero'),
+        '% Clientes': ("% Clientes", 'texto'),
+        'Ingreso': ("Ingresos", 'moneda'),
+        '% Ingreso': ("% Ingresos", 'texto'),
+        'Ingreso por Cliente': ("Ingreso por cliente", 'moneda2'),
+        'Recencia': ("Días desde la última compra", 'entero'),
+        'Pedidos': ("Pedidos promedio", 'texto'),
+    })
+    
+    top = vistas['top'].assign(**{'Último Pedido': lambda t: t['Último Pedido'].dt.strftime('%Y-%m-%d'),
+                                  'Categoría Principal': lambda t: t['Categoría Principal'].astype(str)})
+    tabla_top = tabla_datos(top, {
+        'Dirección': ("Dirección", 'texto'),
+        'Ciudad': ("Ciudad", 'texto'),
+        'Pedidos': ("Pedidos", 'entero'),
+        'Ingreso Total': ("Ingresos", 'moneda'),
+        'Último Pedido': ("Último pedido", 'texto'),
+        'Categoría Principal': ("Categoría principal (histórica)", 'texto'),
+    })
+    
+    fig_retencion, fig_ingresos = armar_cohortes(resultados['cohortes'])
+    
+    return kpis, fig_frecuencia, fig_cohortes, fig_rfm, tabla_rfm, tabla_top, fig_retencion, fig_ingresos
+
+def armar_cohortes(matriz):
+    """Mapas cohorte × meses desde el primer pedido: % de la cohorte que vuelve a comprar e ingreso acumulado por cliente"""
+    cohortes = [f"{mapa_meses[c.month]} {c.year}" for c in matriz['retencion'].index]
+    meses = matriz['retencion'].columns
+    retencion = matriz['retencion'].to_numpy()
+    
+    # El mes 0 es siempre 100%: la escala de color se ajusta a los meses siguientes
+    zmax = np.nanmax(retencion[:, 1:]) if retencion.shape[1] > 1 and np.isfinite(retencion[:, 1:]).any() else 100
+    fig_retencion = go.Figure(data=go.Heatmap(
+        z=retencion,
+        x=meses,
+        y=cohortes,
+        customdata=matriz['activos'].to_numpy(),
+        zmin=0, zmax=zmax,
+        colorscale='Viridis',
+        colorbar=dict(title="% de la<br>Cohorte", ticksuffix="%"),
+        hovertemplate='<b>Cohorte:</b> %{y}<br><b>Mes:</b> +%{x}<br><b>Compraron:</b> %{customdata:,} clientes (%{z:.1f}%)<extra></extra>'
+    ))
+    fig_retencion.update_layout(
+        title='🔥 Retención: Mes del Primer Pedido vs Meses Transcurridos',
+        xaxis_title='Meses desde el Primer Pedido',
+        yaxis_title='Cohorte',
+        yaxis_autorange='reversed',
+        height=450
+    )
+    
+    fig_ingresos = go.Figure(data=go.Heatmap(
+        z=matriz['ingresos'].to_numpy(),
+        x=meses,
+        y=cohortes,
+        colorscale='Viridis',
+        colorbar=dict(title="Ingreso por<br>Cliente", tickprefix="$", tickformat=",.0f"),
+        hovertemplate='<b>Cohorte:</b> %{y}<br><b>Mes:</b> +%{x}<br><b>Ingreso acumulado:</b> $%{z:,.2f} por cliente<extra></extra>'
+    ))
+    fig_ingresos.update_layout(
+        title='💰 Ingreso Acumulado por Cliente de cada Cohorte',
+        xaxis_title='Meses desde el Primer Pedido',
+        yaxis_title='Cohorte',
+        yaxis_autorange='reversed',
+        height=450
+    )
+    
+    return fig_retencion, fig_ingresos
+
+SALIDAS_DASHBOARD = [Output('subtitulo', 'children'),
+                     Output('kpis', 'children'),
+                     Output('tendencias', 'children'),
+                     Output('graf-mes', 'figure'),
+                     Output('graf-tendencia', 'figure'),
+                     Output('graf-heatmap', 'figure'),
+                     Output('graf-dias', 'figure'),
+                     Output('graf-ciudades', 'figure'),
+                     Output('mapa-estados', 'figure'),
+                     Output('resumen', 'children'),
+                     Output('prod-container', 'children'),
+                     Output('tabla-prod-mes', 'children'),
+                     Output('factores-prod', 'children'),
+                     Output('graf-horas-dist', 'figure'),
+                     Output('graf-horas-heat', 'figure'),
+                     Output('graf-horas-evo', 'figure'),
+                     Output('graf-comp-tend', 'figure'),
+                     Output('graf-comp-dist', 'figure'),
+                     Output('comp-kpis', 'children'),
+                     Output('comp-tabla', 'children'),
+                     Output('eventos-cards', 'children'),
+                     Output('eventos-explicacion', 'children'),
+                     Output('prod-comp', 'children'),
+                     Output('clientes-kpis', 'children'),
+                     Output('graf-clientes-frecuencia', 'figure'),
+                     Output('graf-clientes-cohortes', 'figure'),
+                     Output('graf-clientes-rfm', 'figure'),
+                     Output('clientes-rfm', 'children'),
+                     Output('clientes-top', 'children'),
+                     Output('graf-cohortes-retencion', 'figure'),
+                     Output('graf-cohortes-ingresos', 'figure')]
+ENTRADAS_DASHBOARD = [Input('ciudad', 'value'),
+                      Input('estado', 'value'),
+                      Input('mes', 'value'),
+                      Input('dia', 'value'),
+                      Input('categoria', 'value'),
+                      Input('rango', 'value'),
+                      Input('fechas', 'start_date'),
+                      Input('fechas', 'end_date'),
+                      Input('filtro-prod', 'value'),
+                      Input('comp-periodo', 'value'),
+                      Input('comp-meses', 'value'),
+                      Input('comp-metrica', 'value'),
+                      Input('comp-rango-a', 'start_date'),
+                      Input('comp-rango-a', 'end_date'),
+                      Input('comp-rango-b', 'start_date'),
+                      Input('comp-rango-b', 'end_date')]
+
+# Salidas de la pestaña GENERAL y sus agregaciones: en modo cliente las calcula el navegador
+SALIDAS_GENERAL = SALIDAS_DASHBOARD[:10]
+TAREAS_GENERAL = {'resumen', 'ventas_mes_num', 'ventas_mes', 'tendencia', 'pronostico', 'hora_dia', 'dias',
+                  'horas', 'ciudades', 'mapa', 'categorias', 'productos'}
+
+# Bloques de salidas en el orden de SALIDAS_DASHBOARD: (cantidad de salidas,
+# entradas de las que dependen además de los 8 filtros base, tareas que necesitan)
+BLOQUES_DASHBOARD = {
+    'general': (len(SALIDAS_GENERAL), set(), TAREAS_GENERAL),
+    'producto': (3, {'filtro-prod'}, {'producto_estrella', 'ranking_mes'}),
+    'horas': (3, set(), {'horas', 'mes_hora'}),
+    'comparador': (4, {'comp-periodo', 'comp-meses', 'comp-metrica', 'comp-rango-a', 'comp-rango-b'}, {'comparador'}),
+    'eventos': (2, set(), {'eventos', 'anomalias'}),
+    'complementos': (1, set(), {'complementarios'}),
+    'clientes': (8, set(), {'clientes', 'cohortes'}),
+}
+ENTRADAS_BASE = {entrada.component_id for entrada in ENTRADAS_DASHBOARD[:8]}
+
+# VENTAS_PAYLOAD=1 imprime el tamaño serializado de cada salida en cada refresco
+REPORTE_PAYLOAD = os.environ.get('VENTAS_PAYLOAD', '').lower() in ('1', 'si', 'true')
+
+def entradas_disparadas():
+    """Ids de las entradas que dispararon el callback; None en la carga inicial o fuera de un callback"""
+    try:
+        disparadas = set(dash.ctx.triggered_prop_ids.values())
+    except (MissingCallbackContextException, LookupError):
+        # Fuera de un callback (dump, precalentamiento en otro hilo) se arman todos los bloques
+        return None
+    return disparadas or None
+
+def bloques_afectados(disparadas):
+    """Bloques cuyas dependencias incluyen alguna entrada disparada (todos si cambió un filtro base)"""
+    if disparadas is None or disparadas & ENTRADAS_BASE:
+        return list(BLOQUES_DASHBOARD)
+    return [b for b, (_, entradas, _) in BLOQUES_DASHBOARD.items() if entradas & disparadas]
+
+# Bloques ya serializados por estado de filtros (VENTAS_CACHE_FIGURAS: memoria, disco:<carpeta>, redis://..., ninguna)
+CACHE_SALIDAS = crear_cache(os.environ.get('VENTAS_CACHE_FIGURAS', 'memoria'))
+
+def salidas_en_cache(claves):
+    """{bloque: salidas} de los bloques guardados; vuelven como el JSON que Dash envía al navegador"""
+    if CACHE_SALIDAS is None:
+        return {}
+    version = panel.version
+    guardadas = {b: CACHE_SALIDAS.obtener(version, clave) for b, clave in claves.items()}
+    return {b: tuple(json.loads(texto)) for b, texto in guardadas.items() if texto is not None}
+
+def guardar_en_cache(claves, salidas):
+    if CACHE_SALIDAS is None:
+        return
+    version = panel.version
+    for b, valores in salidas.items():
+        CACHE_SALIDAS.guardar(version, claves[b], pio.json.to_json_plotly(list(valores)))
+
+def tamano_payload(valor):
+    """Bytes del JSON que Dash envía al navegador para una salida"""
+    return len(pio.json.to_json_plotly(valor))
+
+def ensamblar_salidas(salidas, bloques, general=True):
+    """Tupla en el orden de SALIDAS_DASHBOARD; los bloques no recalculados van como no_update"""
+    valores, ids = (), []
+    for nombre, (cantidad, _, _) in BLOQUES_DASHBOARD.items():
+        if nombre == 'general' and not general:
+            continue
+        valores += salidas[nombre] if nombre in bloques else (no_update,) * cantidad
+    
+    if REPORTE_PAYLOAD:
+        salidas_ids = SALIDAS_DASHBOARD if general else SALIDAS_DASHBOARD[len(SALIDAS_GENERAL):]
+        tamanos = {s.component_id: tamano_payload(v) for s, v in zip(salidas_ids, valores) if v is not no_update}
+        grandes = sorted(tamanos.items(), key=lambda t: -t[1])[:5]
+        print(f"   📦 Payload: {sum(tamanos.values()) / 1024:,.0f} KB en {len(tamanos)}/{len(valores)} salidas | "
+              + ", ".join(f"{n} {b / 1024:,.0f}" for n, b in grandes))
+    return valores
+
+def update_dashboard(ciudad, estado, mes, dia, categoria, rango, start, end, filtro_prod, periodo_comp, meses_comp, metrica,
+                     desde_a=None, hasta_a=None, desde_b=None, hasta_b=None, general=True):
+    
+    # Solo se recalculan los bloques que dependen de las entradas que cambiaron
+    bloques = [b for b in bloques_afectados(entradas_disparadas()) if general or b != 'general']
+    
+    # Aplicar filtros base
+    filtro = condiciones_filtro(ciudad, estado, mes, dia, categoria, rango, start, end)
+    
+    # Bloques ya armados para este estado de filtros y esta versión de los datos
+    parametros_bloque = {'filtro-prod': filtro_prod, 'comp-periodo': periodo_comp,
+                         'comp-meses': list(meses_comp or ()), 'comp-metrica': metrica,
+                         'comp-rango-a': [desde_a, hasta_a], 'comp-rango-b': [desde_b, hasta_b]}
+    # Ventanas del comparador: las elegidas del período o los dos rangos de fechas
+    if periodo_comp == 'Rangos':
+        seleccion_comp = tuple(ventanas_rangos((desde_a, hasta_a), (desde_b, hasta_b)).items())
+    else:
+        seleccion_comp = tuple(meses_comp or ())
+    claves = {b: clave_salida(b, filtro, sorted((e, parametros_bloque[e]) for e in BLOQUES_DASHBOARD[b][1]))
+              for b in bloques}
+    salidas = salidas_en_cache(claves)
+    pendientes = [b for b in bloques if b not in salidas]
+    if not pendientes:
+        return ensamblar_salidas(salidas, bloques, general)
+    
+    # Solo las columnas que leen las tareas pendientes; con almacén, partes que cada tarea recorre por su cuenta
+    nombres = set().union(*(BLOQUES_DASHBOARD[b][2] for b in pendientes))
+    data = panel.lineas(filtro, columnas_tareas(nombres) + ['Ciudad', 'Producto'])
+    filas = contar_lineas(data)
+    
+    # Ciudades y productos distintos unidos desde los bocetos por celda (o nunique sin ellos)
+    conteos = panel.distintos.contar(filtro) if panel.distintos is not None else None
+    if conteos is None:
+        conteos = {c: len(valores_distintos(con_columnas(data, [c]), c)) for c in ('Ciudad', 'Producto')}
+    subtitulo = f"📊 {filas:,} transacciones | {conteos['Ciudad']} ciudades | {conteos['Producto']} productos"
+    
+    # Figura vacía para casos sin datos
+    empty_fig = go.Figure().add_annotation(text="Sin datos", showarrow=False)
+    empty_fig.update_layout(height=300)
+    
+    if filas == 0:
+        empty_kpi = dbc.Row([dbc.Col(html.H4("No hay datos para los filtros seleccionados"), width=12)])
+        empty_tendencias = html.P("Sin datos")
+        empty_resumen = html.P("Sin datos")
+        empty_container = html.P("Sin datos")
+        empty_table = html.P("Sin datos")
+        empty_factores = html.P("Sin datos")
+        empty_eventos = html.P("Sin datos")
+        empty_explicacion = html.P("Sin datos")
+        
+        armado = {
+            'general': lambda: (subtitulo, empty_kpi, empty_tendencias, empty_fig, empty_fig, empty_fig, empty_fig,
+                                empty_fig, empty_fig, empty_resumen),
+            'producto': lambda: (empty_container, empty_table, empty_factores),
+            'horas': lambda: (empty_fig, empty_fig, empty_fig),
+            'comparador': lambda: (empty_fig, empty_fig, empty_fig, empty_table),
+            'eventos': lambda: (empty_eventos, empty_explicacion),
+            'complementos': lambda: (empty_fig,),
+            'clientes': lambda: (empty_kpi, empty_fig, empty_fig, empty_fig, empty_table, empty_table, empty_fig, empty_fig),
+        }
+    else:
+        # Agregaciones de los bloques pendientes (en serie, hilos o procesos); las figuras se arman después
+        resultados, _ = ejecutar_tareas(data, filtro, {
+            'filtros': (ciudad, estado, mes, dia, categoria, rango, start, end),
+            'filtro_prod': filtro_prod,
+            'periodo_comp': periodo_comp,
+            'meses_comp': seleccion_comp,
+        }, nombres=nombres)
+        agregar = resultados.__getitem__
+        
+        armado = {
+            'general': lambda: (subtitulo,) + armar_general(data, agregar),
+            'producto': lambda: armar_producto(resultados),
+            'horas': lambda: armar_horas(agregar),
+            'comparador': lambda: armar_comparador(resultados, periodo_comp, seleccion_comp, metrica, empty_fig),
+            'eventos': lambda: armar_eventos(resultados),
+            'complementos': lambda: armar_complementos(resultados),
+            'clientes': lambda: armar_clientes(resultados, empty_fig),
+        }
+    
+    nuevas = {b: armado[b]() for b in pendientes}
+    guardar_en_cache(claves, nuevas)
+    salidas.update(nuevas)
+    return ensamblar_salidas(salidas, bloques, general)
+
+# ========================================
+# PRECALENTAMIENTO DE VISTAS POPULARES
+# ========================================
+# VENTAS_PRECALENTAR=0 lo desactiva; VENTAS_REGISTRO_VISTAS guarda cuántas veces se pidió cada vista entre reinicios
+PRECALENTAR = os.environ.get('VENTAS_PRECALENTAR', '1').lower() not in ('0', 'no', 'false')
+REGISTRO_VISTAS = os.environ.get('VENTAS_REGISTRO_VISTAS')
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: sin lock entre procesos (el servidor de desarrollo es uno solo)
+    fcntl = None
+
+class PrecalentadorVistas:
+    """Arma en segundo plano las vistas más comunes para que su primer usuario las encuentre en caché"""
+    
+    # Segundos sin pedidos en curso antes de seguir con la siguiente vista
+    pausa = 0.5
+    # Vistas que conserva el registro (las más pedidas) y segundos entre escrituras
+    maximo_registro = 200
+    intervalo_registro = 30
+    
+    def __init__(self, registro=None, populares=20):
+        self.registro = registro
+        self.populares = populares
+        self.pedidas = Counter()
+        # Pedidas desde la última escritura del registro (se suman a las de los demás workers al escribir)
+        self.nuevas = Counter()
+        self.guardado = time.monotonic()
+        self.activos = 0
+        self.ultimo_pedido = 0.0
+        self._lock = threading.Lock()
+        self._hilo = None
+        if registro:
+            self.pedidas = self._leer_registro()
+    
+    def _normalizar(self, entradas):
+        # Mismo formato que manda el navegador: fechas como texto y listas como tuplas
+        return tuple(tuple(v) if isinstance(v, list) else str(v) if isinstance(v, date) else v for v in entradas)
+    
+    def _leer_registro(self):
+        try:
+            with open(self.registro, encoding='utf-8') as f:
+                return Counter({self._normalizar(vista): veces for vista, veces in json.load(f)})
+        except (FileNotFoundError, ValueError):
+            return Counter()
+    
+    def guardar_registro(self):
+        """Suma las vistas nuevas a las del archivo y lo reescribe con las más pedidas"""
+        if not self.registro:
+            return
+        with self._lock:
+            nuevas, self.nuevas = self.nuevas, Counter()
+            self.guardado = time.monotonic()
+        if not nuevas:
+            return
+        with open(f"{self.registro}.lock", 'w') as candado:
+            if fcntl is not None:
+                fcntl.flock(candado, fcntl.LOCK_EX)
+            pedidas = self._leer_registro() + nuevas
+            temporal = f"{self.registro}.{os.getpid()}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(pedidas.most_common(self.maximo_registro), f, ensure_ascii=False)
+            os.replace(temporal, self.registro)
+        with self._lock:
+            self.pedidas = pedidas + self.nuevas
+    
+    def anotar(self, entradas):
+        """Cuenta la vista pedida; el registro se reescribe cada `intervalo_registro` segundos"""
+        vista = self._normalizar(entradas)
+        with self._lock:
+            self.pedidas[vista] += 1
+            self.nuevas[vista] += 1
+            toca = self.registro and time.monotonic() - self.guardado > self.intervalo_registro
+        if toca:
+            self.guardar_registro()
+    
+    def pedido_iniciado(self):
+        with self._lock:
+            self.activos += 1
+    
+    def pedido_terminado(self):
+        with self._lock:
+            self.activos -= 1
+            self.ultimo_pedido = time.monotonic()
+    
+    def vistas(self):
+        """Vista inicial, las más pedidas, y cada estado, mes y categoría sobre la vista inicial"""
+        opciones = panel.opciones
+        inicial = self._normalizar(('Todas', 'Todos', 'Todos', 'Todos', 'Todas', 'Todos',
+                                    opciones['fecha_min'], opciones['fecha_max'],
+                                    'General', 'Mes', opciones_comparador('Mes')[1], 'ingresos',
+                                    None, None, None, None))
+        variantes = ([(1, e) for e in opciones['estados'][1:]] + [(2, m) for m in meses_list[1:]]
+                     + [(4, c) for c in opciones['categorias'][1:]])
+        candidatas = [inicial] + [vista for vista, _ in self.pedidas.most_common(self.populares)]
+        candidatas += [inicial[:i] + (valor,) + inicial[i + 1:] for i, valor in variantes]
+        return list(dict.fromkeys(candidatas))
+    
+    def _esperar_turno(self):
+        while self.activos or time.monotonic() - self.ultimo_pedido < self.pausa:
+            time.sleep(0.05)
+    
+    def _ejecutar(self):
+        inicio = time.perf_counter()
+        vistas = self.vistas()
+        for vista in vistas:
+            self._esperar_turno()
+            comienzo = time.perf_counter()
+            try:
+                update_dashboard(*vista, general=not MODO_CLIENTE)
+            except Exception as e:
+                print(f"   ⚠️ Precalentamiento: error en {vista[:8]}: {e}")
+            # Un hilo comparte el GIL con los que atienden: descansa al menos lo que tardó la vista,
+            # así nunca ocupa más de la mitad del proceso aunque lleguen pedidos a mitad de una vista
+            time.sleep(time.perf_counter() - comienzo)
+        print(f"\n🔥 Precalentadas {len(vistas)} vistas en {time.perf_counter() - inicio:.1f}s | {CACHE_SALIDAS.resumen()}")
+    
+    def iniciar(self):
+        if not PRECALENTAR or CACHE_SALIDAS is None:
+            return
+        # Con caché de disco o Redis las vistas sirven a todos los workers: precalienta solo el que reserva
+        if CACHE_SALIDAS.compartida and not CACHE_SALIDAS.reservar(panel.version, 'precalentamiento'):
+            print("\n🔥 Otro worker precalienta la caché compartida")
+            return
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._ejecutar, daemon=True, name='precalentamiento')
+            self._hilo.start()
+
+precalentador = PrecalentadorVistas(REGISTRO_VISTAS)
+panel.al_terminar.append(precalentador.iniciar)
+atexit.register(precalentador.guardar_registro)
+
+# Cualquier pedido en curso (callbacks, modales, descargas) pausa el precalentamiento
+@server.before_request
+def marcar_pedido():
+    precalentador.pedido_iniciado()
+
+@server.teardown_request
+def desmarcar_pedido(error=None):
+    precalentador.pedido_terminado()
+
+def atender_dashboard(*entradas, general=True):
+    """Callback en vivo: anota la vista pedida"""
+    precalentador.anotar(entradas)
+    return update_dashboard(*entradas, general=general)
+
+if MODO_CLIENTE:
+    # GENERAL se calcula en el navegador sobre el cubo; el servidor solo arma las demás pestañas
+    @callback(SALIDAS_DASHBOARD[len(SALIDAS_GENERAL):], ENTRADAS_DASHBOARD)
+    def update_dashboard_servidor(*entradas):
+        return atender_dashboard(*entradas, general=False)
+    
+    clientside_callback(ClientsideFunction(namespace='panel', function_name='actualizar_general'),
+                        SALIDAS_GENERAL, ENTRADAS_DASHBOARD[:8] + [Input('cubo-ventas', 'data')])
+else:
+    callback(SALIDAS_DASHBOARD, ENTRADAS_DASHBOARD)(atender_dashboard)
 
 # ========================================
 # CALLBACK PARA MODAL DE HORAS
@@ -1560,72 +2712,43 @@ def modal_horas(clickData, cerrar_clicks, is_open, start, end, ciudad, estado, c
     # Obtener la hora clickeada
     hora = clickData['points'][0]['x']
     
-    # Aplicar filtros
-    data = df.copy()
-    
-    if estado != 'Todos':
-        data = data[data['Estado Nombre'] == estado]
-    if ciudad != 'Todas':
-        data = data[data['Ciudad'] == ciudad]
-    if mes != 'Todos':
-        data = data[data['Mes'] == mes]
-    if dia != 'Todos':
-        data = data[data['Día Semana Nombre'] == dia]
-    if categoria != 'Todas':
-        data = data[data['Categoría'] == categoria]
-    
-    try:
-        start_date = pd.to_datetime(start).date()
-        end_date = pd.to_datetime(end).date()
-        data = data[(data['Fecha'] >= start_date) & (data['Fecha'] <= end_date)]
-    except:
-        pass
+    # Aplicar filtros y la hora seleccionada como una condición más
+    filtro = condiciones_filtro(ciudad, estado, mes, dia, categoria, start=start, end=end)
+    filtro_hora = filtro._replace(condiciones=filtro.condiciones + (('Hora', hora),))
+    data_hora = panel.lineas(filtro_hora, ['Producto', 'Cantidad Pedida', 'Ingreso Total', 'Pedido Key'])
+    medidas = {'Cantidad Pedida': ('Cantidad Pedida', 'sum'), 'Ingreso Total': ('Ingreso Total', 'sum'),
+               'Pedido Key': ('Pedido Key', 'nunique')}
     
-    # Filtrar por la hora seleccionada
-    data_hora = data[data['Hora'] == hora]
+    # Top 10 productos en esa hora
+    top_productos = agregar_por_partes(data_hora, ['Producto'], medidas)
     
-    if data_hora.empty:
+    if top_productos.empty:
         return True, f"⏰ Hora: {hora}:00", html.P("No hay datos para esta hora en el período seleccionado")
     
-    # Top 10 productos en esa hora
-    top_productos = data_hora.groupby('Producto').agg({
-        'Cantidad Pedida': 'sum',
-        'Ingreso Total': 'sum',
-        'ID de Pedido': 'nunique'
-    }).sort_values('Cantidad Pedida', ascending=False).head(10).reset_index()
+    top_productos = top_productos.sort_values('Cantidad Pedida', ascending=False).head(10).reset_index()
     
     # Tabla de productos
-    rows = []
-    for _, r in top_productos.iterrows():
-        ticket_promedio = r['Ingreso Total'] / r['ID de Pedido'] if r['ID de Pedido'] > 0 else 0
-        rows.append(html.Tr([
-            html.Td(r['Producto'][:40]),
-            html.Td(f"{r['Cantidad Pedida']:,.0f}", className="text-end"),
-            html.Td(f"${r['Ingreso Total']:,.0f}", className="text-end"),
-            html.Td(f"{r['ID de Pedido']:,}", className="text-end"),
-            html.Td(f"${ticket_promedio:,.2f}", className="text-end")
-        ]))
-    
-    tabla = dbc.Table(
-        [html.Thead(html.Tr([
-            html.Th("Producto"),
-            html.Th("Unidades", className="text-end"),
-            html.Th("Ingresos", className="text-end"),
-            html.Th("Pedidos", className="text-end"),
-            html.Th("Ticket Prom", className="text-end")
-        ])),
-         html.Tbody(rows)],
-        striped=True, bordered=True, hover=True, size='sm'
-    )
+    top_productos['Producto'] = top_productos['Producto'].str[:40]
+    top_productos['Ticket'] = (top_productos['Ingreso Total'] / top_productos['Pedido Key']).fillna(0)
+    tabla = tabla_datos(top_productos, {
+        'Producto': ("Producto", 'texto'),
+        'Cantidad Pedida': ("Unidades", 'entero'),
+        'Ingreso Total': ("Ingresos", 'moneda'),
+        'Pedido Key': ("Pedidos", 'entero'),
+        'Ticket': ("Ticket Prom", 'moneda2')
+    })
     
     # KPIs de la hora
-    total_unidades = data_hora['Cantidad Pedida'].sum()
-    total_ingresos = data_hora['Ingreso Total'].sum()
-    total_pedidos = data_hora['ID de Pedido'].nunique()
+    totales = agregar_por_partes(data_hora, [], medidas).to_dict('records')[0]
+    total_unidades = totales['Cantidad Pedida']
+    total_ingresos = totales['Ingreso Total']
+    total_pedidos = totales['Pedido Key']
     ticket_promedio_hora = total_ingresos / total_pedidos if total_pedidos > 0 else 0
     
     # Comparación con el promedio general
-    promedio_general_unidades = data['Cantidad Pedida'].sum() / 24 if len(data) > 0 else 0
+    unidades = agregar_por_partes(panel.lineas(filtro, ['Cantidad Pedida']), [],
+                                  {'Cantidad Pedida': ('Cantidad Pedida', 'sum')})['Cantidad Pedida'].iloc[0]
+    promedio_general_unidades = unidades / 24
     variacion = ((total_unidades / promedio_general_unidades) - 1) * 100 if promedio_general_unidades > 0 else 0
     
     contenido = html.Div([
@@ -1664,6 +2787,88 @@ def modal_horas(clickData, cerrar_clicks, is_open, start, end, ciudad, estado, c
     
     return True, f"⏰ Análisis de la hora: {hora}:00", contenido
 
+# ========================================
+# CALLBACK PARA MODAL DE ESTADO (MAPA)
+# ========================================
+@callback(
+    [Output('modal-geo', 'is_open'),
+     Output('modal-geo-titulo', 'children'),
+     Output('modal-geo-contenido', 'children')],
+    [Input('mapa-estados', 'clickData'),
+     Input('cerrar-modal-geo', 'n_clicks')],
+    [State('fechas', 'start_date'),
+     State('fechas', 'end_date'),
+     State('ciudad', 'value'),
+     State('categoria', 'value'),
+     State('rango', 'value'),
+     State('mes', 'value'),
+     State('dia', 'value')]
+)
+def modal_geo(clickData, cerrar_clicks, start, end, ciudad, categoria, rango, mes, dia):
+    ctx = dash.callback_context
+    
+    if not ctx.triggered or 'cerrar-modal-geo' in ctx.triggered[0]['prop_id'] or clickData is None:
+        return False, "", html.P("")
+    
+    # El clic da el código de dos letras; el estado del mapa reemplaza al del filtro
+    estado = panel.geo.estado_de_codigo(clickData['points'][0]['location'])
+    if estado is None:
+        return False, "", html.P("")
+    filtro = condiciones_filtro(ciudad, estado, mes, dia, categoria, rango, start, end)
+    ciudades = panel.geo.agregar(filtro, 'ciudad')
+    postales = panel.geo.agregar(filtro, 'codigo_postal')
+    
+    if ciudades.empty:
+        return True, f"🗺️ {estado}", html.P("No hay ventas de este estado en el período seleccionado")
+    
+    ingresos = ciudades['Ingreso Total'].sum()
+    pedidos = ciudades['Pedidos'].sum()
+    unidades = ciudades['Cantidad Pedida'].sum()
+    ticket = ingresos / pedidos if pedidos > 0 else 0
+    
+    kpis = dbc.Row([
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("💰 Ingresos", className="text-center"),
+                                        html.H4(f"${ingresos:,.0f}", className="text-center text-primary")])]), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("📦 Pedidos", className="text-center"),
+                                        html.H4(f"{pedidos:,}", className="text-center text-success")])]), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🛒 Unidades", className="text-center"),
+                                        html.H4(f"{unidades:,}", className="text-center text-info")])]), width=3),
+        dbc.Col(dbc.Card([dbc.CardBody([html.H6("🎫 Ticket", className="text-center"),
+                                        html.H4(f"${ticket:,.2f}", className="text-center text-warning")])]), width=3),
+    ], className="mb-3")
+    
+    ciudades = ciudades.sort_values('Ingreso Total')
+    fig_ciudades = px.bar(ciudades, x='Ingreso Total', y='Ciudad', orientation='h',
+                          title=f'🏙️ Ciudades de {estado}', color='Ingreso Total',
+                          color_continuous_scale='Reds', text_auto='.2s',
+                          custom_data=['Pedidos'])
+    fig_ciudades.update_traces(texttemplate='$%{text:.2s}',
+                               hovertemplate='%{y}<br>💰 $%{x:,.0f}<br>📦 Pedidos: %{customdata[0]:,}<extra></extra>')
+    fig_ciudades.update_layout(height=max(250, 60 * len(ciudades)), coloraxis_showscale=False)
+    
+    postales = postales.sort_values('Ingreso Total', ascending=False)
+    postales['% Estado'] = (postales['Ingreso Total'] / ingresos * 100).round(1)
+    postales['Ticket'] = postales['Ingreso Total'] / postales['Pedidos']
+    tabla = tabla_datos(postales, {
+        'Código Postal': ("Código Postal", 'texto'),
+        'Ciudad': ("Ciudad", 'texto'),
+        'Ingreso Total': ("Ingresos", 'moneda'),
+        'Pedidos': ("Pedidos", 'entero'),
+        'Cantidad Pedida': ("Unidades", 'entero'),
+        'Ticket': ("Ticket Prom", 'moneda2'),
+        '% Estado': ("% del Estado", 'texto'),
+    })
+    
+    contenido = html.Div([
+        kpis,
+        dcc.Graph(figure=fig_ciudades),
+        html.Hr(),
+        html.H5(f"📮 Códigos postales de {estado}"),
+        tabla
+    ])
+    
+    return True, f"🗺️ {estado}: ciudades y códigos postales", contenido
+
 # ========================================
 # CALLBACK PARA MODAL DE EVENTOS
 # ========================================
@@ -1691,61 +2896,45 @@ def modal_evento(n_clicks_list, cerrar_clicks, is_open, start, end, ciudad, esta
     evento = eval(trigger)['index']
     
     # Aplicar filtros
-    data = df.copy()
-    if estado != 'Todos':
-        data = data[data['Estado Nombre'] == estado]
-    if ciudad != 'Todas':
-        data = data[data['Ciudad'] == ciudad]
-    if categoria != 'Todas':
-        data = data[data['Categoría'] == categoria]
-    
-    try:
-        start_date = pd.to_datetime(start).date()
-        end_date = pd.to_datetime(end).date()
-        data = data[(data['Fecha'] >= start_date) & (data['Fecha'] <= end_date)]
-    except:
-        pass
-    
-    # Agregar columna Evento
-    data['Evento'] = data['Fecha Pedido'].apply(identificar_evento)
+    filtro = condiciones_filtro(ciudad, estado, categoria=categoria, start=start, end=end)
     
-    # Obtener fechas del evento
+    # Obtener fechas del evento (los detectados traen su fecha en el índice: 'auto:AAAA-MM-DD')
     fechas_evento = []
+    if evento.startswith('auto:'):
+        fechas_evento = [pd.to_datetime(evento[len('auto:'):])]
+        evento = f"🤖 {fechas_evento[0]:%d/%m/%Y}"
     for e, f in eventos.items():
         if e == evento:
             fechas_evento = [pd.to_datetime(ff) for ff in f]
             break
     
-    # Filtrar datos del evento
-    data_evento = data[data['Fecha Pedido'].dt.date.isin([f.date() for f in fechas_evento])]
+    # Filtrar datos del evento: solo se leen sus días
+    dias = [f.date() for f in fechas_evento if filtro.desde is None or filtro.desde <= f.date() <= filtro.hasta]
+    columnas = ['Producto', 'Cantidad Pedida', 'Ingreso Total', 'Pedido Key']
+    data_evento = pd.concat([filtrar(panel.datos, filtro._replace(desde=d, hasta=d), columnas) for d in dias]) \
+        if dias else None
     
-    if data_evento.empty:
+    if data_evento is None or data_evento.empty:
         return True, evento, html.P("No hay datos para este evento en el período seleccionado")
     
     # Top 10 productos (cambié de 5 a 10 para dar más información)
     top_productos = data_evento.groupby('Producto')['Cantidad Pedida'].sum().nlargest(10).reset_index()
     
-    rows = []
-    for _, r in top_productos.iterrows():
-        rows.append(html.Tr([
-            html.Td(r['Producto'][:40]),
-            html.Td(f"{r['Cantidad Pedida']:,.0f}", className="text-end")
-        ]))
-    
-    tabla = dbc.Table(
-        [html.Thead(html.Tr([html.Th("Producto"), html.Th("Unidades", className="text-end")])),
-         html.Tbody(rows)],
-        striped=True, bordered=True, hover=True, size='sm'
-    )
+    top_productos['Producto'] = top_productos['Producto'].str[:40]
+    tabla = tabla_datos(top_productos, {
+        'Producto': ("Producto", 'texto'),
+        'Cantidad Pedida': ("Unidades", 'entero')
+    })
     
     # KPIs del evento
     total = data_evento['Ingreso Total'].sum()
-    pedidos = data_evento['ID de Pedido'].nunique()
+    pedidos = panel.pedidos.contar(data_evento['Pedido Key'])
     ticket = total / pedidos if pedidos > 0 else 0
     
-    # Comparación con día normal
-    data_normal = data[data['Evento'] == 'Normal']
-    prom_normal = data_normal.groupby('Fecha')['Ingreso Total'].sum().mean() if not data_normal.empty else 1
+    # Comparación con día normal (ingresos de cada día sin evento, parte por parte)
+    data = panel.lineas(filtro, COLUMNAS_TAREAS['eventos'])
+    dias_normales = pd.concat([eventos_y_dias_normales(parte)[1] for parte in como_partes(data)])
+    prom_normal = dias_normales.mean() if not dias_normales.empty else 1
     incremento = ((total / prom_normal) - 1) * 100
     
     contenido = html.Div([
@@ -1793,26 +2982,16 @@ def exportar_general(n_clicks, ciudad, estado, mes, dia, categoria, rango, start
         return no_update
     
     # Aplicar filtros
-    data = df.copy()
-    if estado != 'Todos': data = data[data['Estado Nombre'] == estado]
-    if ciudad != 'Todas': data = data[data['Ciudad'] == ciudad]
-    if mes != 'Todos': data = data[data['Mes'] == mes]
-    if dia != 'Todos': data = data[data['Día Semana Nombre'] == dia]
-    if categoria != 'Todas': data = data[data['Categoría'] == categoria]
-    if rango != 'Todos': data = data[data['Rango Precio'] == rango]
-    
-    try:
-        start_date = pd.to_datetime(start).date()
-        end_date = pd.to_datetime(end).date()
-        data = data[(data['Fecha'] >= start_date) & (data['Fecha'] <= end_date)]
-    except:
-        pass
+    filtro = condiciones_filtro(ciudad, estado, mes, dia, categoria, rango, start, end)
+    nombres = ['ventas_mes', 'productos', 'ciudades']
+    data = panel.lineas(filtro, COLUMNAS_INFORME + columnas_tareas(nombres))
+    agregar = lambda nombre: panel.motor.agregar(nombre, filtro, con_columnas(data, COLUMNAS_TAREAS[nombre]))
     
     # Preparar tablas
     tablas = {
-        "Ventas por Mes": data.groupby('Mes')['Ingreso Total'].sum().reset_index(),
-        "Top 10 Productos": data.groupby('Producto')['Cantidad Pedida'].sum().nlargest(10).reset_index(),
-        "Ventas por Ciudad": data.groupby('Ciudad')['Ingreso Total'].sum().nlargest(10).reset_index()
+        "Ventas por Mes": agregar('ventas_mes'),
+        "Top 10 Productos": agregar('productos').set_index('Producto')['Cantidad Pedida'].nlargest(10).reset_index(),
+        "Ventas por Ciudad": agregar('ciudades').set_index('Ciudad')['Ingreso Total'].nlargest(10).reset_index()
     }
     
     html_content = generar_informe_html("VISIÓN GENERAL", data, tablas)
@@ -1833,41 +3012,14 @@ def exportar_producto(n_clicks, ciudad, estado, mes, dia, categoria, rango, star
         return no_update
     
     # Aplicar filtros
-    data = df.copy()
-    if estado != 'Todos': data = data[data['Estado Nombre'] == estado]
-    if ciudad != 'Todas': data = data[data['Ciudad'] == ciudad]
-    if mes != 'Todos': data = data[data['Mes'] == mes]
-    if dia != 'Todos': data = data[data['Día Semana Nombre'] == dia]
-    if categoria != 'Todas': data = data[data['Categoría'] == categoria]
-    if rango != 'Todos': data = data[data['Rango Precio'] == rango]
-    
-    try:
-        start_date = pd.to_datetime(start).date()
-        end_date = pd.to_datetime(end).date()
-        data = data[(data['Fecha'] >= start_date) & (data['Fecha'] <= end_date)]
-    except:
-        pass
+    data = aplicar_filtros(ciudad, estado, mes, dia, categoria, rango, start, end,
+                           columnas=COLUMNAS_INFORME + COLUMNAS_TAREAS['ranking_mes'])
     
     # Análisis del producto estrella
-    if filtro_prod == 'General':
-        analisis = analizar_producto_estrella(data, "GLOBAL")
-    elif filtro_prod == 'Mes':
-        if mes != 'Todos':
-            analisis = analizar_producto_estrella(data[data['Mes'] == mes], f"MES: {mes}")
-        else:
-            mtop = data.groupby('Mes')['Cantidad Pedida'].sum().idxmax()
-            analisis = analizar_producto_estrella(data[data['Mes'] == mtop], f"MES: {mtop} (top)")
-    elif filtro_prod == 'Semana':
-        stop = data.groupby('Semana')['Cantidad Pedida'].sum().idxmax()
-        analisis = analizar_producto_estrella(data[data['Semana'] == stop], f"SEMANA: {stop}")
-    else:
-        dtop = data.groupby('Día del Año')['Cantidad Pedida'].sum().idxmax()
-        analisis = analizar_producto_estrella(data[data['Día del Año'] == dtop], "DÍA PICO")
+    analisis = producto_estrella((ciudad, estado, mes, dia, categoria, rango, start, end), filtro_prod)
     
     # Producto por mes
-    prods_mes = data.groupby(['Mes','Producto'])['Cantidad Pedida'].sum().reset_index()
-    idx = prods_mes.groupby('Mes')['Cantidad Pedida'].idxmax()
-    top_mes = prods_mes.loc[idx].reset_index(drop=True)
+    top_mes = ranking_por_periodo(con_columnas(data, COLUMNAS_TAREAS['ranking_mes']), 'Mes')
     
     tablas = {
         "Producto Estrella": pd.DataFrame([{
@@ -1896,27 +3048,10 @@ def exportar_eventos(n_clicks, ciudad, estado, mes, dia, categoria, rango, start
         return no_update
     
     # Aplicar filtros
-    data = df.copy()
-    if estado != 'Todos': data = data[data['Estado Nombre'] == estado]
-    if ciudad != 'Todas': data = data[data['Ciudad'] == ciudad]
-    if mes != 'Todos': data = data[data['Mes'] == mes]
-    if dia != 'Todos': data = data[data['Día Semana Nombre'] == dia]
-    if categoria != 'Todas': data = data[data['Categoría'] == categoria]
-    if rango != 'Todos': data = data[data['Rango Precio'] == rango]
-    
-    try:
-        start_date = pd.to_datetime(start).date()
-        end_date = pd.to_datetime(end).date()
-        data = data[(data['Fecha'] >= start_date) & (data['Fecha'] <= end_date)]
-    except:
-        pass
+    data = aplicar_filtros(ciudad, estado, mes, dia, categoria, rango, start, end, columnas=COLUMNAS_INFORME)
     
     # Identificar eventos
-    data['Evento'] = data['Fecha Pedido'].apply(identificar_evento)
-    eventos_data = data[data['Evento'] != 'Normal'].groupby('Evento').agg({
-        'Ingreso Total': 'sum',
-        'ID de Pedido': 'nunique'
-    }).reset_index()
+    eventos_data, _ = agregar_eventos(con_columnas(data, COLUMNAS_TAREAS['eventos']))
     
     tablas = {
         "Impacto de Eventos": eventos_data
@@ -1926,18 +3061,45 @@ def exportar_eventos(n_clicks, ciudad, estado, mes, dia, categoria, rango, start
     
     return dict(content=html_content, filename=f"informe_eventos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
 
+@callback(
+    Output("download-calidad", "data"),
+    Input("btn-exportar-calidad", "n_clicks"),
+    prevent_initial_call=True
+)
+def exportar_calidad(n_clicks):
+    if not n_clicks or not panel.calidad:
+        return no_update
+    contenido = json.dumps(panel.calidad, ensure_ascii=False, indent=2, default=str)
+    return dict(content=contenido, filename=f"calidad_datos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
 # ============================================
-# 16. EJECUCIÓN
+# 14. EJECUCIÓN
 # ============================================
 def abrir_navegador():
     webbrowser.open('http://127.0.0.1:8050')
 
 if __name__ == '__main__':
+    if not buscar_archivos(ruta):
+        print("\n" + "="*80)
+        print("❌ ERROR CRÍTICO".center(80))
+        print("="*80)
+        print("\nNo se encontraron archivos CSV en la ruta:")
+        print(f"   {ruta}")
+        print("\nPor favor, verifica que:")
+        print("   1. La ruta sea correcta")
+        print("   2. Los archivos tengan el formato 'Dataset_de_ventas_*.csv'")
+        print("   3. Los archivos existan en esa ubicación")
+        print("\n" + "="*80)
+        sys.exit(1)
+    
+    # Los datos se cargan en segundo plano; el navegador muestra la pantalla de espera
+    panel.precargar()
+    
     print("\n" + "="*80)
     print("✅ DASHBOARD INICIADO".center(80))
     print("="*80)
     print("\n🌐 http://127.0.0.1:8050")
-    print(f"\n📊 {len(df):,} registros | ${TOTAL_INGRESOS:,.0f} | {TOTAL_PEDIDOS:,} pedidos")
+    print("\n⏳ Los datos se cargan en segundo plano mientras el servidor ya acepta conexiones")
     print("\n🎯 Pestañas: GENERAL | COMPARADOR | PRODUCTO | HORAS | EVENTOS | COMPLEMENTOS | PROPUESTAS")
     print("\n✅ NUEVA FUNCIONALIDAD INTERACTIVA:")
     print("   • Haz clic en las tarjetas de EVENTOS para ver los TOP 10 productos")
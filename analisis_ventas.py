@@ -1,69 +1,24 @@
 import pandas as pd
-import os
-import glob
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import plotly.express as px
 
+from datos_ventas import RUTA_DATOS, cargar_ventas, orden_meses
+
 print("=== INICIANDO DASHBOARD EJECUTIVO ===")
 
 # =====================================================
-# 1️⃣ CARGA DE DATOS
+# 1️⃣ CARGA Y LIMPIEZA DE DATOS (SIN INVENTAR)
 # =====================================================
+# Mismo pipeline (y misma caché) que Ciencia_datos.py: ver paquete datos_ventas
 
-carpeta = r"C:\Users\USUARIO\Desktop\Ciencia de Datos\Dataset de ventas"
-archivos = glob.glob(os.path.join(carpeta, "*.csv"))
-
-if not archivos:
-    raise ValueError("No se encontraron archivos CSV en la carpeta")
-
-df_list = []
-
-for archivo in archivos:
-    df_temp = pd.read_csv(archivo, encoding="utf-8-sig", low_memory=False)
-    print(f"Archivo cargado: {os.path.basename(archivo)}")
-    df_list.append(df_temp)
-
-df = pd.concat(df_list, ignore_index=True)
+df = cargar_ventas(RUTA_DATOS)
 print(f"Total filas cargadas: {len(df)}")
 
-# =====================================================
-# 2️⃣ LIMPIEZA DE DATOS (SIN INVENTAR)
-# =====================================================
-
-df = df[df["Fecha de Pedido"] != "Fecha de Pedido"]
-
-df["Fecha de Pedido"] = pd.to_datetime(
-    df["Fecha de Pedido"],
-    format="%m/%d/%y %H:%M",
-    errors="coerce"
-)
-
-df["Cantidad Pedida"] = pd.to_numeric(df["Cantidad Pedida"], errors="coerce")
-df["Precio Unitario"] = pd.to_numeric(df["Precio Unitario"], errors="coerce")
-
-df.dropna(subset=["Fecha de Pedido", "Cantidad Pedida", "Precio Unitario"], inplace=True)
-
-df["Ventas"] = df["Cantidad Pedida"] * df["Precio Unitario"]
-
-df["Mes"] = df["Fecha de Pedido"].dt.strftime("%B")
-
-orden_meses = [
-    "January","February","March","April","May","June",
-    "July","August","September","October","November","December"
-]
-
+df["Ventas"] = df["Ingreso Total"]
 df["Mes"] = pd.Categorical(df["Mes"], categories=orden_meses, ordered=True)
 
-def extraer_ciudad(direccion):
-    try:
-        return direccion.split(",")[1].strip()
-    except:
-        return "Desconocida"
-
-df["Ciudad"] = df["Dirección de Envio"].apply(extraer_ciudad)
-
 # =====================================================
 # FUNCIÓN FORMATO PROFESIONAL
 # =====================================================
@@ -186,7 +141,7 @@ def update_dashboard(meses, ciudades, productos):
         dff = dff[dff["Producto"].isin(productos)]
 
     total_ventas = dff["Ventas"].sum()
-    total_pedidos = dff["ID de Pedido"].nunique()
+    total_pedidos = dff["Pedido Key"].nunique()
     ticket_promedio = total_ventas / total_pedidos if total_pedidos > 0 else 0
 
     kpis = [
@@ -211,7 +166,7 @@ def update_dashboard(meses, ciudades, productos):
 
     # EVENTOS ESPECIALES
     eventos_dict = {"Black Friday": "11-29", "Navidad": "12-25"}
-    dff["MesDia"] = dff["Fecha de Pedido"].dt.strftime("%m-%d")
+    dff["MesDia"] = dff["Fecha Pedido"].dt.strftime("%m-%d")
 
     eventos_resumen = []
 
@@ -0,0 +1,359 @@
+// Modo cliente del panel (VENTAS_CLIENTE=1): la pestaña GENERAL se recalcula en el
+// navegador sobre el cubo pre-agregado (datos_ventas/cubo.py), sin ida y vuelta al servidor.
+// El cubo no viene en el layout: se pide una vez, comprimido con gzip, a la dirección que
+// deja el servidor en el Store 'cubo-ventas'.
+
+(function () {
+    const MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto',
+                   'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'];
+    // getUTCDay(): 0 = domingo
+    const DIAS_UTC = ['Domingo', 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado'];
+    const ORDEN_DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo'];
+    const TIPOS = {u1: Uint8Array, u2: Uint16Array, u4: Uint32Array};
+    const UN_DIA = 86400000;
+    // Media móvil y variación de la tendencia diaria, en días (VENTANA_MEDIA_MOVIL y DIAS_VARIACION del servidor)
+    const VENTANA_MEDIA_MOVIL = 7;
+    const DIAS_VARIACION = 7;
+
+    // ========================================
+    // Descarga y decodificación del cubo (una sola vez por sesión)
+    // ========================================
+    let decodificado = null;
+    const descargas = new Map();
+
+    // Promesa del cubo de esa dirección: se descarga y se descomprime una sola vez
+    function cargarCubo(url) {
+        if (!descargas.has(url)) {
+            const descarga = fetch(url).then(function (respuesta) {
+                if (!respuesta.ok) {
+                    throw new Error('No se pudo descargar el cubo (' + respuesta.status + ')');
+                }
+                return new Response(respuesta.body.pipeThrough(new DecompressionStream('gzip'))).json();
+            });
+            // Si falla, el próximo cambio de filtro lo vuelve a intentar
+            descarga.catch(function () { descargas.delete(url); });
+            descargas.set(url, descarga);
+        }
+        return descargas.get(url);
+    }
+
+    function arreglo(columna) {
+        const texto = atob(columna.bdata);
+        const bytes = new Uint8Array(texto.length);
+        for (let i = 0; i < texto.length; i++) {
+            bytes[i] = texto.charCodeAt(i);
+        }
+        if (!(columna.dtype in TIPOS)) {
+            throw new Error('Tipo no soportado en el cubo: ' + columna.dtype);
+        }
+        return new TIPOS[columna.dtype](bytes.buffer);
+    }
+
+    function decodificar(cubo) {
+        if (decodificado && decodificado.cubo === cubo) {
+            return decodificado;
+        }
+        const columnas = {};
+        Object.keys(cubo.columnas).forEach(function (nombre) {
+            columnas[nombre] = arreglo(cubo.columnas[nombre]);
+        });
+        const inicio = Date.parse(cubo.fecha_inicio + 'T00:00:00Z');
+        const dias = columnas.dia;
+        let maximo = 0;
+        for (let i = 0; i < dias.length; i++) {
+            if (dias[i] > maximo) maximo = dias[i];
+        }
+        // Fecha, mes y día de la semana de cada día del cubo
+        const fechas = [], meses = [], semana = [];
+        for (let d = 0; d <= maximo; d++) {
+            const fecha = new Date(inicio + d * UN_DIA);
+            fechas.push(fecha.toISOString().slice(0, 10));
+            meses.push(fecha.getUTCMonth());
+            semana.push(DIAS_UTC[fecha.getUTCDay()]);
+        }
+        decodificado = {cubo: cubo, columnas: columnas, inicio: inicio, fechas: fechas, meses: meses, semana: semana};
+        return decodificado;
+    }
+
+    function indiceDia(inicio, fecha) {
+        return Math.round((Date.parse(String(fecha).slice(0, 10) + 'T00:00:00Z') - inicio) / UN_DIA);
+    }
+
+    // ========================================
+    // Agregación
+    // ========================================
+    function sumar(mapa, clave, valor) {
+        mapa.set(clave, (mapa.get(clave) || 0) + valor);
+    }
+
+    // Primera clave con el valor máximo, recorriendo las claves ordenadas (como idxmax tras groupby)
+    function claveMaxima(mapa) {
+        let mejor = null;
+        Array.from(mapa.keys()).sort().forEach(function (clave) {
+            if (mejor === null || mapa.get(clave) > mapa.get(mejor)) mejor = clave;
+        });
+        return mejor;
+    }
+
+    function agregar(cubo, d, filtros) {
+        const c = d.columnas;
+        const [ciudad, estado, mes, dia, categoria, rango, start, end] = filtros;
+        const conCategoria = categoria && categoria !== 'Todas';
+        const conRango = rango && rango !== 'Todos';
+        const pedidos = c[cubo.pedidos[(conCategoria ? '1' : '0') + (conRango ? '1' : '0')]];
+
+        const lugarValido = cubo.lugares.map(function (l) {
+            return (!ciudad || ciudad === 'Todas' || l[0] === ciudad) && (!estado || estado === 'Todos' || l[1] === estado);
+        });
+        const productoValido = cubo.productos.map(function (p) {
+            return (!conCategoria || p[1] === categoria) && (!conRango || p[2] === rango);
+        });
+        const numeroMes = mes && mes !== 'Todos' ? MESES.indexOf(mes) : -1;
+        const desde = start && end ? indiceDia(d.inicio, start) : -Infinity;
+        const hasta = start && end ? indiceDia(d.inicio, end) : Infinity;
+
+        const r = {
+            lineas: 0, ingresos: 0, pedidos: 0, unidades: 0,
+            ciudades: new Map(), estados: new Map(), categorias: new Map(), productos: new Map(),
+            meses: new Map(), diario: new Map(), dias: new Map(), horas: new Map(), horaDia: new Map(),
+        };
+        for (let i = 0; i < c.dia.length; i++) {
+            const k = c.dia[i];
+            if (k < desde || k > hasta || !lugarValido[c.lugar[i]] || !productoValido[c.producto[i]]) continue;
+            if (numeroMes >= 0 && d.meses[k] !== numeroMes) continue;
+            if (dia && dia !== 'Todos' && d.semana[k] !== dia) continue;
+
+            const lugar = cubo.lugares[c.lugar[i]], producto = cubo.productos[c.producto[i]];
+            const ingresos = c.centavos[i] / 100, hora = c.hora[i], n = pedidos[i];
+            r.lineas += c.lineas[i];
+            r.ingresos += ingresos;
+            r.pedidos += n;
+            r.unidades += c.unidades[i];
+            sumar(r.ciudades, lugar[0], ingresos);
+            sumar(r.estados, lugar[1], ingresos);
+            sumar(r.categorias, producto[1], ingresos);
+            sumar(r.productos, producto[0], c.unidades[i]);
+            sumar(r.meses, d.meses[k], ingresos);
+            sumar(r.diario, k, ingresos);
+            sumar(r.dias, d.semana[k], n);
+            sumar(r.horas, hora, n);
+            sumar(r.horaDia, d.semana[k] + '|' + hora, c.lineas[i]);
+        }
+        r.codigos = new Map(cubo.lugares.map(function (l) { return [l[1], l[2]]; }));
+        // Días del filtro para la tendencia densa (los días sin ventas van en cero)
+        r.serie = [];
+        for (let k = Math.max(desde, 0); k <= Math.min(hasta, d.fechas.length - 1); k++) {
+            if (numeroMes >= 0 && d.meses[k] !== numeroMes) continue;
+            if (dia && dia !== 'Todos' && d.semana[k] !== dia) continue;
+            r.serie.push(k);
+        }
+        return r;
+    }
+
+    // ========================================
+    // Componentes y figuras
+    // ========================================
+    function componente(namespace, tipo, props) {
+        return {namespace: namespace, type: tipo, props: props};
+    }
+
+    function tarjeta(titulo, valor, claseValor, claseTarjeta, etiqueta, extra) {
+        return componente('dash_bootstrap_components', 'Col', {width: 3, children:
+            componente('dash_bootstrap_components', 'Card', {className: claseTarjeta, children: [
+                componente('dash_bootstrap_components', 'CardBody', {children: [
+                    componente('dash_html_components', 'H6', {children: titulo}),
+                    componente('dash_html_components', etiqueta || 'H3', {children: valor, className: claseValor}),
+                ].concat(extra || [])}),
+            ]}),
+        });
+    }
+
+    function fila(columnas) {
+        return componente('dash_bootstrap_components', 'Row', {children: columnas});
+    }
+
+    function numero(valor, decimales) {
+        return valor.toLocaleString('en-US', {minimumFractionDigits: decimales || 0, maximumFractionDigits: decimales || 0});
+    }
+
+    function figuraVacia() {
+        return {data: [], layout: {height: 300, annotations: [{text: 'Sin datos', showarrow: false}]}};
+    }
+
+    function sinDatos() {
+        const vacio = componente('dash_html_components', 'P', {children: 'Sin datos'});
+        return ['📊 0 transacciones | 0 ciudades | 0 productos',
+                fila([componente('dash_bootstrap_components', 'Col', {width: 12, children:
+                    componente('dash_html_components', 'H4', {children: 'No hay datos para los filtros seleccionados'})})]),
+                vacio, figuraVacia(), figuraVacia(), figuraVacia(), figuraVacia(), figuraVacia(), figuraVacia(), vacio];
+    }
+
+    // Serie pronosticada del filtro, como TablaPronosticos.clave_filtro: el total o solo una categoría o un estado
+    function pronosticoFiltro(cubo, filtros) {
+        const [ciudad, estado, mes, dia, categoria, rango, start, end] = filtros;
+        const p = cubo.pronosticos;
+        const activo = function (v, todos) { return v && v !== todos; };
+        if (!p || (start && end && String(end).slice(0, 10) < p.inicio)) return null;
+        if (activo(ciudad, 'Todas') || activo(mes, 'Todos') || activo(dia, 'Todos') || activo(rango, 'Todos')) return null;
+        if (activo(categoria, 'Todas') && activo(estado, 'Todos')) return null;
+        const clave = activo(categoria, 'Todas') ? 'Categoría|' + categoria : activo(estado, 'Todos') ? 'Estado Nombre|' + estado : '';
+        const serie = p.series[clave];
+        if (!serie) return null;
+        const inicio = Date.parse(p.inicio + 'T00:00:00Z');
+        const fechas = serie[0].map(function (_, i) { return new Date(inicio + i * UN_DIA).toISOString().slice(0, 10); });
+        return {fechas: fechas, media: serie[0], inferior: serie[1], superior: serie[2], etiqueta: p.etiqueta || 'Banda 95%'};
+    }
+
+    // Ingresos por día de la serie, media móvil por días de calendario, acumulado y variación
+    function tendencia(serie, diario) {
+        const posicion = new Map(serie.map(function (k, i) { return [k, i]; }));
+        const ingresos = serie.map(function (k) { return diario.get(k) || 0; });
+        const media = [], acumulado = [], variacion = [];
+        let total = 0, ventana = 0, inicio = 0;
+        ingresos.forEach(function (valor, i) {
+            total += valor;
+            ventana += valor;
+            while (serie[inicio] <= serie[i] - VENTANA_MEDIA_MOVIL) {
+                ventana -= ingresos[inicio];
+                inicio++;
+            }
+            media.push(ventana / (i - inicio + 1));
+            acumulado.push(total);
+            const previo = ingresos[posicion.get(serie[i] - DIAS_VARIACION)];
+            const cambio = previo > 0 ? (valor - previo) / previo * 100 : NaN;
+            variacion.push(isNaN(cambio) ? '—' : (cambio >= 0 ? '+' : '') + cambio.toFixed(1) + '%');
+        });
+        return {ingresos: ingresos, media: media, acumulado: acumulado, variacion: variacion};
+    }
+
+    function general(cubo, r, d, filtros) {
+        const subtitulo = '📊 ' + numero(r.lineas) + ' transacciones | ' + r.ciudades.size + ' ciudades | '
+            + r.productos.size + ' productos';
+        const ticket = r.pedidos > 0 ? r.ingresos / r.pedidos : 0;
+
+        const kpis = fila([
+            tarjeta('💰 INGRESOS', '$' + numero(r.ingresos), undefined, 'border-primary'),
+            tarjeta('📦 PEDIDOS', numero(r.pedidos), undefined, 'border-success'),
+            tarjeta('🎫 TICKET', '$' + numero(ticket, 2), undefined, 'border-info'),
+            tarjeta('🏙️ CIUDADES', String(r.ciudades.size), undefined, 'border-warning'),
+        ]);
+
+        // Tendencias
+        const mesesNum = Array.from(r.meses.keys()).sort(function (a, b) { return a - b; });
+        let crecimiento = 0;
+        if (mesesNum.length > 1) {
+            const primero = r.meses.get(mesesNum[0]), ultimo = r.meses.get(mesesNum[mesesNum.length - 1]);
+            crecimiento = (ultimo - primero) / primero * 100;
+        }
+        const horas = Array.from(r.horas.keys()).sort(function (a, b) { return a - b; });
+        let horaPico = horas[0];
+        horas.forEach(function (h) { if (r.horas.get(h) > r.horas.get(horaPico)) horaPico = h; });
+        const prodTop = claveMaxima(r.productos);
+        const colorCrec = crecimiento > 0 ? 'success' : crecimiento < 0 ? 'danger' : 'warning';
+        const pronostico = pronosticoFiltro(cubo, filtros);
+        const proximos = pronostico ? [componente('dash_html_components', 'Small', {className: 'text-muted', children:
+            '🔮 Próximos ' + pronostico.media.length + ' días: $'
+            + numero(pronostico.media.reduce(function (a, b) { return a + b; }, 0))})] : [];
+
+        const tendencias = fila([
+            tarjeta('📈 CRECIMIENTO', (crecimiento > 0 ? '+' : '') + crecimiento.toFixed(1) + '%', 'text-' + colorCrec, 'bg-light',
+                    undefined, proximos),
+            tarjeta('⏰ HORA PICO', horaPico + ':00', 'text-warning', 'bg-light'),
+            tarjeta('📆 MEJOR DÍA', claveMaxima(r.dias), 'text-info', 'bg-light'),
+            tarjeta('🏆 PRODUCTO', prodTop.slice(0, 15), 'text-success', 'bg-light', 'H6'),
+        ]);
+
+        // Gráfico 1: Ventas por Mes
+        const ingresosMes = mesesNum.map(function (m) { return r.meses.get(m); });
+        const figMes = {data: [{type: 'bar', x: mesesNum.map(function (m) { return MESES[m]; }), y: ingresosMes,
+                                text: ingresosMes, texttemplate: '$%{text:.2s}', textposition: 'outside',
+                                marker: {color: ingresosMes, colorscale: 'Blues', showscale: true}}],
+                        layout: {title: {text: '💰 Ventas por Mes'}}};
+
+        // Gráfico 2: Tendencia Diaria, con media móvil, acumulado y variación (como datos_ventas/series.py)
+        const t = tendencia(r.serie, r.diario);
+        const fechasSerie = r.serie.map(function (k) { return d.fechas[k]; });
+        const figTendencia = {data: [
+            {type: 'scatter', mode: 'lines', name: 'Ingresos', line: {color: '#8e44ad'}, x: fechasSerie, y: t.ingresos,
+             customdata: t.acumulado.map(function (a, i) { return [a, t.variacion[i]]; }),
+             hovertemplate: '%{x|%d/%m/%Y}<br>💰 $%{y:,.0f}<br>Acumulado: $%{customdata[0]:,.0f}'
+                            + '<br>vs ' + DIAS_VARIACION + ' días antes: %{customdata[1]}<extra></extra>'},
+            {type: 'scatter', mode: 'lines', name: 'Media ' + VENTANA_MEDIA_MOVIL + ' días',
+             line: {color: '#f39c12', width: 3}, x: fechasSerie, y: t.media,
+             hovertemplate: '%{x|%d/%m/%Y}<br>Media: $%{y:,.0f}<extra></extra>'},
+        ], layout: {title: {text: '📈 Tendencia Diaria'}, legend: {orientation: 'h', y: 1.02, x: 1, xanchor: 'right'}}};
+        if (pronostico) {
+            // Banda del 95% (con la cobertura medida en el nombre): borde superior invisible y el inferior rellena hasta él
+            figTendencia.data.push(
+                {type: 'scatter', mode: 'lines', x: pronostico.fechas, y: pronostico.superior, line: {width: 0},
+                 showlegend: false, hoverinfo: 'skip'},
+                {type: 'scatter', mode: 'lines', x: pronostico.fechas, y: pronostico.inferior, line: {width: 0},
+                 fill: 'tonexty', fillcolor: 'rgba(142, 68, 173, 0.15)', name: pronostico.etiqueta, hoverinfo: 'skip'},
+                {type: 'scatter', mode: 'lines', x: pronostico.fechas, y: pronostico.media, name: 'Pronóstico',
+                 line: {color: '#8e44ad', dash: 'dash'},
+                 customdata: pronostico.inferior.map(function (v, i) { return [v, pronostico.superior[i]]; }),
+                 hovertemplate: '%{x|%d/%m/%Y}<br>🔮 $%{y:,.0f}<br>($%{customdata[0]:,.0f} - $%{customdata[1]:,.0f})<extra></extra>'});
+        }
+
+        // Gráfico 3: Heatmap
+        const filasHeat = ORDEN_DIAS.filter(function (n) { return r.dias.has(n); });
+        const figHeatmap = {data: [{type: 'heatmap', x: horas, y: filasHeat, colorscale: 'Viridis',
+                                    colorbar: {title: {text: 'Pedidos'}, tickformat: ',d'},
+                                    z: filasHeat.map(function (n) {
+                                        return horas.map(function (h) { return r.horaDia.get(n + '|' + h) || 0; });
+                                    })}],
+                            layout: {title: {text: '🔥 Mapa de Calor - Horas Pico (más oscuro = más ventas)'},
+                                     xaxis: {title: {text: 'Hora'}}, yaxis: {title: {text: 'Día Semana Nombre'}}}};
+
+        // Gráfico 4: Ventas por Día
+        const pedidosDia = filasHeat.map(function (n) { return r.dias.get(n); });
+        const figDias = {data: [{type: 'bar', x: filasHeat, y: pedidosDia, text: pedidosDia, textposition: 'outside',
+                                 marker: {color: filasHeat.map(function (n) { return n === 'Sábado' || n === 'Domingo' ? '#e74c3c' : '#3498db'; })},
+                                 hovertemplate: '%{x}<br>📦 Pedidos: %{y:,}<extra></extra>'}],
+                         layout: {title: {text: '📆 Ventas por Día (azul = laborable, rojo = finde)'}}};
+
+        // Gráfico 5: Ciudades
+        const topCiudades = Array.from(r.ciudades.keys()).sort()
+            .sort(function (a, b) { return r.ciudades.get(b) - r.ciudades.get(a); }).slice(0, 10);
+        const ingresosCiudad = topCiudades.map(function (n) { return r.ciudades.get(n); });
+        const figCiudades = {data: [{type: 'bar', orientation: 'h', x: ingresosCiudad, y: topCiudades,
+                                     text: ingresosCiudad, texttemplate: '$%{text:.2s}',
+                                     marker: {color: ingresosCiudad, colorscale: 'Reds', showscale: true}}],
+                             layout: {title: {text: '🏙️ Top 10 Ciudades por Ingresos'}, yaxis: {autorange: 'reversed'}}};
+
+        // Gráfico 6: Mapa de Estados
+        const estados = Array.from(r.estados.keys()).sort();
+        const figMapa = {data: [{type: 'choropleth', locationmode: 'USA-states', colorscale: 'Reds',
+                                 colorbar: {title: {text: 'Ingresos ($)'}},
+                                 locations: estados.map(function (n) { return r.codigos.get(n); }),
+                                 z: estados.map(function (n) { return r.estados.get(n); }), text: estados}],
+                         layout: {title: {text: '🗺️ Ventas por Estado (EE.UU.)'}, geo: {scope: 'usa'}, height: 400}};
+
+        // Resumen Ejecutivo
+        const resumen = fila([
+            tarjeta('🏆 Producto Estrella', prodTop.slice(0, 20), 'text-success', 'border-success', 'P'),
+            tarjeta('🏙️ Ciudad Top', claveMaxima(r.ciudades).slice(0, 20), 'text-primary', 'border-primary', 'P'),
+            tarjeta('🗺️ Estado Top', claveMaxima(r.estados).slice(0, 20), 'text-info', 'border-info', 'P'),
+            tarjeta('📦 Categoría Top', claveMaxima(r.categorias).slice(0, 20), 'text-warning', 'border-warning', 'P'),
+        ]);
+
+        return [subtitulo, kpis, tendencias, figMes, figTendencia, figHeatmap, figDias, figCiudades, figMapa, resumen];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        panel: {
+            actualizar_general: function (ciudad, estado, mes, dia, categoria, rango, start, end, referencia) {
+                if (!referencia) {
+                    return Array(10).fill(window.dash_clientside.no_update);
+                }
+                // Dash espera la promesa: la primera vez incluye la descarga del cubo
+                return cargarCubo(referencia.url).then(function (cubo) {
+                    const d = decodificar(cubo);
+                    const filtros = [ciudad, estado, mes, dia, categoria, rango, start, end];
+                    const r = agregar(cubo, d, filtros);
+                    return r.lineas === 0 ? sinDatos() : general(cubo, r, d, filtros);
+                });
+            },
+        },
+    });
+})();
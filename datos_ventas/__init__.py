@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Capa de datos compartida por los paneles de ventas.
+
+    from datos_ventas import cargar_ventas
+    df = cargar_ventas()          # usa VENTAS_RUTA o la ruta por defecto
+"""
+
+import importlib
+
+from .catalogos import (mapa_meses, orden_meses, dias_espanol, orden_dias,
+                        estados_usa, codigos_estados, rangos_precio)
+from .carga import (RUTA_DATOS, CARPETA_CACHE, buscar_archivos, version_datos, leer_archivos,
+                    quitar_duplicados, asignar_categoria, extraer_ubicacion, procesar_datos, cargar_ventas)
+from .calidad import ReporteCalidad, unir_reportes, resumen_motivos, tabla_por_archivo
+from .columnar import (publicar_dataset, adjuntar_dataset, dataset_publicado, leer_manifiesto,
+                       publicar_objetos, adjuntar_objetos)
+from .indice import IndiceFechas
+from .cubo import COLUMNAS_CUBO, construir_cubo, comprimir_cubo
+from .pedidos import COLUMNAS_PEDIDO, COLUMNAS_TABLA_PEDIDOS, TablaPedidos, clave_pedido
+
+# Módulos que también se ejecutan con `python -m datos_ventas.<módulo>`: se importan al pedir
+# uno de sus nombres, así `-m` no los encuentra ya importados (RuntimeWarning de runpy)
+PEREZOSOS = {
+    'almacen': ['CARPETA_ALMACEN', 'AlmacenVentas', 'almacen_disponible', 'construir_almacen'],
+    'consultas': ['Filtro', 'SIN_FILTRO', 'AGREGACIONES', 'MotorPandas', 'MotorSQLite', 'MotorDuckDB',
+                  'filtrar', 'PartesFiltradas', 'como_partes', 'con_columnas', 'contar_lineas', 'valores_distintos',
+                  'agregar_por_partes', 'columnas_agregacion', 'crear_motor', 'verificar_paridad', 'comparar_motores'],
+    'cache_salidas': ['CacheMemoria', 'CacheDisco', 'CacheRedis', 'ClienteLocal', 'clave_salida', 'crear_cache'],
+    'distintos': ['COLUMNAS_DISTINTOS', 'ConjuntoBits', 'BocetoHLL', 'TablaDistintos',
+                  'crear_distintos', 'verificar_distintos'],
+    'series': ['COLUMNAS_SERIES', 'SeriesVentas', 'media_movil', 'acumulado', 'variacion', 'remuestrear',
+               'verificar_series'],
+    'pronostico': ['COLUMNAS_PRONOSTICO', 'TablaPronosticos', 'ajustar_holt_winters', 'pronosticar',
+                   'crear_pronosticos', 'verificar_pronosticos'],
+    'anomalias': ['TablaAnomalias', 'z_robusto', 'mediana_movil', 'residuos_diarios', 'residuos_horarios',
+                  'grupos_segmentos'],
+    'clientes': ['COLUMNAS_CLIENTES', 'SEGMENTOS_RFM', 'IndiceClientes', 'normalizar_direcciones',
+                 'matriz_cohortes', 'resumen_recompra', 'distribucion_pedidos', 'cohortes_recompra',
+                 'segmentos_rfm', 'resumen_rfm', 'verificar_clientes'],
+    'geo': ['COLUMNAS_GEO', 'NIVELES_GEO', 'CapaGeo', 'verificar_geo'],
+    'productos': ['COLUMNAS_PERFIL', 'PERIODOS_PERFIL', 'PerfilProductos', 'verificar_perfil'],
+}
+_MODULO_DE = {nombre: modulo for modulo, nombres in PEREZOSOS.items() for nombre in nombres}
+
+
+def __getattr__(nombre):
+    if nombre in _MODULO_DE:
+        valor = getattr(importlib.import_module(f".{_MODULO_DE[nombre]}", __name__), nombre)
+        # Queda en el paquete: la próxima vez no pasa por aquí
+        globals()[nombre] = valor
+        return valor
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_MODULO_DE))
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén columnar en disco, particionado por año/mes, para historiales que no
+caben en memoria.
+
+    python -m datos_ventas.almacen [carpeta_almacen] [ruta_csv]
+
+Cada partición (anio=2019/mes=01) guarda una columna por archivo .npy, con las
+filas ordenadas por 'Fecha Pedido'. Las columnas de texto usan diccionarios
+globales (un mismo código significa lo mismo en todas las particiones), así que
+leer varias particiones es concatenar códigos: el texto vuelve como pd.Categorical
+sobre el diccionario y solo se decodifica al mostrarlo.
+Una consulta con rango de fechas solo abre (con mmap) las particiones de ese rango y
+de cada una copia solo las filas del rango; las lecturas no se guardan en memoria.
+Para agregar todo el historial sin tenerlo entero, recorrer() entrega una partición por vez.
+
+Los CSV se procesan de a uno: al agregar un mes nuevo solo se procesa ese archivo;
+si cambió alguno de los ya incorporados, el almacén se reconstruye.
+"""
+
+import glob
+import json
+import os
+import shutil
+import sys
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .calidad import ReporteCalidad, guardar_reporte, imprimir_reporte, unir_reportes
+from .carga import (RUTA_DATOS, CARPETA_CACHE, VERSION_PIPELINE, COLUMNAS_ORIGINALES, buscar_archivos,
+                    version_datos, leer_archivos, quitar_duplicados, procesar_datos)
+from .columnar import (_nombre_archivo, tipo_columna, valores_numericos, diccionario,
+                       categorias_a_json, categorias_de_json)
+from .indice import IndiceFechas
+
+CARPETA_ALMACEN = os.environ.get('VENTAS_ALMACEN', os.path.join(CARPETA_CACHE, 'almacen'))
+MANIFIESTO_ALMACEN = 'almacen.json'
+# Huellas de las filas incorporadas, un archivo por CSV: un CSV nuevo se deduplica contra los anteriores
+CARPETA_HUELLAS = 'huellas'
+
+
+def almacen_disponible(carpeta):
+    return bool(carpeta) and os.path.exists(os.path.join(carpeta, MANIFIESTO_ALMACEN))
+
+
+def _huella(archivo):
+    st = os.stat(archivo)
+    return f"{st.st_size}|{st.st_mtime_ns}"
+
+
+def _carpeta_particion(clave):
+    anio, mes = clave.split('-')
+    return os.path.join(f"anio={anio}", f"mes={mes}")
+
+
+# ============================================
+# ESCRITURA
+# ============================================
+def _codificar(df, esquema):
+    """Columnas de df como arreglos de NumPy; amplía el esquema y los diccionarios globales"""
+    if not esquema:
+        for nombre, serie in df.items():
+            entrada = {'nombre': nombre, 'tipo': tipo_columna(serie)}
+            if entrada['tipo'] == 'categoria':
+                entrada['categorias'] = serie.cat.categories.tolist()
+                entrada['ordenada'] = bool(serie.cat.ordered)
+            elif entrada['tipo'] == 'fecha_hora':
+                entrada['dtype'] = str(serie.dtype)
+            elif entrada['tipo'] == 'numerico':
+                entrada['dtype'] = str(valores_numericos(serie.iloc[:0]).dtype)
+            else:
+                entrada['categorias'] = []
+            esquema.append(entrada)
+
+    arreglos = {}
+    for entrada in esquema:
+        serie = df[entrada['nombre']]
+        tipo = entrada['tipo']
+        if tipo == 'categoria':
+            arreglos[entrada['nombre']] = serie.cat.codes.to_numpy()
+        elif tipo == 'fecha_hora':
+            arreglos[entrada['nombre']] = serie.to_numpy().view('int64')
+        elif tipo == 'numerico':
+            arreglos[entrada['nombre']] = valores_numericos(serie).astype(entrada['dtype'], copy=False)
+        else:
+            # Los valores nuevos se agregan al final: los códigos ya escritos no cambian
+            conocidas = pd.Index(categorias_de_json(tipo, entrada['categorias']))
+            nuevas = pd.Index(serie.dropna().unique()).difference(conocidas)
+            if len(nuevas):
+                entrada['categorias'] += categorias_a_json(tipo, nuevas)
+                conocidas = conocidas.append(nuevas)
+            arreglos[entrada['nombre']] = conocidas.get_indexer(serie).astype(np.int32)
+    return arreglos
+
+
+def _escribir_particion(carpeta, clave, esquema, arreglos):
+    """Escribe (o amplía) una partición con las filas ordenadas por fecha"""
+    destino = os.path.join(carpeta, _carpeta_particion(clave))
+    if os.path.exists(destino):
+        for i, entrada in enumerate(esquema):
+            existente = np.load(os.path.join(destino, _nombre_archivo(i)))
+            arreglos[entrada['nombre']] = np.concatenate([existente, arreglos[entrada['nombre']]])
+
+    orden = np.argsort(arreglos['Fecha Pedido'], kind='stable')
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    for i, entrada in enumerate(esquema):
+        np.save(os.path.join(temporal, _nombre_archivo(i)), arreglos[entrada['nombre']][orden])
+
+    anterior = f"{destino}.{os.getpid()}.old"
+    if os.path.exists(destino):
+        os.replace(destino, anterior)
+    os.replace(temporal, destino)
+    shutil.rmtree(anterior, ignore_errors=True)
+
+    dtype_fecha = next(c['dtype'] for c in esquema if c['nombre'] == 'Fecha Pedido')
+    fechas = arreglos['Fecha Pedido'][orden].view(dtype_fecha)
+    return {
+        'clave': clave,
+        'carpeta': _carpeta_particion(clave),
+        'filas': len(orden),
+        'desde': str(fechas[0].astype('datetime64[D]')),
+        'hasta': str(fechas[-1].astype('datetime64[D]')),
+    }
+
+
+def _ruta_huellas(carpeta, archivo):
+    return os.path.join(carpeta, CARPETA_HUELLAS, f"{os.path.basename(archivo)}.npy")
+
+
+def _huellas_incorporadas(carpeta, manifiesto):
+    """Huellas ordenadas de las filas de los CSV que ya figuran en el manifiesto"""
+    huellas = [np.load(_ruta_huellas(carpeta, nombre)) for nombre in manifiesto['archivos']
+               if os.path.exists(_ruta_huellas(carpeta, nombre))]
+    return np.sort(np.concatenate(huellas)) if huellas else np.array([], dtype=np.uint64)
+
+
+def _guardar_manifiesto(carpeta, manifiesto):
+    temporal = os.path.join(carpeta, f"{MANIFIESTO_ALMACEN}.{os.getpid()}.tmp")
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False)
+    os.replace(temporal, os.path.join(carpeta, MANIFIESTO_ALMACEN))
+
+
+def _consistente(carpeta, manifiesto):
+    """Cada partición en disco tiene las filas que dice el manifiesto"""
+    if not manifiesto['columnas']:
+        return True
+    i = next(i for i, c in enumerate(manifiesto['columnas']) if c['nombre'] == 'Fecha Pedido')
+    en_disco = sorted(os.path.relpath(os.path.dirname(a), carpeta)
+                      for a in glob.glob(os.path.join(carpeta, 'anio=*', 'mes=*', _nombre_archivo(i))))
+    if en_disco != sorted(p['carpeta'] for p in manifiesto['particiones']):
+        return False
+    return all(len(np.load(os.path.join(carpeta, p['carpeta'], _nombre_archivo(i)), mmap_mode='r')) == p['filas']
+               for p in manifiesto['particiones'])
+
+
+def construir_almacen(ruta=RUTA_DATOS, carpeta=CARPETA_ALMACEN):
+    """Incorpora al almacén los CSV nuevos de `ruta`, de a un archivo por vez"""
+    archivos = buscar_archivos(ruta)
+    if not archivos:
+        raise FileNotFoundError(f"No se encontraron archivos de ventas en {ruta}")
+
+    manifiesto = None
+    if almacen_disponible(carpeta):
+        with open(os.path.join(carpeta, MANIFIESTO_ALMACEN), encoding='utf-8') as f:
+            manifiesto = json.load(f)
+        actuales = {os.path.basename(a): _huella(a) for a in archivos}
+        if manifiesto.get('pipeline') != VERSION_PIPELINE:
+            print("   ⚠️ Cambió el pipeline de procesamiento: se reconstruye el almacén")
+            manifiesto = None
+        elif any(actuales.get(nombre) != huella for nombre, huella in manifiesto['archivos'].items()):
+            print("   ⚠️ Cambiaron archivos ya incorporados: se reconstruye el almacén")
+            manifiesto = None
+        elif not _consistente(carpeta, manifiesto):
+            print("   ⚠️ El almacén quedó a medias (construcción interrumpida): se reconstruye")
+            manifiesto = None
+
+    if manifiesto is None:
+        shutil.rmtree(carpeta, ignore_errors=True)
+        os.makedirs(carpeta)
+        manifiesto = {'version': None, 'pipeline': VERSION_PIPELINE, 'archivos': {}, 'columnas': [],
+                      'particiones': [], 'extras': {}}
+
+    particiones = {p['clave']: p for p in manifiesto['particiones']}
+    pendientes = [a for a in archivos if os.path.basename(a) not in manifiesto['archivos']]
+    vistas = _huellas_incorporadas(carpeta, manifiesto)
+
+    for archivo in pendientes:
+        calidad = ReporteCalidad(COLUMNAS_ORIGINALES)
+        df, huellas, duplicados = quitar_duplicados(leer_archivos([archivo], calidad), vistas, calidad)
+        # Las huellas de un CSV solo cuentan cuando el manifiesto lo incorpora (abajo)
+        os.makedirs(os.path.join(carpeta, CARPETA_HUELLAS), exist_ok=True)
+        np.save(_ruta_huellas(carpeta, archivo), huellas)
+        vistas = np.sort(np.concatenate([vistas, huellas]))
+        df = procesar_datos(df, calidad)
+        arreglos = _codificar(df, manifiesto['columnas'])
+
+        fechas = df['Fecha Pedido']
+        claves = (fechas.dt.year * 100 + fechas.dt.month).to_numpy()
+        for valor in np.unique(claves):
+            filas = claves == valor
+            clave = f"{valor // 100}-{valor % 100:02d}"
+            particiones[clave] = _escribir_particion(
+                carpeta, clave, manifiesto['columnas'],
+                {nombre: arreglo[filas] for nombre, arreglo in arreglos.items()})
+
+        manifiesto['archivos'][os.path.basename(archivo)] = _huella(archivo)
+        manifiesto.setdefault('duplicados', {})[os.path.basename(archivo)] = duplicados.to_dict('records')
+        manifiesto.setdefault('calidad', {})[os.path.basename(archivo)] = calidad.a_dict()
+        manifiesto['particiones'] = [particiones[c] for c in sorted(particiones)]
+        manifiesto['version'] = version_datos([a for a in archivos if os.path.basename(a) in manifiesto['archivos']])
+        # El manifiesto se guarda después de cada archivo; si se interrumpe, _consistente lo detecta
+        _guardar_manifiesto(carpeta, manifiesto)
+
+    if pendientes:
+        reporte = unir_reportes(manifiesto.get('calidad', {}).values())
+        imprimir_reporte(reporte)
+        guardar_reporte(reporte, os.path.join(carpeta, 'calidad.json'))
+    print(f"\n🗄️ Almacén listo en {carpeta}: {len(manifiesto['particiones'])} particiones, "
+          f"{sum(p['filas'] for p in manifiesto['particiones']):,} filas")
+    return carpeta
+
+
+# ============================================
+# LECTURA
+# ============================================
+class AlmacenVentas:
+    """Lectura por rango de fechas: solo se abren las particiones necesarias y se recorta por búsqueda binaria"""
+
+    def __init__(self, carpeta=CARPETA_ALMACEN):
+        self.carpeta = carpeta
+        with open(os.path.join(carpeta, MANIFIESTO_ALMACEN), encoding='utf-8') as f:
+            self.manifiesto = json.load(f)
+        self.version = self.manifiesto['version']
+        self.columnas = [c['nombre'] for c in self.manifiesto['columnas']]
+        self._esquema = {c['nombre']: (i, c) for i, c in enumerate(self.manifiesto['columnas'])}
+        self._diccionarios = {}
+        self._lock = threading.Lock()
+
+    def particiones(self, desde=None, hasta=None):
+        desde = desde.isoformat() if isinstance(desde, date) else desde
+        hasta = hasta.isoformat() if isinstance(hasta, date) else hasta
+        return [p for p in self.manifiesto['particiones']
+                if (desde is None or p['hasta'] >= desde) and (hasta is None or p['desde'] <= hasta)]
+
+    def rango_fechas(self):
+        particiones = self.manifiesto['particiones']
+        if not particiones:
+            return None, None
+        return date.fromisoformat(particiones[0]['desde']), date.fromisoformat(particiones[-1]['hasta'])
+
+    def calidad(self):
+        """Reporte de calidad de todos los CSV incorporados (calidad.ReporteCalidad)"""
+        return unir_reportes(self.manifiesto.get('calidad', {}).values())
+
+    def valores(self, columna):
+        """Valores distintos de una columna de texto, sin recorrer las filas"""
+        return categorias_de_json(self._esquema[columna][1]['tipo'], self._esquema[columna][1]['categorias'])
+
+    def _categorias(self, entrada):
+        """(categorías ordenadas, recodificación): los códigos globales están en orden de llegada y
+        se pasan al orden alfabético, como los de factorize(sort=True). Uno por columna y por proceso"""
+        with self._lock:
+            if entrada['nombre'] not in self._diccionarios:
+                categorias = categorias_de_json(entrada['tipo'], entrada['categorias'])
+                if entrada['tipo'] == 'fecha':
+                    self._diccionarios[entrada['nombre']] = (diccionario(categorias), None)
+                else:
+                    orden = np.argsort(np.asarray(categorias, dtype=object), kind='stable')
+                    recodificar = np.empty(len(orden) + 1, dtype=np.int32)
+                    recodificar[orden] = np.arange(len(orden), dtype=np.int32)
+                    # El código -1 (faltante) sigue siendo -1
+                    recodificar[-1] = -1
+                    indice = pd.Index(np.asarray(categorias, dtype=object)[orden], dtype='str')
+                    self._diccionarios[entrada['nombre']] = (indice, recodificar)
+            return self._diccionarios[entrada['nombre']]
+
+    def _tramo(self, particion, desde, hasta):
+        """Filas [inicio, fin) de la partición con fecha entre desde y hasta, por búsqueda binaria"""
+        if (desde is None or particion['desde'] >= str(desde)) and (hasta is None or particion['hasta'] <= str(hasta)):
+            return 0, particion['filas']
+        i, entrada = self._esquema['Fecha Pedido']
+        fechas = np.load(os.path.join(self.carpeta, particion['carpeta'], _nombre_archivo(i)), mmap_mode='r')
+        tramo = IndiceFechas(fechas.view(entrada['dtype'])).tramo(desde, hasta)
+        return tramo.start, tramo.stop
+
+    def _columna(self, entrada, partes):
+        """Columna armada con los tramos de cada partición: sin copiar si es numérica y de una sola partición"""
+        if not partes:
+            dtype = {'numerico': entrada.get('dtype'), 'fecha_hora': 'int64'}.get(entrada['tipo'], np.int32)
+            valores = np.empty(0, dtype=dtype)
+        else:
+            valores = partes[0] if len(partes) == 1 else np.concatenate(partes)
+
+        tipo = entrada['tipo']
+        if tipo == 'numerico':
+            return valores
+        if tipo == 'fecha_hora':
+            return valores.view(entrada['dtype'])
+        if tipo == 'categoria':
+            return pd.Categorical.from_codes(valores, categories=entrada['categorias'],
+                                             ordered=entrada.get('ordenada', False))
+        categorias, recodificar = self._categorias(entrada)
+        if tipo == 'fecha':
+            return categorias[valores]
+        return pd.Categorical.from_codes(recodificar[valores], categories=categorias)
+
+    def _marco(self, particiones, desde, hasta, columnas):
+        tramos = [self._tramo(p, desde, hasta) for p in particiones]
+        datos = {}
+        for nombre in columnas:
+            i, entrada = self._esquema[nombre]
+            datos[nombre] = self._columna(entrada, [
+                np.load(os.path.join(self.carpeta, p['carpeta'], _nombre_archivo(i)), mmap_mode='r')[inicio:fin]
+                for p, (inicio, fin) in zip(particiones, tramos) if fin > inicio])
+        df = pd.DataFrame(datos, copy=False)
+        df.attrs['version'] = self.version
+        df.attrs['extras'] = self.manifiesto['extras']
+        return df
+
+    def vacio(self, columnas=None):
+        """DataFrame sin filas con las columnas y tipos de leer()"""
+        return self._marco([], None, None, list(columnas or self.columnas))
+
+    def leer(self, desde=None, hasta=None, columnas=None):
+        """Filas con fecha entre desde y hasta, ordenadas por 'Fecha Pedido'; solo las columnas pedidas"""
+        return self._marco(self.particiones(desde, hasta), desde, hasta, list(columnas or self.columnas))
+
+    def recorrer(self, desde=None, hasta=None, columnas=None):
+        """Las mismas filas que leer(), una partición por vez (para agregar sin cargar todo el rango)"""
+        for particion in self.particiones(desde, hasta):
+            df = self._marco([particion], desde, hasta, list(columnas or self.columnas))
+            if len(df):
+                yield df
+
+
+if __name__ == '__main__':
+    construir_almacen(ruta=sys.argv[2] if len(sys.argv) > 2 else RUTA_DATOS,
+                      carpeta=sys.argv[1] if len(sys.argv) > 1 else CARPETA_ALMACEN)
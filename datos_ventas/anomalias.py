@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Detección de días y horas atípicos en todos los segmentos, calculada una vez al cargar.
+
+Parte de las series densas (series.SeriesVentas): cada filtro del panel por ciudad,
+estado, categoría o rango de precio es un grupo de segmentos, así que las series de
+todos los grupos salen de un único producto de matrices (días x segmentos por
+segmentos x grupos) y la detección corre sobre todas las columnas a la vez:
+
+- por día, los ingresos menos una mediana móvil centrada (tendencia) y el efecto del
+  día de la semana; el residuo se mide con z robusto (mediana y MAD)
+- por hora del día, las líneas de cada hora contra el total del día repartido según el
+  perfil horario típico del grupo (residuo de Pearson, también con z robusto)
+
+El resultado es una tabla chica de anomalías por grupo; la pestaña EVENTOS muestra las
+del filtro activo junto a los eventos del calendario.
+
+    python -m datos_ventas.anomalias     # anomalías del total y tiempo con miles de grupos
+"""
+
+import os
+import time
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .catalogos import mapa_meses, dias_espanol
+from .series import COLUMNAS_CALENDARIO, COLUMNAS_SEGMENTO
+
+# z robusto a partir del cual un día (o una hora) es atípico
+UMBRAL_DIARIO = float(os.environ.get('VENTAS_UMBRAL_ANOMALIA', 3.5))
+UMBRAL_HORARIO = float(os.environ.get('VENTAS_UMBRAL_ANOMALIA_HORA', 4.5))
+# Días de la mediana móvil que hace de tendencia
+VENTANA_TENDENCIA = 15
+# Líneas esperadas mínimas para evaluar una hora (con menos, el ruido domina)
+MINIMO_HORA = 5
+# Grupos por bloque: acota la memoria de las ventanas de la mediana y de los arreglos por hora
+BLOQUE_GRUPOS = 256
+# Escala del MAD a desvío estándar en una normal
+ESCALA_MAD = 0.6745
+
+
+# ============================================
+# DETECCIÓN VECTORIZADA
+# ============================================
+def z_robusto(residuos):
+    """z por columna con mediana y MAD; las columnas sin dispersión quedan en cero"""
+    mediana = np.median(residuos, axis=0)
+    mad = np.median(np.abs(residuos - mediana), axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = ESCALA_MAD * (residuos - mediana) / mad
+    return np.where(mad > 0, z, 0.0)
+
+
+def mediana_movil(valores, ventana=VENTANA_TENDENCIA):
+    """Mediana centrada de `ventana` días por columna; en los bordes se repite el extremo"""
+    mitad = ventana // 2
+    extendido = np.pad(valores, ((mitad, ventana - 1 - mitad), (0, 0)), mode='edge')
+    return np.median(sliding_window_view(extendido, ventana, axis=0), axis=-1)
+
+
+def residuos_diarios(valores, dia_semana):
+    """(z, esperado) de cada día y columna: tendencia por mediana móvil más efecto del día de la semana"""
+    tendencia = mediana_movil(valores)
+    resto = valores - tendencia
+    semanal = np.zeros((7, valores.shape[1]))
+    for dia in range(7):
+        if (dia_semana == dia).any():
+            semanal[dia] = np.median(resto[dia_semana == dia], axis=0)
+    esperado = tendencia + semanal[dia_semana]
+    return z_robusto(valores - esperado), esperado
+
+
+def residuos_horarios(valores):
+    """(z, esperado) de cada (día, hora) y columna: total del día repartido con el perfil horario típico"""
+    por_dia = valores.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reparto = valores / por_dia[:, None, :]
+    # Perfil típico: participación media de cada hora en los días con ventas (suma 1 por grupo;
+    # la mediana se anula en los grupos chicos, que venden en pocas horas por día)
+    dias_con_ventas = np.maximum((por_dia > 0).sum(axis=0), 1)
+    perfil = np.nan_to_num(reparto).sum(axis=0) / dias_con_ventas
+    esperado = por_dia[:, None, :] * perfil[None]
+    pearson = (valores - esperado) / np.sqrt(np.maximum(esperado, 1))
+    dias, horas, grupos = valores.shape
+    z = z_robusto(pearson.reshape(dias * horas, grupos)).reshape(valores.shape)
+    return np.where(esperado >= MINIMO_HORA, z, 0.0), esperado
+
+
+# ============================================
+# GRUPOS DE SEGMENTOS
+# ============================================
+def grupos_segmentos(segmentos):
+    """(claves, pertenencia): cada combinación de valores de las columnas de segmento que puede
+    pedir un filtro, con su columna en la matriz de pertenencia (segmentos x grupos). Las claves
+    que eligen los mismos segmentos comparten columna"""
+    columnas, claves = [], {}
+    indice = {}
+    for r in range(len(COLUMNAS_SEGMENTO) + 1):
+        for dimensiones in combinations(COLUMNAS_SEGMENTO, r):
+            if dimensiones:
+                grupos = segmentos.groupby(list(dimensiones), sort=True).ngroup().to_numpy()
+                filas = segmentos[list(dimensiones)].drop_duplicates().sort_values(list(dimensiones))
+                filas = list(filas.itertuples(index=False))
+            else:
+                grupos, filas = np.zeros(len(segmentos), dtype=np.int64), [()]
+            for codigo, fila in enumerate(filas):
+                miembros = grupos == codigo
+                huella = miembros.tobytes()
+                if huella not in indice:
+                    indice[huella] = len(columnas)
+                    columnas.append(miembros)
+                claves[frozenset(zip(dimensiones, fila))] = indice[huella]
+    return claves, np.column_stack(columnas).astype(float)
+
+
+def describir_grupo(clave):
+    """Texto del grupo para el panel, en el orden de las columnas de segmento"""
+    partes = dict(clave)
+    return ' · '.join(str(partes[c]) for c in COLUMNAS_SEGMENTO if c in partes) or 'Total'
+
+
+# ============================================
+# TABLA DE ANOMALÍAS
+# ============================================
+class TablaAnomalias:
+    """Días y horas atípicos de cada grupo de segmentos"""
+
+    def __init__(self, series, umbral_diario=UMBRAL_DIARIO, umbral_horario=UMBRAL_HORARIO):
+        self.claves, pertenencia = grupos_segmentos(series.segmentos)
+        self.grupos = pertenencia.shape[1]
+        # El último día puede estar incompleto (los CSV cortan a cualquier hora): no se evalúa
+        n = max(len(series.dias) - 1, 0)
+        dias = series.dias[:n]
+        dia_semana = series.calendario['Día Semana'].to_numpy()[:n]
+        ingresos = series.diario['centavos'][:n] / 100
+        # Las líneas por hora van en float32 (conteos exactos) y como matriz (día·hora x segmento)
+        lineas = series.horario['lineas'][:n].astype(np.float32).reshape(n * 24, -1)
+
+        diarias, horarias = [], []
+        for inicio in range(0, self.grupos, BLOQUE_GRUPOS):
+            bloque = pertenencia[:, inicio:inicio + BLOQUE_GRUPOS]
+            valores = ingresos @ bloque
+            z, esperado = residuos_diarios(valores, dia_semana)
+            dia, grupo = np.nonzero(np.abs(z) >= umbral_diario)
+            diarias.append(pd.DataFrame({'grupo': grupo + inicio, 'Fecha': dias[dia], 'Valor': valores[dia, grupo],
+                                         'Esperado': esperado[dia, grupo], 'z': z[dia, grupo]}))
+
+            valores = (lineas @ bloque.astype(np.float32)).reshape(n, 24, -1)
+            z, esperado = residuos_horarios(valores)
+            dia, hora, grupo = np.nonzero(np.abs(z) >= umbral_horario)
+            horarias.append(pd.DataFrame({'grupo': grupo + inicio, 'Fecha': dias[dia], 'Hora': hora,
+                                          'Valor': valores[dia, hora, grupo], 'Esperado': esperado[dia, hora, grupo],
+                                          'z': z[dia, hora, grupo]}))
+
+        self.diarias = self._ordenar(pd.concat(diarias, ignore_index=True))
+        self.horarias = self._ordenar(pd.concat(horarias, ignore_index=True))
+
+    def _ordenar(self, tabla):
+        tabla['Fecha'] = pd.to_datetime(tabla['Fecha'])
+        tabla['Tipo'] = np.where(tabla['z'] > 0, 'Pico', 'Caída')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tabla['Variación'] = np.where(tabla['Esperado'] > 0, (tabla['Valor'] / tabla['Esperado'] - 1) * 100, np.nan)
+        return tabla.sort_values(['grupo', 'Fecha'], kind='stable').reset_index(drop=True)
+
+    def grupo_filtro(self, filtro):
+        """Columna del grupo que corresponde a las condiciones de segmento del filtro, o None si
+        alguna condición no es de segmento ni de calendario (p. ej. un producto)"""
+        if any(c not in COLUMNAS_SEGMENTO and c not in COLUMNAS_CALENDARIO for c, _ in filtro.condiciones):
+            return None
+        condiciones = frozenset((c, str(v)) for c, v in filtro.condiciones if c in COLUMNAS_SEGMENTO)
+        return self.claves.get(condiciones)
+
+    def para_filtro(self, filtro):
+        """(diarias, horarias) del grupo del filtro dentro de su rango de fechas, mes y día de la semana"""
+        grupo = self.grupo_filtro(filtro)
+        if grupo is None:
+            return None
+        resultado = []
+        for tabla in (self.diarias, self.horarias):
+            tabla = tabla[tabla['grupo'] == grupo]
+            fechas = tabla['Fecha']
+            mascara = np.ones(len(tabla), dtype=bool)
+            if filtro.desde is not None:
+                mascara &= (fechas >= pd.Timestamp(filtro.desde)).to_numpy()
+            if filtro.hasta is not None:
+                mascara &= (fechas < pd.Timestamp(filtro.hasta) + pd.Timedelta(days=1)).to_numpy()
+            for columna, valor in filtro.condiciones:
+                if columna == 'Mes':
+                    mascara &= (fechas.dt.month.map(mapa_meses) == valor).to_numpy()
+                elif columna == 'Día Semana Nombre':
+                    mascara &= (fechas.dt.day_name().map(dias_espanol) == valor).to_numpy()
+            resultado.append(tabla[mascara].drop(columns='grupo').reset_index(drop=True))
+        return tuple(resultado)
+
+
+if __name__ == '__main__':
+    from .carga import cargar_ventas
+    from .consultas import SIN_FILTRO
+    from .series import COLUMNAS_SERIES, SeriesVentas
+
+    series = SeriesVentas(cargar_ventas()[COLUMNAS_SERIES])
+    inicio = time.perf_counter()
+    tabla = TablaAnomalias(series)
+    print(f"\n🔎 ANOMALÍAS: {tabla.grupos:,} grupos en {time.perf_counter() - inicio:.2f}s | "
+          f"{len(tabla.diarias):,} días y {len(tabla.horarias):,} horas atípicos")
+    diarias, horarias = tabla.para_filtro(SIN_FILTRO)
+    print("\n   Total, por día:\n" + diarias.to_string(index=False, float_format='{:.1f}'.format))
+    print("\n   Total, por hora:\n" + horarias.head(15).to_string(index=False, float_format='{:.1f}'.format))
+
+    # Escala: los mismos segmentos repetidos en 20 copias de cada ciudad
+    copias = 20
+    series.segmentos = pd.concat([series.segmentos.assign(Ciudad=series.segmentos['Ciudad'] + f" {i}")
+                                  for i in range(copias)], ignore_index=True)
+    series.diario = {m: np.tile(v, copias) for m, v in series.diario.items()}
+    series.horario = {m: np.tile(v, copias) for m, v in series.horario.items()}
+    inicio = time.perf_counter()
+    grande = TablaAnomalias(series)
+    print(f"\n   x{copias} segmentos: {grande.grupos:,} grupos en {time.perf_counter() - inicio:.2f}s")
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+Escritura de archivos junto a la caché que comparten la carga, la calidad y los pronósticos.
+"""
+
+import json
+import os
+
+
+def guardar_json(datos, ruta):
+    """Escribe `datos` como JSON de forma atómica: un lector nunca ve el archivo a medias"""
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(temporal, ruta)
+    return ruta
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de salidas ya serializadas del panel, por estado de filtros y versión de datos.
+
+Las vistas más comunes (todo en 'Todos', un solo estado...) se piden una y otra vez:
+el panel guarda el JSON de cada bloque de salidas y en la siguiente visita lo devuelve
+sin filtrar, agregar ni armar figuras. Tres backends con la misma interfaz:
+
+- memoria: LRU dentro del proceso
+- disco:<carpeta>: un archivo por clave, compartido entre workers
+- redis://...: cualquier cliente con get/set/delete/scan_iter (redis-py, o
+  ClienteLocal para probar sin servidor con 'local')
+
+La versión de los datos es parte de cada clave: cuando el dataset cambia, las entradas
+de la versión anterior dejan de usarse y se borran. Con disco o Redis la caché es de todos
+los workers, y reservar() deja que uno solo haga una tarea por versión (el precalentamiento).
+
+    VENTAS_CACHE_FIGURAS=disco:/tmp/ventas_figuras python Ciencia_datos.py
+
+Verificación de los backends:
+
+    python -m datos_ventas.cache_salidas
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+# Entradas del LRU en memoria (cada una es el JSON de un bloque de salidas; una vista ocupa hasta 6)
+TAMANO_CACHE = int(os.environ.get('VENTAS_CACHE_FIGURAS_TAM', 512))
+
+
+def clave_salida(*partes):
+    """Huella estable de las partes (bloque, filtros normalizados, parámetros)"""
+    texto = json.dumps(partes, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+class _CacheVersionada:
+    """Base de los backends: cuenta aciertos y descarta otras versiones al cambiar de dataset"""
+
+    nombre = None
+    # Si la ven todos los workers (una tarea reservada alcanza para todos)
+    compartida = False
+
+    def __init__(self):
+        self.version = None
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+    def _usar_version(self, version):
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self._descartar_otras(version)
+                    self.version = version
+
+    def obtener(self, version, clave):
+        """JSON guardado o None"""
+        self._usar_version(version)
+        texto = self._leer(version, clave)
+        if texto is None:
+            self.fallos += 1
+        else:
+            self.aciertos += 1
+        return texto
+
+    def guardar(self, version, clave, texto):
+        self._usar_version(version)
+        self._escribir(version, clave, texto)
+
+    def reservar(self, version, tarea, segundos=3600):
+        """True para el primero que reserva `tarea` en esta versión; la reserva vence a los `segundos`
+        (si quien la tenía murió sin terminar, otro la toma)"""
+        self._usar_version(version)
+        return self._reservar(version, tarea, segundos)
+
+    def _reservar(self, version, tarea, segundos):
+        return True
+
+    def resumen(self):
+        total = self.aciertos + self.fallos
+        return f"{self.nombre}: {self.aciertos}/{total} aciertos" if total else f"{self.nombre}: sin consultas"
+
+
+# ============================================
+# MEMORIA
+# ============================================
+class CacheMemoria(_CacheVersionada):
+    """LRU en el proceso"""
+
+    nombre = 'memoria'
+
+    def __init__(self, maximo=TAMANO_CACHE):
+        super().__init__()
+        self.maximo = maximo
+        self._entradas = OrderedDict()
+
+    def _leer(self, version, clave):
+        with self._lock:
+            texto = self._entradas.get(clave)
+            if texto is not None:
+                self._entradas.move_to_end(clave)
+            return texto
+
+    def _escribir(self, version, clave, texto):
+        with self._lock:
+            self._entradas[clave] = texto
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def _descartar_otras(self, version):
+        self._entradas.clear()
+
+
+# ============================================
+# DISCO
+# ============================================
+class CacheDisco(_CacheVersionada):
+    """Un archivo por clave en <carpeta>/<versión>/; los workers comparten la carpeta"""
+
+    nombre = 'disco'
+    compartida = True
+
+    def __init__(self, carpeta):
+        super().__init__()
+        self.carpeta = carpeta
+
+    def _ruta(self, version, clave):
+        return os.path.join(self.carpeta, str(version), f"{clave}.json")
+
+    def _leer(self, version, clave):
+        try:
+            with open(self._ruta(version, clave), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _escribir(self, version, clave, texto):
+        ruta = self._ruta(version, clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        os.replace(temporal, ruta)
+
+    def _reservar(self, version, tarea, segundos):
+        ruta = os.path.join(self.carpeta, str(version), f"{tarea}.reserva")
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        try:
+            if time.time() - os.path.getmtime(ruta) > segundos:
+                os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        try:
+            # O_EXCL: solo un proceso crea el archivo
+            os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def _descartar_otras(self, version):
+        if not os.path.isdir(self.carpeta):
+            return
+        for nombre in os.listdir(self.carpeta):
+            if nombre != str(version):
+                shutil.rmtree(os.path.join(self.carpeta, nombre), ignore_errors=True)
+
+
+# ============================================
+# REDIS (o compatible)
+# ============================================
+class ClienteLocal:
+    """Sustituto en memoria de redis-py con las operaciones que usa CacheRedis"""
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            valor, vence = self._datos.get(clave, (None, None))
+            if vence is not None and vence < time.monotonic():
+                del self._datos[clave]
+                return None
+            return valor
+
+    def set(self, clave, valor, ex=None, nx=False):
+        with self._lock:
+            if nx:
+                actual = self._datos.get(clave)
+                if actual is not None and (actual[1] is None or actual[1] >= time.monotonic()):
+                    return None
+            self._datos[clave] = (valor.encode('utf-8') if isinstance(valor, str) else valor,
+                                  time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, *claves):
+        with self._lock:
+            return sum(self._datos.pop(c, None) is not None for c in claves)
+
+    def scan_iter(self, match='*'):
+        with self._lock:
+            return [c for c in list(self._datos) if fnmatch.fnmatchcase(c, match)]
+
+
+class CacheRedis(_CacheVersionada):
+    """Claves <prefijo>:<versión>:<clave> con vencimiento opcional"""
+
+    nombre = 'redis'
+
+    def __init__(self, cliente, prefijo='ventas', vencimiento=None):
+        super().__init__()
+        self.cliente = cliente
+        self.prefijo = prefijo
+        self.vencimiento = vencimiento
+        # ClienteLocal vive en el proceso: no la comparten los workers
+        self.compartida = not isinstance(cliente, ClienteLocal)
+
+    def _clave(self, version, clave):
+        return f"{self.prefijo}:{version}:{clave}"
+
+    def _leer(self, version, clave):
+        valor = self.cliente.get(self._clave(version, clave))
+        return valor.decode('utf-8') if isinstance(valor, bytes) else valor
+
+    def _escribir(self, version, clave, texto):
+        self.cliente.set(self._clave(version, clave), texto, ex=self.vencimiento)
+
+    def _reservar(self, version, tarea, segundos):
+        # SET NX: solo el primero la crea
+        return bool(self.cliente.set(self._clave(version, f"reserva:{tarea}"), str(os.getpid()), ex=segundos, nx=True))
+
+    def _descartar_otras(self, version):
+        actuales = f"{self.prefijo}:{version}:"
+        viejas = [c for c in self.cliente.scan_iter(match=f"{self.prefijo}:*")
+                  if not (c.decode('utf-8') if isinstance(c, bytes) else c).startswith(actuales)]
+        if viejas:
+            self.cliente.delete(*viejas)
+
+
+def crear_cache(destino='memoria'):
+    """Backend según destino: memoria, disco:<carpeta>, redis://..., local o ninguna (None)"""
+    if not destino or destino == 'ninguna':
+        return None
+    if destino == 'memoria':
+        return CacheMemoria()
+    if destino.startswith('disco:'):
+        return CacheDisco(destino[len('disco:'):])
+    if destino == 'local':
+        return CacheRedis(ClienteLocal())
+    if destino.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError as e:
+            print(f"   ⚠️ Caché redis no disponible ({e}), se usa memoria")
+            return CacheMemoria()
+        return CacheRedis(redis.Redis.from_url(destino))
+    raise ValueError(f"Destino de caché desconocido: {destino}")
+
+
+# ============================================
+# VERIFICACIÓN
+# ============================================
+def verificar_backends(carpeta):
+    """Mismo comportamiento en los tres backends: acierto, LRU, y limpieza al cambiar de versión"""
+    backends = [CacheMemoria(maximo=2), CacheDisco(carpeta), CacheRedis(ClienteLocal())]
+    for cache in backends:
+        a, b, c = (clave_salida('general', f) for f in ('Todos', 'Texas', 'Enero'))
+        assert cache.obtener('v1', a) is None
+        cache.guardar('v1', a, '{"a": 1}')
+        cache.guardar('v1', b, '{"b": 2}')
+        assert cache.obtener('v1', a) == '{"a": 1}'
+        cache.guardar('v1', c, '{"c": 3}')
+        if cache.nombre == 'memoria':
+            # 'b' es la menos usada: el LRU la descarta
+            assert cache.obtener('v1', b) is None
+        assert cache.obtener('v2', a) is None, f"{cache.nombre}: la versión nueva no debe ver datos viejos"
+        assert cache.obtener('v1', a) is None, f"{cache.nombre}: las entradas viejas deben borrarse"
+        # En memoria cada proceso hace su tarea; en los compartidos, solo el primero
+        assert cache.reservar('v2', 'tarea') and cache.reservar('v2', 'tarea') == (cache.nombre == 'memoria')
+        assert cache.reservar('v3', 'tarea'), f"{cache.nombre}: la reserva es por versión"
+        print(f"   ✅ {cache.resumen()}")
+    shutil.rmtree(carpeta, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    print("\n🧪 Verificando backends de la caché de salidas...")
+    verificar_backends(os.path.join(tempfile.gettempdir(), f"ventas_cache_prueba_{os.getpid()}"))
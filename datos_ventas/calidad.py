@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Reporte de calidad de la carga: filas rechazadas por motivo y por archivo de origen.
+
+Cada etapa del pipeline ya calcula una máscara con las filas que descarta (encabezados,
+IDs vacíos, duplicados, números y fechas que no se pueden convertir, direcciones sin
+ciudad). ReporteCalidad recibe esas mismas máscaras y solo toca las filas marcadas:
+cuenta por archivo y guarda unas pocas de muestra, sin otra pasada sobre el dataset.
+
+El reporte viaja en df.attrs['calidad'], se guarda como JSON junto a la caché
+(calidad_<versión>.json) y se muestra en la pestaña CALIDAD del panel.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .archivos import guardar_json
+
+# Filas de ejemplo que se guardan por motivo
+MUESTRAS_POR_MOTIVO = 5
+
+# motivo: (descripción, la fila se descarta)
+MOTIVOS = {
+    'encabezado': ("Encabezado repetido dentro del archivo", True),
+    'id_vacio': ("Línea vacía o sin ID de pedido", True),
+    'duplicado': ("Línea duplicada exacta", True),
+    'cantidad_invalida': ("Cantidad no numérica", True),
+    'precio_invalido': ("Precio no numérico", True),
+    'no_positivo': ("Cantidad o precio cero o negativo", True),
+    'fecha_invalida': ("Fecha que no se puede interpretar", True),
+    'direccion_invalida': ("Dirección sin ciudad y estado (queda como 'Desconocido')", False),
+}
+
+
+class ReporteCalidad:
+    """Conteos y muestras de filas rechazadas, por motivo y archivo"""
+
+    def __init__(self, columnas):
+        # Columnas de las filas de muestra (las del CSV, con los valores tal como venían)
+        self.columnas = list(columnas) + ['Mes Archivo']
+        self.leidas = {}
+        self.validas = None
+        self.motivos = {}
+
+    def leer(self, archivo, filas):
+        self.leidas[archivo] = self.leidas.get(archivo, 0) + int(filas)
+
+    def registrar(self, motivo, df, mascara):
+        """Cuenta las filas de `mascara` (la misma con la que la etapa las descarta) por 'Mes Archivo'"""
+        mascara = np.asarray(mascara, dtype=bool)
+        if not mascara.any():
+            return
+        rechazadas = df[mascara]
+        entrada = self.motivos.setdefault(motivo, {'por_archivo': {}, 'muestras': []})
+        archivos = rechazadas['Mes Archivo'] if 'Mes Archivo' in rechazadas else pd.Series('Sin archivo', index=rechazadas.index)
+        for archivo, filas in archivos.value_counts(sort=False).items():
+            entrada['por_archivo'][archivo] = entrada['por_archivo'].get(archivo, 0) + int(filas)
+
+        faltan = MUESTRAS_POR_MOTIVO - len(entrada['muestras'])
+        if faltan > 0:
+            columnas = [c for c in self.columnas if c in rechazadas.columns]
+            muestra = rechazadas[columnas].head(faltan).astype(object)
+            entrada['muestras'] += muestra.where(muestra.notna(), None).to_dict('records')
+
+    def a_dict(self):
+        """Reporte serializable a JSON"""
+        return {
+            'generado': datetime.now().isoformat(timespec='seconds'),
+            'leidas': self.leidas,
+            'validas': self.validas,
+            'motivos': self.motivos,
+        }
+
+
+def unir_reportes(reportes):
+    """Un reporte con la suma de varios (p. ej. uno por CSV del almacén)"""
+    total = {'generado': None, 'leidas': {}, 'validas': 0, 'motivos': {}}
+    for reporte in reportes:
+        if not reporte:
+            continue
+        total['generado'] = max(filter(None, [total['generado'], reporte.get('generado')]), default=None)
+        for archivo, filas in reporte['leidas'].items():
+            total['leidas'][archivo] = total['leidas'].get(archivo, 0) + filas
+        total['validas'] += reporte.get('validas') or 0
+        for motivo, datos in reporte['motivos'].items():
+            entrada = total['motivos'].setdefault(motivo, {'por_archivo': {}, 'muestras': []})
+            for archivo, filas in datos['por_archivo'].items():
+                entrada['por_archivo'][archivo] = entrada['por_archivo'].get(archivo, 0) + filas
+            entrada['muestras'] = (entrada['muestras'] + datos['muestras'])[:MUESTRAS_POR_MOTIVO]
+    return total
+
+
+def resumen_motivos(reporte):
+    """DataFrame con una fila por motivo: descripción, si descarta, filas y % de las leídas"""
+    leidas = sum(reporte['leidas'].values()) or 1
+    filas = [{'Motivo': motivo, 'Descripción': MOTIVOS.get(motivo, (motivo, True))[0],
+              'Descarta': MOTIVOS.get(motivo, (motivo, True))[1], 'Filas': sum(datos['por_archivo'].values()),
+              '% Leídas': round(100 * sum(datos['por_archivo'].values()) / leidas, 3)}
+             for motivo, datos in reporte['motivos'].items()]
+    return pd.DataFrame(filas, columns=['Motivo', 'Descripción', 'Descarta', 'Filas', '% Leídas'])
+
+
+def tabla_por_archivo(reporte):
+    """Filas leídas y rechazadas por motivo, una fila por archivo de origen"""
+    tabla = pd.DataFrame({motivo: datos['por_archivo'] for motivo, datos in reporte['motivos'].items()})
+    tabla = tabla.reindex(sorted(reporte['leidas'])).fillna(0).astype(int)
+    tabla.insert(0, 'Leídas', pd.Series(reporte['leidas']))
+    return tabla.rename_axis('Archivo').reset_index()
+
+
+def imprimir_reporte(reporte):
+    leidas = sum(reporte['leidas'].values())
+    resumen = resumen_motivos(reporte)
+    descartadas = int(resumen.loc[resumen['Descarta'], 'Filas'].sum())
+    print(f"   🩺 Calidad: {descartadas:,} de {leidas:,} filas leídas descartadas ({100 * descartadas / max(leidas, 1):.2f}%)")
+    for fila in resumen.itertuples(index=False):
+        print(f"      • {fila.Descripción}: {fila.Filas:,}")
+
+
+def guardar_reporte(reporte, ruta):
+    """Escribe el reporte como JSON (de forma atómica)"""
+    return guardar_json(reporte, ruta)
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Carga y limpieza de los CSV mensuales de ventas.
+
+Un único pipeline para todos los paneles. El resultado se guarda en disco
+por versión de datos (nombre, tamaño y fecha de modificación de cada CSV),
+así que el parseo se paga una vez por versión y no una vez por aplicación.
+"""
+
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from .calidad import ReporteCalidad, guardar_reporte, imprimir_reporte
+from .catalogos import mapa_meses, dias_espanol, estados_usa, codigos_estados, rangos_precio
+from .pedidos import clave_pedido
+
+RUTA_DATOS = os.environ.get('VENTAS_RUTA', r"C:\Users\USUARIO\Desktop\Ciencia de Datos\Dataset de ventas")
+CARPETA_CACHE = os.environ.get('VENTAS_CACHE', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache_ventas'))
+PATRON_ARCHIVOS = "Dataset_de_ventas_*.csv"
+
+# Subir este número cuando cambie el pipeline invalida las cachés existentes
+VERSION_PIPELINE = 7
+
+# Columnas de los CSV; una fila duplicada repite todas
+COLUMNAS_ORIGINALES = ['ID de Pedido', 'Producto', 'Cantidad Pedida', 'Precio Unitario', 'Fecha de Pedido',
+                       'Dirección de Envio']
+# Columnas casi únicas: se hashea cada texto directamente (factorizarlas antes cuesta más que hashear)
+COLUMNAS_DISPERSAS = ['ID de Pedido', 'Fecha de Pedido', 'Dirección de Envio']
+# Valores de 'ID de Pedido' que delatan un encabezado repetido (exportaciones en inglés o en español)
+ENCABEZADOS_ID = ['Order ID', 'ID de Pedido']
+
+
+def buscar_archivos(ruta=RUTA_DATOS):
+    return sorted(glob.glob(os.path.join(ruta, PATRON_ARCHIVOS)))
+
+
+def version_datos(archivos):
+    """Huella de los archivos de entrada; cambia si se agrega, quita o modifica un CSV"""
+    h = hashlib.sha1(f"pipeline-{VERSION_PIPELINE}".encode())
+    for archivo in archivos:
+        st = os.stat(archivo)
+        h.update(f"{os.path.basename(archivo)}|{st.st_size}|{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+# ============================================
+# LECTURA
+# ============================================
+def leer_archivos(archivos, calidad=None):
+    print("\n📂 INICIALIZANDO DATA WAREHOUSE...")
+    print(f"   ✅ Archivos encontrados: {len(archivos)}")
+    df_list = []
+    encabezados = 0
+
+    for archivo in archivos:
+        nombre = os.path.basename(archivo)
+        mes = nombre.replace('Dataset_de_ventas_', '').replace('.csv', '')
+        print(f"      • Cargando: {nombre}")
+
+        try:
+            df_temp = pd.read_csv(archivo, dtype=str, encoding='utf-8-sig')
+            df_temp['Mes Archivo'] = mes
+            # Encabezados repetidos dentro del archivo y líneas vacías
+            repetidos = df_temp['ID de Pedido'].isin(ENCABEZADOS_ID)
+            vacios = df_temp['ID de Pedido'].isna()
+            encabezados += int(repetidos.sum())
+            if calidad is not None:
+                calidad.leer(mes, len(df_temp))
+                calidad.registrar('encabezado', df_temp, repetidos)
+                calidad.registrar('id_vacio', df_temp, vacios)
+            df_list.append(df_temp[~(repetidos | vacios)])
+        except Exception as e:
+            print(f"      ⚠️ Error en {nombre}: {e}")
+            continue
+
+    if not df_list:
+        raise ValueError("No se pudo cargar ningún archivo válido")
+
+    df = pd.concat(df_list, ignore_index=True)
+    if encabezados:
+        print(f"   🧹 Encabezados repetidos descartados: {encabezados:,}")
+    print(f"\n   ✅ TOTAL: {len(df):,} registros procesados")
+    return df
+
+
+# ============================================
+# DUPLICADOS
+# ============================================
+def huellas_filas(df):
+    """Hash de 64 bits de cada fila sobre las columnas del CSV (una pasada vectorizada por columna)"""
+    huellas = np.zeros(len(df), dtype=np.uint64)
+    for columna in COLUMNAS_ORIGINALES:
+        valores = pd.util.hash_array(df[columna].to_numpy(), categorize=columna not in COLUMNAS_DISPERSAS)
+        huellas = huellas * np.uint64(0x100000001B3) ^ valores
+    return huellas
+
+
+def quitar_duplicados(df, vistas=None, calidad=None):
+    """Quita las filas repetidas exactas, en el mismo archivo, en otro del lote o ya vistas en
+    `vistas` (huellas ordenadas de cargas anteriores). Devuelve (df, huellas de las filas
+    conservadas, reporte por mes)"""
+    huellas = huellas_filas(df)
+    # Una sola pasada sobre enteros: tabla hash de las huellas, no drop_duplicates sobre textos
+    repetida = pd.Series(huellas).duplicated().to_numpy(copy=True)
+    if vistas is not None and len(vistas):
+        posiciones = np.minimum(np.searchsorted(vistas, huellas), len(vistas) - 1)
+        repetida |= vistas[posiciones] == huellas
+
+    # Repetidas dentro de su mismo archivo: la huella combinada con el archivo también se repite
+    archivo = pd.factorize(df['Mes Archivo'])[0].astype(np.uint64)
+    mismo_archivo = pd.Series(huellas ^ (archivo * np.uint64(0x9E3779B97F4A7C15))).duplicated().to_numpy()
+
+    duplicadas = df[repetida]
+    # Mes de cada duplicada: se parsea cada día distinto una vez, no cada fila
+    dias, unicos = pd.factorize(duplicadas['Fecha de Pedido'].str[:8], use_na_sentinel=False)
+    meses = pd.to_datetime(pd.Series(unicos, dtype=object), format='%m/%d/%y', errors='coerce').dt.strftime('%Y-%m')
+    reporte = pd.DataFrame({
+        'Mes': meses.fillna('Sin fecha').to_numpy()[dias] if len(unicos) else np.array([], dtype=object),
+        'Duplicados': 1,
+        'Entre archivos': ~mismo_archivo[repetida],
+        'Ingreso Duplicado': (pd.to_numeric(duplicadas['Cantidad Pedida'], errors='coerce') *
+                              pd.to_numeric(duplicadas['Precio Unitario'], errors='coerce')).fillna(0),
+    }).groupby('Mes', sort=True).sum().round(2).reset_index()
+
+    if not len(duplicadas):
+        return df, huellas, reporte
+    if calidad is not None:
+        calidad.registrar('duplicado', df, repetida)
+    print(f"   🧹 Filas duplicadas descartadas: {len(duplicadas):,} "
+          f"(${reporte['Ingreso Duplicado'].sum():,.2f} de ingreso inflado)")
+    for mes, cantidad, entre in zip(reporte['Mes'], reporte['Duplicados'], reporte['Entre archivos']):
+        print(f"      • {mes}: {cantidad:,} ({entre:,} entre archivos)")
+    return df[~repetida].reset_index(drop=True), huellas[~repetida], reporte
+
+
+# ============================================
+# LIMPIEZA Y ENRIQUECIMIENTO
+# ============================================
+def asignar_categoria(producto):
+    producto = str(producto).lower()
+    if 'batteries' in producto:
+        return 'Baterías'
+    elif 'cable' in producto:
+        return 'Cables'
+    elif any(x in producto for x in ['headphones', 'airpods', 'earpods', 'bose']):
+        return 'Auriculares'
+    elif any(x in producto for x in ['monitor', 'screen']):
+        return 'Monitores'
+    elif any(x in producto for x in ['laptop', 'macbook', 'thinkpad']):
+        return 'Computadoras'
+    elif any(x in producto for x in ['phone', 'iphone']):
+        return 'Teléfonos'
+    elif 'tv' in producto:
+        return 'Televisores'
+    elif any(x in producto for x in ['washing', 'dryer', 'lg']):
+        return 'Electrodomésticos'
+    else:
+        return 'Otros'
+
+
+def _ubicacion(direcciones):
+    """Ciudad, estado, código postal y máscara de direcciones con ciudad y estado"""
+    partes = direcciones.astype(str).str.split(',', expand=True)
+    if partes.shape[1] < 3:
+        desconocido = pd.Series('Desconocido', index=direcciones.index)
+        return desconocido, desconocido.copy(), desconocido.copy(), pd.Series(False, index=direcciones.index)
+
+    valida = partes[2].notna()
+    ciudad = partes[1].str.strip().where(valida, 'Desconocido')
+    estado_zip = partes[2].str.strip().str.split(' ')
+    estado = estado_zip.str[0].where(valida, 'Desconocido')
+    codigo_postal = estado_zip.str[1].where(valida).fillna('Desconocido')
+    return ciudad, estado, codigo_postal, valida
+
+
+def extraer_ubicacion(direcciones):
+    """Ciudad y estado de 'calle, ciudad, ESTADO zip' para toda la columna a la vez"""
+    ciudad, estado, _, _ = _ubicacion(direcciones)
+    return ciudad, estado
+
+
+def procesar_datos(df, calidad=None):
+    """Convierte, limpia y enriquece; con `calidad` (ReporteCalidad) registra las filas que
+    descarta cada paso con la misma máscara que las descarta"""
+    print("\n🔄 PROCESANDO DATOS...")
+
+    # Convertir columnas numéricas
+    cantidad = pd.to_numeric(df['Cantidad Pedida'], errors='coerce')
+    precio = pd.to_numeric(df['Precio Unitario'], errors='coerce')
+
+    # Filas con valores inválidos: las mismas máscaras descartan y alimentan el reporte de calidad
+    sin_cantidad = cantidad.isna().to_numpy()
+    sin_precio = precio.isna().to_numpy() & ~sin_cantidad
+    no_positivo = ((cantidad <= 0) | (precio <= 0)).to_numpy() & ~(sin_cantidad | sin_precio)
+    if calidad is not None:
+        # Antes de reemplazar las columnas: las muestras conservan el texto original
+        calidad.registrar('cantidad_invalida', df, sin_cantidad)
+        calidad.registrar('precio_invalido', df, sin_precio)
+        calidad.registrar('no_positivo', df, no_positivo)
+    df['Cantidad Pedida'] = cantidad
+    df['Precio Unitario'] = precio
+    df = df[~(sin_cantidad | sin_precio | no_positivo)].copy()
+
+    # Calcular ingresos
+    df['Ingreso Total'] = df['Cantidad Pedida'] * df['Precio Unitario']
+
+    # Procesar fechas
+    print("   • Procesando fechas...")
+    df['Fecha de Pedido'] = df['Fecha de Pedido'].astype(str)
+    df['Fecha Pedido'] = pd.to_datetime(df['Fecha de Pedido'], format='%m/%d/%y %H:%M', errors='coerce')
+    sin_fecha = df['Fecha Pedido'].isna().to_numpy()
+    if calidad is not None:
+        calidad.registrar('fecha_invalida', df, sin_fecha)
+
+    # Eliminar filas con fechas inválidas y ordenar por fecha: un rango de fechas
+    # queda como un tramo contiguo de filas (ver indice.IndiceFechas)
+    df = df[~sin_fecha].sort_values('Fecha Pedido', kind='stable').reset_index(drop=True)
+
+    # Clave entera del pedido: contar pedidos distintos no hashea textos (ver pedidos.TablaPedidos)
+    df['Pedido Key'] = clave_pedido(df['ID de Pedido'])
+
+    # Extraer componentes de fecha
+    fechas = df['Fecha Pedido'].dt
+    df['Fecha'] = fechas.date
+    df['Mes Num'] = fechas.month
+    df['Día'] = fechas.day
+    df['Hora'] = fechas.hour
+    df['Día Semana'] = fechas.dayofweek
+    df['Día del Año'] = fechas.dayofyear
+    df['Año'] = fechas.year
+    # Ventanas del comparador con su año: la semana ISO 1 de 2020 empieza el 30/12/2019
+    iso = fechas.isocalendar()
+    df['Semana'] = iso['year'].astype(str) + '-W' + iso['week'].astype(str).str.zfill(2)
+    df['Año Mes'] = df['Año'].astype(str) + '-' + df['Mes Num'].astype(str).str.zfill(2)
+    df['Trimestre'] = df['Año'].astype(str) + '-T' + fechas.quarter.astype(str)
+    df['Día del Trimestre'] = (fechas.normalize() - fechas.to_period('Q').dt.start_time).dt.days + 1
+
+    df['Mes'] = df['Mes Num'].map(mapa_meses)
+    df['Día Semana Nombre'] = fechas.day_name().map(dias_espanol)
+    df['Es Finde'] = df['Día Semana'].isin([5, 6])
+
+    # Ubicación
+    print("   • Procesando ubicaciones...")
+    df['Ciudad'], df['Estado'], df['Código Postal'], valida = _ubicacion(df['Dirección de Envio'])
+    if calidad is not None:
+        calidad.registrar('direccion_invalida', df, ~valida)
+
+    # Categorías: se clasifica cada producto distinto una sola vez
+    print("   • Clasificando productos...")
+    productos = df['Producto'].unique()
+    df['Categoría'] = df['Producto'].map({p: asignar_categoria(p) for p in productos})
+
+    # Rangos de precio
+    df['Rango Precio'] = pd.cut(df['Precio Unitario'],
+                                bins=[0, 20, 100, 500, 1000, 10000],
+                                labels=rangos_precio)
+
+    # Estados
+    print("   • Mapeando estados...")
+    df['Estado Nombre'] = df['Estado'].map(estados_usa).fillna(df['Estado'])
+    df['Estado Codigo'] = df['Estado Nombre'].map(codigos_estados).fillna('NA')
+    if calidad is not None:
+        calidad.validas = len(df)
+    return df
+
+
+# ============================================
+# PIPELINE CON CACHÉ
+# ============================================
+def cargar_ventas(ruta=RUTA_DATOS, usar_cache=True):
+    """Dataset limpio y enriquecido; lee de la caché en disco si la versión de datos no cambió"""
+    archivos = buscar_archivos(ruta)
+    if not archivos:
+        raise FileNotFoundError(f"No se encontraron archivos '{PATRON_ARCHIVOS}' en {ruta}")
+
+    version = version_datos(archivos)
+    archivo_cache = os.path.join(CARPETA_CACHE, f"ventas_{version}.pkl")
+
+    if usar_cache and os.path.exists(archivo_cache):
+        print(f"\n📦 Usando datos en caché (versión {version})")
+        df = pd.read_pickle(archivo_cache)
+    else:
+        calidad = ReporteCalidad(COLUMNAS_ORIGINALES)
+        df, _, duplicados = quitar_duplicados(leer_archivos(archivos, calidad), calidad=calidad)
+        df = procesar_datos(df, calidad)
+        df.attrs['duplicados'] = duplicados.to_dict('records')
+        df.attrs['calidad'] = calidad.a_dict()
+        imprimir_reporte(df.attrs['calidad'])
+        if usar_cache:
+            try:
+                os.makedirs(CARPETA_CACHE, exist_ok=True)
+                guardar_reporte(df.attrs['calidad'], os.path.join(CARPETA_CACHE, f"calidad_{version}.json"))
+                temporal = f"{archivo_cache}.{os.getpid()}.tmp"
+                df.to_pickle(temporal)
+                os.replace(temporal, archivo_cache)
+            except OSError as e:
+                print(f"   ⚠️ No se pudo guardar la caché: {e}")
+
+    df.attrs['version'] = version
+    return df
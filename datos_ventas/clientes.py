@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de clientes: la dirección de envío normalizada identifica al cliente.
+
+Los CSV no traen un ID de cliente; la dirección se repite en todos los pedidos que llegan
+al mismo domicilio, así que sirve de identidad (quien compra desde dos domicilios cuenta
+como dos clientes). El índice se arma una vez al cargar, con agrupaciones vectorizadas:
+
+- por cliente: pedidos, primer y último pedido, ingreso acumulado, unidades y composición
+  de la canasta (ingreso por categoría)
+- por pedido, ordenados por cliente y fecha: cliente, día, total, ciudad y estado; las
+  consultas de cada filtro recorren estos arreglos en lugar de reagrupar las líneas
+
+Sobre los pedidos del filtro se calculan la tasa de recompra, las cohortes por mes del
+primer pedido y los segmentos RFM (recencia, frecuencia, monto) de la pestaña CLIENTES.
+
+    python -m datos_ventas.clientes     # compara el índice con groupby de pandas
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from .catalogos import orden_meses, orden_dias
+
+# Columnas de las líneas que necesita IndiceClientes
+COLUMNAS_CLIENTES = ['Pedido Key', 'Dirección de Envio', 'Fecha Pedido', 'Ciudad', 'Estado Nombre', 'Categoría',
+                     'Ingreso Total', 'Cantidad Pedida']
+# Condiciones de filtro que se resuelven con los arreglos por pedido (las demás necesitan las líneas)
+COLUMNAS_FILTRO_PEDIDO = ['Ciudad', 'Estado Nombre', 'Mes', 'Día Semana Nombre']
+# Quintiles de recencia y monto del RFM
+CUANTILES_RFM = 5
+# Matrices de cohortes guardadas por índice (una por estado de filtros)
+CACHE_COHORTES = 64
+
+# segmento: descripción (en el orden en que se muestran)
+SEGMENTOS_RFM = {
+    'Campeones': "Compraron hace poco y 3 o más veces",
+    'Leales': "3 o más pedidos, el último no tan reciente",
+    'Potenciales': "Compraron hace poco por segunda vez",
+    'Nuevos': "Compraron hace poco por primera vez",
+    'Necesitan atención': "Recencia media, 1 o 2 pedidos",
+    'En riesgo': "2 pedidos, el último hace tiempo",
+    'Hibernando': "Un solo pedido, hace tiempo",
+}
+
+
+def normalizar_direcciones(direcciones):
+    """(código de cliente de cada dirección, direcciones normalizadas): mayúsculas, sin puntos
+    ni '#' y con espacios y comas uniformes. Las direcciones vacías quedan con código -1"""
+    codigos, unicas = pd.factorize(direcciones, sort=False)
+    # Solo se normalizan los textos distintos (la mayoría de las direcciones se repite); una
+    # pasada de métodos de str cuesta menos que tres reemplazos con expresiones regulares
+    normalizadas = [' '.join(str(d).upper().replace('.', '').replace('#', '').replace(',', ', ').split())
+                    .replace(' ,', ',') for d in unicas]
+    clientes, finales = pd.factorize(np.asarray(normalizadas, dtype=object), sort=True)
+    clientes = np.append(clientes, -1)  # el -1 de factorize (dirección vacía) sigue en -1
+    return clientes[codigos], finales
+
+
+def inicios_de_grupo(codigos):
+    """Posición donde empieza cada tramo de códigos iguales en un arreglo ordenado"""
+    return np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]]) if len(codigos) else np.zeros(0, dtype=np.int64)
+
+
+def matriz_cohortes(cliente, dia, total):
+    """(meses, activos, ingresos) en una pasada sobre pedidos ordenados por (cliente, fecha): filas
+    por mes del primer pedido (cohorte), columnas por meses transcurridos desde ese pedido.
+    `activos` cuenta cada cliente una vez por mes; `ingresos` suma el total de los pedidos"""
+    mes = dia.astype('datetime64[M]').astype(np.int64)
+    if not len(mes):
+        return np.zeros(0, dtype='datetime64[M]'), np.zeros((0, 0), dtype=np.int64), np.zeros((0, 0))
+    inicio = inicios_de_grupo(cliente)
+    primero = np.repeat(mes[inicio], np.diff(np.r_[inicio, len(mes)]))
+    base, n = mes.min(), mes.max() - mes.min() + 1
+    celda = (primero - base) * n + (mes - primero)
+    ingresos = np.bincount(celda, weights=total, minlength=n * n).reshape(n, n)
+    # Primer pedido de cada (cliente, mes): el mes de un cliente no baja porque está ordenado por fecha
+    nuevo = np.r_[True, (cliente[1:] != cliente[:-1]) | (mes[1:] != mes[:-1])]
+    activos = np.bincount(celda[nuevo], minlength=n * n).reshape(n, n)
+    return np.arange(base, base + n).astype('datetime64[M]'), activos, ingresos
+
+
+# ============================================
+# ÍNDICE
+# ============================================
+def _por_pedido(lineas):
+    """Arreglos por pedido (ordenados por clave): totales sumados y dirección, fecha y ubicación de la primera línea"""
+    claves, primera, pedido = np.unique(lineas['Pedido Key'].to_numpy(), return_index=True, return_inverse=True)
+    n = len(claves)
+    ingresos = lineas['Ingreso Total'].to_numpy(dtype=float)
+    categoria, categorias = pd.factorize(lineas['Categoría'], sort=True)
+    return {
+        'claves': claves,
+        'total': np.bincount(pedido, weights=ingresos, minlength=n),
+        'unidades': np.bincount(pedido, weights=lineas['Cantidad Pedida'].to_numpy(dtype=float), minlength=n),
+        'categorias': categorias,
+        'canasta': np.bincount(pedido * len(categorias) + categoria, weights=ingresos,
+                               minlength=n * len(categorias)).reshape(n, len(categorias)),
+        'direcciones': lineas['Dirección de Envio'].to_numpy()[primera],
+        'fecha': lineas['Fecha Pedido'].to_numpy()[primera],
+        'ciudad': lineas['Ciudad'].to_numpy()[primera],
+        'estado': lineas['Estado Nombre'].to_numpy()[primera],
+    }
+
+
+def _unir_pedidos(partes):
+    """Pedidos de partes sin pedidos en común, ordenados por clave y con las categorías de todas"""
+    if len(partes) == 1:
+        return partes[0]
+    categorias = pd.Index(sorted(set().union(*(parte['categorias'] for parte in partes))))
+    canastas = []
+    for parte in partes:
+        canasta = np.zeros((len(parte['claves']), len(categorias)))
+        canasta[:, categorias.get_indexer(parte['categorias'])] = parte['canasta']
+        canastas.append(canasta)
+    claves = np.concatenate([parte['claves'] for parte in partes])
+    orden = np.argsort(claves, kind='stable')
+    pedidos = {nombre: np.concatenate([parte[nombre] for parte in partes])[orden]
+               for nombre in ('claves', 'total', 'unidades', 'direcciones', 'fecha', 'ciudad', 'estado')}
+    pedidos.update(categorias=categorias, canasta=np.concatenate(canastas)[orden])
+    return pedidos
+
+
+class IndiceClientes:
+    """Clientes (direcciones normalizadas) con sus totales y sus pedidos ordenados por fecha"""
+
+    def __init__(self, lineas):
+        # Las líneas en un DataFrame o en partes por tramo de días (almacén): un pedido cae en un solo
+        # día, así que los pedidos de cada parte se concatenan
+        if isinstance(lineas, pd.DataFrame):
+            pedidos = _por_pedido(lineas)
+        else:
+            pedidos = _unir_pedidos([_por_pedido(parte) for parte in lineas])
+        self.claves, self.categorias = pedidos['claves'], pedidos['categorias']
+        total, unidades, canasta = pedidos['total'], pedidos['unidades'], pedidos['canasta']
+        direcciones, fecha = pedidos['direcciones'], pedidos['fecha']
+        n = len(self.claves)
+
+        cliente, _ = normalizar_direcciones(direcciones)
+        ciudad, ciudades = pd.factorize(pedidos['ciudad'], sort=True)
+        estado, estados = pd.factorize(pedidos['estado'], sort=True)
+        self.ciudades, self.estados = pd.Index(ciudades), pd.Index(estados)
+
+        # Pedidos con cliente, ordenados por (cliente, fecha); los de dirección vacía quedan fuera
+        orden = np.lexsort((fecha, cliente))
+        orden = orden[cliente[orden] >= 0]
+        self._posicion = np.full(n, -1, dtype=np.int64)
+        self._posicion[orden] = np.arange(len(orden))
+        self.cliente = cliente[orden].astype(np.int32)
+        self.dia = fecha[orden].astype('datetime64[D]')
+        self.total = total[orden]
+        self.ciudad = ciudad[orden].astype(np.int16)
+        self.estado = estado[orden].astype(np.int16)
+
+        # Clientes: una fila por dirección normalizada, con la forma en que aparece en su primer pedido
+        inicio = inicios_de_grupo(self.cliente)
+        fin = np.r_[inicio[1:], len(self.cliente)] - 1
+        canasta = np.add.reduceat(canasta[orden], inicio, axis=0) if len(inicio) else canasta[:0]
+        self.canasta = pd.DataFrame(canasta, columns=list(self.categorias))
+        self._cohortes = {}
+        self.clientes = pd.DataFrame({
+            'Dirección': direcciones[orden][inicio],
+            'Ciudad': pd.Categorical.from_codes(self.ciudad[inicio], self.ciudades),
+            'Estado Nombre': pd.Categorical.from_codes(self.estado[inicio], self.estados),
+            'Pedidos': np.diff(np.r_[inicio, len(self.cliente)]),
+            'Primer Pedido': self.dia[inicio],
+            'Último Pedido': self.dia[fin],
+            'Ingreso Total': np.add.reduceat(self.total, inicio) if len(inicio) else np.zeros(0),
+            'Unidades': np.add.reduceat(unidades[orden], inicio) if len(inicio) else np.zeros(0),
+            'Categoría Principal': pd.Categorical.from_codes(canasta.argmax(axis=1), self.categorias),
+        })
+
+    def __len__(self):
+        return len(self.clientes)
+
+    @property
+    def bytes(self):
+        arreglos = (self.cliente, self.dia, self.total, self.ciudad, self.estado, self._posicion)
+        return sum(a.nbytes for a in arreglos) + int(self.clientes.memory_usage(deep=True).sum())
+
+    def _mascara_pedidos(self, filtro):
+        """Pedidos del filtro a partir de los arreglos por pedido, o None si alguna condición
+        necesita las líneas (categoría, rango de precio, producto...)"""
+        if any(c not in COLUMNAS_FILTRO_PEDIDO for c, _ in filtro.condiciones):
+            return None
+        mascara = np.ones(len(self.cliente), dtype=bool)
+        if filtro.desde is not None:
+            mascara &= self.dia >= np.datetime64(filtro.desde, 'D')
+        if filtro.hasta is not None:
+            mascara &= self.dia <= np.datetime64(filtro.hasta, 'D')
+        for columna, valor in filtro.condiciones:
+            if columna == 'Ciudad':
+                mascara &= self.ciudad == self.ciudades.get_indexer([valor])[0]
+            elif columna == 'Estado Nombre':
+                mascara &= self.estado == self.estados.get_indexer([valor])[0]
+            elif columna == 'Mes':
+                meses = self.dia.astype('datetime64[M]').astype(np.int64) % 12
+                mascara &= np.asarray(orden_meses, dtype=object)[meses] == valor
+            else:
+                # 1970-01-01 fue jueves: (días + 3) % 7 da 0 para el lunes, como orden_dias
+                dias_semana = (self.dia.astype(np.int64) + 3) % 7
+                mascara &= np.asarray(orden_dias, dtype=object)[dias_semana] == valor
+        return mascara
+
+    def pedidos_filtro(self, filtro, lineas=None):
+        """(máscara de pedidos, total de cada pedido dentro del filtro); con condiciones de
+        línea el total es el de las líneas filtradas (p. ej. solo la categoría elegida)"""
+        mascara = self._mascara_pedidos(filtro)
+        if mascara is not None:
+            return mascara, self.total
+        # Las líneas pueden venir en partes por tramo de días: los conteos por pedido se suman
+        total = np.zeros(len(self.cliente))
+        lineas_pedido = np.zeros(len(self.cliente), dtype=np.int64)
+        for parte in ([lineas] if isinstance(lineas, pd.DataFrame) else lineas):
+            posicion = self._posicion[np.searchsorted(self.claves, parte['Pedido Key'].to_numpy())]
+            validas = posicion >= 0
+            total += np.bincount(posicion[validas], weights=parte['Ingreso Total'].to_numpy(dtype=float)[validas],
+                                 minlength=len(self.cliente))
+            lineas_pedido += np.bincount(posicion[validas], minlength=len(self.cliente))
+        return lineas_pedido > 0, total
+
+    def por_cliente(self, filtro, lineas=None):
+        """Una fila por cliente con pedidos en el filtro: pedidos, ingreso, primer, segundo y último pedido"""
+        mascara, total = self.pedidos_filtro(filtro, lineas)
+        cliente, dia, total = self.cliente[mascara], self.dia[mascara], total[mascara]
+        inicio = inicios_de_grupo(cliente)
+        pedidos = np.diff(np.r_[inicio, len(cliente)])
+        # Segundo pedido (NaT si solo hubo uno): los pedidos de cada cliente están ordenados por fecha
+        segundo = np.where(pedidos > 1, dia[np.minimum(inicio + 1, max(len(dia) - 1, 0))], np.datetime64('NaT'))
+        return pd.DataFrame({
+            'Cliente': cliente[inicio],
+            'Pedidos': pedidos,
+            'Ingreso Total': np.add.reduceat(total, inicio) if len(inicio) else np.zeros(0),
+            'Primer Pedido': dia[inicio],
+            'Segundo Pedido': segundo.astype('datetime64[D]'),
+            'Último Pedido': dia[np.r_[inicio[1:], len(cliente)] - 1] if len(inicio) else dia[:0],
+        })
+
+    def cohortes(self, filtro, lineas=None):
+        """Retención por cohorte del filtro: {'clientes': tamaño de cada cohorte, 'activos',
+        'retencion' (% de la cohorte que compró en cada mes) e 'ingresos' (por cliente de la
+        cohorte, acumulados)}, con filas por mes del primer pedido y columnas por meses desde él.
+        Las celdas posteriores al último mes quedan en NaN. Se guarda por filtro"""
+        if filtro in self._cohortes:
+            return self._cohortes[filtro]
+        mascara, total = self.pedidos_filtro(filtro, lineas)
+        meses, activos, ingresos = matriz_cohortes(self.cliente[mascara], self.dia[mascara], total[mascara])
+        n = len(meses)
+        futuro = np.add.outer(np.arange(n), np.arange(n)) >= n
+        tamano = activos[:, 0]
+        con_clientes = tamano > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            retencion = np.where(futuro, np.nan, 100 * activos / tamano[:, None])
+            por_cliente = np.where(futuro, np.nan, np.cumsum(ingresos, axis=1) / tamano[:, None])
+        indice = pd.PeriodIndex(meses[con_clientes], freq='M', name='Cohorte')
+        columnas = pd.RangeIndex(n, name='Meses desde el primer pedido')
+        resultado = {
+            'clientes': pd.Series(tamano[con_clientes], index=indice, name='Clientes'),
+            'activos': pd.DataFrame(np.where(futuro, np.nan, activos)[con_clientes], index=indice, columns=columnas),
+            'retencion': pd.DataFrame(retencion[con_clientes], index=indice, columns=columnas),
+            'ingresos': pd.DataFrame(por_cliente[con_clientes], index=indice, columns=columnas),
+        }
+        if len(self._cohortes) >= CACHE_COHORTES:
+            self._cohortes.pop(next(iter(self._cohortes)))
+        self._cohortes[filtro] = resultado
+        return resultado
+
+    def analizar(self, filtro, lineas=None, top=10):
+        """Vistas de la pestaña CLIENTES para el filtro: recompra, pedidos por cliente, cohortes,
+        segmentos RFM y los clientes de mayor ingreso"""
+        clientes = self.por_cliente(filtro, lineas)
+        if clientes.empty:
+            return None
+        mayores = clientes.nlargest(top, 'Ingreso Total')
+        mayores = mayores.assign(**self.clientes.loc[mayores['Cliente'], ['Dirección', 'Ciudad', 'Categoría Principal']]
+                                 .reset_index(drop=True).set_axis(mayores.index))
+        return {
+            'recompra': resumen_recompra(clientes),
+            'frecuencia': distribucion_pedidos(clientes),
+            'cohortes': cohortes_recompra(clientes),
+            'rfm': resumen_rfm(segmentos_rfm(clientes)),
+            'top': mayores,
+        }
+
+
+# ============================================
+# VISTAS
+# ============================================
+def resumen_recompra(clientes):
+    """Clientes, recurrentes (2 o más pedidos), tasa de recompra, valores por cliente y días hasta la 2.ª compra"""
+    recurrentes = clientes['Pedidos'] > 1
+    ingresos = clientes['Ingreso Total'].sum()
+    espera = (clientes['Segundo Pedido'] - clientes['Primer Pedido']).dt.days
+    return {
+        'Clientes': len(clientes),
+        'Recurrentes': int(recurrentes.sum()),
+        'Tasa Recompra': 100 * recurrentes.mean() if len(clientes) else 0.0,
+        'Pedidos por Cliente': clientes['Pedidos'].mean() if len(clientes) else 0.0,
+        'Ingreso por Cliente': ingresos / len(clientes) if len(clientes) else 0.0,
+        '% Ingreso Recurrentes': 100 * clientes.loc[recurrentes, 'Ingreso Total'].sum() / ingresos if ingresos else 0.0,
+        'Días a 2.ª Compra': float(espera.median()) if recurrentes.any() else None,
+    }
+
+
+def distribucion_pedidos(clientes, maximo=5):
+    """Clientes e ingreso según la cantidad de pedidos (1, 2, ..., 'maximo+')"""
+    pedidos = clientes['Pedidos'].clip(upper=maximo)
+    tabla = clientes.groupby(pedidos).agg(Clientes=('Cliente', 'size'), Ingreso=('Ingreso Total', 'sum'))
+    tabla = tabla.reindex(range(1, maximo + 1), fill_value=0)
+    tabla.index = [str(p) for p in tabla.index[:-1]] + [f"{maximo}+"]
+    return tabla.rename_axis('Pedidos').reset_index()
+
+
+def cohortes_recompra(clientes):
+    """Por mes del primer pedido: clientes nuevos, % que volvió a comprar e ingreso por cliente"""
+    cohorte = clientes['Primer Pedido'].dt.to_period('M')
+    tabla = clientes.groupby(cohorte).agg(Nuevos=('Cliente', 'size'), Recurrentes=('Pedidos', lambda p: int((p > 1).sum())),
+                                          Ingreso=('Ingreso Total', 'sum'))
+    tabla['% Recompra'] = 100 * tabla['Recurrentes'] / tabla['Nuevos']
+    tabla['Ingreso por Cliente'] = tabla['Ingreso'] / tabla['Nuevos']
+    return tabla.rename_axis('Cohorte').reset_index()
+
+
+def segmentos_rfm(clientes, referencia=None):
+    """Puntajes R, F, M (1 a 5) y segmento de cada cliente. R y M son quintiles; F es la
+    cantidad de pedidos hasta 5 (la mayoría compra una sola vez y los quintiles se repetirían)"""
+    if referencia is None:
+        referencia = clientes['Último Pedido'].max() + pd.Timedelta(days=1)
+    recencia = (referencia - clientes['Último Pedido']).dt.days.to_numpy()
+    # Rango antes de cortar: con valores repetidos los quintiles no tendrían bordes únicos
+    r = CUANTILES_RFM - np.minimum((pd.Series(recencia).rank(method='first', pct=True).to_numpy()
+                                    * CUANTILES_RFM).astype(int), CUANTILES_RFM - 1)
+    f = np.minimum(clientes['Pedidos'].to_numpy(), CUANTILES_RFM)
+    m = 1 + np.minimum((clientes['Ingreso Total'].rank(method='first', pct=True).to_numpy()
+                        * CUANTILES_RFM).astype(int), CUANTILES_RFM - 1)
+    segmento = np.select(
+        [(r >= 4) & (f >= 3), f >= 3, (r >= 4) & (f == 2), (r >= 4) & (f == 1), (r <= 2) & (f == 2), (r <= 2) & (f == 1)],
+        ['Campeones', 'Leales', 'Potenciales', 'Nuevos', 'En riesgo', 'Hibernando'],
+        default='Necesitan atención')
+    return clientes.assign(Recencia=recencia, R=r, F=f, M=m, Segmento=segmento)
+
+
+def resumen_rfm(rfm):
+    """Una fila por segmento: clientes, % de clientes, ingreso, % del ingreso y promedios"""
+    tabla = rfm.groupby('Segmento').agg(Clientes=('Cliente', 'size'), Ingreso=('Ingreso Total', 'sum'),
+                                        Recencia=('Recencia', 'mean'), Pedidos=('Pedidos', 'mean'))
+    tabla = tabla.reindex([s for s in SEGMENTOS_RFM if s in tabla.index])
+    tabla['% Clientes'] = 100 * tabla['Clientes'] / tabla['Clientes'].sum()
+    tabla['% Ingreso'] = 100 * tabla['Ingreso'] / tabla['Ingreso'].sum()
+    tabla['Ingreso por Cliente'] = tabla['Ingreso'] / tabla['Clientes']
+    tabla['Descripción'] = tabla.index.map(SEGMENTOS_RFM)
+    return tabla.rename_axis('Segmento').reset_index()
+
+
+# ============================================
+# VERIFICACIÓN
+# ============================================
+def verificar_clientes(df):
+    """Compara por_cliente con un groupby de pandas por dirección normalizada en varios filtros"""
+    from .consultas import Filtro, filtrar, fuente_en_memoria
+
+    lineas = df[COLUMNAS_CLIENTES]
+    inicio = time.perf_counter()
+    indice = IndiceClientes(lineas)
+    print(f"\n👥 ÍNDICE DE CLIENTES: {len(indice):,} clientes, {len(indice.cliente):,} pedidos "
+          f"({indice.bytes / 1e6:.1f} MB) en {time.perf_counter() - inicio:.2f}s")
+
+    clave = normalizar_direcciones(df['Dirección de Envio'].to_numpy())[0]
+    base = df.assign(Cliente=clave)
+    datos = fuente_en_memoria(base)
+    filtros = {
+        'sin filtro': Filtro((), None, None),
+        'California': Filtro((('Estado Nombre', 'California'),), None, None),
+        'Marzo, sábados': Filtro((('Mes', 'Marzo'), ('Día Semana Nombre', 'Sábado')), None, None),
+        'Portland, 2.º semestre': Filtro((('Ciudad', 'Portland'),), pd.Timestamp('2019-07-01').date(), None),
+        'Monitores, Premium': Filtro((('Categoría', 'Monitores'), ('Rango Precio', 'Premium')), None, None),
+    }
+    todo_ok = True
+    for nombre, filtro in filtros.items():
+        filtradas = filtrar(datos, filtro)
+        inicio = time.perf_counter()
+        vista = indice.por_cliente(filtro, filtradas).set_index('Cliente')
+        rapido = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        esperado = filtradas.groupby('Cliente').agg(Pedidos=('Pedido Key', 'nunique'), Ingreso=('Ingreso Total', 'sum'),
+                                                    Primero=('Fecha', 'min'), Ultimo=('Fecha', 'max'))
+        lento = time.perf_counter() - inicio
+        ok = (vista.index.equals(esperado.index)
+              and (vista['Pedidos'].to_numpy() == esperado['Pedidos'].to_numpy()).all()
+              and np.allclose(vista['Ingreso Total'], esperado['Ingreso'])
+              and (pd.to_datetime(vista['Primer Pedido']).dt.date.to_numpy() == esperado['Primero'].to_numpy()).all()
+              and (pd.to_datetime(vista['Último Pedido']).dt.date.to_numpy() == esperado['Ultimo'].to_numpy()).all())
+        todo_ok &= ok
+        print(f"   {'✅' if ok else '❌'} {nombre}: {len(vista):,} clientes | índice {rapido * 1000:.0f} ms, groupby {lento * 1000:.0f} ms")
+
+    # Cohortes: clientes distintos por (mes del primer pedido, meses desde él) contra groupby
+    for nombre in ('sin filtro', 'California', 'Monitores, Premium'):
+        filtradas = filtrar(datos, filtros[nombre])
+        inicio = time.perf_counter()
+        matriz = indice.cohortes(filtros[nombre], filtradas)
+        rapido = time.perf_counter() - inicio
+        mes = pd.to_datetime(filtradas['Fecha']).dt.to_period('M')
+        primero = mes.groupby(filtradas['Cliente']).transform('min')
+        edad = (mes - primero).map(lambda d: d.n)
+        esperado = (filtradas.groupby([primero.rename('Cohorte'), edad.rename('Edad')])['Cliente'].nunique()
+                    .unstack(fill_value=0))
+        activos = matriz['activos'].reindex(columns=esperado.columns).fillna(0)
+        ok = activos.index.equals(esperado.index) and (activos.to_numpy() == esperado.to_numpy()).all()
+        todo_ok &= ok
+        print(f"   {'✅' if ok else '❌'} cohortes {nombre}: {matriz['activos'].shape} en {rapido * 1000:.0f} ms")
+
+    # Escala: los pedidos repetidos 10 veces con clientes distintos en cada copia
+    copias = 10
+    n = len(indice.cliente)
+    cliente = (np.tile(indice.cliente.astype(np.int64), copias) + np.repeat(np.arange(copias), n) * len(indice))
+    inicio = time.perf_counter()
+    matriz_cohortes(cliente, np.tile(indice.dia, copias), np.tile(indice.total, copias))
+    print(f"   ⏱️ Cohortes de {len(cliente):,} pedidos: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    vistas = indice.analizar(filtros['sin filtro'])
+    recompra = vistas['recompra']
+    print(f"\n   Recompra: {recompra['Tasa Recompra']:.1f}% de {recompra['Clientes']:,} clientes | "
+          f"{recompra['% Ingreso Recurrentes']:.1f}% del ingreso | mediana {recompra['Días a 2.ª Compra']:.0f} días a la 2.ª compra")
+    print(vistas['rfm'][['Segmento', 'Clientes', '% Clientes', '% Ingreso', 'Recencia', 'Pedidos']]
+          .to_string(index=False, float_format='{:.1f}'.format))
+    return todo_ok
+
+
+if __name__ == '__main__':
+    from .carga import cargar_ventas
+
+    verificar_clientes(cargar_ventas())
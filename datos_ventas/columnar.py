@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Dataset publicado en formato columnar para compartirlo entre procesos.
+
+Cada columna se guarda como un archivo .npy que los workers abren con
+np.load(mmap_mode='r'): las columnas numéricas y de fecha-hora no se copian,
+todos los procesos leen las mismas páginas (en /dev/shm es memoria compartida).
+
+Las columnas de texto se guardan codificadas: los códigos por fila en un .npy y el
+diccionario de valores distintos en dos .npy más (bytes UTF-8 y desplazamientos), todos
+abiertos con mmap. Cada worker las ve como pd.Categorical sobre los códigos compartidos y
+solo decodifica el diccionario (un texto por valor distinto, no por fila).
+
+Tipos al volver: las columnas de texto (str u object) vuelven como category con categorías
+ordenadas alfabéticamente y el dtype original en manifiesto['columnas'][i]['dtype']; las
+numéricas, de fecha-hora y los enteros con NA de pandas (UInt32, Int64, boolean) conservan
+su dtype; las de objetos date vuelven como objetos date.
+
+Junto al dataset se pueden publicar objetos ya armados (los índices del panel): van en un
+pickle cuyos arreglos numéricos grandes se guardan aparte como .npy y se abren con mmap al
+adjuntarlos, así que los workers los comparten en solo lectura en vez de rearmarlos.
+"""
+
+import json
+import os
+import pickle
+import shutil
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+MANIFIESTO = 'manifiesto.json'
+CARPETA_OBJETOS = 'objetos'
+ARCHIVO_OBJETOS = 'objetos.pkl'
+# Arreglos desde este tamaño van a su propio .npy; los más chicos viajan dentro del pickle
+BYTES_MINIMOS_NPY = 1 << 16
+
+
+def _nombre_archivo(i, parte=None):
+    return f"col_{i:03d}.npy" if parte is None else f"col_{i:03d}_{parte}.npy"
+
+
+def publicar_dataset(df, carpeta, extras=None, objetos=None):
+    """Escribe df en `carpeta` (de forma atómica) y devuelve la carpeta publicada; `objetos`
+    ({nombre: objeto}) se publican con él (ver publicar_objetos)"""
+    temporal = f"{carpeta.rstrip(os.sep)}.{os.getpid()}.tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    if objetos:
+        publicar_objetos(objetos, os.path.join(temporal, CARPETA_OBJETOS))
+
+    columnas = []
+    for i, (nombre, serie) in enumerate(df.items()):
+        archivo = _nombre_archivo(i)
+        entrada = {'nombre': nombre, 'archivo': archivo, 'tipo': tipo_columna(serie)}
+
+        if entrada['tipo'] == 'categoria':
+            entrada['categorias'] = serie.cat.categories.tolist()
+            entrada['ordenada'] = bool(serie.cat.ordered)
+            valores = serie.cat.codes.to_numpy()
+        elif entrada['tipo'] == 'fecha_hora':
+            entrada['dtype'] = str(serie.dtype)
+            valores = serie.to_numpy().view('int64')
+        elif entrada['tipo'] == 'numerico':
+            entrada['dtype'] = str(serie.dtype)
+            valores, nulos = partes_numericas(serie)
+            if nulos is not None:
+                entrada['nulos'] = _nombre_archivo(i, 'nulos')
+                np.save(os.path.join(temporal, entrada['nulos']), nulos)
+        elif entrada['tipo'] == 'fecha':
+            codigos, categorias = pd.factorize(serie, use_na_sentinel=True)
+            entrada['categorias'] = categorias_a_json('fecha', categorias)
+            valores = codigos.astype(np.int32)
+        else:
+            # Códigos con el dtype que elegiría pandas (int8/16/32): from_codes los usa sin copiar
+            entrada['dtype'] = str(serie.dtype)
+            codigos, categorias = pd.factorize(serie, sort=True, use_na_sentinel=True)
+            valores = pd.Categorical.from_codes(codigos, categories=categorias).codes
+            entrada['textos'], entrada['desplazamientos'] = _nombre_archivo(i, 'textos'), _nombre_archivo(i, 'desplazamientos')
+            textos, desplazamientos = codificar_textos(categorias)
+            np.save(os.path.join(temporal, entrada['textos']), textos)
+            np.save(os.path.join(temporal, entrada['desplazamientos']), desplazamientos)
+
+        np.save(os.path.join(temporal, archivo), np.ascontiguousarray(valores))
+        columnas.append(entrada)
+
+    manifiesto = {
+        'version': df.attrs.get('version'),
+        'filas': len(df),
+        'columnas': columnas,
+        'extras': extras or {},
+    }
+    with open(os.path.join(temporal, MANIFIESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, default=_a_json)
+
+    # Reemplazo atómico: los workers nunca ven una publicación a medias
+    anterior = f"{carpeta.rstrip(os.sep)}.{os.getpid()}.old"
+    if os.path.exists(carpeta):
+        os.replace(carpeta, anterior)
+    os.replace(temporal, carpeta)
+    shutil.rmtree(anterior, ignore_errors=True)
+    return carpeta
+
+
+def tipo_columna(serie):
+    """categoria, fecha_hora, numerico, fecha (objetos date) o texto"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return 'categoria'
+    if pd.api.types.is_datetime64_dtype(serie.dtype):
+        return 'fecha_hora'
+    if pd.api.types.is_bool_dtype(serie.dtype) or pd.api.types.is_numeric_dtype(serie.dtype):
+        return 'numerico'
+    muestra = serie.dropna()
+    if len(muestra) and isinstance(muestra.iloc[0], date):
+        return 'fecha'
+    return 'texto'
+
+
+def valores_numericos(serie):
+    # Los enteros con NA de pandas (p. ej. 'Semana') se guardan con su dtype de NumPy
+    return serie.to_numpy(dtype=serie.dtype.numpy_dtype if hasattr(serie.dtype, 'numpy_dtype') else None)
+
+
+def partes_numericas(serie):
+    """(valores, máscara de NA o None): los enteros y booleanos con NA de pandas se publican como
+    su arreglo de NumPy más la máscara, para reconstruir el mismo dtype sin copiar"""
+    if hasattr(serie.dtype, 'numpy_dtype'):
+        return serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0), serie.isna().to_numpy()
+    return serie.to_numpy(), None
+
+
+def categorias_a_json(tipo, categorias):
+    if tipo == 'fecha':
+        return [c.isoformat() for c in categorias]
+    return [str(c) for c in categorias]
+
+
+def categorias_de_json(tipo, categorias):
+    if tipo == 'fecha':
+        return [date.fromisoformat(c) for c in categorias]
+    return list(categorias)
+
+
+def codificar_textos(textos):
+    """(bytes UTF-8 concatenados, desplazamientos) de una lista de textos"""
+    codificados = [str(t).encode('utf-8') for t in textos]
+    desplazamientos = np.zeros(len(codificados) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in codificados], out=desplazamientos[1:])
+    return np.frombuffer(b''.join(codificados), dtype=np.uint8), desplazamientos
+
+
+def decodificar_textos(textos, desplazamientos):
+    """Lista de textos desde los bytes y desplazamientos de codificar_textos"""
+    crudo = textos.tobytes()
+    return [crudo[a:b].decode('utf-8') for a, b in zip(desplazamientos[:-1].tolist(), desplazamientos[1:].tolist())]
+
+
+def _a_json(valor):
+    # Escalares de NumPy dentro de `extras` (KPIs, etc.)
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+
+def leer_manifiesto(carpeta):
+    with open(os.path.join(carpeta, MANIFIESTO), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dataset_publicado(carpeta):
+    return bool(carpeta) and os.path.exists(os.path.join(carpeta, MANIFIESTO))
+
+
+def diccionario(categorias):
+    """Arreglo de objetos para decodificar con diccionario[codigos]; el código -1 (faltante) apunta a la última posición"""
+    valores = np.empty(len(categorias) + 1, dtype=object)
+    valores[:-1] = categorias
+    valores[-1] = np.nan
+    return valores
+
+
+def _abrir(carpeta, archivo):
+    return np.load(os.path.join(carpeta, archivo), mmap_mode='r')
+
+
+def columna_publicada(carpeta, entrada):
+    """Valores de una columna publicada: arreglos sobre el mmap salvo el diccionario de los textos"""
+    valores = _abrir(carpeta, entrada['archivo'])
+    tipo = entrada['tipo']
+    if tipo == 'numerico':
+        if 'nulos' in entrada:
+            # IntegerArray / BooleanArray sobre los valores y la máscara publicados
+            return pd.api.types.pandas_dtype(entrada['dtype']).construct_array_type()(valores, _abrir(carpeta, entrada['nulos']))
+        return valores
+    if tipo == 'fecha_hora':
+        return valores.view(entrada['dtype'])
+    if tipo == 'categoria':
+        return pd.Categorical.from_codes(valores, categories=entrada['categorias'], ordered=entrada.get('ordenada', False))
+    if tipo == 'fecha':
+        return diccionario(categorias_de_json(tipo, entrada['categorias']))[valores]
+    categorias = decodificar_textos(_abrir(carpeta, entrada['textos']), _abrir(carpeta, entrada['desplazamientos']))
+    return pd.Categorical.from_codes(valores, categories=pd.Index(categorias, dtype='str'))
+
+
+def adjuntar_dataset(carpeta, columnas=None):
+    """DataFrame de solo lectura sobre los archivos publicados, sin copiar columnas numéricas ni códigos de texto"""
+    manifiesto = leer_manifiesto(carpeta)
+    datos = {entrada['nombre']: columna_publicada(carpeta, entrada) for entrada in manifiesto['columnas']
+             if columnas is None or entrada['nombre'] in columnas}
+    df = pd.DataFrame(datos, copy=False)
+    df.attrs['version'] = manifiesto['version']
+    df.attrs['extras'] = manifiesto['extras']
+    return df
+
+
+# ============================================
+# OBJETOS PUBLICADOS
+# ============================================
+class _PicklerArreglos(pickle.Pickler):
+    """Pickle que deja cada arreglo numérico grande en un .npy de `carpeta`"""
+
+    def __init__(self, archivo, carpeta):
+        super().__init__(archivo, protocol=pickle.HIGHEST_PROTOCOL)
+        self.carpeta = carpeta
+        # id -> (arreglo, archivo): un arreglo referenciado desde varios objetos se guarda una vez
+        self.guardados = {}
+
+    def persistent_id(self, objeto):
+        if not isinstance(objeto, np.ndarray) or objeto.dtype.hasobject or objeto.nbytes < BYTES_MINIMOS_NPY:
+            return None
+        if id(objeto) not in self.guardados:
+            archivo = f"arreglo_{len(self.guardados):04d}.npy"
+            np.save(os.path.join(self.carpeta, archivo), objeto)
+            self.guardados[id(objeto)] = (objeto, archivo)
+        return ('npy', self.guardados[id(objeto)][1])
+
+
+class _UnpicklerArreglos(pickle.Unpickler):
+    """Reconstruye los objetos con sus arreglos grandes abiertos con mmap en solo lectura"""
+
+    def __init__(self, archivo, carpeta):
+        super().__init__(archivo)
+        self.carpeta = carpeta
+        # Un mmap por archivo: las referencias compartidas vuelven a ser el mismo arreglo
+        self.abiertos = {}
+
+    def persistent_load(self, pid):
+        _, archivo = pid
+        if archivo not in self.abiertos:
+            self.abiertos[archivo] = _abrir(self.carpeta, archivo)
+        return self.abiertos[archivo]
+
+
+def publicar_objetos(objetos, carpeta):
+    """Guarda {nombre: objeto} en `carpeta`: un solo pickle (las referencias compartidas entre
+    objetos se conservan) y sus arreglos numéricos grandes como .npy"""
+    os.makedirs(carpeta, exist_ok=True)
+    with open(os.path.join(carpeta, ARCHIVO_OBJETOS), 'wb') as f:
+        _PicklerArreglos(f, carpeta).dump(dict(objetos))
+
+
+def adjuntar_objetos(carpeta):
+    """{nombre: objeto} publicados junto al dataset de `carpeta` ({} si no hay): los arreglos grandes
+    quedan sobre los .npy compartidos, de solo lectura"""
+    carpeta = os.path.join(carpeta, CARPETA_OBJETOS)
+    if not os.path.exists(os.path.join(carpeta, ARCHIVO_OBJETOS)):
+        return {}
+    with open(os.path.join(carpeta, ARCHIVO_OBJETOS), 'rb') as f:
+        return _UnpicklerArreglos(f, carpeta).load()
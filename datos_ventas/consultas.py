@@ -0,0 +1,571 @@
+# -*- coding: utf-8 -*-
+"""
+Motores de consulta intercambiables para las agregaciones del panel.
+
+Cada agregación se declara una sola vez (claves de agrupación y medidas) y se
+ejecuta con pandas o como SQL sobre un motor embebido (SQLite, o DuckDB si está
+instalado). Todos los motores devuelven el mismo DataFrame: claves ordenadas y
+una columna por medida, con los tipos del dataset.
+
+    VENTAS_MOTOR=sqlite python Ciencia_datos.py
+
+Verificación de paridad contra pandas y benchmark a 1x/10x/100x del dataset (por
+defecto los tres; 100x son ~18 millones de filas y varios GB, con menos memoria
+se pasan solo 1 10):
+
+    python -m datos_ventas.consultas 1 10 100
+
+DuckDB es opcional: si no está instalado se avisa y ni su paridad ni su tiempo se
+verifican. SQLite es 5 a 6 veces más lento que pandas en memoria (a 1x sin filtro, las
+agregaciones del panel tardan 1.4-2.0 s contra ~0.3 s): conviene cuando los datos viven
+en la base, no para reemplazar a pandas.
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .distintos import COLUMNAS_DISTINTOS, TablaDistintos
+from .indice import IndiceFechas
+from .pedidos import TablaPedidos
+from .series import COLUMNAS_SERIES, SeriesVentas
+
+# Filtros activos: condiciones ((columna, valor), ...) y rango de fechas (date o None)
+Filtro = namedtuple('Filtro', ['condiciones', 'desde', 'hasta'])
+SIN_FILTRO = Filtro((), None, None)
+
+# nombre: (claves de agrupación, {columna del resultado: (función, columna de origen)})
+AGREGACIONES = {
+    'resumen': ([], {'Filas': ('count', None), 'Ingreso Total': ('sum', 'Ingreso Total'),
+                     'Pedidos': ('nunique', 'Pedido Key'), 'Cantidad Pedida': ('sum', 'Cantidad Pedida'),
+                     'Ciudades': ('nunique', 'Ciudad'), 'Productos': ('nunique', 'Producto')}),
+    'ventas_mes_num': (['Mes Num'], {'Ingreso Total': ('sum', 'Ingreso Total')}),
+    'ventas_mes': (['Mes'], {'Ingreso Total': ('sum', 'Ingreso Total')}),
+    'diario': (['Fecha'], {'Ingreso Total': ('sum', 'Ingreso Total')}),
+    'hora_dia': (['Hora', 'Día Semana Nombre'], {'Pedidos': ('count', None)}),
+    'dias': (['Día Semana Nombre', 'Día Semana'], {'Pedidos': ('nunique', 'Pedido Key')}),
+    'horas': (['Hora'], {'Pedidos': ('nunique', 'Pedido Key')}),
+    'mes_hora': (['Mes', 'Hora'], {'Pedidos': ('count', None)}),
+    'ciudades': (['Ciudad'], {'Ingreso Total': ('sum', 'Ingreso Total')}),
+    'estados': (['Estado Nombre'], {'Ingreso Total': ('sum', 'Ingreso Total')}),
+    'categorias': (['Categoría'], {'Ingreso Total': ('sum', 'Ingreso Total')}),
+    'productos': (['Producto'], {'Cantidad Pedida': ('sum', 'Cantidad Pedida')}),
+}
+
+# Columnas por las que se puede filtrar (además del rango de fechas)
+COLUMNAS_FILTRO = ['Estado Nombre', 'Ciudad', 'Mes', 'Día Semana Nombre', 'Categoría', 'Rango Precio']
+
+
+def columnas_necesarias():
+    columnas = set(COLUMNAS_FILTRO) | {'Fecha', 'Fecha Pedido'}
+    for claves, medidas in AGREGACIONES.values():
+        columnas.update(claves)
+        columnas.update(origen for _, origen in medidas.values() if origen)
+    return sorted(columnas)
+
+
+def columnas_agregacion(agregacion):
+    """Columnas de las líneas que lee una agregación (claves, medidas y 'Fecha Pedido' para contar filas)"""
+    claves, medidas = AGREGACIONES[agregacion]
+    columnas = list(claves) + [origen for _, origen in medidas.values() if origen]
+    if any(funcion == 'count' for funcion, _ in medidas.values()):
+        columnas.append('Fecha Pedido')
+    return list(dict.fromkeys(columnas))
+
+
+def _con_condiciones(columnas, filtro):
+    """Las columnas pedidas más las de las condiciones del filtro, sin repetir"""
+    return list(dict.fromkeys(list(columnas) + [columna for columna, _ in filtro.condiciones]))
+
+
+def _enmascarar(df, filtro):
+    mascara = np.ones(len(df), dtype=bool)
+    for columna, valor in filtro.condiciones:
+        mascara &= (df[columna] == valor).to_numpy()
+    return df[mascara]
+
+
+def filtrar(datos, filtro, columnas=None):
+    """Rango de fechas por búsqueda binaria (datos(desde, hasta, columnas)) y una única máscara para el resto;
+    con `columnas` solo se leen esas y las de las condiciones"""
+    if columnas is not None:
+        columnas = _con_condiciones(columnas, filtro)
+    return _enmascarar(datos(filtro.desde, filtro.hasta, columnas), filtro)
+
+
+class PartesFiltradas:
+    """Las líneas del filtro de a una partición del almacén por vez (AlmacenVentas.recorrer), con solo
+    las columnas pedidas. Se puede recorrer varias veces: cada recorrido vuelve a leer las particiones"""
+
+    def __init__(self, almacen, filtro, columnas):
+        self.almacen = almacen
+        self.filtro = filtro
+        self.columnas = _con_condiciones(columnas, filtro)
+
+    def __iter__(self):
+        # Solo las partes con filas; si ninguna tiene, una vacía para que siempre haya columnas y tipos
+        vacias = True
+        for df in self.almacen.recorrer(self.filtro.desde, self.filtro.hasta, self.columnas):
+            df = _enmascarar(df, self.filtro)
+            if len(df):
+                vacias = False
+                yield df
+        if vacias:
+            yield self.vacio()
+
+    def con_columnas(self, columnas):
+        return PartesFiltradas(self.almacen, self.filtro, columnas)
+
+    def vacio(self):
+        """DataFrame sin filas con las columnas y tipos de las partes"""
+        return self.almacen.vacio(self.columnas)
+
+
+def como_partes(lineas):
+    """Las líneas como partes por tramo de días: un DataFrame es una sola parte"""
+    return [lineas] if isinstance(lineas, pd.DataFrame) else lineas
+
+
+def con_columnas(lineas, columnas):
+    """Las mismas líneas con solo `columnas` para leer; un DataFrame ya filtrado queda como está"""
+    return lineas if isinstance(lineas, pd.DataFrame) else lineas.con_columnas(columnas)
+
+
+def contar_lineas(lineas):
+    """Filas de las líneas; en partes se cuentan leyendo una sola columna"""
+    if isinstance(lineas, pd.DataFrame):
+        return len(lineas)
+    return sum(len(parte) for parte in lineas.con_columnas(['Fecha Pedido']))
+
+
+def valores_distintos(lineas, columna):
+    """Conjunto de valores de `columna` en las líneas (un DataFrame o sus partes)"""
+    return set().union(*(parte[columna].unique().tolist() for parte in como_partes(lineas)))
+
+
+# Cómo se unen los agregados de cada parte: las partes son tramos de días disjuntos y un pedido
+# cae en un solo día, así que sumas, conteos y pedidos distintos ('Pedido Key') se suman
+UNIR_PARCIALES = {'sum': 'sum', 'size': 'sum', 'min': 'min', 'max': 'max', 'first': 'first'}
+
+
+def _agregar(df, claves, medidas):
+    if claves:
+        return df.groupby(claves, observed=True).agg(**medidas)
+    return pd.DataFrame([{alias: len(df) if funcion == 'size' else df[origen].agg(funcion)
+                          for alias, (origen, funcion) in medidas.items()}])
+
+
+def agregar_por_partes(lineas, claves, medidas):
+    """groupby(claves).agg(**medidas) de las líneas, un DataFrame o sus partes por tramo de días (sin
+    claves, una sola fila). En partes se agrega cada una y se unen los parciales: nunique solo de 'Pedido Key'"""
+    if isinstance(lineas, pd.DataFrame):
+        return _agregar(lineas, claves, medidas)
+    unir = {}
+    for alias, (origen, funcion) in medidas.items():
+        if funcion == 'nunique' and origen != 'Pedido Key':
+            raise ValueError(f"nunique de '{origen}' no se puede unir entre partes")
+        unir[alias] = 'sum' if funcion == 'nunique' else UNIR_PARCIALES[funcion]
+    parciales = [_agregar(parte, claves, medidas) for parte in lineas]
+    if len(parciales) <= 1:
+        return parciales[0] if parciales else _agregar(lineas.vacio(), claves, medidas)
+    juntos = pd.concat(parciales)
+    if not claves:
+        return pd.DataFrame([{alias: juntos[alias].agg(funcion) for alias, funcion in unir.items()}])
+    return juntos.groupby(level=list(range(len(claves))), observed=True).agg(unir)
+
+
+def fuente_en_memoria(df):
+    """Función datos(desde, hasta, columnas) sobre un DataFrame ordenado por 'Fecha Pedido'"""
+    indice = IndiceFechas(df['Fecha Pedido'])
+
+    def datos(desde=None, hasta=None, columnas=None):
+        tramo = df if desde is None and hasta is None else df.iloc[indice.tramo(desde, hasta)]
+        return tramo if columnas is None else tramo[columnas]
+    return datos
+
+
+# ============================================
+# PANDAS
+# ============================================
+class MotorPandas:
+    """Agregaciones con groupby sobre el DataFrame filtrado"""
+
+    nombre = 'pandas'
+
+    def __init__(self, datos, pedidos=None, distintos=None, series=None, lineas=None):
+        self.datos = datos
+        # lineas(filtro, columnas): DataFrame filtrado o partes por tramo de días (por defecto, filtrar sobre datos)
+        self.lineas = lineas or (lambda filtro, columnas: filtrar(datos, filtro, columnas))
+        # Con la tabla de pedidos, los pedidos distintos se cuentan sobre ella (pedidos.TablaPedidos)
+        self.pedidos = pedidos
+        # Con bocetos de distintos, los nunique del resumen se unen por celdas (distintos.TablaDistintos)
+        self.distintos = distintos
+        # Con series densas, las agregaciones por día u hora son sumas sobre arreglos (series.SeriesVentas)
+        self.series = series
+
+    def _por_pedidos(self, claves, medidas):
+        return (self.pedidos is not None and set(claves) <= set(self.pedidos.tabla.columns)
+                and all(m == ('nunique', 'Pedido Key') for m in medidas.values()))
+
+    def agregar(self, agregacion, filtro=SIN_FILTRO, data=None):
+        claves, medidas = AGREGACIONES[agregacion]
+        # Por día u hora se suman las series, sin tocar las líneas
+        if self.series is not None:
+            resultado = self.series.agregar(claves, medidas, filtro)
+            if resultado is not None:
+                return resultado
+
+        # `data` permite reutilizar las líneas ya filtradas por el callback
+        if data is None:
+            data = self.lineas(filtro, columnas_agregacion(agregacion))
+        if not isinstance(data, pd.DataFrame):
+            return self._agregar_partes(agregacion, filtro, data)
+
+        if not claves:
+            conteos = self.distintos.contar(filtro) if self.distintos is not None else None
+            fila = {}
+            for alias, (funcion, origen) in medidas.items():
+                if funcion == 'count':
+                    fila[alias] = len(data)
+                elif funcion == 'nunique' and conteos is not None and origen in conteos:
+                    fila[alias] = conteos[origen]
+                elif funcion == 'nunique' and origen == 'Pedido Key' and self.pedidos is not None:
+                    fila[alias] = self.pedidos.contar(data[origen].to_numpy())
+                elif funcion == 'nunique':
+                    fila[alias] = data[origen].nunique()
+                else:
+                    fila[alias] = data[origen].sum()
+            return pd.DataFrame([fila])
+
+        if self._por_pedidos(claves, medidas):
+            conteo = self.pedidos.contar_por(data, claves)
+            return conteo.to_frame(next(iter(medidas))).reset_index()
+
+        return data.groupby(claves).agg(**{
+            alias: ('Fecha Pedido', 'size') if funcion == 'count' else (origen, funcion)
+            for alias, (funcion, origen) in medidas.items()
+        }).reset_index()
+
+    def _agregar_partes(self, agregacion, filtro, partes):
+        """agregar() de líneas en partes por tramo de días: se agrega cada parte y se suman los parciales
+        (filas, sumas y pedidos distintos; un pedido cae en un solo día). Los demás nunique del resumen
+        salen de los bocetos o de unir los valores de las partes"""
+        claves, medidas = AGREGACIONES[agregacion]
+        if claves:
+            parciales = [self.agregar(agregacion, filtro, parte) for parte in partes]
+            if len(parciales) == 1:
+                return parciales[0]
+            return pd.concat(parciales).groupby(claves, observed=True)[list(medidas)].sum().reset_index()
+
+        # Los bocetos dan los distintos del filtro entero: se piden una vez, no por parte
+        conteos = self.distintos.contar(filtro) if self.distintos is not None else {}
+        por_partes = {alias: ('Fecha Pedido', 'size') if funcion == 'count' else (origen, funcion)
+                      for alias, (funcion, origen) in medidas.items()
+                      if funcion != 'nunique' or (origen == 'Pedido Key' and origen not in conteos)}
+        fila = agregar_por_partes(partes, [], por_partes).to_dict('records')[0]
+        for alias, (funcion, origen) in medidas.items():
+            if alias not in fila:
+                fila[alias] = conteos[origen] if origen in conteos else \
+                    len(valores_distintos(partes.con_columnas([origen]), origen))
+        return pd.DataFrame([{alias: fila[alias] for alias in medidas}])
+
+
+# ============================================
+# SQL (SQLite y DuckDB)
+# ============================================
+def _sql_columna(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _sql_medida(funcion, origen):
+    if funcion == 'count':
+        return 'COUNT(*)'
+    if funcion == 'nunique':
+        return f"COUNT(DISTINCT {_sql_columna(origen)})"
+    return f"SUM({_sql_columna(origen)})"
+
+
+class _MotorSQL:
+    """Base de los motores SQL: arma la consulta y normaliza el resultado"""
+
+    nombre = None
+
+    def __init__(self, lineas):
+        # Un DataFrame o sus partes por tramo de días: la tabla se crea con la primera y se le agregan las demás
+        self._lock = threading.Lock()
+        self.tipos = None
+        for df in como_partes(lineas):
+            columnas = [c for c in columnas_necesarias() if c in df.columns and c != 'Fecha Pedido']
+            if self.tipos is None:
+                self.tipos = df[columnas].dtypes.to_dict()
+                self._conectar(df[columnas])
+            else:
+                self._insertar(df[columnas])
+        self._indexar()
+
+    def _sql(self, agregacion, filtro):
+        claves, medidas = AGREGACIONES[agregacion]
+        select = [_sql_columna(c) for c in claves]
+        select += [f"{_sql_medida(f, o)} AS {_sql_columna(alias)}" for alias, (f, o) in medidas.items()]
+
+        where, parametros = [], []
+        for columna, valor in filtro.condiciones:
+            where.append(f"{_sql_columna(columna)} = ?")
+            parametros.append(valor)
+        if filtro.desde is not None:
+            where.append('"Fecha" >= ?')
+            parametros.append(self._fecha(filtro.desde))
+        if filtro.hasta is not None:
+            where.append('"Fecha" <= ?')
+            parametros.append(self._fecha(filtro.hasta))
+
+        sql = f"SELECT {', '.join(select)} FROM ventas"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if claves:
+            grupo = ', '.join(_sql_columna(c) for c in claves)
+            sql += f" GROUP BY {grupo} ORDER BY {grupo}"
+        return sql, parametros
+
+    def agregar(self, agregacion, filtro=SIN_FILTRO, data=None):
+        sql, parametros = self._sql(agregacion, filtro)
+        with self._lock:
+            resultado = self._ejecutar(sql, parametros)
+
+        claves, medidas = AGREGACIONES[agregacion]
+        if not claves and len(resultado) and resultado.iloc[0].isna().all():
+            resultado = resultado.fillna(0)
+        # Mismos tipos que el groupby de pandas
+        for columna in claves:
+            if columna == 'Fecha':
+                resultado[columna] = pd.to_datetime(resultado[columna]).dt.date
+            else:
+                resultado[columna] = resultado[columna].astype(self.tipos[columna])
+        for alias, (funcion, origen) in medidas.items():
+            entero = funcion != 'sum' or pd.api.types.is_integer_dtype(self.tipos[origen])
+            resultado[alias] = resultado[alias].fillna(0).astype('int64' if entero else 'float64')
+        return resultado
+
+
+class MotorSQLite(_MotorSQL):
+    """Tabla en memoria de SQLite (biblioteca estándar), con índice por fecha"""
+
+    nombre = 'sqlite'
+
+    def _tabla(self, df):
+        tabla = df.copy()
+        tabla['Fecha'] = pd.to_datetime(tabla['Fecha']).dt.strftime('%Y-%m-%d')
+        for columna in tabla.columns:
+            if isinstance(tabla[columna].dtype, pd.CategoricalDtype):
+                tabla[columna] = tabla[columna].astype(str)
+        return tabla
+
+    def _conectar(self, df):
+        self.conexion = sqlite3.connect(':memory:', check_same_thread=False)
+        self._insertar(df)
+
+    def _insertar(self, df):
+        self._tabla(df).to_sql('ventas', self.conexion, index=False, chunksize=50_000, if_exists='append')
+
+    def _indexar(self):
+        self.conexion.execute('CREATE INDEX ventas_fecha ON ventas ("Fecha")')
+
+    def _fecha(self, valor):
+        return valor.isoformat()
+
+    def _ejecutar(self, sql, parametros):
+        return pd.read_sql_query(sql, self.conexion, params=parametros)
+
+
+class MotorDuckDB(_MotorSQL):
+    """Tabla columnar de DuckDB (opcional: pip install duckdb)"""
+
+    nombre = 'duckdb'
+
+    def _cargar(self, df, sql):
+        tabla = df.copy()
+        tabla['Fecha'] = pd.to_datetime(tabla['Fecha'])
+        self.conexion.register('ventas_df', tabla)
+        self.conexion.execute(sql)
+        self.conexion.unregister('ventas_df')
+
+    def _conectar(self, df):
+        import duckdb
+
+        self.conexion = duckdb.connect()
+        self._cargar(df, 'CREATE TABLE ventas AS SELECT * REPLACE (CAST("Fecha" AS DATE) AS "Fecha") FROM ventas_df')
+
+    def _insertar(self, df):
+        self._cargar(df, 'INSERT INTO ventas SELECT * REPLACE (CAST("Fecha" AS DATE) AS "Fecha") FROM ventas_df')
+
+    def _indexar(self):
+        # Columnar: sin índice, los filtros por fecha usan las estadísticas de cada bloque
+        pass
+
+    def _fecha(self, valor):
+        return valor
+
+    def _ejecutar(self, sql, parametros):
+        return self.conexion.execute(sql, parametros).df()
+
+
+MOTORES = {'pandas': MotorPandas, 'sqlite': MotorSQLite, 'duckdb': MotorDuckDB}
+
+
+def crear_motor(nombre, datos, pedidos=None, distintos=None, series=None, lineas=None):
+    """Motor `nombre` sobre datos(desde, hasta, columnas); vuelve a pandas si no se puede crear.
+    Con `lineas(filtro, columnas)` (almacén) las líneas llegan en partes y no se lee el historial entero"""
+    if nombre not in MOTORES:
+        print(f"   ⚠️ Motor de consultas desconocido '{nombre}', se usa pandas")
+        nombre = 'pandas'
+    if nombre == 'pandas':
+        return MotorPandas(datos, pedidos, distintos, series, lineas)
+
+    try:
+        inicio = time.perf_counter()
+        columnas = columnas_necesarias()
+        motor = MOTORES[nombre](lineas(SIN_FILTRO, columnas) if lineas else datos(columnas=columnas))
+        print(f"   • Motor de consultas {nombre} listo en {time.perf_counter() - inicio:.1f}s")
+        return motor
+    except ImportError as e:
+        print(f"   ⚠️ Motor {nombre} no disponible ({e}), se usa pandas")
+        return MotorPandas(datos, pedidos, distintos, series, lineas)
+
+
+# ============================================
+# PARIDAD Y BENCHMARK
+# ============================================
+def filtros_de_prueba(df):
+    """Casos representativos: sin filtro, un estado, una ciudad y categoría, un rango corto"""
+    fecha_min, fecha_max = df['Fecha'].min(), df['Fecha'].max()
+    estado = df['Estado Nombre'].mode().iloc[0]
+    ciudad = df.loc[df['Estado Nombre'] == estado, 'Ciudad'].mode().iloc[0]
+    return {
+        'sin filtro': SIN_FILTRO,
+        'estado': Filtro((('Estado Nombre', estado),), None, None),
+        'ciudad y categoría': Filtro((('Ciudad', ciudad), ('Categoría', 'Cables')), None, None),
+        'dos semanas': Filtro((), fecha_min + (fecha_max - fecha_min) / 4,
+                              fecha_min + (fecha_max - fecha_min) / 4 + (date(2000, 1, 15) - date(2000, 1, 1))),
+        'rango y día': Filtro((('Día Semana Nombre', 'Sábado'), ('Rango Precio', 'Medio')), fecha_min, fecha_max),
+    }
+
+
+# Variantes de pandas con tablas auxiliares que se comparan como motores
+MOTORES_PANDAS = ('pandas', 'pedidos', 'distintos', 'series')
+
+
+def _motor_pandas(nombre, datos, df):
+    """pandas solo, con tabla de pedidos ('pedidos'), además con bocetos de distintos exactos
+    ('distintos') o además con series de tiempo ('series')"""
+    pedidos = TablaPedidos(df) if nombre in ('pedidos', 'distintos', 'series') else None
+    distintos = TablaDistintos(df[COLUMNAS_DISTINTOS], 'exacto') if nombre in ('distintos', 'series') else None
+    series = SeriesVentas(df[COLUMNAS_SERIES]) if nombre == 'series' else None
+    return MotorPandas(datos, pedidos, distintos, series)
+
+
+def verificar_paridad(df, nombres=('pedidos', 'distintos', 'series', 'sqlite', 'duckdb'), filtros=None):
+    """Compara cada motor (SQL, o pandas con tablas auxiliares) con pandas en todas las agregaciones"""
+    datos = fuente_en_memoria(df)
+    referencia = MotorPandas(datos)
+    filtros = filtros or filtros_de_prueba(df)
+    diferencias = []
+    # Un caso sin filas compara tablas vacías: no prueba nada
+    for caso, filtro in filtros.items():
+        if not referencia.agregar('resumen', filtro)['Filas'].iloc[0]:
+            diferencias.append(('pandas', caso, 'resumen', "el caso no tiene filas"))
+
+    for nombre in nombres:
+        try:
+            motor = _motor_pandas(nombre, datos, df) if nombre in MOTORES_PANDAS else MOTORES[nombre](df)
+        except ImportError as e:
+            print(f"   ⚠️ {nombre}: no instalado ({e}); su paridad NO se verificó")
+            continue
+        for caso, filtro in filtros.items():
+            for agregacion, (claves, medidas) in AGREGACIONES.items():
+                esperado = referencia.agregar(agregacion, filtro)
+                obtenido = motor.agregar(agregacion, filtro)
+                problema = None
+                if len(esperado) != len(obtenido):
+                    problema = f"{len(obtenido)} filas (pandas: {len(esperado)})"
+                elif any((esperado[c].to_numpy() != obtenido[c].to_numpy()).any() for c in claves):
+                    problema = "claves distintas"
+                else:
+                    for alias in medidas:
+                        if not np.allclose(esperado[alias].to_numpy(float), obtenido[alias].to_numpy(float), rtol=1e-9):
+                            problema = f"'{alias}' distinto"
+                if problema:
+                    diferencias.append((nombre, caso, agregacion, problema))
+        print(f"   • {nombre}: {len(filtros) * len(AGREGACIONES)} comparaciones")
+    return diferencias
+
+
+def ampliar(df, factor):
+    """Dataset `factor` veces más grande (misma distribución, pedidos distintos), ordenado por fecha"""
+    if factor == 1:
+        return df
+    copias = []
+    for i in range(factor):
+        copia = df.copy()
+        copia['Pedido Key'] = copia['Pedido Key'] + i * (int(df['Pedido Key'].max()) + 1)
+        copias.append(copia)
+    return pd.concat(copias, ignore_index=True).sort_values('Fecha Pedido', kind='stable').reset_index(drop=True)
+
+
+def comparar_motores(df, factores=(1, 10, 100), nombres=('pandas', 'pedidos', 'distintos', 'series', 'sqlite', 'duckdb'),
+                     repeticiones=3):
+    """Tiempo de carga y de cada agregación por motor y tamaño de datos; devuelve un DataFrame"""
+    base = df[columnas_necesarias()]
+    filas = []
+    for factor in factores:
+        datos_df = ampliar(base, factor)
+        datos = fuente_en_memoria(datos_df)
+        filtros = filtros_de_prueba(datos_df)
+        print(f"\n⏱️ {factor}x ({len(datos_df):,} filas)")
+
+        for nombre in nombres:
+            try:
+                inicio = time.perf_counter()
+                if nombre in MOTORES_PANDAS:
+                    motor = _motor_pandas(nombre, datos, datos_df)
+                else:
+                    motor = MOTORES[nombre](datos_df)
+                carga = time.perf_counter() - inicio
+            except ImportError as e:
+                print(f"   ⚠️ {nombre}: no instalado ({e}); sin tiempos")
+                continue
+
+            for caso, filtro in filtros.items():
+                inicio = time.perf_counter()
+                for _ in range(repeticiones):
+                    for agregacion in AGREGACIONES:
+                        motor.agregar(agregacion, filtro)
+                segundos = (time.perf_counter() - inicio) / repeticiones
+                filas.append({'factor': factor, 'filas': len(datos_df), 'motor': nombre, 'caso': caso,
+                              'carga_s': round(carga, 3), 'panel_ms': round(segundos * 1000, 1)})
+            print(f"   • {nombre}: carga {carga:.2f}s")
+
+    resultado = pd.DataFrame(filas)
+    if not resultado.empty:
+        print("\n" + resultado.pivot_table(index=['factor', 'caso'], columns='motor', values='panel_ms').to_string())
+    return resultado
+
+
+if __name__ == '__main__':
+    from .carga import cargar_ventas
+
+    df = cargar_ventas()
+    print("\n🔎 PARIDAD CONTRA PANDAS")
+    diferencias = verificar_paridad(df)
+    for diferencia in diferencias:
+        print(f"   ❌ {diferencia}")
+    if not diferencias:
+        print("   ✅ Todos los motores instalados coinciden con pandas")
+
+    comparar_motores(df, factores=[int(f) for f in sys.argv[1:]] or (1, 10, 100))
+    sys.exit(1 if diferencias else 0)
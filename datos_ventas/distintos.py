@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Conteos de valores distintos (pedidos, ciudades, productos) que se pueden sumar entre celdas.
+
+Un conteo distinto no se suma: un pedido con dos productos está en dos celdas. Por eso
+cada celda pre-agregada (día, ciudad, estado, categoría, rango de precio) guarda un
+boceto unible de cada columna y un filtro cualquiera del panel se resuelve eligiendo
+celdas y uniendo sus bocetos, sin recorrer las líneas:
+
+- dominios chicos (ciudades, productos): conjunto de bits exacto; unir es un OR
+- dominios grandes (pedidos): las claves de cada celda, exacto, o en modo
+  'aproximado' un HyperLogLog disperso (registro, rango) por celda; unir es un máximo
+  por registro y el error típico es 1.04 / sqrt(2**precision)
+
+    VENTAS_DISTINTOS=aproximado python Ciencia_datos.py
+
+Precisión contra nunique de pandas:
+
+    python -m datos_ventas.distintos
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# exacto, aproximado (HyperLogLog en los dominios grandes) o filas (sin bocetos: nunique sobre las líneas)
+MODO_DISTINTOS = os.environ.get('VENTAS_DISTINTOS', 'exacto')
+# Bits de registro del HyperLogLog: 2**12 registros, ~1.6% de error típico
+PRECISION_HLL = int(os.environ.get('VENTAS_HLL_PRECISION', 12))
+# Hasta este tamaño de dominio cada celda guarda un conjunto de bits
+LIMITE_BITS = 4096
+
+# Claves de las celdas; mes y día de la semana dependen de la fecha
+COLUMNAS_CELDA = ['Fecha', 'Ciudad', 'Estado Nombre', 'Categoría', 'Rango Precio']
+COLUMNAS_DERIVADAS = ['Mes', 'Día Semana Nombre']
+# Columnas con conteo distinto
+COLUMNAS_CONTADAS = ['Pedido Key', 'Ciudad', 'Producto']
+COLUMNAS_DISTINTOS = COLUMNAS_CELDA + COLUMNAS_DERIVADAS + [c for c in COLUMNAS_CONTADAS if c not in COLUMNAS_CELDA]
+
+
+# ============================================
+# BOCETOS
+# ============================================
+class ConjuntoBits:
+    """Conjunto exacto de códigos 0..n-1 en bits empaquetados"""
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    @classmethod
+    def de_codigos(cls, codigos, n):
+        marcas = np.zeros(n, dtype=bool)
+        marcas[codigos] = True
+        return cls(np.packbits(marcas))
+
+    def unir(self, otro):
+        return ConjuntoBits(self.bits | otro.bits)
+
+    def contar(self):
+        return int(np.unpackbits(self.bits).sum())
+
+
+def _longitud_bits(valores):
+    """Posición del bit más alto de cada uint64 (0 para el cero), sin pasar por float"""
+    valores = valores.copy()
+    longitud = np.zeros(len(valores), dtype=np.int64)
+    for salto in (32, 16, 8, 4, 2, 1):
+        alto = valores >= (np.uint64(1) << np.uint64(salto))
+        longitud[alto] += salto
+        valores[alto] >>= np.uint64(salto)
+    return longitud + (valores > 0)
+
+
+def registros_hll(valores, precision=PRECISION_HLL):
+    """(registro, rango) de cada valor: los primeros bits del hash eligen el registro y el
+    resto aporta la posición de su primer 1"""
+    hashes = pd.util.hash_array(np.asarray(valores))
+    resto = 64 - precision
+    registro = (hashes >> np.uint64(resto)).astype(np.int64)
+    cola = hashes & np.uint64((1 << resto) - 1)
+    rango = (resto - _longitud_bits(cola) + 1).astype(np.uint8)
+    return registro, rango
+
+
+class BocetoHLL:
+    """HyperLogLog: un máximo por registro"""
+
+    def __init__(self, registros):
+        self.registros = registros
+
+    @classmethod
+    def vacio(cls, precision=PRECISION_HLL):
+        return cls(np.zeros(1 << precision, dtype=np.uint8))
+
+    @classmethod
+    def de_registros(cls, registro, rango, precision=PRECISION_HLL):
+        boceto = cls.vacio(precision)
+        np.maximum.at(boceto.registros, registro, rango)
+        return boceto
+
+    def unir(self, otro):
+        return BocetoHLL(np.maximum(self.registros, otro.registros))
+
+    def contar(self):
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimado = alfa * m * m / np.ldexp(1.0, -self.registros.astype(np.int64)).sum()
+        ceros = int(np.count_nonzero(self.registros == 0))
+        # Pocos valores: conteo lineal sobre los registros vacíos
+        if estimado <= 2.5 * m and ceros:
+            estimado = m * np.log(m / ceros)
+        return int(round(estimado))
+
+
+# ============================================
+# TABLA DE CELDAS
+# ============================================
+class TablaDistintos:
+    """Celdas pre-agregadas con un boceto unible por columna contada"""
+
+    def __init__(self, lineas, modo=MODO_DISTINTOS, precision=PRECISION_HLL):
+        self.modo = modo
+        self.precision = precision
+
+        # Las líneas en un DataFrame o en partes por tramo de días (almacén)
+        if isinstance(lineas, pd.DataFrame):
+            tabla, celda = self._celdas(lineas)
+            contadas = {columna: (celda, lineas[columna]) for columna in COLUMNAS_CONTADAS}
+        else:
+            tabla, contadas = self._unir_partes(lineas)
+        self.dias = pd.to_datetime(tabla['Fecha']).to_numpy('datetime64[D]')
+
+        # Columnas de filtro como códigos enteros: comparar enteros, no textos
+        self._codigos = {}
+        for columna in COLUMNAS_CELDA[1:] + COLUMNAS_DERIVADAS:
+            codigos, valores = pd.factorize(tabla[columna].astype(str))
+            self._codigos[columna] = (codigos, {v: i for i, v in enumerate(valores)})
+        self.celdas = len(tabla)
+
+        self.bocetos = {columna: self._armar(*contadas[columna]) for columna in COLUMNAS_CONTADAS}
+
+    @staticmethod
+    def _celdas(lineas):
+        """(primera línea de cada celda, celda de cada línea)"""
+        claves = lineas[COLUMNAS_CELDA].astype({'Rango Precio': str})
+        # Celdas ordenadas por fecha (la primera clave): el rango de fechas es un tramo contiguo
+        celda = claves.groupby(COLUMNAS_CELDA, sort=True).ngroup().to_numpy()
+        primera = np.zeros(celda.max() + 1 if len(celda) else 0, dtype=np.int64)
+        primera[celda[::-1]] = np.arange(len(celda))[::-1]
+        return lineas.iloc[primera][COLUMNAS_CELDA + COLUMNAS_DERIVADAS].reset_index(drop=True), celda
+
+    def _unir_partes(self, partes):
+        """Celdas de partes con días disjuntos, una tras otra (siguen ordenadas por fecha), y los pares
+        (celda, valor) distintos de cada columna contada: armar un boceto con los pares o con las líneas da lo mismo"""
+        tablas, pares = [], {columna: [] for columna in COLUMNAS_CONTADAS}
+        celdas = 0
+        for parte in partes:
+            tabla, celda = self._celdas(parte)
+            for columna in COLUMNAS_CONTADAS:
+                pares[columna].append(pd.DataFrame({'celda': celda + celdas, 'valor': parte[columna].to_numpy()})
+                                      .drop_duplicates())
+            tablas.append(tabla)
+            celdas += len(tabla)
+        pares = {columna: pd.concat(lista, ignore_index=True) for columna, lista in pares.items()}
+        return (pd.concat(tablas, ignore_index=True),
+                {columna: (p['celda'].to_numpy(), p['valor']) for columna, p in pares.items()})
+
+    def _armar(self, celda, valores):
+        codigos, dominio = pd.factorize(valores)
+        if len(dominio) <= LIMITE_BITS:
+            # Un conjunto de bits por celda
+            bits = np.zeros((self.celdas, len(dominio)), dtype=bool)
+            bits[celda, codigos] = True
+            return ('bits', np.packbits(bits, axis=1))
+        if self.modo == 'aproximado':
+            # HyperLogLog disperso: (registro, rango máximo) por celda
+            registro, rango = registros_hll(dominio.to_numpy()[codigos], self.precision)
+            pares = pd.DataFrame({'celda': celda, 'registro': registro, 'rango': rango})
+            pares = pares.groupby(['celda', 'registro'], sort=True)['rango'].max().reset_index()
+            return ('hll', pares['celda'].to_numpy(), pares['registro'].to_numpy(), pares['rango'].to_numpy())
+        # Claves distintas de cada celda
+        pares = np.unique(celda.astype(np.int64) * len(dominio) + codigos)
+        return ('claves', len(dominio), pares // len(dominio), pares % len(dominio))
+
+    def seleccionar(self, filtro):
+        """Máscara de las celdas del filtro, o None si alguna condición no es de celda"""
+        mascara = np.ones(self.celdas, dtype=bool)
+        if filtro.desde is not None:
+            mascara[:np.searchsorted(self.dias, np.datetime64(filtro.desde, 'D'))] = False
+        if filtro.hasta is not None:
+            mascara[np.searchsorted(self.dias, np.datetime64(filtro.hasta, 'D'), side='right'):] = False
+        for columna, valor in filtro.condiciones:
+            if columna not in self._codigos:
+                return None
+            codigos, indice = self._codigos[columna]
+            mascara &= codigos == indice.get(str(valor), -1)
+        return mascara
+
+    def unir(self, mascara, columna):
+        """Boceto de `columna` unido sobre las celdas de la máscara"""
+        boceto = self.bocetos[columna]
+        if boceto[0] == 'bits':
+            return ConjuntoBits(np.bitwise_or.reduce(boceto[1][mascara], axis=0))
+        if boceto[0] == 'hll':
+            _, celda, registro, rango = boceto
+            elegidos = mascara[celda]
+            return BocetoHLL.de_registros(registro[elegidos], rango[elegidos], self.precision)
+        _, n, celda, codigos = boceto
+        return ConjuntoBits.de_codigos(codigos[mascara[celda]], n)
+
+    def contar(self, filtro):
+        """{columna: distintos} para el filtro, o None si no se resuelve con celdas"""
+        mascara = self.seleccionar(filtro)
+        if mascara is None:
+            return None
+        return {columna: self.unir(mascara, columna).contar() for columna in COLUMNAS_CONTADAS}
+
+
+def crear_distintos(lineas, modo=MODO_DISTINTOS):
+    """Tabla de distintos según el modo; None con 'filas'"""
+    if modo == 'filas':
+        return None
+    if modo not in ('exacto', 'aproximado'):
+        print(f"   ⚠️ Modo de distintos desconocido '{modo}', se usa exacto")
+        modo = 'exacto'
+    return TablaDistintos(lineas, modo)
+
+
+# ============================================
+# PRECISIÓN
+# ============================================
+def verificar_distintos(df, filtros=None, sigmas=4):
+    """Compara los dos modos con nunique de pandas; exacto debe coincidir y aproximado quedar
+    dentro de `sigmas` errores típicos. Devuelve la lista de diferencias"""
+    from .consultas import Filtro, filtrar, filtros_de_prueba, fuente_en_memoria
+
+    datos = fuente_en_memoria(df)
+    if filtros is None:
+        # Además de los casos del benchmark, filtros por columnas derivadas de la fecha y del producto
+        filtros = filtros_de_prueba(df)
+        filtros['mes y rango'] = Filtro((('Mes', df['Mes'].iloc[0]), ('Rango Precio', 'Premium')), None, None)
+        filtros['día y estado'] = Filtro((('Día Semana Nombre', 'Lunes'),
+                                           ('Estado Nombre', df['Estado Nombre'].iloc[-1])), None, None)
+    diferencias = []
+    for modo in ('exacto', 'aproximado'):
+        inicio = time.perf_counter()
+        tabla = TablaDistintos(df[COLUMNAS_DISTINTOS], modo)
+        print(f"\n   • {modo}: {tabla.celdas:,} celdas en {time.perf_counter() - inicio:.1f}s")
+        tolerancia = sigmas * 1.04 / np.sqrt(1 << tabla.precision)
+        for caso, filtro in filtros.items():
+            data = filtrar(datos, filtro)
+            inicio = time.perf_counter()
+            conteos = tabla.contar(filtro)
+            ms_bocetos = (time.perf_counter() - inicio) * 1000
+            inicio = time.perf_counter()
+            esperados = {columna: data[columna].nunique() for columna in COLUMNAS_CONTADAS}
+            ms_filas = (time.perf_counter() - inicio) * 1000
+
+            errores = {c: abs(conteos[c] - esperados[c]) / max(esperados[c], 1) for c in COLUMNAS_CONTADAS}
+            for columna, error in errores.items():
+                if error > (tolerancia if modo == 'aproximado' else 0):
+                    diferencias.append((modo, caso, columna, conteos[columna], esperados[columna]))
+            detalle = ', '.join(f"{c} {conteos[c]:,}/{esperados[c]:,}" for c in COLUMNAS_CONTADAS)
+            print(f"     {caso:<20} {detalle} | error máx {max(errores.values()):.2%} | "
+                  f"{ms_bocetos:.1f} ms (nunique {ms_filas:.1f} ms)")
+    return diferencias
+
+
+if __name__ == '__main__':
+    import sys
+
+    from .carga import cargar_ventas
+
+    print("\n🔎 BOCETOS DE DISTINTOS CONTRA NUNIQUE")
+    diferencias = verificar_distintos(cargar_ventas())
+    for diferencia in diferencias:
+        print(f"   ❌ {diferencia}")
+    if not diferencias:
+        print("\n   ✅ Exacto coincide con pandas y aproximado queda dentro de la tolerancia")
+    sys.exit(1 if diferencias else 0)
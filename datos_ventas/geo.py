@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Capa geográfica: estados, ciudades y códigos postales como códigos enteros, con agregados
+precalculados por lugar.
+
+Un lugar es un (estado, ciudad, código postal) distinto; las ciudades se distinguen por
+estado (Portland de Oregon y Portland de Maine son dos ciudades). Al cargar, las líneas se
+agrupan una sola vez en celdas (día, lugar, categoría, rango de precio) con ingresos,
+unidades y pedidos distintos. Los pedidos distintos no se pueden sumar entre categorías (un
+pedido con dos categorías estaría en dos celdas), así que hay una tabla de celdas por
+variante: sin categoría ni rango, con categoría, con rango y con ambos; dentro de una
+variante cada pedido cae en una sola celda y las sumas son exactas.
+
+El mapa de estados y el detalle de un estado (ciudades y códigos postales) se responden
+sumando las celdas del filtro por nivel, sin volver a recorrer las filas.
+
+    python -m datos_ventas.geo      # compara los agregados con groupby de pandas
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from .catalogos import orden_meses, orden_dias
+
+# Columnas de las líneas que necesita CapaGeo
+COLUMNAS_GEO = ['Pedido Key', 'Fecha Pedido', 'Estado Nombre', 'Estado Codigo', 'Ciudad', 'Código Postal',
+                'Categoría', 'Rango Precio', 'Ingreso Total', 'Cantidad Pedida']
+# nivel: columnas que lo identifican (la primera fila de cada grupo da los nombres)
+NIVELES_GEO = {
+    'estado': ['Estado Nombre', 'Estado Codigo'],
+    'ciudad': ['Estado Nombre', 'Ciudad'],
+    'codigo_postal': ['Estado Nombre', 'Ciudad', 'Código Postal'],
+}
+# Condiciones de filtro que resuelven las celdas; con otras, agregar devuelve None
+COLUMNAS_FILTRO_GEO = {'Ciudad', 'Estado Nombre', 'Mes', 'Día Semana Nombre', 'Categoría', 'Rango Precio'}
+# Medidas de cada celda
+MEDIDAS_GEO = ['Ingreso Total', 'Cantidad Pedida', 'Pedidos']
+
+
+def _codigos(valores):
+    """(códigos, categorías) ordenados; los vacíos van a la categoría 'Desconocido'"""
+    valores = pd.Series(valores).astype(object).where(pd.notna(valores), 'Desconocido').astype(str)
+    return pd.factorize(valores, sort=True)
+
+
+def _celdas(lineas):
+    """Lugares, categorías y rangos ordenados, primer día y una tabla de celdas por variante de las líneas"""
+    # Lugares: un código por (estado, ciudad, código postal), con el código de estado de su primera fila
+    columnas = NIVELES_GEO['codigo_postal']
+    lugar = lineas.groupby(columnas, sort=True, observed=True).ngroup().to_numpy()
+    primera = pd.Series(np.arange(len(lugar))).groupby(lugar).first().to_numpy()
+    lugares = lineas[columnas + ['Estado Codigo']].iloc[primera].astype(str).reset_index(drop=True)
+
+    dias = lineas['Fecha Pedido'].to_numpy().astype('datetime64[D]')
+    inicio = dias.min() if len(dias) else np.datetime64('1970-01-01')
+    dia = (dias - inicio).astype(np.int64)
+
+    categoria, categorias = _codigos(lineas['Categoría'].to_numpy())
+    rango, rangos = _codigos(lineas['Rango Precio'].to_numpy())
+    pedido = pd.factorize(lineas['Pedido Key'].to_numpy())[0]
+    ingresos = lineas['Ingreso Total'].to_numpy(dtype=float)
+    unidades = lineas['Cantidad Pedida'].to_numpy(dtype=float)
+
+    # Una tabla de celdas por variante (categoría en la clave, rango en la clave)
+    n_lugares, n_cat, n_rango = len(lugares), len(categorias), len(rangos)
+    celdas = {}
+    for por_categoria in (False, True):
+        for por_rango in (False, True):
+            clave = dia * n_lugares + lugar
+            clave = clave * n_cat + categoria if por_categoria else clave
+            clave = clave * n_rango + rango if por_rango else clave
+            claves, celda = np.unique(clave, return_inverse=True)
+            # Pedidos distintos por celda: pares (pedido, celda) únicos
+            pares = np.unique(pedido.astype(np.int64) * len(claves) + celda)
+            tabla = {
+                'Ingreso Total': np.bincount(celda, weights=ingresos, minlength=len(claves)),
+                'Cantidad Pedida': np.bincount(celda, weights=unidades, minlength=len(claves)),
+                'Pedidos': np.bincount(pares % len(claves), minlength=len(claves)),
+            }
+            if por_rango:
+                tabla['rango'], claves = claves % n_rango, claves // n_rango
+            if por_categoria:
+                tabla['categoria'], claves = claves % n_cat, claves // n_cat
+            tabla['lugar'], tabla['dia'] = claves % n_lugares, claves // n_lugares
+            celdas[(por_categoria, por_rango)] = tabla
+    return {'lugares': lugares, 'categorias': categorias, 'rangos': rangos, 'inicio': inicio,
+            'n_dias': int(dia.max()) + 1 if len(dia) else 0, 'celdas': celdas}
+
+
+def _unir_celdas(partes):
+    """Celdas de partes con días disjuntos con los códigos de todas. Los códigos ordenados conservan el
+    orden dentro de cada parte, así que las celdas de cada variante siguen ordenadas por clave"""
+    if len(partes) == 1:
+        return partes[0]
+    columnas = NIVELES_GEO['codigo_postal']
+    # Cada lugar con el código de estado de su primera fila (la de la primera parte donde aparece)
+    lugares = (pd.concat([parte['lugares'] for parte in partes], ignore_index=True)
+               .drop_duplicates(columnas).sort_values(columnas, kind='stable').reset_index(drop=True))
+    categorias = pd.Index(sorted(set().union(*(parte['categorias'] for parte in partes))))
+    rangos = pd.Index(sorted(set().union(*(parte['rangos'] for parte in partes))))
+    inicio = min(parte['inicio'] for parte in partes)
+    celdas = {variante: {medida: [] for medida in tabla} for variante, tabla in partes[0]['celdas'].items()}
+    n_dias = 0
+    for parte in partes:
+        desde = int((parte['inicio'] - inicio).astype(np.int64))
+        n_dias = max(n_dias, desde + parte['n_dias'])
+        codigos = {'lugar': pd.MultiIndex.from_frame(lugares[columnas]).get_indexer(
+                       pd.MultiIndex.from_frame(parte['lugares'][columnas])),
+                   'categoria': categorias.get_indexer(parte['categorias']),
+                   'rango': rangos.get_indexer(parte['rangos'])}
+        for variante, tabla in parte['celdas'].items():
+            for medida, valores in tabla.items():
+                if medida in codigos:
+                    valores = codigos[medida][valores]
+                elif medida == 'dia':
+                    valores = valores + desde
+                celdas[variante][medida].append(valores)
+    return {'lugares': lugares, 'categorias': categorias, 'rangos': rangos, 'inicio': inicio, 'n_dias': n_dias,
+            'celdas': {variante: {medida: np.concatenate(v) for medida, v in tabla.items()}
+                       for variante, tabla in celdas.items()}}
+
+
+class CapaGeo:
+    """Lugares con códigos enteros y celdas (día, lugar, categoría, rango) por variante de pedidos"""
+
+    def __init__(self, lineas):
+        # Las líneas en un DataFrame o en partes por tramo de días (almacén): cada parte se arma con sus
+        # propios códigos y después se pasa a los de todas
+        if isinstance(lineas, pd.DataFrame):
+            partes = _celdas(lineas)
+        else:
+            partes = _unir_celdas([_celdas(parte) for parte in lineas])
+        self.lugares, self.categorias, self.rangos = partes['lugares'], partes['categorias'], partes['rangos']
+        self.celdas = partes['celdas']
+        # Códigos de estado y ciudad de cada lugar
+        estado, estados = pd.factorize(self.lugares['Estado Nombre'], sort=True)
+        ciudad, _ = pd.factorize(pd.MultiIndex.from_frame(self.lugares[['Estado Nombre', 'Ciudad']]), sort=True)
+        self.niveles = {'estado': estado, 'ciudad': ciudad, 'codigo_postal': np.arange(len(self.lugares))}
+        # Nombres de cada código de nivel (la primera fila del lugar que lo usa)
+        self.nombres = {nivel: self.lugares.groupby(codigos, sort=True)[NIVELES_GEO[nivel]].first().reset_index(drop=True)
+                        for nivel, codigos in self.niveles.items()}
+
+        # Días del rango con su mes y día de la semana (para las condiciones de calendario)
+        self.inicio = partes['inicio']
+        self.dias = self.inicio + np.arange(partes['n_dias'])
+        self.mes_dia = np.asarray(orden_meses, dtype=object)[self.dias.astype('datetime64[M]').astype(np.int64) % 12]
+        self.semana_dia = np.asarray(orden_dias, dtype=object)[(self.dias.astype(np.int64) + 3) % 7]
+
+        # Agregados sin filtro de cada nivel (la vista inicial del mapa)
+        self.totales = {nivel: self._sumar(self.celdas[(False, False)], None, nivel) for nivel in NIVELES_GEO}
+
+    @property
+    def bytes(self):
+        return sum(a.nbytes for tabla in self.celdas.values() for a in tabla.values())
+
+    def _sumar(self, tabla, mascara, nivel):
+        """Medidas de las celdas elegidas sumadas por código del nivel; solo grupos con ventas"""
+        codigos = self.niveles[nivel][tabla['lugar']]
+        n = len(self.nombres[nivel])
+        if mascara is not None:
+            codigos = codigos[mascara]
+        resultado = self.nombres[nivel].copy()
+        for medida in MEDIDAS_GEO:
+            valores = tabla[medida] if mascara is None else tabla[medida][mascara]
+            resultado[medida] = np.bincount(codigos, weights=valores, minlength=n)
+        resultado['Pedidos'] = resultado['Pedidos'].astype(np.int64)
+        resultado['Cantidad Pedida'] = resultado['Cantidad Pedida'].astype(np.int64)
+        presentes = np.bincount(codigos, minlength=n) > 0
+        return resultado[presentes].reset_index(drop=True)
+
+    def agregar(self, filtro, nivel='estado'):
+        """Ingresos, unidades y pedidos del filtro por estado, ciudad o código postal; None si el
+        filtro tiene condiciones que las celdas no resuelven (p. ej. un producto)"""
+        columnas = {c for c, _ in filtro.condiciones}
+        if not columnas <= COLUMNAS_FILTRO_GEO:
+            return None
+        if not filtro.condiciones and filtro.desde is None and filtro.hasta is None:
+            return self.totales[nivel].copy()
+
+        tabla = self.celdas[('Categoría' in columnas, 'Rango Precio' in columnas)]
+        dias = np.ones(len(self.dias), dtype=bool)
+        if filtro.desde is not None:
+            dias &= self.dias >= np.datetime64(filtro.desde, 'D')
+        if filtro.hasta is not None:
+            dias &= self.dias <= np.datetime64(filtro.hasta, 'D')
+        lugares = np.ones(len(self.lugares), dtype=bool)
+        mascara = np.ones(len(tabla['lugar']), dtype=bool)
+        for columna, valor in filtro.condiciones:
+            if columna == 'Mes':
+                dias &= self.mes_dia == valor
+            elif columna == 'Día Semana Nombre':
+                dias &= self.semana_dia == valor
+            elif columna in ('Ciudad', 'Estado Nombre'):
+                lugares &= (self.lugares[columna] == str(valor)).to_numpy()
+            elif columna == 'Categoría':
+                mascara &= tabla['categoria'] == self.categorias.get_indexer([str(valor)])[0]
+            else:
+                mascara &= tabla['rango'] == self.rangos.get_indexer([str(valor)])[0]
+        mascara &= dias[tabla['dia']] & lugares[tabla['lugar']]
+        return self._sumar(tabla, mascara, nivel)
+
+    def estado_de_codigo(self, codigo):
+        """Nombre del estado con ese código de dos letras (el que da el clic en el mapa), o None"""
+        estados = self.nombres['estado']
+        encontrados = estados.loc[estados['Estado Codigo'] == codigo, 'Estado Nombre']
+        return encontrados.iloc[0] if len(encontrados) else None
+
+
+# ============================================
+# VERIFICACIÓN
+# ============================================
+def verificar_geo(df):
+    """Compara agregar con groupby de pandas por nivel en varios filtros"""
+    from .consultas import Filtro, filtrar, fuente_en_memoria
+
+    inicio = time.perf_counter()
+    geo = CapaGeo(df[COLUMNAS_GEO])
+    print(f"\n🗺️ CAPA GEO: {len(geo.lugares):,} lugares, {len(geo.celdas[(True, True)]['lugar']):,} celdas "
+          f"({geo.bytes / 1e6:.1f} MB) en {time.perf_counter() - inicio:.2f}s")
+
+    datos = fuente_en_memoria(df)
+    filtros = {
+        'sin filtro': Filtro((), None, None),
+        'California, Marzo': Filtro((('Estado Nombre', 'California'), ('Mes', 'Marzo')), None, None),
+        'Portland, sábados': Filtro((('Ciudad', 'Portland'), ('Día Semana Nombre', 'Sábado')), None, None),
+        'Monitores, 2.º semestre': Filtro((('Categoría', 'Monitores'),), pd.Timestamp('2019-07-01').date(), None),
+        'Premium, Texas': Filtro((('Rango Precio', 'Premium'), ('Estado Nombre', 'Texas')), None, None),
+        'Cables, Económico': Filtro((('Categoría', 'Cables'), ('Rango Precio', 'Económico')), None, None),
+    }
+    todo_ok = True
+    for nombre, filtro in filtros.items():
+        filtradas = filtrar(datos, filtro)
+        for nivel, columnas in NIVELES_GEO.items():
+            inicio = time.perf_counter()
+            rapido = geo.agregar(filtro, nivel)
+            ms = (time.perf_counter() - inicio) * 1000
+            claves = columnas[:1] + columnas[2:] if nivel == 'estado' else columnas
+            esperado = (filtradas.groupby(claves, observed=True)
+                        .agg(ingresos=('Ingreso Total', 'sum'), unidades=('Cantidad Pedida', 'sum'),
+                             pedidos=('Pedido Key', 'nunique')).reset_index())
+            ok = (len(rapido) == len(esperado)
+                  and (rapido[claves].astype(str).to_numpy() == esperado[claves].astype(str).to_numpy()).all()
+                  and np.allclose(rapido['Ingreso Total'], esperado['ingresos'])
+                  and (rapido['Cantidad Pedida'].to_numpy() == esperado['unidades'].to_numpy()).all()
+                  and (rapido['Pedidos'].to_numpy() == esperado['pedidos'].to_numpy()).all())
+            todo_ok &= ok
+            print(f"   {'✅' if ok else '❌'} {nombre} por {nivel}: {len(rapido)} grupos en {ms:.1f} ms")
+    return todo_ok
+
+
+if __name__ == '__main__':
+    from .carga import cargar_ventas
+
+    verificar_geo(cargar_ventas())
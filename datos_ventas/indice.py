@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Índice por fecha sobre datos ordenados por 'Fecha Pedido'.
+
+El pipeline (y cada partición del almacén) deja las filas ordenadas por fecha,
+así que un rango de fechas es un tramo contiguo de filas: se ubica el mes con los
+límites mensuales y dentro del mes se hace una búsqueda binaria.
+"""
+
+import numpy as np
+
+
+class IndiceFechas:
+    """Límites de cada mes y tramos de filas por rango de fechas"""
+
+    def __init__(self, fechas):
+        self.valores = np.asarray(fechas)
+        if len(self.valores) and (self.valores[1:] < self.valores[:-1]).any():
+            raise ValueError("Las fechas deben estar ordenadas para indexarlas")
+
+        meses = self.valores.astype('datetime64[M]')
+        self.inicios = np.concatenate([[0], np.flatnonzero(meses[1:] != meses[:-1]) + 1]) if len(meses) else np.array([], dtype=np.intp)
+        self.finales = np.append(self.inicios[1:], len(self.valores)).astype(np.intp)
+        self.meses = meses[self.inicios]
+
+    def limites(self):
+        """{'AAAA-MM': (primera fila, fila siguiente a la última)}"""
+        return {str(m): (int(i), int(f)) for m, i, f in zip(self.meses, self.inicios, self.finales)}
+
+    def _posicion(self, momento):
+        # Primera fila con fecha >= momento
+        k = np.searchsorted(self.meses, momento.astype('datetime64[M]'))
+        if k == len(self.meses):
+            return len(self.valores)
+        inicio, fin = self.inicios[k], self.finales[k]
+        if self.meses[k] != momento.astype('datetime64[M]'):
+            return int(inicio)
+        return int(inicio + np.searchsorted(self.valores[inicio:fin], momento))
+
+    def tramo(self, desde=None, hasta=None):
+        """slice de las filas con fecha entre desde y hasta (días completos, ambos incluidos)"""
+        i = 0 if desde is None else self._posicion(np.datetime64(desde, 'D'))
+        j = len(self.valores) if hasta is None else self._posicion(np.datetime64(hasta, 'D') + 1)
+        return slice(i, max(i, j))
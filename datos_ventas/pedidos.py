@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Tabla de hechos a nivel pedido, vinculada a las líneas por 'Pedido Key'.
+
+Cada línea lleva una clave entera de su pedido (el ID numérico del CSV), así que
+contar pedidos distintos no necesita hashear textos: se marcan las claves presentes
+en un arreglo de booleanos y se cuentan. Fecha, hora y dirección son las mismas en
+todas las líneas de un pedido; los conteos por esas columnas salen de la tabla de
+pedidos con un simple conteo de filas.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Columnas que comparten todas las líneas de un pedido
+COLUMNAS_PEDIDO = ['ID de Pedido', 'Fecha Pedido', 'Fecha', 'Mes', 'Mes Num', 'Hora', 'Día Semana',
+                   'Día Semana Nombre', 'Ciudad', 'Estado Nombre']
+# Columnas de las líneas que necesita TablaPedidos
+COLUMNAS_TABLA_PEDIDOS = ['Pedido Key'] + COLUMNAS_PEDIDO + ['Ingreso Total', 'Cantidad Pedida']
+
+# Más allá de este factor entre rango de claves y pedidos no conviene el mapa directo
+DISPERSION_MAXIMA = 4
+
+
+def clave_pedido(ids):
+    """Clave entera estable de cada ID: el número del ID, o un hash si no es numérico"""
+    numeros = pd.to_numeric(ids, errors='coerce')
+    if not numeros.isna().any():
+        return numeros.to_numpy(dtype=np.int64)
+    # Hash estable (igual en todos los procesos) en la mitad alta del rango, sin pisar IDs numéricos
+    hashes = pd.util.hash_pandas_object(ids, index=False).to_numpy() >> np.uint64(2)
+    return np.where(numeros.notna(), numeros.fillna(0), hashes.astype(np.int64) | np.int64(1 << 61)).astype(np.int64)
+
+
+class TablaPedidos:
+    """Un pedido por fila: columnas compartidas, total, líneas y unidades"""
+
+    def __init__(self, lineas):
+        # Las líneas en un DataFrame o en partes por tramo de días (almacén): un pedido cae en un solo
+        # día, así que las tablas de cada parte se concatenan sin repetir pedidos
+        if isinstance(lineas, pd.DataFrame):
+            tabla = self._por_pedido(lineas)
+        else:
+            tabla = pd.concat([self._por_pedido(parte) for parte in lineas]).sort_index(kind='stable')
+        self.tabla = tabla.reset_index()
+        self.claves = self.tabla['Pedido Key'].to_numpy()
+
+        # Mapa directo clave -> fila si las claves son densas (IDs consecutivos); si no, búsqueda binaria
+        self.base = int(self.claves[0]) if len(self.claves) else 0
+        rango = int(self.claves[-1]) - self.base + 1 if len(self.claves) else 0
+        self._filas = None
+        if rango <= DISPERSION_MAXIMA * max(len(self.claves), 1):
+            self._filas = np.full(rango, -1, dtype=np.int64)
+            self._filas[self.claves - self.base] = np.arange(len(self.claves))
+
+    @staticmethod
+    def _por_pedido(lineas):
+        columnas = [c for c in COLUMNAS_PEDIDO if c in lineas.columns]
+        grupos = lineas.groupby('Pedido Key', sort=True)
+        tabla = grupos[columnas].first()
+        tabla['Total Pedido'] = grupos['Ingreso Total'].sum()
+        tabla['Lineas'] = grupos.size()
+        tabla['Unidades'] = grupos['Cantidad Pedida'].sum()
+        return tabla
+
+    def __len__(self):
+        return len(self.tabla)
+
+    def filas(self, claves):
+        """Fila de la tabla de cada clave"""
+        claves = np.asarray(claves, dtype=np.int64)
+        if self._filas is not None:
+            return self._filas[claves - self.base]
+        return np.searchsorted(self.claves, claves)
+
+    def marcar(self, claves):
+        """Máscara de los pedidos que tienen al menos una de las líneas dadas"""
+        mascara = np.zeros(len(self.tabla), dtype=bool)
+        mascara[self.filas(claves)] = True
+        return mascara
+
+    def contar(self, claves):
+        """Pedidos distintos entre las claves dadas"""
+        return int(np.count_nonzero(self.marcar(claves)))
+
+    def de_lineas(self, lineas):
+        """Pedidos de las líneas (ya filtradas) dadas"""
+        return self.tabla[self.marcar(lineas['Pedido Key'].to_numpy())]
+
+    def contar_por(self, lineas, claves):
+        """Pedidos distintos por `claves` (columnas de pedido), como groupby(claves).nunique()"""
+        # Solo las columnas del grupo: copiar la tabla entera cuesta más que el conteo
+        mascara = self.marcar(lineas['Pedido Key'].to_numpy())
+        return self.tabla.loc[mascara, claves].groupby(claves).size()
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil de productos precalculado: el producto estrella de cualquier filtro y período sin
+reagrupar las líneas.
+
+Al cargar, las líneas se agrupan una sola vez en celdas (día, ciudad, producto, rango de
+precio) con unidades, ingresos, suma de precios, líneas y pedidos distintos; un pedido cae
+en un solo día y una sola ciudad, así que los pedidos de un producto se suman entre celdas.
+Cada día lleva su mes, su semana ISO y su fecha, de modo que el período top (mes, semana o
+día con más unidades) sale de las mismas celdas.
+
+Para cada filtro se eligen las celdas, se recorta al período pedido y se suma por producto,
+por (producto, mes) y por (producto, ciudad): el mismo perfil que armaba el panel con
+groupby sobre las filas filtradas.
+
+    python -m datos_ventas.productos     # compara el perfil con groupby de pandas
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from .catalogos import mapa_meses, orden_meses, orden_dias
+
+# Columnas de las líneas que necesita PerfilProductos
+COLUMNAS_PERFIL = ['Pedido Key', 'Fecha Pedido', 'Producto', 'Categoría', 'Rango Precio', 'Ciudad', 'Estado Nombre',
+                   'Precio Unitario', 'Ingreso Total', 'Cantidad Pedida']
+# Condiciones de filtro que resuelven las celdas; con otras, perfil devuelve None
+COLUMNAS_FILTRO_PERFIL = {'Ciudad', 'Estado Nombre', 'Mes', 'Día Semana Nombre', 'Categoría', 'Rango Precio'}
+# Análisis del producto estrella -> período del que se toma el top (None: todo el filtro)
+PERIODOS_PERFIL = {'General': None, 'Mes': 'Año Mes', 'Semana': 'Semana', 'Día': 'Fecha'}
+# Menos líneas que estas en el filtro: no hay análisis
+MINIMO_LINEAS = 10
+
+
+def _celdas(lineas):
+    """Productos, lugares y rangos ordenados, primer día y celdas (día, lugar, producto, rango) de las líneas"""
+    producto, productos = pd.factorize(lineas['Producto'].to_numpy(), sort=True)
+    categoria_producto = (pd.Series(lineas['Categoría'].to_numpy()).groupby(producto).first()
+                          .reindex(range(len(productos))).to_numpy())
+    lugar_idx = pd.MultiIndex.from_arrays([lineas['Estado Nombre'].to_numpy(), lineas['Ciudad'].to_numpy()])
+    lugar, lugares = pd.factorize(lugar_idx, sort=True)
+    rango, rangos = pd.factorize(lineas['Rango Precio'].astype(str).to_numpy(), sort=True)
+
+    dias = lineas['Fecha Pedido'].to_numpy().astype('datetime64[D]')
+    inicio = dias.min() if len(dias) else np.datetime64('1970-01-01')
+    dia = (dias - inicio).astype(np.int64)
+
+    # Celdas: una por (día, lugar, producto, rango) con ventas
+    n_lugares, n_productos, n_rangos = len(lugares), len(productos), len(rangos)
+    clave = ((dia * n_lugares + lugar) * n_productos + producto) * n_rangos + rango
+    claves, celda = np.unique(clave, return_inverse=True)
+    n = len(claves)
+    pares = np.unique(pd.factorize(lineas['Pedido Key'].to_numpy())[0].astype(np.int64) * n + celda)
+    celdas = {
+        'unidades': np.bincount(celda, weights=lineas['Cantidad Pedida'].to_numpy(dtype=float), minlength=n),
+        'ingresos': np.bincount(celda, weights=lineas['Ingreso Total'].to_numpy(dtype=float), minlength=n),
+        'precios': np.bincount(celda, weights=lineas['Precio Unitario'].to_numpy(dtype=float), minlength=n),
+        'lineas': np.bincount(celda, minlength=n),
+        'pedidos': np.bincount(pares % n, minlength=n),
+        'rango': claves % n_rangos,
+    }
+    claves //= n_rangos
+    celdas['producto'], claves = claves % n_productos, claves // n_productos
+    celdas['lugar'], celdas['dia'] = claves % n_lugares, claves // n_lugares
+    return {'productos': productos, 'categoria_producto': categoria_producto, 'lugares': lugares, 'rangos': rangos,
+            'inicio': inicio, 'n_dias': int(dia.max()) + 1 if len(dia) else 0, 'celdas': celdas}
+
+
+def _unir_celdas(partes):
+    """Celdas de partes con días disjuntos con los códigos de todas. Los códigos ordenados conservan el
+    orden dentro de cada parte, así que las celdas siguen ordenadas por (día, lugar, producto, rango)"""
+    if len(partes) == 1:
+        return partes[0]
+    productos = np.unique(np.concatenate([parte['productos'] for parte in partes]).astype(object))
+    lugares = pd.MultiIndex.from_tuples(sorted(set().union(*(parte['lugares'] for parte in partes))))
+    rangos = np.unique(np.concatenate([parte['rangos'] for parte in partes]).astype(object))
+    inicio = min(parte['inicio'] for parte in partes)
+    categoria_producto = np.empty(len(productos), dtype=object)
+    celdas = {medida: [] for medida in partes[0]['celdas']}
+    n_dias = 0
+    # La categoría de un producto es la de su primera línea: se recorre de la última parte a la primera
+    for parte in partes[::-1]:
+        categoria_producto[pd.Index(productos).get_indexer(parte['productos'])] = parte['categoria_producto']
+    for parte in partes:
+        desde = int((parte['inicio'] - inicio).astype(np.int64))
+        n_dias = max(n_dias, desde + parte['n_dias'])
+        codigos = {'producto': pd.Index(productos).get_indexer(parte['productos']),
+                   'lugar': lugares.get_indexer(parte['lugares']), 'rango': pd.Index(rangos).get_indexer(parte['rangos'])}
+        for medida, valores in parte['celdas'].items():
+            if medida in codigos:
+                valores = codigos[medida][valores]
+            elif medida == 'dia':
+                valores = valores + desde
+            celdas[medida].append(valores)
+    return {'productos': productos, 'categoria_producto': categoria_producto, 'lugares': lugares, 'rangos': rangos,
+            'inicio': inicio, 'n_dias': n_dias, 'celdas': {medida: np.concatenate(v) for medida, v in celdas.items()}}
+
+
+class PerfilProductos:
+    """Celdas (día, ciudad, producto, rango de precio) con las medidas del perfil de productos"""
+
+    def __init__(self, lineas):
+        # Las líneas en un DataFrame o en partes por tramo de días (almacén): cada parte se arma con sus
+        # propios códigos y después se pasa a los de todas
+        if isinstance(lineas, pd.DataFrame):
+            partes = _celdas(lineas)
+        else:
+            partes = _unir_celdas([_celdas(parte) for parte in lineas])
+        self.productos, self.categoria_producto = partes['productos'], partes['categoria_producto']
+        self.celdas = partes['celdas']
+        # Lugar: (estado, ciudad); el perfil agrupa por nombre de ciudad, como groupby('Ciudad')
+        lugares = partes['lugares']
+        self.estado_lugar = lugares.get_level_values(0).to_numpy()
+        self.ciudad_lugar, self.ciudades = pd.factorize(lugares.get_level_values(1), sort=True)
+        self.rangos = pd.Index(partes['rangos'])
+
+        # Días del rango con su mes, día de la semana y períodos del análisis
+        self.dias = partes['inicio'] + np.arange(partes['n_dias'])
+        mes_num = self.dias.astype('datetime64[M]').astype(np.int64) % 12
+        self.mes_dia = np.asarray(orden_meses, dtype=object)[mes_num]
+        self.semana_dia = np.asarray(orden_dias, dtype=object)[(self.dias.astype(np.int64) + 3) % 7]
+        calendario = pd.DatetimeIndex(self.dias)
+        iso = calendario.isocalendar()
+        self.periodos = {
+            'Año Mes': calendario.strftime('%Y-%m').to_numpy(),
+            'Semana': (iso['year'].astype(str) + '-W' + iso['week'].astype(str).str.zfill(2)).to_numpy(),
+            'Fecha': calendario.strftime('%Y-%m-%d').to_numpy(),
+        }
+        # Meses del perfil por nombre (la estacionalidad agrupa enero de todos los años)
+        self.meses, self.mes_codigo_dia = np.unique(self.mes_dia.astype(str), return_inverse=True)
+
+    def __len__(self):
+        return len(self.celdas['dia'])
+
+    @property
+    def bytes(self):
+        return sum(a.nbytes for a in self.celdas.values())
+
+    def mascara(self, filtro):
+        """Celdas del filtro, o None si tiene condiciones que las celdas no resuelven (p. ej. un producto)"""
+        if not {c for c, _ in filtro.condiciones} <= COLUMNAS_FILTRO_PERFIL:
+            return None
+        celdas = self.celdas
+        dias = np.ones(len(self.dias), dtype=bool)
+        if filtro.desde is not None:
+            dias &= self.dias >= np.datetime64(filtro.desde, 'D')
+        if filtro.hasta is not None:
+            dias &= self.dias <= np.datetime64(filtro.hasta, 'D')
+        lugares = np.ones(len(self.estado_lugar), dtype=bool)
+        productos = np.ones(len(self.productos), dtype=bool)
+        mascara = np.ones(len(self), dtype=bool)
+        for columna, valor in filtro.condiciones:
+            if columna == 'Mes':
+                dias &= self.mes_dia == valor
+            elif columna == 'Día Semana Nombre':
+                dias &= self.semana_dia == valor
+            elif columna == 'Estado Nombre':
+                lugares &= self.estado_lugar == str(valor)
+            elif columna == 'Ciudad':
+                lugares &= self.ciudades[self.ciudad_lugar] == str(valor)
+            elif columna == 'Categoría':
+                productos &= self.categoria_producto == str(valor)
+            else:
+                mascara &= celdas['rango'] == self.rangos.get_indexer([str(valor)])[0]
+        return mascara & dias[celdas['dia']] & lugares[celdas['lugar']] & productos[celdas['producto']]
+
+    def periodo_top(self, mascara, periodo):
+        """(valor, celdas) del período con más unidades dentro de la máscara; ante empates, el primero"""
+        valores, codigo_dia = np.unique(self.periodos[periodo], return_inverse=True)
+        dia = self.celdas['dia'][mascara]
+        por_periodo = np.bincount(codigo_dia[dia], weights=self.celdas['unidades'][mascara], minlength=len(valores))
+        top = int(np.argmax(por_periodo))
+        return valores[top], mascara & (codigo_dia[self.celdas['dia']] == top)
+
+    def perfil(self, mascara):
+        """Totales por producto, unidades por (producto, mes) y ciudades top, como construir_perfil_productos"""
+        c = {medida: valores[mascara] for medida, valores in self.celdas.items()}
+        n = len(self.productos)
+        lineas = np.bincount(c['producto'], weights=c['lineas'], minlength=n)
+        presentes = lineas > 0
+        totales = pd.DataFrame({
+            'Cantidad Pedida': np.bincount(c['producto'], weights=c['unidades'], minlength=n).astype(np.int64),
+            'Ingreso Total': np.bincount(c['producto'], weights=c['ingresos'], minlength=n),
+            'Pedido Key': np.bincount(c['producto'], weights=c['pedidos'], minlength=n).astype(np.int64),
+            'Precio Unitario': np.bincount(c['producto'], weights=c['precios'], minlength=n) / np.maximum(lineas, 1),
+        }, index=pd.Index(self.productos, name='Producto'))[presentes]
+        totales = totales.sort_values('Cantidad Pedida', ascending=False)
+
+        por_mes = self._por_producto(c, self.mes_codigo_dia[c['dia']], self.meses, 'Mes')
+        por_ciudad = self._por_producto(c, self.ciudad_lugar[c['lugar']], self.ciudades, 'Ciudad')
+        ciudades_top = por_ciudad.sort_values(ascending=False).groupby(level='Producto').head(3)
+        return {
+            'totales': totales,
+            'por_mes': por_mes,
+            'ciudades_top': ciudades_top,
+            'precio_promedio': c['precios'].sum() / c['lineas'].sum() if c['lineas'].sum() else np.nan,
+        }
+
+    def _por_producto(self, c, codigos, nombres, columna):
+        """Unidades por (producto, código) de las celdas elegidas; solo los pares con líneas"""
+        k = len(nombres)
+        pares = c['producto'] * k + codigos
+        unidades = np.bincount(pares, weights=c['unidades'], minlength=len(self.productos) * k)
+        presentes = np.flatnonzero(np.bincount(pares, weights=c['lineas'], minlength=len(self.productos) * k))
+        indice = pd.MultiIndex.from_arrays([self.productos[presentes // k], np.asarray(nombres)[presentes % k]],
+                                           names=['Producto', columna])
+        return pd.Series(unidades[presentes].astype(np.int64), index=indice, name='Cantidad Pedida')
+
+    def analizar(self, filtro, analisis, mes='Todos'):
+        """(perfil, etiqueta del período) del producto estrella; (None, None) si hay menos de
+        MINIMO_LINEAS líneas, o None si el filtro no se resuelve con las celdas"""
+        mascara = self.mascara(filtro)
+        if mascara is None:
+            return None
+        if not self.celdas['lineas'][mascara].sum():
+            return None, None
+        periodo = PERIODOS_PERFIL.get(analisis, 'Fecha')
+        if periodo is None:
+            etiqueta = "GLOBAL"
+        elif periodo == 'Año Mes' and mes != 'Todos':
+            etiqueta = f"MES: {mes}"
+        else:
+            valor, mascara = self.periodo_top(mascara, periodo)
+            if periodo == 'Año Mes':
+                anio, numero = valor.split('-')
+                etiqueta = f"MES: {mapa_meses[int(numero)]} {anio} (top)"
+            else:
+                etiqueta = f"SEMANA: {valor}" if periodo == 'Semana' else f"DÍA PICO: {valor}"
+        if self.celdas['lineas'][mascara].sum() < MINIMO_LINEAS:
+            return None, None
+        return self.perfil(mascara), etiqueta
+
+
+# ============================================
+# VERIFICACIÓN
+# ============================================
+def perfil_pandas(data):
+    """Perfil con groupby sobre las filas (la referencia de verificar_perfil)"""
+    totales = data.groupby('Producto').agg({
+        'Cantidad Pedida': 'sum', 'Ingreso Total': 'sum', 'Pedido Key': 'nunique', 'Precio Unitario': 'mean'
+    }).sort_values('Cantidad Pedida', ascending=False)
+    por_ciudad = data.groupby(['Producto', 'Ciudad'])['Cantidad Pedida'].sum()
+    return {
+        'totales': totales,
+        'por_mes': data.groupby(['Producto', 'Mes'])['Cantidad Pedida'].sum(),
+        'ciudades_top': por_ciudad.sort_values(ascending=False).groupby(level='Producto').head(3),
+        'precio_promedio': data['Precio Unitario'].mean(),
+    }
+
+
+def verificar_perfil(df):
+    """Compara el perfil y el período top con groupby de pandas en varios filtros y análisis"""
+    from .consultas import Filtro, filtrar, fuente_en_memoria
+
+    inicio = time.perf_counter()
+    perfil = PerfilProductos(df[COLUMNAS_PERFIL])
+    print(f"\n🏆 PERFIL DE PRODUCTOS: {len(perfil):,} celdas ({perfil.bytes / 1e6:.1f} MB) "
+          f"en {time.perf_counter() - inicio:.2f}s")
+
+    datos = fuente_en_memoria(df)
+    filtros = {
+        'sin filtro': Filtro((), None, None),
+        'California': Filtro((('Estado Nombre', 'California'),), None, None),
+        'Portland, sábados': Filtro((('Ciudad', 'Portland'), ('Día Semana Nombre', 'Sábado')), None, None),
+        'Monitores, 2.º semestre': Filtro((('Categoría', 'Monitores'),), pd.Timestamp('2019-07-01').date(), None),
+        'Premium, Marzo': Filtro((('Rango Precio', 'Premium'), ('Mes', 'Marzo')), None, None),
+    }
+    columnas_periodo = {'Año Mes': 'Año Mes', 'Semana': 'Semana', 'Fecha': 'Fecha'}
+    todo_ok = True
+    for nombre, filtro in filtros.items():
+        filtradas = filtrar(datos, filtro)
+        for analisis, periodo in PERIODOS_PERFIL.items():
+            inicio = time.perf_counter()
+            rapido, etiqueta = perfil.analizar(filtro, analisis)
+            ms = (time.perf_counter() - inicio) * 1000
+            filas = filtradas
+            if periodo is not None:
+                claves = filas[columnas_periodo[periodo]].astype(str)
+                top = filas.groupby(claves)['Cantidad Pedida'].sum().idxmax()
+                filas = filas[claves == top]
+            esperado = perfil_pandas(filas)
+            ok = (rapido['totales'].index.equals(esperado['totales'].index)
+                  and np.allclose(rapido['totales'].to_numpy(dtype=float), esperado['totales'].to_numpy(dtype=float))
+                  and rapido['por_mes'].equals(esperado['por_mes'].astype(np.int64).rename('Cantidad Pedida'))
+                  and rapido['ciudades_top'].index.equals(esperado['ciudades_top'].index)
+                  and np.isclose(rapido['precio_promedio'], esperado['precio_promedio']))
+            todo_ok &= ok
+            print(f"   {'✅' if ok else '❌'} {nombre}, {analisis}: {etiqueta} | "
+                  f"{rapido['totales'].index[0]} en {ms:.1f} ms")
+    return todo_ok
+
+
+if __name__ == '__main__':
+    from .carga import cargar_ventas
+
+    verificar_perfil(cargar_ventas())
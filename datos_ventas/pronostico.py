@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Pronóstico de ingresos diarios por producto, categoría y estado (y el total).
+
+Cada serie se ajusta con Holt-Winters aditivo con tendencia amortiguada y estación
+semanal. Los parámetros (alfa, beta, gamma, amortiguación) se eligen por búsqueda en
+grilla minimizando el error a un paso; la recursión avanza día a día pero cada paso
+actualiza a la vez todas las series y todas las combinaciones de la grilla.
+
+El ajuste corre una sola vez al cargar, repartido en un pool de procesos, y el estado
+final de cada serie se guarda como JSON junto a la caché (pronostico_<versión>.json). El
+pronóstico y su banda salen de ese estado con fórmulas cerradas: las vistas del panel
+solo eligen la serie que corresponde al filtro.
+
+    VENTAS_HORIZONTE=30                 días pronosticados
+    VENTAS_PRONOSTICO_TRABAJADORES=4    procesos del ajuste (1: en el proceso actual)
+
+Prueba contra los últimos días reservados y contra la estación ingenua:
+
+    python -m datos_ventas.pronostico
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .archivos import guardar_json
+from .carga import CARPETA_CACHE
+
+# Días pronosticados y procesos del ajuste
+HORIZONTE_PRONOSTICO = int(os.environ.get('VENTAS_HORIZONTE', 30))
+TRABAJADORES_PRONOSTICO = int(os.environ.get('VENTAS_PRONOSTICO_TRABAJADORES', min(8, os.cpu_count() or 1)))
+
+# Columnas del dataset que necesita el ajuste y dimensiones con una serie por valor
+COLUMNAS_PRONOSTICO = ['Fecha Pedido', 'Producto', 'Categoría', 'Estado Nombre', 'Ingreso Total']
+DIMENSIONES_PRONOSTICO = ['Producto', 'Categoría', 'Estado Nombre']
+
+# Estación semanal, banda del 95% y grilla de parámetros. Con residuos normales la banda sería
+# de 1.96 desvíos, pero en los días reservados cubría ~87%: el z se calibra con VENTANAS_BANDA
+# backtests de RESERVA_BANDA días (calibrar_banda), Z_BANDA queda para series demasiado cortas
+# y el panel muestra la cobertura medida fuera de la calibración (medir_cobertura)
+ESTACION = 7
+Z_BANDA = 1.96
+COBERTURA_BANDA = 0.95
+RESERVA_BANDA = 28
+VENTANAS_BANDA = 4
+ALFAS = [0.05, 0.1, 0.2, 0.3, 0.5, 0.7]
+BETAS = [0.0, 0.02, 0.05, 0.1, 0.2]
+GAMMAS = [0.01, 0.05, 0.1, 0.2, 0.3]
+AMORTIGUACIONES = [0.9, 0.98]
+
+
+# ============================================
+# SERIES DIARIAS
+# ============================================
+def series_diarias(lineas):
+    """(días, claves, matriz): ingresos por día de cada serie, una fila por clave (columna, valor);
+    la primera es el total con clave (None, None)"""
+    dias_linea = lineas['Fecha Pedido'].to_numpy().astype('datetime64[D]')
+    inicio = dias_linea.min()
+    dia = (dias_linea - inicio).astype(np.int64)
+    n_dias = int(dia.max()) + 1
+    ingresos = lineas['Ingreso Total'].to_numpy(dtype=float)
+
+    claves = [(None, None)]
+    filas = [np.bincount(dia, weights=ingresos, minlength=n_dias)]
+    for columna in DIMENSIONES_PRONOSTICO:
+        codigos, valores = pd.factorize(lineas[columna].astype(str), sort=True)
+        matriz = np.bincount(codigos * n_dias + dia, weights=ingresos, minlength=len(valores) * n_dias)
+        claves += [(columna, v) for v in valores]
+        filas += list(matriz.reshape(len(valores), n_dias))
+    return inicio + np.arange(n_dias), claves, np.vstack(filas)
+
+
+def unir_series_diarias(partes):
+    """series_diarias de todas las líneas a partir de las de cada tramo de días (p. ej. una
+    partición del almacén por vez): los días no se solapan, las claves se unen"""
+    partes = list(partes)
+    inicio = min(dias[0] for dias, _, _ in partes)
+    n_dias = int((max(dias[-1] for dias, _, _ in partes) - inicio) // np.timedelta64(1, 'D')) + 1
+    filas = {}
+    for dias, claves, matriz in partes:
+        desde = int((dias[0] - inicio) // np.timedelta64(1, 'D'))
+        for clave, fila in zip(claves, matriz):
+            filas.setdefault(clave, np.zeros(n_dias))[desde:desde + len(fila)] += fila
+    claves = [(None, None)] + [(columna, valor) for columna in DIMENSIONES_PRONOSTICO
+                               for valor in sorted(v for c, v in filas if c == columna)]
+    return inicio + np.arange(n_dias), claves, np.vstack([filas[c] for c in claves])
+
+
+# ============================================
+# HOLT-WINTERS
+# ============================================
+def _grilla():
+    return [g.ravel() for g in np.meshgrid(ALFAS, BETAS, GAMMAS, AMORTIGUACIONES, indexing='ij')]
+
+
+def ajustar_holt_winters(matriz, estacion=ESTACION):
+    """Mejor combinación de la grilla y estado final de cada fila de `matriz` (series x días).
+    Forma de corrección del error: e = y - (nivel + phi*tendencia + s)"""
+    y = np.asarray(matriz, dtype=float)
+    k, n = y.shape
+    alfa, beta, gamma, phi = _grilla()
+
+    # Inicio con las dos primeras semanas: nivel, pendiente entre ellas y desvíos de la primera
+    primera = y[:, :estacion].mean(axis=1)
+    pendiente = (y[:, estacion:2 * estacion].mean(axis=1) - primera) / estacion
+    nivel = np.repeat(primera[:, None], len(alfa), axis=1)
+    tendencia = np.repeat(pendiente[:, None], len(alfa), axis=1)
+    estaciones = np.repeat((y[:, :estacion] - primera[:, None])[:, None, :], len(alfa), axis=1)
+    sse = np.zeros_like(nivel)
+
+    for t in range(n):
+        s = estaciones[:, :, t % estacion]
+        error = y[:, t, None] - (nivel + phi * tendencia + s)
+        if t >= estacion:
+            sse += error ** 2
+        nivel = nivel + phi * tendencia + alfa * error
+        tendencia = phi * tendencia + alfa * beta * error
+        estaciones[:, :, t % estacion] = s + gamma * error
+
+    mejor = sse.argmin(axis=1)
+    filas = np.arange(k)
+    return {
+        'alfa': alfa[mejor], 'beta': beta[mejor], 'gamma': gamma[mejor], 'phi': phi[mejor],
+        'nivel': nivel[filas, mejor], 'tendencia': tendencia[filas, mejor],
+        'estaciones': estaciones[filas, mejor],
+        'sigma': np.sqrt(sse[filas, mejor] / max(n - estacion, 1)),
+        # Posición en la estación del primer día pronosticado
+        'fase': np.full(k, n % estacion),
+    }
+
+
+def ajustar_en_pool(matriz, trabajadores=TRABAJADORES_PRONOSTICO):
+    """ajustar_holt_winters repartiendo las filas entre procesos"""
+    trabajadores = min(trabajadores, len(matriz))
+    if trabajadores <= 1:
+        return ajustar_holt_winters(matriz)
+    # Con fork los procesos reciben su parte sin reimportar el panel
+    contexto = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(trabajadores, mp_context=contexto) as pool:
+        partes = list(pool.map(ajustar_holt_winters, np.array_split(matriz, trabajadores)))
+    return {clave: np.concatenate([p[clave] for p in partes]) for clave in partes[0]}
+
+
+def calibrar_banda(matriz, reserva=RESERVA_BANDA, ventanas=VENTANAS_BANDA, cobertura=COBERTURA_BANDA,
+                   trabajadores=TRABAJADORES_PRONOSTICO):
+    """z que cubre `cobertura` de los días reservados: en cada una de las últimas `ventanas` ventanas de
+    `reserva` días se ajusta con los días anteriores y se mide |real - pronóstico| en desvíos del
+    pronóstico a h pasos; el z es el cuantil de todos esos errores juntos"""
+    errores = []
+    for ventana in range(ventanas):
+        fin = matriz.shape[1] - ventana * reserva
+        if fin - reserva < 2 * ESTACION:
+            break
+        ajuste = ajustar_en_pool(matriz[:, :fin - reserva], trabajadores)
+        # Con z=0 el borde superior es el pronóstico sin recortar; con z=1, un desvío por encima
+        _, _, centro = pronosticar(ajuste, reserva, z=0)
+        _, _, borde = pronosticar(ajuste, reserva, z=1)
+        desvio = borde - centro
+        validos = desvio > 0
+        errores.append(np.abs(matriz[:, fin - reserva:fin] - centro)[validos] / desvio[validos])
+    errores = np.concatenate(errores) if errores else np.empty(0)
+    return float(np.quantile(errores, cobertura)) if errores.size else Z_BANDA
+
+
+def medir_cobertura(matriz, reserva=RESERVA_BANDA, trabajadores=TRABAJADORES_PRONOSTICO):
+    """Parte de los últimos `reserva` días dentro de la banda, con el ajuste y la calibración hechos
+    sin esos días (lo que se puede esperar del pronóstico); None si la serie es demasiado corta"""
+    if matriz.shape[1] < 2 * reserva + 2 * ESTACION:
+        return None
+    entrenamiento, prueba = matriz[:, :-reserva], matriz[:, -reserva:]
+    z = calibrar_banda(entrenamiento, reserva, trabajadores=trabajadores)
+    _, inferior, superior = pronosticar(ajustar_en_pool(entrenamiento, trabajadores), reserva, z=z)
+    return float(((prueba >= inferior) & (prueba <= superior)).mean())
+
+
+def pronosticar(ajuste, horizonte=HORIZONTE_PRONOSTICO, estacion=ESTACION, z=Z_BANDA):
+    """(media, inferior, superior) de forma series x horizonte a partir del estado final"""
+    h = np.arange(1, horizonte + 1)
+    phi = ajuste['phi'][:, None]
+    # Suma phi + phi**2 + ... + phi**h de la tendencia amortiguada
+    amortiguada = np.cumsum(phi ** h, axis=1)
+    posicion = (ajuste['fase'][:, None] + h - 1) % estacion
+    s = np.take_along_axis(ajuste['estaciones'], posicion, axis=1)
+    media = ajuste['nivel'][:, None] + amortiguada * ajuste['tendencia'][:, None] + s
+
+    # Varianza a h pasos: sigma**2 * (1 + suma de c_j**2), c_j = alfa*(1 + beta*phi_j) + gamma*[j múltiplo de la estación]
+    j = h[:-1]
+    c = (ajuste['alfa'][:, None] * (1 + ajuste['beta'][:, None] * amortiguada[:, :-1])
+         + ajuste['gamma'][:, None] * (j % estacion == 0))
+    varianza = 1 + np.concatenate([np.zeros((len(media), 1)), np.cumsum(c ** 2, axis=1)], axis=1)
+    ancho = z * ajuste['sigma'][:, None] * np.sqrt(varianza)
+    # Ingresos no negativos
+    return np.maximum(media, 0), np.maximum(media - ancho, 0), media + ancho
+
+
+# ============================================
+# TABLA DE PRONÓSTICOS
+# ============================================
+class TablaPronosticos:
+    """Estado ajustado de cada serie y su pronóstico ya calculado"""
+
+    def __init__(self, claves, ajuste, inicio, horizonte=HORIZONTE_PRONOSTICO, z=Z_BANDA, cobertura=None):
+        self.claves = [tuple(c) for c in claves]
+        self._filas = {clave: i for i, clave in enumerate(self.claves)}
+        self.ajuste = ajuste
+        # Primer día pronosticado
+        self.inicio = np.datetime64(inicio, 'D')
+        self.horizonte = horizonte
+        # Desvíos de la banda, calibrados con backtests (calibrar_banda), y su cobertura medida (medir_cobertura)
+        self.z = z
+        self.cobertura = cobertura
+        self.fechas = pd.DatetimeIndex(self.inicio + np.arange(horizonte))
+        self.media, self.inferior, self.superior = pronosticar(ajuste, horizonte, z=z)
+
+    @classmethod
+    def ajustar(cls, lineas, horizonte=HORIZONTE_PRONOSTICO, trabajadores=TRABAJADORES_PRONOSTICO):
+        # `lineas` es un DataFrame o un iterable de DataFrames por tramo de días (almacen.recorrer)
+        if isinstance(lineas, pd.DataFrame):
+            dias, claves, matriz = series_diarias(lineas)
+        else:
+            dias, claves, matriz = unir_series_diarias(series_diarias(parte) for parte in lineas)
+        # El último día puede estar incompleto (los CSV cortan a cualquier hora): se ajusta hasta
+        # el anterior y el pronóstico empieza en él
+        matriz = matriz[:, :-1]
+        return cls(claves, ajustar_en_pool(matriz, trabajadores), dias[-1], horizonte,
+                   calibrar_banda(matriz, trabajadores=trabajadores), medir_cobertura(matriz, trabajadores=trabajadores))
+
+    @property
+    def etiqueta_banda(self):
+        """Nombre de la banda en los gráficos, con la cobertura medida si se pudo medir"""
+        etiqueta = f"Banda {COBERTURA_BANDA:.0%}"
+        return etiqueta if self.cobertura is None else f"{etiqueta} (medida: {self.cobertura:.0%})"
+
+    def a_dict(self):
+        return {
+            'inicio': str(self.inicio), 'horizonte': self.horizonte, 'estacion': ESTACION, 'z': self.z,
+            'cobertura': self.cobertura,
+            'claves': [list(c) for c in self.claves],
+            'ajuste': {clave: valores.tolist() for clave, valores in self.ajuste.items()},
+        }
+
+    @classmethod
+    def de_dict(cls, datos):
+        ajuste = {clave: np.asarray(valores) for clave, valores in datos['ajuste'].items()}
+        return cls(datos['claves'], ajuste, datos['inicio'], datos['horizonte'], datos['z'], datos.get('cobertura'))
+
+    def serie(self, columna=None, valor=None):
+        """DataFrame Fecha, Pronóstico, Inferior, Superior de la serie, o None si no se ajustó"""
+        fila = self._filas.get((columna, None if valor is None else str(valor)))
+        if fila is None:
+            return None
+        return pd.DataFrame({'Fecha': self.fechas, 'Pronóstico': self.media[fila],
+                             'Inferior': self.inferior[fila], 'Superior': self.superior[fila]})
+
+    def total(self, columna=None, valor=None):
+        """Ingresos pronosticados en todo el horizonte, o None"""
+        fila = self._filas.get((columna, None if valor is None else str(valor)))
+        return None if fila is None else float(self.media[fila].sum())
+
+    def clave_filtro(self, filtro):
+        """Serie que corresponde al filtro del panel: el total o una sola dimensión ajustada, sin
+        recortes de calendario y con el rango de fechas llegando al final de los datos"""
+        if filtro.hasta is not None and np.datetime64(filtro.hasta, 'D') < self.inicio:
+            return None
+        if not filtro.condiciones:
+            return (None, None)
+        if len(filtro.condiciones) == 1 and filtro.condiciones[0][0] in DIMENSIONES_PRONOSTICO:
+            columna, valor = filtro.condiciones[0]
+            return (columna, str(valor)) if (columna, str(valor)) in self._filas else None
+        return None
+
+    def para_filtro(self, filtro):
+        clave = self.clave_filtro(filtro)
+        return None if clave is None else self.serie(*clave)
+
+    def para_cliente(self):
+        """Pronósticos serializables para el navegador: {'columna|valor': [media, inferior, superior]}"""
+        return {
+            'inicio': str(self.inicio), 'horizonte': self.horizonte, 'etiqueta': self.etiqueta_banda,
+            'series': {'' if c[0] is None else f"{c[0]}|{c[1]}":
+                       [np.round(a[i], 2).tolist() for a in (self.media, self.inferior, self.superior)]
+                       for i, c in enumerate(self.claves)},
+        }
+
+
+def crear_pronosticos(lineas, version=None, carpeta=CARPETA_CACHE, horizonte=HORIZONTE_PRONOSTICO,
+                      trabajadores=TRABAJADORES_PRONOSTICO):
+    """Pronósticos de la versión de datos: del JSON guardado si existe, si no se ajustan y se guardan"""
+    ruta = os.path.join(carpeta, f"pronostico_{version}.json") if version else None
+    if ruta and os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as f:
+            datos = json.load(f)
+        # Los guardados antes de calibrar la banda no traen 'z': se vuelven a ajustar
+        if datos.get('horizonte') == horizonte and datos.get('estacion') == ESTACION and 'z' in datos:
+            return TablaPronosticos.de_dict(datos)
+
+    inicio = time.perf_counter()
+    tabla = TablaPronosticos.ajustar(lineas, horizonte, trabajadores)
+    print(f"\n🔮 Pronósticos: {len(tabla.claves)} series ajustadas en {time.perf_counter() - inicio:.1f} s "
+          f"({trabajadores} procesos)")
+    if ruta:
+        guardar_json(tabla.a_dict(), ruta)
+    return tabla
+
+
+# ============================================
+# PRUEBA
+# ============================================
+def verificar_pronosticos(df, reserva=28):
+    """Ajusta sin los últimos `reserva` días completos y compara con lo ocurrido: error (WAPE) de
+    Holt-Winters y de repetir la última semana, y cobertura de la banda (calibrada antes de esos
+    días, como en el panel). Devuelve un DataFrame"""
+    dias, claves, matriz = series_diarias(df[COLUMNAS_PRONOSTICO])
+    # Sin el último día (incompleto), como en el ajuste del panel
+    matriz = matriz[:, :-1]
+    entrenamiento, prueba = matriz[:, :-reserva], matriz[:, -reserva:]
+
+    inicio = time.perf_counter()
+    ajuste = ajustar_en_pool(entrenamiento)
+    segundos = time.perf_counter() - inicio
+    z = calibrar_banda(entrenamiento)
+    media, inferior, superior = pronosticar(ajuste, reserva, z=z)
+    ingenuo = np.tile(entrenamiento[:, -ESTACION:], (1, -(-reserva // ESTACION)))[:, :reserva]
+
+    def wape(estimado):
+        return np.abs(estimado - prueba).sum(axis=1) / np.maximum(prueba.sum(axis=1), 1)
+
+    resultado = pd.DataFrame({
+        'Dimensión': ['Total' if c is None else c for c, _ in claves],
+        'Serie': ['Total' if v is None else v for _, v in claves],
+        'WAPE Holt-Winters': wape(media), 'WAPE ingenuo': wape(ingenuo),
+        'Cobertura': ((prueba >= inferior) & (prueba <= superior)).mean(axis=1),
+        'alfa': ajuste['alfa'], 'beta': ajuste['beta'], 'gamma': ajuste['gamma'], 'phi': ajuste['phi'],
+    })
+    print(f"\n   • {len(claves)} series x {entrenamiento.shape[1]} días ajustadas en {segundos:.2f}s "
+          f"({TRABAJADORES_PRONOSTICO} procesos), {reserva} días de prueba, banda de {z:.2f} desvíos "
+          f"(1.96 con residuos normales)")
+    return resultado
+
+
+if __name__ == '__main__':
+    from .carga import cargar_ventas
+
+    print("\n🔮 PRONÓSTICO CONTRA LOS ÚLTIMOS DÍAS")
+    resultado = verificar_pronosticos(cargar_ventas())
+    print(resultado.round(3).to_string(index=False))
+    por_dimension = resultado.groupby('Dimensión', sort=False)[['WAPE Holt-Winters', 'WAPE ingenuo', 'Cobertura']].mean()
+    print("\n" + por_dimension.round(3).to_string())
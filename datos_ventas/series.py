@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+Series de tiempo densas por segmento, precalculadas al cargar y recortadas por filtro.
+
+Cada línea cae en una celda (día, hora, segmento), donde el segmento es ciudad, estado,
+categoría y rango de precio. Por celda se guardan ingresos (en centavos, enteros
+exactos), unidades, líneas y pedidos en arreglos densos de forma (días, 24, segmentos),
+y su suma por día. Mes y día de la semana dependen del día, así que cualquier filtro del
+panel elige días y segmentos, y una serie es una suma sobre ejes, sin recorrer líneas.
+
+Los pedidos de un segmento no se suman entre segmentos (un pedido puede tener productos
+de varias categorías), pero día, hora y dirección son las mismas en todo el pedido: como
+en el cubo del modo cliente, cada pedido se cuenta en un segmento representante según
+los filtros de producto activos.
+
+Sobre una serie: media móvil, acumulado, variación contra N días antes y remuestreo a
+semanas o meses, todo con NumPy.
+
+    python -m datos_ventas.series     # paridad con groupby de pandas y tiempos
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from .catalogos import mapa_meses, dias_espanol
+
+# Columnas del dataset que necesita la tabla de series
+COLUMNAS_SERIES = ['Fecha Pedido', 'Ciudad', 'Estado Nombre', 'Categoría', 'Rango Precio',
+                   'Pedido Key', 'Cantidad Pedida', 'Ingreso Total']
+# Claves de los segmentos y columnas que dependen del día (o de la hora)
+COLUMNAS_SEGMENTO = ['Ciudad', 'Estado Nombre', 'Categoría', 'Rango Precio']
+COLUMNAS_CALENDARIO = ['Fecha', 'Mes', 'Mes Num', 'Día Semana', 'Día Semana Nombre']
+COLUMNAS_TIEMPO = set(COLUMNAS_CALENDARIO) | {'Hora'}
+
+# Medida de una agregación (función, columna de origen) -> arreglo de la tabla
+MEDIDAS_SERIE = {
+    ('sum', 'Ingreso Total'): 'centavos',
+    ('sum', 'Cantidad Pedida'): 'unidades',
+    ('count', None): 'lineas',
+    ('nunique', 'Pedido Key'): 'pedidos',
+}
+# Nombre de cada arreglo en las series y la tendencia
+NOMBRES_MEDIDA = {'centavos': 'Ingreso Total', 'unidades': 'Cantidad Pedida', 'lineas': 'Filas', 'pedidos': 'Pedidos'}
+
+
+def _entero_chico(valores):
+    """Arreglo con el entero sin signo más chico que alcance para su máximo"""
+    maximo = int(valores.max()) if valores.size else 0
+    dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64) if maximo <= np.iinfo(t).max)
+    return valores.astype(dtype)
+
+
+# ============================================
+# OPERACIONES SOBRE UNA SERIE
+# ============================================
+def media_movil(dias, valores, ventana=7):
+    """Promedio de los días presentes en [día - ventana + 1, día] (días de calendario, no posiciones)"""
+    acumulado = np.concatenate([[0.0], np.cumsum(valores, dtype=float)])
+    inicio = np.searchsorted(dias, dias - np.timedelta64(ventana - 1, 'D'))
+    fin = np.arange(1, len(dias) + 1)
+    return (acumulado[fin] - acumulado[inicio]) / (fin - inicio)
+
+
+def acumulado(valores):
+    return np.cumsum(valores)
+
+
+def variacion(dias, valores, dias_atras=7):
+    """Variación (%) contra el valor de `dias_atras` días antes; NaN si ese día no está en la serie o es cero"""
+    anteriores = dias - np.timedelta64(dias_atras, 'D')
+    posicion = np.searchsorted(dias, anteriores)
+    presente = posicion < len(dias)
+    presente[presente] = dias[posicion[presente]] == anteriores[presente]
+    previo = np.full(len(valores), np.nan)
+    previo[presente] = np.asarray(valores, dtype=float)[posicion[presente]]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(previo > 0, (valores - previo) / previo * 100, np.nan)
+
+
+def remuestrear(dias, valores, frecuencia='W'):
+    """Sumas por semana (lunes a domingo, 'W') o por mes ('M'): (inicio de cada período, sumas)"""
+    dias = np.asarray(dias, dtype='datetime64[D]')
+    if frecuencia == 'M':
+        periodos = dias.astype('datetime64[M]').astype('datetime64[D]')
+    elif frecuencia == 'W':
+        # 1970-01-01 fue jueves: (días desde la época + 3) % 7 es 0 los lunes
+        periodos = dias - (dias.astype(np.int64) + 3) % 7
+    else:
+        raise ValueError(f"Frecuencia desconocida: {frecuencia}")
+    if not len(dias):
+        return periodos, np.asarray(valores)[:0]
+    inicios = np.concatenate([[0], np.flatnonzero(periodos[1:] != periodos[:-1]) + 1])
+    return periodos[inicios], np.add.reduceat(np.asarray(valores), inicios)
+
+
+# ============================================
+# TABLA DE SERIES
+# ============================================
+def _codigos_segmentos(segmentos):
+    """{columna: (código de cada segmento, {valor: código})} de las columnas de los segmentos"""
+    resultado = {}
+    for columna in COLUMNAS_SEGMENTO:
+        codigos, valores = pd.factorize(segmentos[columna])
+        resultado[columna] = (codigos, {v: i for i, v in enumerate(valores)})
+    return resultado
+
+
+def _unir_celdas(partes):
+    """Celdas de partes con días disjuntos, en el rango de días y los segmentos (ordenados) de todas.
+    Cada parte conserva el orden de sus segmentos, así que sus representantes de pedido no cambian"""
+    if len(partes) == 1:
+        return partes[0]
+    inicio = min(p_inicio for p_inicio, _, _ in partes)
+    n_dias = max(int((p_inicio - inicio).astype(np.int64)) + len(h['lineas']) for p_inicio, _, h in partes)
+    segmentos = (pd.concat([s for _, s, _ in partes]).drop_duplicates()
+                 .sort_values(COLUMNAS_SEGMENTO, kind='stable').reset_index(drop=True))
+    todos = pd.MultiIndex.from_frame(segmentos.astype(str))
+    horario = {medida: np.zeros((n_dias, 24, len(segmentos)), dtype=np.int64) for medida in partes[0][2]}
+    for p_inicio, p_segmentos, p_horario in partes:
+        desde = int((p_inicio - inicio).astype(np.int64))
+        posicion = todos.get_indexer(pd.MultiIndex.from_frame(p_segmentos.astype(str)))
+        for medida, valores in p_horario.items():
+            horario[medida][desde:desde + len(valores), :, posicion] = valores
+    return inicio, segmentos, horario
+
+
+class SeriesVentas:
+    """Medidas densas por (día, hora, segmento) y su calendario"""
+
+    def __init__(self, lineas):
+        # Las líneas en un DataFrame o en partes por tramo de días (almacén): cada parte se arma en sus
+        # propios días y segmentos y después se ubica en los de todas
+        if isinstance(lineas, pd.DataFrame):
+            self.inicio, self.segmentos, horario = self._celdas(lineas)
+        else:
+            self.inicio, self.segmentos, horario = _unir_celdas([self._celdas(parte) for parte in lineas])
+        self.dias = self.inicio + np.arange(len(horario['lineas']))
+        self._codigos = _codigos_segmentos(self.segmentos)
+
+        # Calendario de cada día, con los mismos valores que pone el pipeline
+        indice = pd.DatetimeIndex(self.dias)
+        self.calendario = pd.DataFrame({
+            'Fecha': indice.date,
+            'Mes': indice.month.map(mapa_meses),
+            'Mes Num': indice.month.to_numpy(np.int32),
+            'Día Semana': indice.dayofweek.to_numpy(np.int32),
+            'Día Semana Nombre': indice.day_name().map(dias_espanol),
+        })
+        self._dia_codigos = {}
+        for columna in ('Mes', 'Día Semana Nombre'):
+            codigos, valores = pd.factorize(self.calendario[columna])
+            self._dia_codigos[columna] = (codigos, {v: i for i, v in enumerate(valores)})
+
+        # Por día en int64; por hora con el entero más chico que alcance
+        self.diario = {medida: valores.sum(axis=1) for medida, valores in horario.items()}
+        self.horario = {medida: _entero_chico(valores) for medida, valores in horario.items()}
+
+    @staticmethod
+    def _celdas(lineas):
+        """(primer día, segmentos, {medida: arreglo int64 (días, 24, segmentos)}) de las líneas"""
+        fechas = lineas['Fecha Pedido'].to_numpy()
+        dia_linea = fechas.astype('datetime64[D]')
+        inicio = dia_linea.min() if len(dia_linea) else np.datetime64('1970-01-01')
+        dia = (dia_linea - inicio).astype(np.int64)
+        hora = lineas['Fecha Pedido'].dt.hour.to_numpy(np.int64)
+        n_dias = int(dia.max()) + 1 if len(dia) else 0
+
+        # Segmentos y sus columnas de filtro como códigos enteros
+        claves = lineas[COLUMNAS_SEGMENTO].astype({'Rango Precio': str})
+        segmento = claves.groupby(COLUMNAS_SEGMENTO, sort=True).ngroup().to_numpy()
+        segmentos = claves.groupby(COLUMNAS_SEGMENTO, sort=True).size().index.to_frame(index=False)
+        n_segmentos = len(segmentos)
+        codigos = _codigos_segmentos(segmentos)
+
+        celda = (dia * 24 + hora) * n_segmentos + segmento
+        forma = (n_dias, 24, n_segmentos)
+
+        def densa(pesos=None, celdas=celda):
+            suma = np.bincount(celdas, weights=pesos, minlength=n_dias * 24 * n_segmentos)
+            return np.rint(suma).astype(np.int64).reshape(forma)
+
+        centavos = np.rint(lineas['Ingreso Total'].to_numpy(dtype=float) * 100)
+        horario = {
+            'centavos': densa(centavos),
+            'unidades': densa(lineas['Cantidad Pedida'].to_numpy(dtype=float)),
+            'lineas': densa(),
+        }
+
+        # Pedidos: uno por representante (el segmento de menor código del pedido, dentro
+        # de su categoría, su rango o ambos según los filtros de producto activos)
+        pares = pd.DataFrame({'pedido': lineas['Pedido Key'].to_numpy(), 'segmento': segmento, 'celda': celda})
+        pares = pares.drop_duplicates(['pedido', 'segmento'])
+        pares['categoria'] = codigos['Categoría'][0][pares['segmento']]
+        pares['rango'] = codigos['Rango Precio'][0][pares['segmento']]
+        for variante, grupo in [((False, False), ['pedido']), ((True, False), ['pedido', 'categoria']),
+                                ((False, True), ['pedido', 'rango']), ((True, True), ['pedido', 'categoria', 'rango'])]:
+            representante = pares['segmento'] == pares.groupby(grupo)['segmento'].transform('min')
+            horario[('pedidos',) + variante] = densa(celdas=pares.loc[representante, 'celda'].to_numpy())
+        return inicio, segmentos, horario
+
+    @property
+    def bytes(self):
+        return sum(v.nbytes for v in self.diario.values()) + sum(v.nbytes for v in self.horario.values())
+
+    def seleccionar(self, filtro):
+        """(índices de los días, máscara de segmentos, variante de pedidos) del filtro, o None
+        si alguna condición no es de día ni de segmento"""
+        dias = np.ones(len(self.dias), dtype=bool)
+        if filtro.desde is not None:
+            dias[:np.searchsorted(self.dias, np.datetime64(filtro.desde, 'D'))] = False
+        if filtro.hasta is not None:
+            dias[np.searchsorted(self.dias, np.datetime64(filtro.hasta, 'D'), side='right'):] = False
+        segmentos = np.ones(len(self.segmentos), dtype=bool)
+        columnas = set()
+        for columna, valor in filtro.condiciones:
+            if columna in self._dia_codigos:
+                codigos, indice = self._dia_codigos[columna]
+                dias &= codigos == indice.get(str(valor), -1)
+            elif columna in self._codigos:
+                codigos, indice = self._codigos[columna]
+                segmentos &= codigos == indice.get(str(valor), -1)
+            else:
+                return None
+            columnas.add(columna)
+        variante = ('Categoría' in columnas, 'Rango Precio' in columnas)
+        return np.flatnonzero(dias), segmentos, variante
+
+    def _sumar(self, medida, seleccion, por_hora=False):
+        """Medida sumada sobre los segmentos elegidos: (días,) o (días, 24)"""
+        dias, segmentos, variante = seleccion
+        if medida == 'pedidos':
+            medida = ('pedidos',) + variante
+        valores = (self.horario if por_hora else self.diario)[medida][dias]
+        if segmentos.all():
+            return valores.sum(axis=-1, dtype=np.int64)
+        return valores[..., segmentos].sum(axis=-1, dtype=np.int64)
+
+    def agregar(self, claves, medidas, filtro):
+        """Agregación por columnas de tiempo con el mismo resultado que groupby(claves) sobre las
+        líneas filtradas (solo grupos con líneas); None si no se resuelve con las series"""
+        if not claves or not set(claves) <= COLUMNAS_TIEMPO or any(m not in MEDIDAS_SERIE for m in medidas.values()):
+            return None
+        seleccion = self.seleccionar(filtro)
+        if seleccion is None:
+            return None
+        por_hora = 'Hora' in claves
+
+        tabla = self.calendario.iloc[seleccion[0]]
+        if por_hora:
+            tabla = tabla.loc[tabla.index.repeat(24)].assign(Hora=np.tile(np.arange(24, dtype=np.int32), len(tabla)))
+        tabla = tabla[claves]
+        for alias, medida in medidas.items():
+            tabla[alias] = self._sumar(MEDIDAS_SERIE[medida], seleccion, por_hora).ravel()
+        con_lineas = self._sumar('lineas', seleccion, por_hora).ravel() > 0
+
+        resultado = tabla[con_lineas].groupby(claves)[list(medidas)].sum().reset_index()
+        for alias, medida in medidas.items():
+            if MEDIDAS_SERIE[medida] == 'centavos':
+                resultado[alias] = resultado[alias] / 100
+        return resultado
+
+    def serie(self, filtro, medida='centavos', por_hora=False):
+        """Serie densa (días sin ventas en cero) de una medida para el filtro, indexada por fecha u hora"""
+        seleccion = self.seleccionar(filtro)
+        if seleccion is None:
+            return None
+        valores = self._sumar(medida, seleccion, por_hora)
+        dias = self.dias[seleccion[0]]
+        if por_hora:
+            indice = pd.DatetimeIndex((dias[:, None] + np.arange(24).astype('timedelta64[h]')).ravel())
+            valores = valores.ravel()
+        else:
+            indice = pd.DatetimeIndex(dias)
+        if medida == 'centavos':
+            valores = valores / 100
+        return pd.Series(valores, index=indice.rename('Fecha'), name=NOMBRES_MEDIDA[medida])
+
+    def tendencia(self, filtro, ventana=7, dias_atras=7):
+        """Ingresos, unidades y pedidos por día, con media móvil, acumulado y variación de los ingresos"""
+        seleccion = self.seleccionar(filtro)
+        if seleccion is None:
+            return None
+        dias = self.dias[seleccion[0]]
+        ingresos = self._sumar('centavos', seleccion) / 100
+        return pd.DataFrame({
+            'Fecha': pd.DatetimeIndex(dias),
+            'Ingreso Total': ingresos,
+            'Cantidad Pedida': self._sumar('unidades', seleccion),
+            'Pedidos': self._sumar('pedidos', seleccion),
+            'Media Móvil': media_movil(dias, ingresos, ventana),
+            'Acumulado': acumulado(ingresos),
+            'Variación': variacion(dias, ingresos, dias_atras),
+        })
+
+
+# ============================================
+# PARIDAD
+# ============================================
+def verificar_series(df, filtros=None):
+    """Compara las agregaciones por tiempo y la serie diaria con groupby de pandas; devuelve las diferencias"""
+    from .consultas import AGREGACIONES, MotorPandas, filtros_de_prueba, fuente_en_memoria, filtrar
+
+    inicio = time.perf_counter()
+    series = SeriesVentas(df[COLUMNAS_SERIES])
+    print(f"\n   • {len(series.dias)} días x {len(series.segmentos)} segmentos en "
+          f"{time.perf_counter() - inicio:.1f}s ({series.bytes / 1e6:.1f} MB)")
+    datos = fuente_en_memoria(df)
+    referencia = MotorPandas(datos)
+    filtros = filtros or filtros_de_prueba(df)
+    diferencias = []
+    for caso, filtro in filtros.items():
+        tiempos = {'series': 0.0, 'pandas': 0.0}
+        for agregacion, (claves, medidas) in AGREGACIONES.items():
+            inicio = time.perf_counter()
+            obtenido = series.agregar(claves, medidas, filtro)
+            tiempos['series'] += time.perf_counter() - inicio
+            if obtenido is None:
+                continue
+            inicio = time.perf_counter()
+            esperado = referencia.agregar(agregacion, filtro)
+            tiempos['pandas'] += time.perf_counter() - inicio
+            if len(esperado) != len(obtenido) or any((esperado[c].to_numpy() != obtenido[c].to_numpy()).any() for c in claves):
+                diferencias.append((caso, agregacion, 'claves distintas'))
+                continue
+            for alias in medidas:
+                if not np.allclose(esperado[alias].to_numpy(float), obtenido[alias].to_numpy(float), rtol=1e-9):
+                    diferencias.append((caso, agregacion, f"'{alias}' distinto"))
+
+        # La tendencia cubre todos los días del filtro; los que tienen ventas coinciden con groupby('Fecha')
+        tendencia = series.tendencia(filtro)
+        data = filtrar(datos, filtro)
+        por_dia = data.groupby('Fecha')[['Ingreso Total', 'Cantidad Pedida']].sum()
+        por_dia['Pedidos'] = data.groupby('Fecha')['Pedido Key'].nunique()
+        densa = tendencia.set_index(tendencia['Fecha'].dt.date).reindex(por_dia.index)
+        for columna in por_dia.columns:
+            if not np.allclose(densa[columna].to_numpy(float), por_dia[columna].to_numpy(float), rtol=1e-9):
+                diferencias.append((caso, 'tendencia', f"'{columna}' distinto"))
+        if not np.isclose(tendencia['Ingreso Total'].sum(), data['Ingreso Total'].sum(), rtol=1e-9):
+            diferencias.append((caso, 'tendencia', 'días sin ventas con ingresos'))
+        print(f"     {caso:<20} series {tiempos['series'] * 1000:.1f} ms | pandas {tiempos['pandas'] * 1000:.1f} ms")
+    return diferencias
+
+
+if __name__ == '__main__':
+    import sys
+
+    from .carga import cargar_ventas
+
+    print("\n🔎 SERIES DE TIEMPO CONTRA GROUPBY")
+    diferencias = verificar_series(cargar_ventas())
+    for diferencia in diferencias:
+        print(f"   ❌ {diferencia}")
+    if not diferencias:
+        print("\n   ✅ Las series coinciden con pandas")
+    sys.exit(1 if diferencias else 0)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Servir el panel con varios workers compartiendo un único dataset:
+
+    VENTAS_RUTA=ventas gunicorn -c gunicorn.conf.py Ciencia_datos:server
+
+El proceso maestro carga los datos una vez, arma los índices del panel (pedidos,
+series, distintos, clientes, geo, productos y anomalías) y publica todo en
+VENTAS_COMPARTIDO (por defecto /dev/shm/ventas_panel, memoria compartida en Linux).
+Cada worker abre el dataset y los arreglos de los índices en modo solo lectura con
+mmap en lugar de volver a leer los CSV y rearmar los índices.
+"""
+
+import os
+
+bind = os.environ.get('VENTAS_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('VENTAS_WORKERS', '4'))
+timeout = 120
+
+os.environ.setdefault('VENTAS_COMPARTIDO', '/dev/shm/ventas_panel')
+
+
+def on_starting(server):
+    from datos_ventas import (cargar_ventas, publicar_dataset, almacen_disponible,
+                              COLUMNAS_PRONOSTICO, crear_pronosticos)
+    from Ciencia_datos import calcular_kpis, PanelVentas, INDICES_PUBLICADOS
+
+    if almacen_disponible(os.environ.get('VENTAS_ALMACEN')):
+        # Con almacén particionado cada worker lee por mmap solo las particiones que consulta
+        server.log.info("Usando el almacén %s; no se publica el dataset completo", os.environ['VENTAS_ALMACEN'])
+        return
+
+    df = cargar_ventas()
+    # Los pronósticos se ajustan aquí (en un pool de procesos) y quedan en la caché para los workers
+    crear_pronosticos(df[COLUMNAS_PRONOSTICO], df.attrs.get('version'))
+    # El reporte de calidad de la carga viaja con los KPIs: los workers no vuelven a leer los CSV
+    extras = {'kpis': calcular_kpis(df), 'calidad': df.attrs.get('calidad')}
+    # Los índices se arman una vez en un panel aparte (el global de los workers queda sin cargar)
+    # y se publican con el dataset: sus arreglos van en .npy que los workers abren por mmap
+    indices = PanelVentas(None)
+    indices.df = df
+    objetos = {nombre: getattr(indices, nombre) for nombre in INDICES_PUBLICADOS}
+    carpeta = publicar_dataset(df, os.environ['VENTAS_COMPARTIDO'], extras=extras, objetos=objetos)
+    server.log.info("Dataset e índices publicados en %s (%s filas, versión %s)", carpeta, f"{len(df):,}",
+                    df.attrs.get('version'))
+
+
+def post_fork(server, worker):
+    # Cada worker se adjunta al dataset publicado en segundo plano
+    from Ciencia_datos import panel
+    panel.precargar()
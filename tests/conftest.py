@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Datos sintéticos para las pruebas: CSV con el formato de los originales
+(Dataset_de_ventas_<Mes>.csv) en una carpeta temporal.
+"""
+
+import os
+import sys
+import tempfile
+
+# datos_ventas lee la ruta y la caché al importarse: las pruebas no tocan las del usuario
+os.environ['VENTAS_RUTA'] = tempfile.mkdtemp(prefix='ventas_csv_')
+os.environ['VENTAS_CACHE'] = tempfile.mkdtemp(prefix='ventas_cache_')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datos_ventas import cargar_ventas, mapa_meses
+
+# (producto, precio): una o más por categoría y por rango de precio
+CATALOGO = [('USB-C Charging Cable', 11.95), ('Lightning Charging Cable', 14.95), ('AA Batteries (4-pack)', 3.84),
+            ('Wired Headphones', 11.99), ('Bose SoundSport Headphones', 99.99), ('Apple Airpods Headphones', 150.0),
+            ('27in FHD Monitor', 149.99), ('20in Monitor', 109.99), ('iPhone', 700.0), ('Google Phone', 600.0),
+            ('Macbook Pro Laptop', 1700.0), ('Flatscreen TV', 300.0), ('LG Dryer', 600.0)]
+# (ciudad, estado, código postal)
+LUGARES = [('Dallas', 'TX', '75001'), ('Austin', 'TX', '73301'), ('San Francisco', 'CA', '94016'),
+           ('Los Angeles', 'CA', '90001'), ('Boston', 'MA', '02215'), ('New York City', 'NY', '10001'),
+           ('Seattle', 'WA', '98101'), ('Atlanta', 'GA', '30301')]
+
+
+def generar_ventas(carpeta, meses=(1, 2, 3), pedidos_por_dia=30, semilla=0):
+    """Un CSV por mes de 2019 con pedidos de 1 a 3 productos distintos; todas las líneas de un
+    pedido comparten fecha, hora y dirección, como en los originales"""
+    azar = np.random.default_rng(semilla)
+    pedido = 100000
+    for mes in meses:
+        filas = []
+        for dia in pd.date_range(f'2019-{mes:02d}-01', periods=pd.Period(f'2019-{mes:02d}').days_in_month):
+            for _ in range(pedidos_por_dia):
+                pedido += 1
+                momento = dia + pd.Timedelta(minutes=int(azar.integers(24 * 60)))
+                ciudad, estado, postal = LUGARES[azar.integers(len(LUGARES))]
+                direccion = f"{azar.integers(1, 999)} Main St, {ciudad}, {estado} {postal}"
+                for i in azar.choice(len(CATALOGO), size=azar.integers(1, 4), replace=False):
+                    producto, precio = CATALOGO[i]
+                    filas.append((pedido, producto, int(azar.integers(1, 4)), precio,
+                                  momento.strftime('%m/%d/%y %H:%M'), direccion))
+        columnas = ['ID de Pedido', 'Producto', 'Cantidad Pedida', 'Precio Unitario', 'Fecha de Pedido',
+                    'Dirección de Envio']
+        pd.DataFrame(filas, columns=columnas).to_csv(
+            os.path.join(carpeta, f'Dataset_de_ventas_{mapa_meses[mes]}.csv'), index=False)
+    return carpeta
+
+
+@pytest.fixture(scope='session')
+def ruta_ventas():
+    """Carpeta VENTAS_RUTA con los CSV sintéticos"""
+    return generar_ventas(os.environ['VENTAS_RUTA'])
+
+
+@pytest.fixture(scope='session')
+def ventas(ruta_ventas):
+    """Dataset limpio y enriquecido de los CSV sintéticos"""
+    return cargar_ventas(ruta_ventas, usar_cache=False)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Con almacén, un refresco del panel sobre todo el historial lee de a una partición y solo las
+columnas que usan sus tareas: nunca arma el historial entero."""
+
+import os
+
+import pytest
+
+from datos_ventas import AlmacenVentas, construir_almacen
+
+# Columnas que puede leer a la vez una tarea (la más ancha es el comparador)
+MAX_COLUMNAS = 12
+
+
+@pytest.fixture(scope='module')
+def modulo_panel(ruta_ventas, tmp_path_factory):
+    """Ciencia_datos sobre un almacén de los CSV sintéticos, con los índices ya armados"""
+    carpeta = str(tmp_path_factory.mktemp('almacen'))
+    construir_almacen(ruta_ventas, carpeta)
+    os.environ.update({'VENTAS_ALMACEN': carpeta, 'VENTAS_CACHE_FIGURAS': 'ninguna', 'VENTAS_PRECALENTAR': '0'})
+    import Ciencia_datos
+    Ciencia_datos.panel.calentar()
+    assert Ciencia_datos.panel.error is None
+    yield Ciencia_datos
+    os.environ.pop('VENTAS_ALMACEN')
+
+
+@pytest.fixture
+def lecturas(monkeypatch):
+    """(particiones, columnas) de cada lectura del almacén"""
+    registradas = []
+    marco = AlmacenVentas._marco
+
+    def registrar(self, particiones, desde, hasta, columnas):
+        registradas.append((len(particiones), len(columnas)))
+        return marco(self, particiones, desde, hasta, columnas)
+    monkeypatch.setattr(AlmacenVentas, '_marco', registrar)
+    return registradas
+
+
+def test_historial_no_se_carga_entero(modulo_panel):
+    with pytest.raises(RuntimeError):
+        modulo_panel.panel.df
+
+
+def test_refresco_completo_lee_de_a_una_particion(modulo_panel, ventas, lecturas):
+    panel = modulo_panel.panel
+    assert len(panel.almacen.particiones()) == 3
+    inicio, fin = str(panel.opciones['fecha_min']), str(panel.opciones['fecha_max'])
+    salidas = modulo_panel.update_dashboard('Todas', 'Todos', 'Todos', 'Todos', 'Todas', 'Todos', inicio, fin,
+                                            'Mes', 'Mes', ['2019-01', '2019-02'], 'ingresos')
+
+    assert salidas[0].startswith(f"📊 {len(ventas):,} transacciones")
+    assert lecturas
+    assert max(particiones for particiones, _ in lecturas) <= 1
+    assert max(columnas for _, columnas in lecturas) <= MAX_COLUMNAS
+
+
+def test_resumen_por_particiones(modulo_panel, ventas, lecturas):
+    resumen = modulo_panel.panel.motor.agregar('resumen', modulo_panel.SIN_FILTRO,
+                                               modulo_panel.panel.lineas(modulo_panel.SIN_FILTRO, ['Ingreso Total',
+                                                                          'Pedido Key', 'Cantidad Pedida',
+                                                                          'Ciudad', 'Producto']))
+    fila = resumen.iloc[0]
+    assert fila['Filas'] == len(ventas)
+    assert fila['Pedidos'] == ventas['Pedido Key'].nunique()
+    assert fila['Cantidad Pedida'] == ventas['Cantidad Pedida'].sum()
+    assert fila['Ingreso Total'] == pytest.approx(ventas['Ingreso Total'].sum())
+    assert fila['Ciudades'] == ventas['Ciudad'].nunique()
+    assert fila['Productos'] == ventas['Producto'].nunique()
+    assert max(particiones for particiones, _ in lecturas) <= 1
+
+
+def test_exportaciones_leen_de_a_una_particion(modulo_panel, lecturas):
+    filtros = ('Todas', 'Todos', 'Todos', 'Todos', 'Todas', 'Todos', None, None)
+    for informe in (modulo_panel.exportar_general(1, *filtros), modulo_panel.exportar_producto(1, *filtros, 'Mes'),
+                    modulo_panel.exportar_eventos(1, *filtros)):
+        assert 'KPIs Principales' in informe['content']
+    assert max(particiones for particiones, _ in lecturas) <= 1
+    assert max(columnas for _, columnas in lecturas) <= MAX_COLUMNAS
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Los objetos publicados con el dataset vuelven iguales y con sus arreglos grandes sobre mmap."""
+
+import numpy as np
+import pandas as pd
+
+from datos_ventas import adjuntar_dataset, adjuntar_objetos, publicar_dataset
+from datos_ventas.columnar import BYTES_MINIMOS_NPY
+
+
+def test_objetos_publicados_se_adjuntan_por_mmap(tmp_path):
+    n = 50_000
+    df = pd.DataFrame({'Pedido Key': np.arange(n), 'Ingreso Total': np.linspace(1, 2, n)})
+    grande = np.arange(n, dtype=np.int64)
+    indice = {'grande': grande, 'otra_vez': grande, 'chico': np.arange(3),
+              'tabla': df.groupby(df['Pedido Key'] % 7)['Ingreso Total'].sum().to_frame()}
+    carpeta = publicar_dataset(df, str(tmp_path / 'publicado'), objetos={'indice': indice})
+
+    publicados = adjuntar_objetos(carpeta)
+    adjuntado = publicados['indice']
+    assert isinstance(adjuntado['grande'], np.memmap) and not adjuntado['grande'].flags.writeable
+    # Una referencia compartida se guarda una sola vez
+    assert adjuntado['otra_vez'] is adjuntado['grande']
+    assert grande.nbytes >= BYTES_MINIMOS_NPY and not isinstance(adjuntado['chico'], np.memmap)
+    np.testing.assert_array_equal(adjuntado['grande'], grande)
+    pd.testing.assert_frame_equal(adjuntado['tabla'], indice['tabla'])
+    assert len(adjuntar_dataset(carpeta)) == n
+
+
+def test_sin_objetos_publicados(tmp_path):
+    carpeta = publicar_dataset(pd.DataFrame({'a': [1, 2]}), str(tmp_path / 'publicado'))
+    assert adjuntar_objetos(carpeta) == {}
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""Paridad de los motores de consultas con pandas en todas las agregaciones, sobre el dataset
+sintético. Los tiempos a 10x/100x siguen en `python -m datos_ventas.consultas`."""
+
+import pytest
+
+from datos_ventas import verificar_paridad
+
+
+@pytest.mark.parametrize('motor', ['pedidos', 'distintos', 'series', 'sqlite', 'duckdb'])
+def test_paridad_con_pandas(ventas, motor):
+    if motor == 'duckdb':
+        pytest.importorskip('duckdb')
+    assert verificar_paridad(ventas, nombres=(motor,)) == []
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Bocetos de distintos contra nunique de pandas: el modo exacto coincide y el aproximado queda dentro
+de la tolerancia de `verificar_distintos`. Los tiempos siguen en `python -m datos_ventas.distintos`."""
+
+import numpy as np
+import pytest
+
+from conftest import generar_ventas
+from datos_ventas import COLUMNAS_DISTINTOS, TablaDistintos, cargar_ventas, filtrar, verificar_distintos
+from datos_ventas.consultas import filtros_de_prueba, fuente_en_memoria
+from datos_ventas.distintos import COLUMNAS_CONTADAS, LIMITE_BITS
+
+SIGMAS = 4
+
+
+@pytest.fixture(scope='module')
+def ventas_grandes(tmp_path_factory):
+    """Más pedidos que LIMITE_BITS: en modo aproximado los pedidos van a un HyperLogLog"""
+    carpeta = generar_ventas(str(tmp_path_factory.mktemp('ventas_grandes')), pedidos_por_dia=60, semilla=1)
+    df = cargar_ventas(carpeta, usar_cache=False)
+    assert df['Pedido Key'].nunique() > LIMITE_BITS
+    return df
+
+
+def _esperados(df, filtro):
+    data = filtrar(fuente_en_memoria(df), filtro)
+    return {columna: data[columna].nunique() for columna in COLUMNAS_CONTADAS}
+
+
+def test_exacto_igual_a_nunique(ventas_grandes):
+    tabla = TablaDistintos(ventas_grandes[COLUMNAS_DISTINTOS], 'exacto')
+    assert tabla.bocetos['Pedido Key'][0] == 'claves'
+    for caso, filtro in filtros_de_prueba(ventas_grandes).items():
+        assert tabla.contar(filtro) == _esperados(ventas_grandes, filtro), caso
+
+
+def test_aproximado_dentro_de_la_tolerancia(ventas_grandes):
+    tabla = TablaDistintos(ventas_grandes[COLUMNAS_DISTINTOS], 'aproximado')
+    assert tabla.bocetos['Pedido Key'][0] == 'hll'
+    tolerancia = SIGMAS * 1.04 / np.sqrt(1 << tabla.precision)
+    for caso, filtro in filtros_de_prueba(ventas_grandes).items():
+        conteos, esperados = tabla.contar(filtro), _esperados(ventas_grandes, filtro)
+        for columna in COLUMNAS_CONTADAS:
+            assert abs(conteos[columna] - esperados[columna]) <= tolerancia * esperados[columna], (caso, columna)
+
+
+def test_por_partes_igual_que_entero(ventas_grandes):
+    lineas = ventas_grandes.sort_values('Fecha')[COLUMNAS_DISTINTOS]
+    entera = TablaDistintos(lineas, 'exacto')
+    # Una parte por mes, como las particiones del almacén
+    por_partes = TablaDistintos([parte for _, parte in lineas.groupby('Mes', sort=False)], 'exacto')
+    for filtro in filtros_de_prueba(ventas_grandes).values():
+        assert por_partes.contar(filtro) == entera.contar(filtro)
+
+
+def test_verificar_distintos_sin_diferencias(ventas):
+    assert verificar_distintos(ventas, sigmas=SIGMAS) == []